@@ -0,0 +1,264 @@
+# app/batch.py
+"""
+Offline bulk (re)scoring of JSONL wallet dumps, e.g. after the scoring weights changed:
+
+    python -m app.batch wallets.jsonl --out rescored/ [--workers 8] [--chunk-mb 16] [--compress gzip]
+
+The input (one WalletMessage per line) is memory-mapped and cut into byte ranges of about
+--chunk-mb that end on a line boundary. A process pool scores whole ranges with the
+service's own model and executor code (SCORING_MODEL, TX_DEDUP, ... apply) and writes,
+per range n, part-<n>.success.jsonl and part-<n>.failure.jsonl (.gz with --compress
+gzip) into --out: one SuccessMessage / FailureMessage per line, in input order.
+Arrow IPC / Parquet transaction tables (app.models.arrow_ingest) are scored as a
+single range, in this process, straight from their columns.
+
+Every finished range is recorded in <out>/checkpoint.jsonl. Running the same command
+again skips the recorded ranges, so an interrupted run resumes where it stopped; --restart
+throws the previous results away. Parts are plain concatenable files:
+
+    cat rescored/part-*.success.jsonl.gz > success.jsonl.gz
+"""
+import os
+import sys
+import glob
+import gzip
+import json
+import mmap
+import time
+import logging
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from app.models.arrow_ingest import check_model, is_table_file, score_file
+from app.services.executor import OK, SCORING_MP_CONTEXT, ScoringExecutor, _init_worker, build_model
+from app.utils.encoding import encode_result
+
+log = logging.getLogger("app.batch")
+
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", str(os.cpu_count() or 1)))
+BATCH_CHUNK_MB = float(os.getenv("BATCH_CHUNK_MB", "16"))
+BATCH_SIZE = int(os.getenv("BATCH_SIZE", "256"))  # wallets per score() call inside a range
+CHECKPOINT_NAME = "checkpoint.jsonl"
+
+_executor: Optional[ScoringExecutor] = None
+
+
+def chunk_ranges(path: str, chunk_bytes: int) -> List[Tuple[int, int]]:
+    """[start, end) byte ranges of about `chunk_bytes` covering the file, each ending after a newline (or at EOF)."""
+    size = os.path.getsize(path)
+    if size == 0:
+        return []
+    ranges = []
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        start = 0
+        while start < size:
+            nl = mm.find(b"\n", min(start + max(1, chunk_bytes), size) - 1)
+            end = size if nl < 0 else nl + 1
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+
+def part_paths(out_dir: str, index: int, compress: str) -> Tuple[str, str]:
+    ext = ".jsonl.gz" if compress == "gzip" else ".jsonl"
+    base = os.path.join(out_dir, f"part-{index:05d}")
+    return base + ".success" + ext, base + ".failure" + ext
+
+
+def _open_out(path: str, compress: str):
+    return gzip.open(path, "wb", compresslevel=6) if compress == "gzip" else open(path, "wb")
+
+
+def score_range(path: str, index: int, start: int, end: int, out_dir: str,
+                compress: str = "none", batch_size: int = BATCH_SIZE) -> Dict[str, int]:
+    """
+    Score the wallets of one byte range into its part files (written under a temporary
+    name and renamed when complete). Returns the range's checkpoint row.
+    """
+    row = {"chunk": index, "bytes": end - start, "wallets": 0, "ok": 0, "failed": 0}
+    ok_path, fail_path = part_paths(out_dir, index, compress)
+    with _open_out(ok_path + ".tmp", compress) as ok_f, _open_out(fail_path + ".tmp", compress) as fail_f:
+        for scored in _scored_batches(path, start, end, batch_size):
+            row["wallets"] += len(scored)
+            for status, result in scored:
+                if status == OK:
+                    ok_f.write(encode_result(result) + b"\n")
+                    row["ok"] += 1
+                else:
+                    fail_f.write(encode_result(result) + b"\n")
+                    row["failed"] += 1
+    os.replace(ok_path + ".tmp", ok_path)
+    os.replace(fail_path + ".tmp", fail_path)
+    return row
+
+
+def _scored_batches(path: str, start: int, end: int, batch_size: int) -> Iterator[List[Tuple[str, Dict[str, Any]]]]:
+    global _executor
+    if is_table_file(path):
+        # an Arrow/Parquet file is a single range, scored straight from its columns
+        yield [(OK, result) for result in score_file(build_model(), path)]
+        return
+    if _executor is None:
+        # no result cache: every wallet is scored once; big wallets still stream
+        _executor = ScoringExecutor(mode="thread", cache=None)
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        lines = [line for line in mm[start:end].split(b"\n") if line.strip()]
+    for i in range(0, len(lines), batch_size):
+        yield _executor.score(lines[i:i + batch_size])
+
+
+class CheckpointMismatch(ValueError):
+    """The output directory holds the checkpoint of a different run."""
+
+
+class Checkpoint:
+    """
+    <out>/checkpoint.jsonl: a header line naming the run (input identity, chunking,
+    compression), then one row per finished range, appended and fsynced as ranges
+    complete. A torn last line (the run was killed while writing it) is dropped.
+    """
+
+    def __init__(self, out_dir: str, header: Dict[str, Any], restart: bool = False):
+        self.path = os.path.join(out_dir, CHECKPOINT_NAME)
+        self.done: Dict[int, Dict[str, int]] = {}
+        if restart and os.path.exists(self.path):
+            os.remove(self.path)
+        if os.path.exists(self.path):
+            with open(self.path, "rb") as f:
+                data = f.read()
+            keep = data[:data.rfind(b"\n") + 1]
+            lines = keep.splitlines()
+            if not lines or json.loads(lines[0]) != header:
+                raise CheckpointMismatch(f"{self.path} belongs to a different input, --chunk-mb or "
+                                         f"--compress; pass --restart to discard it")
+            for line in lines[1:]:
+                row = json.loads(line)
+                self.done[row["chunk"]] = row
+            if len(keep) != len(data):
+                with open(self.path, "r+b") as f:
+                    f.truncate(len(keep))
+        else:
+            with open(self.path, "wb") as f:
+                f.write(json.dumps(header).encode() + b"\n")
+        self._f = open(self.path, "ab")
+
+    def add(self, row: Dict[str, int]):
+        self._f.write(json.dumps(row).encode() + b"\n")
+        self._f.flush()
+        os.fsync(self._f.fileno())
+        self.done[row["chunk"]] = row
+
+    def close(self):
+        self._f.close()
+
+
+class Progress:
+    """Periodic progress / throughput log lines; rates count only this run's ranges."""
+
+    def __init__(self, total_chunks: int, total_bytes: int, resumed: List[Dict[str, int]], every_s: float):
+        self.total_chunks, self.total_bytes = total_chunks, total_bytes
+        self.chunks = len(resumed)
+        self.bytes = sum(r["bytes"] for r in resumed)
+        self.ok = sum(r["ok"] for r in resumed)
+        self.failed = sum(r["failed"] for r in resumed)
+        self.run_wallets = self.run_bytes = 0
+        self.every_s = every_s
+        self.t0 = self._last = time.monotonic()
+
+    def add(self, row: Dict[str, int]):
+        self.chunks += 1
+        self.bytes += row["bytes"]
+        self.ok += row["ok"]
+        self.failed += row["failed"]
+        self.run_wallets += row["wallets"]
+        self.run_bytes += row["bytes"]
+        if time.monotonic() - self._last >= self.every_s:
+            self._last = time.monotonic()
+            log.info("%s", self.line())
+
+    def line(self) -> str:
+        elapsed = max(time.monotonic() - self.t0, 1e-9)
+        rate = self.run_bytes / elapsed
+        eta = (self.total_bytes - self.bytes) / rate if rate > 0 else 0.0
+        return (f"chunks {self.chunks}/{self.total_chunks}  wallets {self.ok + self.failed:,} "
+                f"(failed {self.failed:,})  {self.run_wallets / elapsed:,.0f} wallets/s  "
+                f"{rate / 2 ** 20:.1f} MB/s  eta {time.strftime('%H:%M:%S', time.gmtime(eta))}")
+
+
+def run(args) -> int:
+    os.makedirs(args.out, exist_ok=True)
+    if args.restart:
+        for p in glob.glob(os.path.join(args.out, "part-*")):
+            os.remove(p)
+    for p in glob.glob(os.path.join(args.out, "part-*.tmp")):
+        os.remove(p)  # left behind by a killed run
+
+    chunk_bytes = max(1, int(args.chunk_mb * 2 ** 20))
+    st = os.stat(args.input)
+    header = {"input": os.path.abspath(args.input), "size": st.st_size, "mtime_ns": st.st_mtime_ns,
+              "chunk_bytes": chunk_bytes, "compress": args.compress}
+    checkpoint = Checkpoint(args.out, header, restart=args.restart)
+    ranges = [(0, st.st_size)] if is_table_file(args.input) else chunk_ranges(args.input, chunk_bytes)
+    todo = [(i, s, e) for i, (s, e) in enumerate(ranges) if i not in checkpoint.done]
+    progress = Progress(len(ranges), st.st_size, list(checkpoint.done.values()), args.progress_s)
+    if checkpoint.done:
+        log.info("resuming: %d of %d chunks already done", len(checkpoint.done), len(ranges))
+
+    pool: Optional[ProcessPoolExecutor] = None
+    try:
+        if args.workers <= 1 or is_table_file(args.input):
+            for i, s, e in todo:
+                row = score_range(args.input, i, s, e, args.out, args.compress, args.batch_size)
+                checkpoint.add(row)
+                progress.add(row)
+        elif todo:
+            pool = ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker,
+                                       mp_context=multiprocessing.get_context(SCORING_MP_CONTEXT))
+            futures = [pool.submit(score_range, args.input, i, s, e, args.out, args.compress, args.batch_size)
+                       for i, s, e in todo]
+            for fut in as_completed(futures):
+                row = fut.result()
+                checkpoint.add(row)
+                progress.add(row)
+    except KeyboardInterrupt:
+        log.warning("interrupted after %d of %d chunks; run the same command again to resume",
+                    progress.chunks, len(ranges))
+        return 130
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+        checkpoint.close()
+    log.info("done: %s", progress.line())
+    return 0
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m app.batch")
+    ap.add_argument("input", help="JSONL file, one wallet message per line")
+    ap.add_argument("--out", required=True, help="output directory (part files + checkpoint)")
+    ap.add_argument("--workers", type=int, default=BATCH_WORKERS, help="scoring processes (1: in this process)")
+    ap.add_argument("--chunk-mb", type=float, default=BATCH_CHUNK_MB, help="input bytes per range / checkpoint step")
+    ap.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="wallets per scoring call")
+    ap.add_argument("--compress", choices=("none", "gzip"), default="none")
+    ap.add_argument("--restart", action="store_true", help="discard the checkpoint and parts in --out")
+    ap.add_argument("--progress-s", type=float, default=5.0, help="seconds between progress lines")
+    ap.add_argument("--log-level", default="info")
+    args = ap.parse_args(argv)
+    logging.basicConfig(level=args.log_level.upper(), format="%(asctime)s %(name)s %(levelname)s %(message)s")
+    if args.batch_size < 1:
+        ap.error("--batch-size must be at least 1")
+    if is_table_file(args.input):
+        try:
+            check_model(build_model())
+        except ValueError as e:
+            ap.error(str(e))
+    try:
+        return run(args)
+    except CheckpointMismatch as e:
+        ap.error(str(e))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,11 +1,26 @@
 # app/main.py
+import os
+import json
 import time
-from fastapi import FastAPI, HTTPException
+from time import perf_counter_ns
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from pydantic import ValidationError
+from starlette.concurrency import run_in_threadpool
 
-from app.models.dex_model import DexScoringModel
-from app.utils.types import WalletMessage, to_serializable
+from app.utils.types import WalletMessage, failure_message
+from app.utils.stream import WalletStreamDecoder, DecodeError
+from app.utils.encoding import encode_result
+from app.utils.metrics import METRICS, Registry, stage
+from app.utils.profiling import PROFILING_ENABLED, SAMPLER, sort_key
+from app.services.executor import (ScoringExecutor, OK, INVALID, STREAM_MIN_BYTES, SCORING_WARMUP,
+                                   get_model, score_profiled, warm_up)
+from app.services.coalescer import build_coalescer
 from app.services.kafka_service import KafkaScoringService, KAFKA_ENABLED
+from app.services.mock_broker import BrokerFullError
+from app.services.workers import SharedStats, WORKER_ID
 
 app = FastAPI(title="AI Scoring Server", version="1.0.0")
 
@@ -16,33 +31,107 @@ app.add_middleware(
     allow_methods=["*"], allow_headers=["*"],
 )
 
-# Model + stats
-model = DexScoringModel()
-stats = {"processed": 0, "success": 0, "failure": 0, "avg_ms": 0.0}
+# Metrics (the model, its config snapshot and normalizer are the executor's: get_model())
+_WALLETS = {outcome: METRICS.counter("scoring_wallets_total", "Wallets scored over HTTP", outcome=outcome)
+            for outcome in ("success", "failure")}
+_WALLET_MS = METRICS.counter("scoring_wallets_ms_total", "Summed HTTP scoring time of all wallets, ms")
+_T_SERIALIZE = stage("serialize")
+
+# wallets scored per model.score_batch call on the bulk endpoint
+BATCH_CHUNK_SIZE = int(os.getenv("BATCH_CHUNK_SIZE", "256"))
+
+# /api/v1/score reads the raw body, but documents it as the WalletMessage it must be
+# (the schema is in components since /api/v1/kafka/publish takes a WalletMessage)
+_WALLET_BODY = {"requestBody": {"required": True, "content": {
+    "application/json": {"schema": {"$ref": "#/components/schemas/WalletMessage"}}}}}
+
+# Scoring backend shared by the endpoints and Kafka (SCORING_EXECUTOR=thread|process)
+scoring = ScoringExecutor()
+# batches concurrent /score requests into one model call (SCORE_COALESCE_WINDOW_MS)
+coalescer = build_coalescer(scoring)
 
 # Kafka service (lazy init)
 kafka: KafkaScoringService | None = None
 
+# Stats shared with the other workers when run by app.serve (None in a single process)
+shared_stats = SharedStats.from_env()
+
 
 @app.on_event("startup")
 def on_startup():
     """
-    Start Kafka service only if enabled.
+    Warm up the scoring executor (its worker processes, and with SCORING_WARMUP the
+    scoring paths of this process), then start the Kafka pipeline (against real Kafka
+    when enabled, the in-process mock broker otherwise).
     """
     global kafka
-    kafka = KafkaScoringService()
-    if kafka.real_mode:   # Only start threads if real Kafka mode
-        kafka.start()
+    scoring.start()
+    if SCORING_WARMUP:
+        warm_up()
+    kafka = KafkaScoringService(executor=scoring)
+    kafka.start()
+    if shared_stats is not None:
+        shared_stats.start(_worker_snapshot)
+
+
+@app.on_event("startup")
+async def warm_http():
+    """
+    With SCORING_WARMUP, send one GET /api/v1/health through the app in-process: the
+    first request otherwise pays for anyio's lazily imported stream modules and the
+    first thread-pool worker (~25 ms on a cold pod).
+    """
+    if not SCORING_WARMUP:
+        return
+    path = "/api/v1/health"
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+             "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "",
+             "query_string": b"", "headers": [], "client": None, "server": None}
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    await app(scope, receive, send)
 
 
 @app.on_event("shutdown")
 def on_shutdown():
     """
-    Stop Kafka service cleanly.
+    Stop Kafka service cleanly and save the score-distribution snapshot.
     """
     global kafka
     if kafka:
         kafka.stop()
+    if shared_stats is not None:
+        shared_stats.stop()
+    scoring.stop()  # process mode: the workers publish their sketches as they exit
+    normalizer = get_model().normalizer
+    if normalizer is not None:
+        normalizer.save()
+
+
+def _record_stats(success: int, failure: int, total_ms: float):
+    """
+    Count `success + failure` scored wallets taking `total_ms` overall.
+    """
+    _WALLETS["success"].inc(success)
+    _WALLETS["failure"].inc(failure)
+    _WALLET_MS.inc(total_ms)
+
+
+@app.middleware("http")
+async def _time_requests(request: Request, call_next):
+    t = perf_counter_ns()
+    response = await call_next(request)
+    # streamed responses are timed up to their first byte; unrouted paths share one
+    # label so scanners cannot grow the registry
+    route = request.scope.get("route")
+    METRICS.histogram("http_request_seconds", "HTTP request latency", path=getattr(route, "path", "unmatched"),
+                      status=str(response.status_code)).record_ns(perf_counter_ns() - t)
+    return response
 
 
 @app.get("/")
@@ -58,37 +147,246 @@ def health():
     return {"status": "ok", "kafka_enabled": KAFKA_ENABLED}
 
 
+def _wallet_stats(registry: Registry) -> dict:
+    # the same series looked up in `registry` (this process's, or all workers' merged)
+    c = _WALLETS["success"]
+    success, failure = (registry.counter(c.name, c.help, outcome=o).value() for o in ("success", "failure"))
+    n = success + failure
+    ms = registry.counter(_WALLET_MS.name, _WALLET_MS.help).value()
+    return {"processed": n, "success": success, "failure": failure, "avg_ms": ms / n if n else 0.0}
+
+
+def _local_stats() -> dict:
+    out = _wallet_stats(METRICS)
+    if scoring.cache is not None:
+        out["cache"] = scoring.cache.stats()
+    model = get_model()
+    if model.config is not None:
+        out["config"] = model.config.stats()
+    if model.normalizer is not None:
+        out["normalization"] = model.normalizer.stats()
+    if scoring.incremental is not None and scoring.incremental.dedup is not None:
+        out["dedup"] = scoring.incremental.dedup.stats()
+    if kafka is not None:
+        out["kafka"] = dict(kafka.stats)
+        if kafka.broker is not None:
+            out["kafka"]["broker"] = kafka.broker.stats()
+    return out
+
+
+def _worker_snapshot() -> dict:
+    return {"worker": WORKER_ID, "pid": os.getpid(), "published": time.time(),
+            "stats": _local_stats(), "metrics": METRICS.export()}
+
+
+def _worker_snapshots() -> list:
+    shared_stats.publish()  # our own slot is always current
+    return shared_stats.read_all()
+
+
 @app.get("/api/v1/stats")
 def get_stats():
     """
-    Return processing statistics.
+    Return processing statistics (plus result-cache counters when caching is on and
+    the config snapshot version/staleness when MongoDB config is on).
+    Latency percentiles per stage are on /api/v1/metrics.
+    Under app.serve the answer covers all workers: "total" sums the wallet counters
+    and Kafka counts of every worker, "workers" has each worker's own stats as of its
+    last publish (at most SHARED_STATS_INTERVAL_S old, see "age_s"), and "worker" is
+    the one that answered.
+    """
+    if shared_stats is None:
+        return _local_stats()
+    snaps = _worker_snapshots()
+    now = time.time()
+    total = _wallet_stats(Registry.merged(s["metrics"] for s in snaps))
+    per_worker = [s["stats"]["kafka"] for s in snaps if "kafka" in s["stats"]]
+    if per_worker:
+        total["kafka"] = {k: sum(w.get(k, 0) for w in per_worker)
+                          for k, v in per_worker[0].items() if isinstance(v, (int, float))}
+    workers = {str(s["worker"]): dict(s["stats"], pid=s["pid"], age_s=round(now - s["published"], 3))
+               for s in snaps}
+    return {"worker": WORKER_ID, "total": total, "workers": workers}
+
+
+@app.get("/api/v1/metrics")
+def get_metrics():
+    """
+    Prometheus text exposition of the counters and latency histograms (p50/p95/p99 per
+    scoring stage and per endpoint), summed over all workers under app.serve.
+    """
+    registry = METRICS if shared_stats is None else Registry.merged(s["metrics"] for s in _worker_snapshots())
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+
+def _require_profiling():
+    if not PROFILING_ENABLED:
+        raise HTTPException(status_code=404, detail="profiling is disabled (PROFILING_ENABLED)")
+
+
+@app.post("/api/v1/admin/profile")
+def start_profile(seconds: float = 30.0, interval_ms: float = 5.0):
+    """
+    Run the sampling profiler over the whole process (HTTP and Kafka threads) for
+    `seconds`; the collapsed stacks are written to PROFILE_DIR and served by GET.
     """
-    return stats
+    _require_profiling()
+    if not SAMPLER.start(seconds, interval_ms / 1000):
+        raise HTTPException(status_code=409, detail="a profiling run is already in progress")
+    return SAMPLER.status()
 
 
-@app.post("/api/v1/score")
-def score_wallet(payload: WalletMessage):
+@app.delete("/api/v1/admin/profile")
+def stop_profile():
+    """
+    End the current sampling run early.
+    """
+    _require_profiling()
+    SAMPLER.stop()
+    return SAMPLER.status()
+
+
+@app.get("/api/v1/admin/profile")
+def get_profile(status: bool = False):
+    """
+    Collapsed stacks of the current or last run ("frame;frame;... count" per line, for
+    flamegraph.pl or speedscope), or the run status with ?status=true.
+    """
+    _require_profiling()
+    if status:
+        return SAMPLER.status()
+    return PlainTextResponse(SAMPLER.collapsed())
+
+
+@app.get("/api/v1/sketch")
+def get_sketch():
+    """
+    Export the merged LP/swap score-distribution sketches (load it at startup through
+    SCORE_SKETCH_PATH). Only available with SCORE_NORMALIZATION=percentile.
+    """
+    normalizer = get_model().normalizer
+    if normalizer is None:
+        raise HTTPException(status_code=404, detail="score normalization is off")
+    return normalizer.export()
+
+
+def _request_errors(body, error: str) -> list:
+    """
+    The errors of an invalid /score body as FastAPI reports them for a typed
+    WalletMessage body: pydantic's own, located under "body". A streamed body is not
+    kept, so its error is reported as one value_error.
+    """
+    fallback = [{"type": "value_error", "loc": ("body",), "msg": error, "input": None}]
+    if body is None:
+        return fallback
+    if not body:
+        return [{"type": "missing", "loc": ("body",), "msg": "Field required", "input": None}]
+    try:
+        doc = json.loads(body)
+    except ValueError as e:
+        return [{"type": "json_invalid", "loc": ("body", getattr(e, "pos", 0)), "msg": "JSON decode error",
+                 "input": {}, "ctx": {"error": getattr(e, "msg", str(e))}}]
+    try:
+        if hasattr(WalletMessage, "model_validate"):
+            WalletMessage.model_validate(doc, from_attributes=True)  # as FastAPI validates bodies
+        else:
+            WalletMessage.parse_obj(doc)
+    except ValidationError as e:
+        errors = e.errors(include_url=False) if hasattr(WalletMessage, "model_validate") else e.errors()
+        return [{**err, "loc": ("body", *err["loc"])} for err in errors]
+    return fallback
+
+
+@app.post("/api/v1/score", openapi_extra=_WALLET_BODY)
+async def score_wallet(request: Request):
     """
     Score a wallet request directly via API.
+    The raw body goes to the scoring executor, which validates it once (straight from
+    JSON into a WalletMessage) and scores it, in-thread or in a worker process.
+    Invalid payloads get 422 with pydantic's errors in `detail`, scoring errors 400.
+    Bodies of STREAM_MIN_BYTES or more are never buffered: they are parsed and scored
+    chunk by chunk as they arrive (ScoringExecutor.score_stream).
+    With PROFILING_ENABLED, an `X-Profile: cumulative|tottime|ncalls` header scores the
+    wallet under cProfile and adds the top functions to the response as "profile".
+    With SCORE_COALESCE_WINDOW_MS set, concurrent requests are scored together in
+    batches (app.services.coalescer); processing_time_ms then includes the wait.
     """
     t0 = time.time()
-    try:
-        result = model.score_wallet(payload.dict())
-        ms = int((time.time() - t0) * 1000)
-        result["processing_time_ms"] = ms
+    length = request.headers.get("content-length", "")
+    profile = sort_key(request.headers.get("x-profile")) if PROFILING_ENABLED else None
+    body = None
+    if STREAM_MIN_BYTES and not profile and length.isdigit() and int(length) >= STREAM_MIN_BYTES:
+        status, result = await scoring.score_stream(request.stream())
+    else:
+        body = await request.body()
+        if profile:
+            status, result = await run_in_threadpool(score_profiled, body, profile)
+        elif coalescer is not None:
+            status, result = await coalescer.score(body)
+        else:
+            status, result = (await run_in_threadpool(scoring.score, [body]))[0]
+    ms = int((time.time() - t0) * 1000)
+    if status != OK:
+        _record_stats(0, 1, ms)
+        if status == INVALID:
+            raise RequestValidationError(await run_in_threadpool(_request_errors, body, result["error"]))
+        raise HTTPException(status_code=400, detail=result["error"])
+    result["processing_time_ms"] = ms
+    _record_stats(1, 0, ms)
+    with _T_SERIALIZE.time():
+        return Response(encode_result(result), media_type="application/json")
+
+
+class _DuplexStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse whose generator keeps reading the request body while it streams.
+    The stock class may listen for http.disconnect on `receive` concurrently, which
+    would steal body chunks from request.stream(); here the body reader is the only
+    consumer of `receive` (and raises ClientDisconnect itself).
+    """
+
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+
+@app.post("/api/v1/score/batch")
+async def score_batch(request: Request):
+    """
+    Score many wallets in one request.
+    Body is NDJSON (one WalletMessage per line) or a JSON array of WalletMessages.
+    Wallets are scored in chunks of BATCH_CHUNK_SIZE as the body streams in and every
+    result is streamed back as one NDJSON line: the SuccessMessage, or a FailureMessage
+    for a wallet that could not be decoded, validated or scored.
+    """
+    async def results():
+        decoder = WalletStreamDecoder(raw=True)
+        pending: list = []
 
-        # update stats
-        stats["processed"] += 1
-        stats["success"] += 1
-        n = stats["success"] + stats["failure"]
-        stats["avg_ms"] = (stats["avg_ms"] * (n - 1) + ms) / max(n, 1)
+        async def flush():
+            chunk = pending[:]
+            pending.clear()
+            t0 = time.time()
+            docs = [d for d in chunk if not isinstance(d, DecodeError)]
+            scored = iter(await run_in_threadpool(scoring.score, docs) if docs else [])
+            out = [failure_message("unknown", str(d)) if isinstance(d, DecodeError) else next(scored)[1]
+                   for d in chunk]
+            ok = sum(1 for r in out if "zscore" in r)
+            _record_stats(ok, len(out) - ok, (time.time() - t0) * 1000)
+            with _T_SERIALIZE.time():
+                return b"".join(encode_result(r) + b"\n" for r in out)
 
-        return to_serializable(result)
-    except Exception as e:
-        ms = int((time.time() - t0) * 1000)
-        stats["processed"] += 1
-        stats["failure"] += 1
-        raise HTTPException(status_code=400, detail=str(e))
+        async for data in request.stream():
+            for doc in decoder.feed(data):
+                pending.append(doc)
+                if len(pending) >= BATCH_CHUNK_SIZE:
+                    yield await flush()
+        pending.extend(decoder.close())
+        if pending:
+            yield await flush()
+
+    return _DuplexStreamingResponse(results(), media_type="application/x-ndjson")
 
 
 # ---------------- MOCK KAFKA CONTROL ---------------- #
@@ -96,20 +394,24 @@ def score_wallet(payload: WalletMessage):
 @app.post("/api/v1/kafka/publish")
 def kafka_publish(payload: WalletMessage):
     """
-    Queue a message into the mock Kafka service.
-    Only works if Kafka is disabled (mock mode).
+    Produce a message to the mock broker's input topic, where the scoring pipeline
+    picks it up. Only works if Kafka is disabled (mock mode); 503 while the input
+    topic is full.
     """
     if not kafka or kafka.real_mode:
         raise HTTPException(status_code=400, detail="Kafka mock publish only available in MOCK mode")
-    kafka.mock_send(payload.dict())
+    try:
+        kafka.mock_send(payload.dict())
+    except BrokerFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     return {"status": "queued"}
 
 
 @app.get("/api/v1/kafka/drain")
 def kafka_drain():
     """
-    Drain all queued mock Kafka messages.
-    Only works if Kafka is disabled (mock mode).
+    Return the results the pipeline published to the mock success/failure topics
+    since the last drain. Only works if Kafka is disabled (mock mode).
     """
     if not kafka or kafka.real_mode:
         raise HTTPException(status_code=400, detail="Kafka mock drain only available in MOCK mode")
@@ -0,0 +1,271 @@
+# app/models/arrow_ingest.py
+"""
+Historical backfills from columnar files: Arrow IPC or Parquet tables with one row per
+transaction are turned into TxColumns directly, without building WalletMessage JSON.
+
+Columns are the transaction fields with nested ones joined by "." (what
+pandas.json_normalize or a Spark flatten produce): wallet_address, action, timestamp
+are required; poolId, document_id, protocolType and the USD legs tokenIn.amountUSD,
+tokenOut.amountUSD, token0.amountUSD, token1.amountUSD are optional (missing = null).
+Every wallet's rows of one protocolType (case-insensitive) form one protocol block,
+in file order; the "dexes" blocks and those of the model's category scorers
+(SCORING_CATEGORIES) are scored, so the results match scoring the wallet's JSON with
+one block per protocolType, ordered by their first rows. Tables carry no token
+symbols, so a scorer that reads them (sym_a / sym_b) is refused.
+
+Needs pyarrow (optional: pip install pyarrow). Only DexScoringModel scores tables:
+the notebook model needs per-transaction token symbols these columns do not carry.
+"""
+from __future__ import annotations
+import time
+from functools import partial
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as pa_ipc
+    import pyarrow.parquet as pq
+except ImportError:  # optional: only backfills need it
+    pa = None
+
+from app.models.categories import CategoryScorer, run_concurrently
+from app.models.columnar import ACTION_CODES, ACTION_OTHER, ACTION_SWAP, NO_POOL, TxColumns
+from app.utils.compact import NO_SYMBOL, CompactBlock
+from app.utils.dedup import TX_DEDUP
+
+# logical field -> column name in the file
+DEFAULT_COLUMNS = {
+    "wallet_address": "wallet_address",
+    "action": "action",
+    "timestamp": "timestamp",
+    "poolId": "poolId",
+    "document_id": "document_id",
+    "protocolType": "protocolType",
+    "tokenIn": "tokenIn.amountUSD",
+    "tokenOut": "tokenOut.amountUSD",
+    "token0": "token0.amountUSD",
+    "token1": "token1.amountUSD",
+}
+REQUIRED = ("wallet_address", "action", "timestamp")
+PARQUET_SUFFIXES = (".parquet", ".pq")
+ARROW_SUFFIXES = (".arrow", ".feather", ".ipc")
+
+_UNIT_PER_SECOND = {"s": 1, "ms": 1_000, "us": 1_000_000, "ns": 1_000_000_000}
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise RuntimeError("Arrow/Parquet ingestion needs pyarrow: pip install pyarrow")
+
+
+def is_table_file(path: str) -> bool:
+    return path.lower().endswith(PARQUET_SUFFIXES + ARROW_SUFFIXES)
+
+
+def read_table(path: str, columns: Optional[Dict[str, str]] = None) -> "pa.Table":
+    """
+    Read the transaction columns of a Parquet file or an Arrow IPC file/stream. IPC is
+    memory-mapped, so its columns are used in place; Parquet reads only the needed columns.
+    """
+    _require_pyarrow()
+    names = list({**DEFAULT_COLUMNS, **(columns or {})}.values())
+    if path.lower().endswith(PARQUET_SUFFIXES):
+        schema = pq.read_schema(path)
+        return pq.read_table(path, columns=[n for n in names if n in schema.names], memory_map=True)
+    source = pa.memory_map(path, "r")
+    try:
+        table = pa_ipc.open_file(source).read_all()
+    except pa.ArrowInvalid:
+        source.seek(0)
+        table = pa_ipc.open_stream(source).read_all()
+    return table.select([n for n in names if n in table.column_names])
+
+
+def _numpy(col: "pa.ChunkedArray") -> np.ndarray:
+    # zero-copy for a single null-free chunk of a fixed-width type
+    return col.chunk(0).to_numpy(zero_copy_only=False) if col.num_chunks == 1 else col.to_numpy()
+
+
+def _codes(col: "pa.ChunkedArray") -> Tuple[np.ndarray, List[Any]]:
+    """Codes into the distinct values (in order of first appearance), -1 for null."""
+    # one hash pass; all chunks share the dictionary (dictionary columns are unified)
+    enc = col.unify_dictionaries() if pa.types.is_dictionary(col.type) else col.dictionary_encode()
+    if enc.num_chunks == 0:
+        return np.zeros(0, dtype=np.int64), []
+    codes = pa.chunked_array([c.indices for c in enc.chunks]).fill_null(-1)
+    return _numpy(codes).astype(np.int64, copy=False), enc.chunk(0).dictionary.to_pylist()
+
+
+def _seconds(col: "pa.ChunkedArray") -> np.ndarray:
+    if pa.types.is_timestamp(col.type):
+        per_s = _UNIT_PER_SECOND[col.type.unit]
+        return _numpy(col.cast(pa.int64())) // per_s
+    return _numpy(col.cast(pa.int64()))
+
+
+def _decode(table: "pa.Table", dedup: bool, columns: Optional[Dict[str, str]]) -> Dict[str, Any]:
+    """
+    Per-row NumPy columns of a transactions table, and which rows form which protocol
+    block: `block` numbers (wallet, protocolType) pairs, `ptype` is the row's index into
+    `ptypes` (lower-cased; -1 for a null protocolType), `rows` the rows kept by dedup.
+    """
+    _require_pyarrow()
+    names = {**DEFAULT_COLUMNS, **(columns or {})}
+    present = {field: name for field, name in names.items() if name in table.column_names}
+    for field in REQUIRED:
+        if field not in present:
+            raise ValueError(f"missing column {names[field]!r}")
+        if table.column(present[field]).null_count:
+            raise ValueError(f"column {names[field]!r} has nulls")
+    n = table.num_rows
+
+    wallet, addresses = _codes(table.column(present["wallet_address"]))
+    action_code, actions = _codes(table.column(present["action"]))
+    lookup = np.array([ACTION_CODES.get(a.lower(), ACTION_OTHER) for a in actions] or [ACTION_OTHER], dtype=np.int8)
+    action = lookup[action_code]
+    timestamp = _seconds(table.column(present["timestamp"]))
+
+    if "poolId" in present:
+        pool, pools = _codes(table.column(present["poolId"]))
+        if "" in pools:
+            pool[pool == pools.index("")] = NO_POOL
+    else:
+        pool = np.full(n, NO_POOL, dtype=np.int64)
+
+    def usd(field: str) -> np.ndarray:
+        if field not in present:
+            return np.zeros(n)
+        return _numpy(table.column(present[field]).cast(pa.float64()).fill_null(0.0))
+
+    swap = action == ACTION_SWAP
+    leg_a = np.where(swap, usd("tokenIn"), usd("token0"))
+    leg_b = np.where(swap, usd("tokenOut"), usd("token1"))
+
+    # without a protocolType column every row is "dexes"
+    if "protocolType" in present:
+        code, values = _codes(table.column(present["protocolType"]))
+        ptypes = list(dict.fromkeys(v.lower() for v in values))
+        folded = np.array([ptypes.index(v.lower()) for v in values] + [-1], dtype=np.int64)
+        ptype = folded[code]  # null (-1) picks the trailing -1
+    else:
+        ptypes, ptype = ["dexes"], np.zeros(n, dtype=np.int64)
+    block = wallet * (len(ptypes) + 1) + ptype + 1
+
+    rows = ptype >= 0
+    if dedup and "document_id" in present:
+        doc, docs = _codes(table.column(present["document_id"]))
+        has_id = rows & (doc >= 0)
+        idx = np.flatnonzero(has_id)
+        _, first = np.unique(block[idx] * (len(docs) + 1) + doc[idx], return_index=True)
+        rows &= ~has_id
+        rows[idx[first]] = True
+
+    return {"wallet": wallet, "addresses": addresses, "action": action, "pool": pool,
+            "timestamp": timestamp.astype(np.int64, copy=False), "leg_a": leg_a, "leg_b": leg_b,
+            "ptypes": ptypes, "ptype": ptype, "block": block, "rows": rows}
+
+
+def _dex_rows(d: Dict[str, Any]) -> np.ndarray:
+    return d["rows"] & (d["ptype"] == d["ptypes"].index("dexes")) if "dexes" in d["ptypes"] \
+        else np.zeros(len(d["rows"]), dtype=bool)
+
+
+def _tx_columns(d: Dict[str, Any]) -> TxColumns:
+    # one "dexes" block per wallet that has dexes rows
+    rows = _dex_rows(d)
+    wallet = d["wallet"]
+    block_wallet = np.unique(wallet[rows])
+    block_of_wallet = np.full(len(d["addresses"]), -1, dtype=np.int64)
+    block_of_wallet[block_wallet] = np.arange(len(block_wallet))
+    return TxColumns(
+        block=block_of_wallet[wallet[rows]],
+        action=d["action"][rows],
+        pool=d["pool"][rows],
+        timestamp=d["timestamp"][rows],
+        leg_a=d["leg_a"][rows],
+        leg_b=d["leg_b"][rows],
+        block_wallet=block_wallet,
+    )
+
+
+def table_columns(table: "pa.Table", dedup: bool = TX_DEDUP,
+                  columns: Optional[Dict[str, str]] = None) -> Tuple[TxColumns, List[str]]:
+    """
+    TxColumns of a transactions table plus the wallet address of each wallet index.
+    Rows are grouped by the wallet's dictionary code (no Python dict per row); wallets
+    are numbered in order of first appearance. With `dedup`, a row whose document_id
+    already appeared in the same block is dropped, as on the JSON path.
+    """
+    d = _decode(table, dedup, columns)
+    return _tx_columns(d), d["addresses"]
+
+
+def _other_blocks(d: Dict[str, Any], scorers: Dict[str, CategoryScorer]) -> List[Tuple[int, int, CategoryScorer, CompactBlock]]:
+    """(wallet, first row, scorer, CompactBlock) of every block a category scorer scores."""
+    codes = [i for i, p in enumerate(d["ptypes"]) if p in scorers]
+    idx = np.flatnonzero(d["rows"] & np.isin(d["ptype"], codes))
+    if idx.size == 0:
+        return []
+    idx = idx[np.argsort(d["block"][idx], kind="stable")]  # rows of a block stay in file order
+    starts = np.flatnonzero(np.r_[True, d["block"][idx][1:] != d["block"][idx][:-1]])
+    out = []
+    for rows in np.split(idx, starts[1:]):
+        ptype = d["ptypes"][d["ptype"][rows[0]]]
+        scorer = scorers[ptype]
+        if {"sym_a", "sym_b"} & set(scorer.columns):
+            raise ValueError(f"the {ptype} scorer reads token symbols, which tables do not carry")
+        block = CompactBlock(ptype)
+        block.action.frombytes(d["action"][rows].astype(np.int8).tobytes())
+        block.pool.frombytes(d["pool"][rows].astype(np.int32).tobytes())
+        block.timestamp.frombytes(d["timestamp"][rows].tobytes())
+        block.leg_a.frombytes(d["leg_a"][rows].tobytes())
+        block.leg_b.frombytes(d["leg_b"][rows].tobytes())
+        no_symbol = np.full(len(rows), NO_SYMBOL, dtype=np.int32).tobytes()
+        block.sym_a.frombytes(no_symbol)
+        block.sym_b.frombytes(no_symbol)
+        out.append((int(d["wallet"][rows[0]]), int(rows[0]), scorer, block))
+    return out
+
+
+def check_model(model):
+    """Raise ValueError, before any file is read, if `model` cannot score TxColumns."""
+    if not model.scores_tx_columns:
+        raise ValueError(f"{type(model).__name__} cannot score Arrow/Parquet tables; use SCORING_MODEL=dex")
+
+
+def score_table(model, table: "pa.Table", columns: Optional[Dict[str, str]] = None) -> List[Dict[str, Any]]:
+    """
+    SuccessMessage dicts for every wallet of the table: DexScoringModel.score_columns for
+    the dexes blocks, the model's category scorers for the blocks of their protocolTypes.
+    A wallet's categories are in the order of each block's first row.
+    """
+    check_model(model)
+    t0 = time.time()
+    d = _decode(table, model.dedup_tx, columns)
+    results = model.score_columns(_tx_columns(d), d["addresses"], t0)
+    others = _other_blocks(d, model.scorers)
+    if not others:
+        return results
+    scored = run_concurrently([partial(scorer.category, block, None, model.config)
+                               for _, _, scorer, block in others], model.category_workers)
+    # (first row, category) of every block, per wallet; the dexes block first of all
+    dex_rows = np.flatnonzero(_dex_rows(d))
+    dex_wallets, first = np.unique(d["wallet"][dex_rows], return_index=True)
+    dex_first = dict(zip(dex_wallets.tolist(), dex_rows[first].tolist()))
+    layouts: Dict[int, List[Tuple[int, Dict[str, Any]]]] = {}
+    for (wi, row, _, _), category in zip(others, scored):
+        layouts.setdefault(wi, []).append((row, category))
+    for wi, blocks in layouts.items():
+        result = results[wi]
+        if wi in dex_first:
+            blocks.append((dex_first[wi], result["categories"][0]))
+        cats = result["categories"] = [c for _, c in sorted(blocks, key=lambda b: b[0])]
+        result["zscore"] = model._to_zstr(sum(c["score"] for c in cats) / len(cats))
+    return results
+
+
+def score_file(model, path: str, columns: Optional[Dict[str, str]] = None) -> List[Dict[str, Any]]:
+    check_model(model)
+    return score_table(model, read_table(path, columns), columns)
@@ -0,0 +1,197 @@
+# app/models/categories.py
+"""
+Scorers of the protocolTypes other than "dexes" (which DexScoringModel scores itself),
+registered by protocolType. A scorer declares the CompactBlock columns it reads and
+turns them into a category dict of the SuccessMessage shape; the model decodes every
+block once into a CompactBlock (app.utils.compact) and hands each scorer its columns.
+
+Blocks of one wallet are independent, so run_concurrently() can score them side by side
+on a shared thread pool (CATEGORY_WORKERS); NumPy releases the GIL on the larger
+reductions, so this pays off for wallets with big blocks in several categories.
+"""
+from __future__ import annotations
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter_ns
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.models.columnar import (
+    ACTION_BORROW, ACTION_CLAIM, ACTION_DEPOSIT, ACTION_LIQUIDATE, ACTION_REPAY, ACTION_STAKE,
+    ACTION_UNSTAKE, ACTION_WITHDRAW
+)
+from app.utils.compact import CompactBlock
+from app.utils.metrics import METRICS, Histogram
+
+# protocolTypes scored besides "dexes" (comma-separated registered names; "" = dexes only)
+SCORING_CATEGORIES = os.getenv("SCORING_CATEGORIES", "")
+# threads scoring the blocks of one wallet side by side (0: one after another, in the caller)
+CATEGORY_WORKERS = int(os.getenv("CATEGORY_WORKERS", "0"))
+
+# what CompactBlock.arrays() offers
+COLUMNS = ("action", "pool", "timestamp", "leg_a", "leg_b", "sym_a", "sym_b")
+
+SCORERS: Dict[str, "CategoryScorer"] = {}
+
+_timers: Dict[str, Histogram] = {}
+_pool: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def category_timer(category: str) -> Histogram:
+    """Latency histogram of scoring one protocol block of `category`."""
+    timer = _timers.get(category)
+    if timer is None:
+        timer = _timers[category] = METRICS.histogram(
+            "scoring_category_seconds", "Latency of scoring one protocol block", category=category)
+    return timer
+
+
+class CategoryScorer:
+    """
+    Scores the blocks of one protocolType. `columns` are the CompactBlock columns
+    features() reads (for non-swap actions leg_a/leg_b are the token0/token1 amountUSD);
+    `caps` are the saturation points of the sub-scores, replaced per metric by the
+    thresholds collection under the same protocolType when a ConfigStore is attached.
+    """
+    protocol_type = ""
+    columns: Tuple[str, ...] = ()
+    caps: Mapping[str, float] = {}
+
+    def features(self, cols: Dict[str, np.ndarray]) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    def score(self, features: Dict[str, Any], caps: Mapping[str, float]) -> float:
+        raise NotImplementedError
+
+    def category(self, block: CompactBlock, keep: Optional[np.ndarray] = None, config=None) -> Dict[str, Any]:
+        """The category dict of one block (only the rows `keep` selects)."""
+        t = perf_counter_ns()
+        arrays = block.arrays()
+        cols = {name: arrays[name] if keep is None else arrays[name][keep] for name in self.columns}
+        features = self.features(cols)
+        caps = self.caps if config is None else config.snapshot.caps(self.protocol_type, self.caps)
+        score = max(0.0, min(1000.0, self.score(features, caps)))
+        category_timer(self.protocol_type).record_ns(perf_counter_ns() - t)
+        return {
+            "category": self.protocol_type,
+            "score": round(score, 6),
+            "transaction_count": len(block) if keep is None else int(np.count_nonzero(keep)),
+            "features": features,
+        }
+
+
+def register(scorer: CategoryScorer) -> CategoryScorer:
+    key = scorer.protocol_type.lower()
+    if key == "dexes":
+        raise ValueError("dexes is scored by the model itself")
+    unknown = set(scorer.columns) - set(COLUMNS)
+    if not key or unknown:
+        raise ValueError(f"scorer {type(scorer).__name__}: bad protocol_type or columns {sorted(unknown)}")
+    SCORERS[key] = scorer
+    return scorer
+
+
+def enabled_scorers(names: str = SCORING_CATEGORIES) -> Dict[str, CategoryScorer]:
+    """The registered scorers named in `names` (SCORING_CATEGORIES), by protocolType."""
+    out = {}
+    for name in filter(None, (n.strip().lower() for n in names.split(","))):
+        if name not in SCORERS:
+            raise ValueError(f"unknown scoring category: {name}")
+        out[name] = SCORERS[name]
+    return out
+
+
+def run_concurrently(jobs: Sequence[Callable[[], Any]], workers: int = CATEGORY_WORKERS) -> List[Any]:
+    """
+    Results of `jobs`, in order. With `workers`, all but the first go to the shared
+    thread pool while the calling thread runs the first; otherwise they run in turn.
+    """
+    if workers <= 0 or len(jobs) < 2:
+        return [job() for job in jobs]
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="category")
+    futures = [_pool.submit(job) for job in jobs[1:]]
+    first = jobs[0]()
+    return [first] + [f.result() for f in futures]
+
+
+def _action_usd(cols: Dict[str, np.ndarray], action: int) -> Tuple[float, int]:
+    rows = cols["action"] == action
+    return float((cols["leg_a"][rows] + cols["leg_b"][rows]).sum()), int(np.count_nonzero(rows))
+
+
+class LendingScorer(CategoryScorer):
+    """
+    Supplied volume, how much of the borrowed amount was repaid, and liquidations:
+    up to 400 for supply, 300 for repayment (full marks without borrowing), 300 that
+    liquidations eat into.
+    """
+    protocol_type = "lending"
+    columns = ("action", "leg_a", "leg_b")
+    caps = {"total_supplied_usd": 1000.0, "num_liquidations": 3.0}
+
+    def features(self, cols):
+        supplied, num_supplies = _action_usd(cols, ACTION_DEPOSIT)
+        withdrawn, _ = _action_usd(cols, ACTION_WITHDRAW)
+        borrowed, num_borrows = _action_usd(cols, ACTION_BORROW)
+        repaid, num_repays = _action_usd(cols, ACTION_REPAY)
+        return {
+            "total_supplied_usd": round(supplied, 6),
+            "total_withdrawn_usd": round(withdrawn, 6),
+            "total_borrowed_usd": round(borrowed, 6),
+            "total_repaid_usd": round(repaid, 6),
+            "num_supplies": num_supplies,
+            "num_borrows": num_borrows,
+            "num_repays": num_repays,
+            "num_liquidations": int(np.count_nonzero(cols["action"] == ACTION_LIQUIDATE)),
+        }
+
+    def score(self, f, caps):
+        base = min(f["total_supplied_usd"] / caps["total_supplied_usd"], 1.0) * 400
+        repaid = 1.0 if f["total_borrowed_usd"] == 0 else min(f["total_repaid_usd"] / f["total_borrowed_usd"], 1.0)
+        base += repaid * 300
+        base += (1.0 - min(f["num_liquidations"] / caps["num_liquidations"], 1.0)) * 300
+        return base
+
+
+class StakingScorer(CategoryScorer):
+    """
+    Staked volume, time since the first stake, and how much was unstaked again: up to
+    500, 300 and 200 (the same retention rule as the DEX LP score).
+    """
+    protocol_type = "staking"
+    columns = ("action", "timestamp", "leg_a", "leg_b")
+    caps = {"total_staked_usd": 1000.0, "staking_days": 30.0}
+
+    def features(self, cols):
+        staked, num_stakes = _action_usd(cols, ACTION_STAKE)
+        unstaked, num_unstakes = _action_usd(cols, ACTION_UNSTAKE)
+        ts = cols["timestamp"]
+        stake_ts = ts[(cols["action"] == ACTION_STAKE) & (ts > 0)]
+        days = (int(ts.max()) - int(stake_ts.min())) / 86400.0 if len(stake_ts) else 0.0
+        return {
+            "total_staked_usd": round(staked, 6),
+            "total_unstaked_usd": round(unstaked, 6),
+            "num_stakes": num_stakes,
+            "num_unstakes": num_unstakes,
+            "num_claims": int(np.count_nonzero(cols["action"] == ACTION_CLAIM)),
+            "staking_days": round(days, 6),
+        }
+
+    def score(self, f, caps):
+        staked = f["total_staked_usd"]
+        base = min(staked / caps["total_staked_usd"], 1.0) * 500
+        base += min(f["staking_days"] / caps["staking_days"], 1.0) * 300
+        churn = 0.0 if staked == 0 else min(f["total_unstaked_usd"] / max(staked, 1.0), 1.0)
+        base += (1.0 - churn) * 200
+        return base
+
+
+register(LendingScorer())
+register(StakingScorer())
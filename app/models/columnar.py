@@ -0,0 +1,255 @@
+# app/models/columnar.py
+from __future__ import annotations
+from typing import Any, Dict, Iterable, List, Tuple
+from dataclasses import dataclass
+
+import numpy as np
+
+from app.utils.dedup import first_occurrences
+from app.utils.types import WalletMessage
+
+# interned action codes (anything else is carried as ACTION_OTHER and only counted)
+ACTION_SWAP = 0
+ACTION_DEPOSIT = 1
+ACTION_WITHDRAW = 2
+ACTION_OTHER = 3
+# lending / staking actions; only the category scorers (app.models.categories) read them
+ACTION_BORROW = 4
+ACTION_REPAY = 5
+ACTION_LIQUIDATE = 6
+ACTION_STAKE = 7
+ACTION_UNSTAKE = 8
+ACTION_CLAIM = 9
+ACTION_CODES = {
+    "swap": ACTION_SWAP, "deposit": ACTION_DEPOSIT, "withdraw": ACTION_WITHDRAW,
+    "borrow": ACTION_BORROW, "repay": ACTION_REPAY, "liquidate": ACTION_LIQUIDATE, "liquidation": ACTION_LIQUIDATE,
+    "stake": ACTION_STAKE, "unstake": ACTION_UNSTAKE, "claim": ACTION_CLAIM,
+}
+
+NO_POOL = -1
+
+
+@dataclass
+class TxColumns:
+    """
+    Flat, column-per-field view of the "dexes" transactions of many wallets.
+
+    Every row is one transaction; `block` says which protocol block it came from and
+    `block_wallet` maps each block back to the wallet index it belongs to.
+    For swaps leg_a/leg_b hold tokenIn/tokenOut amountUSD, for LP actions token0/token1.
+    """
+    block: np.ndarray         # int64, protocol block index per row
+    action: np.ndarray        # int8, ACTION_* code per row
+    pool: np.ndarray          # int64, interned poolId per row (NO_POOL if missing)
+    timestamp: np.ndarray     # int64
+    leg_a: np.ndarray         # float64
+    leg_b: np.ndarray         # float64
+    block_wallet: np.ndarray  # int64, wallet index per block
+
+    @property
+    def n_blocks(self) -> int:
+        return len(self.block_wallet)
+
+
+def _usd(token) -> float:
+    # same semantics as DexScoringModel._safe on a missing leg / missing amountUSD
+    if token is None:
+        return 0.0
+    v = token.amountUSD
+    return float(v) if isinstance(v, (int, float)) else 0.0
+
+
+def flatten_wallets(wallets: Iterable[Any], dedup: bool = False) -> TxColumns:
+    """
+    Decode validated wallets into TxColumns. Only "dexes" blocks become blocks,
+    in the same order score_wallet walks them. With `dedup`, a transaction whose
+    document_id already appeared in its block is dropped (one vectorized pass over
+    all blocks at the end).
+
+    Wallets other than WalletMessage are CompactWallets (app.utils.compact): their
+    columns are copied in whole and their pool codes, which are only unique within
+    the wallet, stay distinct per block.
+    """
+    block: List[int] = []
+    action: List[int] = []
+    pool: List[int] = []
+    ts: List[int] = []
+    leg_a: List[float] = []
+    leg_b: List[float] = []
+    block_wallet: List[int] = []
+    doc_ids: List = []
+    pool_codes: Dict[str, int] = {}
+    packed: List[Tuple[int, Dict[str, np.ndarray]]] = []  # (block, columns) of compact blocks
+
+    for wi, wallet in enumerate(wallets):
+        if not isinstance(wallet, WalletMessage):
+            for cblock in wallet.data:
+                if cblock.protocolType.lower() != "dexes":
+                    continue
+                b = len(block_wallet)
+                block_wallet.append(wi)
+                cols = cblock.arrays()
+                if dedup and cblock.unique_rows is not None:
+                    cols = {name: col[cblock.unique_rows] for name, col in cols.items()}
+                packed.append((b, cols))
+            continue
+        for pblock in wallet.data:
+            if pblock.protocolType.lower() != "dexes":
+                continue
+            b = len(block_wallet)
+            block_wallet.append(wi)
+            for t in pblock.transactions:
+                code = ACTION_CODES.get((t.action or "").lower(), ACTION_OTHER)
+                pid = t.poolId or ""
+                block.append(b)
+                doc_ids.append(t.document_id)
+                action.append(code)
+                pool.append(pool_codes.setdefault(pid, len(pool_codes)) if pid else NO_POOL)
+                ts.append(int(t.timestamp or 0))
+                if code == ACTION_SWAP:
+                    leg_a.append(_usd(t.tokenIn))
+                    leg_b.append(_usd(t.tokenOut))
+                else:
+                    leg_a.append(_usd(t.token0))
+                    leg_b.append(_usd(t.token1))
+
+    cols = TxColumns(
+        block=np.asarray(block, dtype=np.int64),
+        action=np.asarray(action, dtype=np.int8),
+        pool=np.asarray(pool, dtype=np.int64),
+        timestamp=np.asarray(ts, dtype=np.int64),
+        leg_a=np.asarray(leg_a, dtype=np.float64),
+        leg_b=np.asarray(leg_b, dtype=np.float64),
+        block_wallet=np.asarray(block_wallet, dtype=np.int64),
+    )
+    keep = first_occurrences(doc_ids, cols.block) if dedup else None
+    if keep is not None:
+        for name in ("block", "action", "pool", "timestamp", "leg_a", "leg_b"):
+            setattr(cols, name, getattr(cols, name)[keep])
+    if packed:
+        # rows of different blocks may interleave freely: every reduction groups by block
+        # and keeps the row order within a block
+        cols.block = np.concatenate([cols.block] + [np.full(len(c["action"]), b, dtype=np.int64) for b, c in packed])
+        for name in ("action", "pool", "timestamp", "leg_a", "leg_b"):
+            col = getattr(cols, name)
+            setattr(cols, name, np.concatenate([col] + [c[name].astype(col.dtype, copy=False) for _, c in packed]))
+    return cols
+
+
+def _group_sum(keys: np.ndarray, weights: np.ndarray, n: int) -> np.ndarray:
+    # np.bincount adds weights sequentially in input order, so every group sum is
+    # bit-identical to the running `+=` of the scalar path
+    return np.bincount(keys, weights=weights, minlength=n).astype(np.float64, copy=False)
+
+
+def _hold_days(cols: TxColumns) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Vectorized version of the greedy deposit->withdraw pairing in
+    DexScoringModel._extract_features. Returns (sum of hold days, number of pairs) per block.
+
+    Within one (block, pool) with sorted deposits d and sorted withdraws w, the scalar loop
+    matches withdraw j iff the number of matches so far m is < c_j (deposits with ts <= w[j]).
+    That recurrence m_j = min(m_{j-1} + 1, c_j) has the closed form
+    m_j = j + min(1, min_{k<=j}(c_k - k)), which is a segmented cumulative minimum.
+    """
+    n = cols.n_blocks
+    lp = ((cols.action == ACTION_DEPOSIT) | (cols.action == ACTION_WITHDRAW)) \
+        & (cols.pool != NO_POOL) & (cols.timestamp != 0)
+    rows = np.flatnonzero(lp)
+    if rows.size == 0:
+        return np.zeros(n), np.zeros(n, dtype=np.int64)
+
+    blk = cols.block[rows]
+    pool = cols.pool[rows]
+    ts = cols.timestamp[rows]
+    is_w = (cols.action[rows] == ACTION_WITHDRAW).astype(np.int64)
+
+    # group = (block, pool); pools are visited in order of their first deposit in the block
+    gkey = blk * (int(pool.max()) + 1) + pool
+    uniq, ginv = np.unique(gkey, return_inverse=True)
+    first_dep = np.full(len(uniq), np.iinfo(np.int64).max, dtype=np.int64)
+    dep_mask = is_w == 0
+    np.minimum.at(first_dep, ginv[dep_mask], rows[dep_mask])
+    has_dep = first_dep[ginv] != np.iinfo(np.int64).max
+
+    # order: block, first-deposit position of the pool, timestamp, deposits before withdraws
+    order = np.lexsort((is_w, ts, first_dep[ginv], blk))
+    order = order[has_dep[order]]
+    if order.size == 0:
+        return np.zeros(n), np.zeros(n, dtype=np.int64)
+    g = ginv[order]
+    ts_s = ts[order]
+    w_s = is_w[order]
+
+    starts = np.flatnonzero(np.r_[True, g[1:] != g[:-1]])
+    seg = np.repeat(np.arange(len(starts)), np.diff(np.r_[starts, len(g)]))
+
+    cum_dep = np.cumsum(1 - w_s)
+    cum_w = np.cumsum(w_s)
+    base_dep = (cum_dep - (1 - w_s))[starts][seg]
+    base_w = (cum_w - w_s)[starts][seg]
+
+    wrows = np.flatnonzero(w_s)
+    if wrows.size == 0:
+        return np.zeros(n), np.zeros(n, dtype=np.int64)
+    wseg = seg[wrows]
+    c = (cum_dep - base_dep)[wrows]        # deposits with ts <= this withdraw
+    j = (cum_w - base_w)[wrows] - 1        # index of this withdraw within its pool
+
+    # segmented cummin: shifting every later segment below all earlier ones resets the minimum
+    span = int(c.max()) + int(j.max()) + 2
+    v = (c - j) - wseg * span
+    m = j + np.minimum(1, np.minimum.accumulate(v) + wseg * span)
+    prev = np.r_[0, m[:-1]]
+    prev[np.r_[True, wseg[1:] != wseg[:-1]]] = 0
+    matched = m > prev
+
+    # deposit paired with a matched withdraw is the (m-1)-th deposit of its pool
+    dep_ts = ts_s[w_s == 0]
+    dep_start = np.r_[0, np.cumsum(np.bincount(seg[w_s == 0], minlength=len(starts)))[:-1]]
+    d_idx = dep_start[wseg[matched]] + m[matched] - 1
+    delta_days = (ts_s[wrows[matched]] - dep_ts[d_idx]) / 86400.0
+
+    pair_blk = blk[order][wrows[matched]]
+    return _group_sum(pair_blk, delta_days, n), np.bincount(pair_blk, minlength=n)
+
+
+def block_features(cols: TxColumns) -> Dict[str, np.ndarray]:
+    """
+    Unrounded CategoryFeatures fields (plus transaction_count) per block, computed with
+    grouped reductions over the flattened columns.
+    """
+    n = cols.n_blocks
+    blk, act = cols.block, cols.action
+    a, b = cols.leg_a, cols.leg_b
+
+    is_swap = act == ACTION_SWAP
+    is_dep = act == ACTION_DEPOSIT
+    is_wd = act == ACTION_WITHDRAW
+
+    # swap volume: one leg if the other is zero, else the average of both legs
+    volume = np.where((a == 0) & (b > 0), b, np.where((b == 0) & (a > 0), a, (a + b) / 2.0))
+    lp_usd = a + b
+
+    hold_sum, hold_n = _hold_days(cols)
+    avg_hold = np.divide(hold_sum, hold_n, out=np.zeros(n), where=hold_n > 0)
+
+    has_pool = cols.pool != NO_POOL
+    if has_pool.any():
+        width = int(cols.pool.max()) + 1
+        pairs = np.unique(blk[has_pool] * width + cols.pool[has_pool])
+        unique_pools = np.bincount(pairs // width, minlength=n)
+    else:
+        unique_pools = np.zeros(n, dtype=np.int64)
+
+    return {
+        "total_deposit_usd": _group_sum(blk[is_dep], lp_usd[is_dep], n),
+        "total_withdraw_usd": _group_sum(blk[is_wd], lp_usd[is_wd], n),
+        "total_swap_volume": _group_sum(blk[is_swap], volume[is_swap], n),
+        "num_deposits": np.bincount(blk[is_dep], minlength=n),
+        "num_withdraws": np.bincount(blk[is_wd], minlength=n),
+        "num_swaps": np.bincount(blk[is_swap], minlength=n),
+        "avg_hold_time_days": avg_hold,
+        "unique_pools": unique_pools,
+        "transaction_count": np.bincount(blk, minlength=n),
+    }
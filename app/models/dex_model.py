@@ -1,72 +1,168 @@
 # app/models/dex_model.py
 from __future__ import annotations
-from typing import Dict, Any, List, Tuple, DefaultDict
+from typing import Dict, Any, Iterable, List, Optional, Tuple, DefaultDict, Sequence, Union
 from collections import defaultdict
+from functools import partial
+from itertools import compress
+from array import array
+import re
 import time
-from decimal import Decimal, ROUND_DOWN
+from time import perf_counter_ns
 
-from app.utils.types import WalletMessage, CategoryFeatures, CategoryScore, SuccessMessage, FailureMessage
+import numpy as np
 
-class DexScoringModel:
-    """
-    Minimal but production-friendly scorer:
-    - Extracts DEX features (deposits/withdrawals/swaps, volumes, unique pools)
-    - Estimates avg hold time (pairing deposits->withdraws by pool where possible)
-    - Builds LP + Swap sub-scores and combines into 0..1000 'zscore'
-    """
+from app.models.columnar import (
+    ACTION_SWAP, ACTION_DEPOSIT, ACTION_WITHDRAW, NO_POOL, TxColumns, flatten_wallets, block_features
+)
+from app.models.categories import CATEGORY_WORKERS, CategoryScorer, category_timer, enabled_scorers, run_concurrently
+from app.utils.compact import CompactBlock, CompactWallet, append_transactions, compact_block
+from app.utils.dedup import TX_DEDUP, unique_transactions
+from app.utils.encoding import zscore_str
+from app.utils.metrics import stage
+from app.utils.stream import TransactionStreamParser
+from app.utils.types import (
+    WalletMessage, ProtocolData, Transaction, TokenAmount, CategoryFeatures, failure_message,
+    parse_wallet, parse_transactions
+)
 
-    def _safe(self, x, default=0.0):
-        return float(x) if isinstance(x, (int, float)) else default
+FEATURE_FIELDS = (
+    "total_deposit_usd", "total_withdraw_usd", "total_swap_volume",
+    "num_deposits", "num_withdraws", "num_swaps",
+    "avg_hold_time_days", "unique_pools",
+)
+FLOAT_FEATURES = ("total_deposit_usd", "total_withdraw_usd", "total_swap_volume", "avg_hold_time_days")
+# where each sub-score saturates; replaced per metric by the thresholds collection when
+# a ConfigStore is attached (see app.services.config_store)
+DEX_CAPS = {
+    "total_deposit_usd": 1000.0, "avg_hold_time_days": 30.0,
+    "total_swap_volume": 2000.0, "num_swaps": 10.0, "unique_pools": 3.0,
+}
+# bump when a change to the scoring logic or the result format invalidates cached results
+MODEL_VERSION = 1
+# per-stage latency histograms (app.utils.metrics)
+_T_FEATURES = stage("features")
+_T_SUBSCORES = stage("subscores")
+_T_ZSCORE = stage("zscore")
+_T_BATCH_FLATTEN = stage("batch_flatten")  # validation + flatten into TxColumns
+_T_BATCH_FEATURES = stage("batch_features")  # grouped features
+_T_BATCH_SCORES = stage("batch_scores")
 
-    def _extract_features(self, pd: Dict[str, Any]) -> Tuple[CategoryFeatures, int]:
-        txs = pd.get("transactions", [])
-        pools_seen = set()
+_ADDRESS_RE = re.compile(rb'"wallet_address"\s*:\s*"([^"\\]*)"')
 
-        total_deposit_usd = 0.0
-        total_withdraw_usd = 0.0
-        total_swap_volume = 0.0
-        num_deposits = num_withdraws = num_swaps = 0
+class FeatureAccumulator:
+    """
+    Running DEX features of one protocol block. Transactions can be fed in any number of
+    add_many() calls (e.g. as a streaming parser produces them); finish() pairs deposits
+    and withdraws and returns (CategoryFeatures, transaction_count).
+    Hold-time timestamps are kept as packed int64 arrays, 8 bytes per LP event.
+    """
 
+    def __init__(self, model: "DexScoringModel"):
+        self.model = model
+        self.tx_count = 0
+        self.pools_seen = set()
+        self.total_deposit_usd = 0.0
+        self.total_withdraw_usd = 0.0
+        self.total_swap_volume = 0.0
+        self.num_deposits = self.num_withdraws = self.num_swaps = 0
         # hold time estimation: deposit times per pool, withdraw times per pool
-        deposits_by_pool: DefaultDict[str, List[int]] = defaultdict(list)
-        withdraws_by_pool: DefaultDict[str, List[int]] = defaultdict(list)
+        self.deposits_by_pool: DefaultDict[str, array] = defaultdict(lambda: array("q"))
+        self.withdraws_by_pool: DefaultDict[str, array] = defaultdict(lambda: array("q"))
+
+    def add_many(self, txs: Iterable[Transaction]):
+        leg_usd = self.model._leg_usd
+        pools_seen = self.pools_seen
+        deposits_by_pool, withdraws_by_pool = self.deposits_by_pool, self.withdraws_by_pool
+        total_deposit_usd = self.total_deposit_usd
+        total_withdraw_usd = self.total_withdraw_usd
+        total_swap_volume = self.total_swap_volume
+        num_deposits, num_withdraws, num_swaps = self.num_deposits, self.num_withdraws, self.num_swaps
+        n = 0
 
         for t in txs:
-            action = (t.get("action") or "").lower()
-            pool_id = t.get("poolId") or ""
-            ts = int(t.get("timestamp") or 0)
+            n += 1
+            action = (t.action or "").lower()
+            pool_id = t.poolId or ""
+            ts = int(t.timestamp or 0)
             if pool_id:
                 pools_seen.add(pool_id)
 
             if action == "swap":
                 num_swaps += 1
-                vin = self._safe(t.get("tokenIn", {}).get("amountUSD"))
-                vout = self._safe(t.get("tokenOut", {}).get("amountUSD"))
+                vin = leg_usd(t.tokenIn)
+                vout = leg_usd(t.tokenOut)
                 # count volume as average of legs if both present, else either
                 volume = vout if vin == 0 and vout > 0 else vin if vout == 0 and vin > 0 else (vin + vout) / 2.0
                 total_swap_volume += volume
 
             elif action == "deposit":
                 num_deposits += 1
-                usd0 = self._safe(t.get("token0", {}).get("amountUSD"))
-                usd1 = self._safe(t.get("token1", {}).get("amountUSD"))
+                usd0 = leg_usd(t.token0)
+                usd1 = leg_usd(t.token1)
                 total_deposit_usd += (usd0 + usd1)
                 if pool_id and ts:
                     deposits_by_pool[pool_id].append(ts)
 
             elif action == "withdraw":
                 num_withdraws += 1
-                usd0 = self._safe(t.get("token0", {}).get("amountUSD"))
-                usd1 = self._safe(t.get("token1", {}).get("amountUSD"))
+                usd0 = leg_usd(t.token0)
+                usd1 = leg_usd(t.token1)
                 total_withdraw_usd += (usd0 + usd1)
                 if pool_id and ts:
                     withdraws_by_pool[pool_id].append(ts)
 
+        self.tx_count += n
+        self.total_deposit_usd = total_deposit_usd
+        self.total_withdraw_usd = total_withdraw_usd
+        self.total_swap_volume = total_swap_volume
+        self.num_deposits, self.num_withdraws, self.num_swaps = num_deposits, num_withdraws, num_swaps
+
+    def add_compact(self, block: CompactBlock, keep: Optional[np.ndarray] = None):
+        """
+        add_many() over the rows of a CompactBlock (only those `keep` selects). Pools are
+        the block's pool codes, which identify pools just as well as their ids.
+        """
+        rows: Iterable = zip(block.action, block.pool, block.timestamp, block.leg_a, block.leg_b)
+        if keep is not None:
+            rows = compress(rows, keep.tolist())
+        pools_seen = self.pools_seen
+        deposits_by_pool, withdraws_by_pool = self.deposits_by_pool, self.withdraws_by_pool
+        total_deposit_usd = self.total_deposit_usd
+        total_withdraw_usd = self.total_withdraw_usd
+        total_swap_volume = self.total_swap_volume
+        num_deposits, num_withdraws, num_swaps = self.num_deposits, self.num_withdraws, self.num_swaps
+        n = 0
+
+        for code, pool, ts, a, b in rows:
+            n += 1
+            if pool != NO_POOL:
+                pools_seen.add(pool)
+            if code == ACTION_SWAP:
+                num_swaps += 1
+                total_swap_volume += b if a == 0 and b > 0 else a if b == 0 and a > 0 else (a + b) / 2.0
+            elif code == ACTION_DEPOSIT:
+                num_deposits += 1
+                total_deposit_usd += (a + b)
+                if pool != NO_POOL and ts:
+                    deposits_by_pool[pool].append(ts)
+            elif code == ACTION_WITHDRAW:
+                num_withdraws += 1
+                total_withdraw_usd += (a + b)
+                if pool != NO_POOL and ts:
+                    withdraws_by_pool[pool].append(ts)
+
+        self.tx_count += n
+        self.total_deposit_usd = total_deposit_usd
+        self.total_withdraw_usd = total_withdraw_usd
+        self.total_swap_volume = total_swap_volume
+        self.num_deposits, self.num_withdraws, self.num_swaps = num_deposits, num_withdraws, num_swaps
+
+    def finish(self) -> Tuple[CategoryFeatures, int]:
         # avg hold time: greedily pair earliest deposit with next withdraw per pool
         hold_days_list: List[float] = []
-        for pool, dlist in deposits_by_pool.items():
+        for pool, dlist in self.deposits_by_pool.items():
             dlist = sorted(dlist)
-            wlist = sorted(withdraws_by_pool.get(pool, []))
+            wlist = sorted(self.withdraws_by_pool.get(pool, ()))
             i = j = 0
             while i < len(dlist) and j < len(wlist):
                 if wlist[j] >= dlist[i]:
@@ -79,72 +175,395 @@ class DexScoringModel:
         avg_hold_days = sum(hold_days_list) / len(hold_days_list) if hold_days_list else 0.0
 
         features = CategoryFeatures(
-            total_deposit_usd=round(total_deposit_usd, 6),
-            total_withdraw_usd=round(total_withdraw_usd, 6),
-            total_swap_volume=round(total_swap_volume, 6),
-            num_deposits=num_deposits,
-            num_withdraws=num_withdraws,
-            num_swaps=num_swaps,
+            total_deposit_usd=round(self.total_deposit_usd, 6),
+            total_withdraw_usd=round(self.total_withdraw_usd, 6),
+            total_swap_volume=round(self.total_swap_volume, 6),
+            num_deposits=self.num_deposits,
+            num_withdraws=self.num_withdraws,
+            num_swaps=self.num_swaps,
             avg_hold_time_days=round(avg_hold_days, 6),
-            unique_pools=len(pools_seen),
+            unique_pools=len(self.pools_seen),
         )
-        return features, len(txs)
+        return features, self.tx_count
+
+
+class StreamingWalletScorer:
+    """
+    Scores one wallet from its raw JSON bytes fed in arbitrary chunks, without ever
+    holding the full transaction list: every transaction is validated in small batches
+    and folded into the block's FeatureAccumulator as soon as the parser cuts it out.
+    finish() returns the same dict score_wallet would. Invalid input raises ValueError.
+    """
+
+    def __init__(self, model: "DexScoringModel", validate_every: int = 256):
+        self.model = model
+        self.validate_every = validate_every
+        self._t0 = time.time()
+        self._parser = TransactionStreamParser()
+        self._pending: DefaultDict[int, List[bytes]] = defaultdict(list)
+        self._seen: DefaultDict[int, int] = defaultdict(int)
+        self._acc: Dict[int, FeatureAccumulator] = {}
+        # blocks of the model's other categories, packed as they stream in
+        self._packed: Dict[int, CompactBlock] = {}
+        self._codes: Tuple[Dict[str, int], Dict[str, int]] = ({}, {})
+        # document_ids met per block, exact like the other paths (grows with the unique ids)
+        self._ids: Optional[DefaultDict[int, set]] = defaultdict(set) if model.dedup_tx else None
+
+    def feed(self, data: bytes):
+        for b, raw in self._parser.feed(data):
+            pending = self._pending[b]
+            pending.append(raw)
+            if len(pending) >= self.validate_every:
+                self._flush(b)
+
+    def _flush(self, b: int):
+        raws = self._pending.pop(b, None)
+        if not raws:
+            return
+        try:
+            txs = parse_transactions(raws)
+        except ValueError as e:
+            raise ValueError(f"data.{b}.transactions[{self._seen[b]}:{self._seen[b] + len(raws)}]: {e}") from None
+        self._seen[b] += len(raws)
+        if self._ids is not None:
+            txs = unique_transactions(txs, self._ids[b])
+        # a block whose protocolType has not come yet (it follows the transactions) is
+        # kept both ways until finish() knows which it is
+        ptype = self._parser.protocol_type(b)
+        ptype = ptype.lower() if ptype is not None else None
+        if ptype is None or ptype == "dexes":
+            self._add(b, txs)
+        if self.model.scorers and (ptype is None or ptype in self.model.scorers):
+            packed = self._packed.get(b)
+            if packed is None:
+                packed = self._packed[b] = CompactBlock(ptype or "")
+            append_transactions(packed, txs, *self._codes)
+
+    def _add(self, b: int, txs: List[Transaction]):
+        acc = self._acc.get(b)
+        if acc is None:
+            acc = self._acc[b] = FeatureAccumulator(self.model)
+        acc.add_many(txs)
 
-    def _score_lp(self, f: CategoryFeatures) -> float:
+    def _dex_category(self, b: int) -> Dict[str, Any]:
+        t = perf_counter_ns()
+        acc = self._acc.get(b) or FeatureAccumulator(self.model)
+        out = self.model._category(*acc.finish())
+        category_timer("dexes").record_ns(perf_counter_ns() - t)
+        return out
+
+    def _categories(self, wallet: WalletMessage) -> List[Dict[str, Any]]:
+        jobs = []
+        for b, block in enumerate(wallet.data):
+            ptype = block.protocolType.lower()
+            scorer = self.model.scorers.get(ptype)
+            if ptype == "dexes":
+                jobs.append(partial(self._dex_category, b))
+            elif scorer is not None:
+                # deduplicated on the way in already
+                jobs.append(partial(scorer.category, self._packed.get(b) or CompactBlock(ptype), None,
+                                    self.model.config))
+        return run_concurrently(jobs, self.model.category_workers)
+
+    def wallet_address_hint(self) -> str:
+        # best effort, for failure messages: wallet_address if the parser has passed it
+        m = _ADDRESS_RE.search(self._parser.skeleton_so_far())
+        return m.group(1).decode() if m else "unknown"
+
+    def finish(self) -> Dict[str, Any]:
+        for b in list(self._pending):
+            self._flush(b)
+        # wallet_address / protocolType / block count come from the transaction-free skeleton
+        wallet = parse_wallet(self._parser.skeleton())
+        return self.model._success(wallet.wallet_address, self._categories(wallet), self._t0)
+
+
+class DexScoringModel:
+    """
+    Minimal but production-friendly scorer:
+    - Extracts DEX features (deposits/withdrawals/swaps, volumes, unique pools)
+    - Estimates avg hold time (pairing deposits->withdraws by pool where possible)
+    - Builds LP + Swap sub-scores and combines into 0..1000 'zscore'
+
+    Sub-score caps come from the attached ConfigStore's current snapshot (in memory,
+    refreshed in the background), DEX_CAPS without one. With a ScoreNormalizer attached,
+    LP and swap sub-scores are mapped to population percentiles before they are combined.
+
+    With `dedup_tx` (TX_DEDUP, on by default) a transaction whose document_id already
+    appeared in the same protocol block is ignored, so overlapping snapshots sent in one
+    payload are counted once. Transactions without a document_id are always counted.
+
+    Blocks of the other protocolTypes in `scorers` (the SCORING_CATEGORIES ones by
+    default, see app.models.categories) become categories of their own, in block order;
+    the zscore is the mean over all categories. The blocks of one wallet are scored
+    side by side on `category_workers` threads (CATEGORY_WORKERS, 0 = in turn).
+    """
+
+    # score_columns() takes TxColumns (flatten_wallets, app.models.arrow_ingest)
+    scores_tx_columns = True
+
+    def __init__(self, config=None, normalizer=None, dedup_tx: bool = TX_DEDUP,
+                 scorers: Optional[Dict[str, CategoryScorer]] = None, category_workers: int = CATEGORY_WORKERS):
+        self.config = config
+        self.normalizer = normalizer
+        self.dedup_tx = dedup_tx
+        self.scorers = enabled_scorers() if scorers is None else scorers
+        self.category_workers = category_workers
+
+    def version_key(self) -> str:
+        """
+        What a result depends on besides the wallet: the model and its MODEL_VERSION, the
+        categories scored, dedup, and the content of the config snapshot. Part of the
+        result-cache key, so a cached result never outlives any of them.
+        """
+        config = self.config.snapshot.fingerprint if self.config is not None else ""
+        return f"{type(self).__name__}:{MODEL_VERSION}:{','.join(sorted(self.scorers))}:{int(self.dedup_tx)}:{config}"
+
+    def _caps(self) -> Dict[str, float]:
+        if self.config is None:
+            return DEX_CAPS
+        return self.config.snapshot.caps("dexes", DEX_CAPS)
+
+    def _safe(self, x, default=0.0):
+        return float(x) if isinstance(x, (int, float)) else default
+
+    def _leg_usd(self, token: Optional[TokenAmount]) -> float:
+        return self._safe(token.amountUSD) if token is not None else 0.0
+
+    def _transactions(self, block: ProtocolData) -> List[Transaction]:
+        return unique_transactions(block.transactions) if self.dedup_tx else block.transactions
+
+    def _extract_features(self, block: Union[ProtocolData, CompactBlock]) -> Tuple[CategoryFeatures, int]:
+        # reads the validated models (or packed columns) directly; no per-transaction dict copies
+        acc = FeatureAccumulator(self)
+        if isinstance(block, CompactBlock):
+            acc.add_compact(block, block.unique_rows if self.dedup_tx else None)
+        else:
+            acc.add_many(self._transactions(block))
+        return acc.finish()
+
+    def _score_lp(self, f: CategoryFeatures, caps: Optional[Dict[str, float]] = None) -> float:
         # simple heuristics
+        caps = caps or self._caps()
         base = 0.0
-        base += min(f.total_deposit_usd / 1000.0, 1.0) * 500  # up to 500
-        base += min(f.avg_hold_time_days / 30.0, 1.0) * 300  # up to 300
+        base += min(f.total_deposit_usd / caps["total_deposit_usd"], 1.0) * 500  # up to 500
+        base += min(f.avg_hold_time_days / caps["avg_hold_time_days"], 1.0) * 300  # up to 300
         # withdraw penalty if churny
         churn = 0.0 if f.total_deposit_usd == 0 else min(f.total_withdraw_usd / max(f.total_deposit_usd, 1.0), 1.0)
         base += (1.0 - churn) * 200  # retainers score higher
         return max(0.0, min(1000.0, base))
 
-    def _score_swap(self, f: CategoryFeatures) -> float:
+    def _score_swap(self, f: CategoryFeatures, caps: Optional[Dict[str, float]] = None) -> float:
+        caps = caps or self._caps()
         base = 0.0
-        base += min(f.total_swap_volume / 2000.0, 1.0) * 700  # up to 700
-        base += min(f.num_swaps / 10.0, 1.0) * 200           # up to 200
-        base += min(f.unique_pools / 3.0, 1.0) * 100         # up to 100
+        base += min(f.total_swap_volume / caps["total_swap_volume"], 1.0) * 700  # up to 700
+        base += min(f.num_swaps / caps["num_swaps"], 1.0) * 200                  # up to 200
+        base += min(f.unique_pools / caps["unique_pools"], 1.0) * 100            # up to 100
         return max(0.0, min(1000.0, base))
 
+    def _score_lp_batch(self, f: Dict[str, np.ndarray], caps: Optional[Dict[str, float]] = None) -> np.ndarray:
+        # vectorized _score_lp, same operation order so results are bit-identical
+        caps = caps or self._caps()
+        dep, wd = f["total_deposit_usd"], f["total_withdraw_usd"]
+        base = np.zeros(len(dep))
+        base += np.minimum(dep / caps["total_deposit_usd"], 1.0) * 500
+        base += np.minimum(f["avg_hold_time_days"] / caps["avg_hold_time_days"], 1.0) * 300
+        churn = np.where(dep == 0, 0.0, np.minimum(wd / np.maximum(dep, 1.0), 1.0))
+        base += (1.0 - churn) * 200
+        return np.maximum(0.0, np.minimum(1000.0, base))
+
+    def _score_swap_batch(self, f: Dict[str, np.ndarray], caps: Optional[Dict[str, float]] = None) -> np.ndarray:
+        caps = caps or self._caps()
+        base = np.zeros(len(f["total_swap_volume"]))
+        base += np.minimum(f["total_swap_volume"] / caps["total_swap_volume"], 1.0) * 700
+        base += np.minimum(f["num_swaps"] / caps["num_swaps"], 1.0) * 200
+        base += np.minimum(f["unique_pools"] / caps["unique_pools"], 1.0) * 100
+        return np.maximum(0.0, np.minimum(1000.0, base))
+
     def _to_zstr(self, val: float) -> str:
-        # 18 decimal places as string
-        return str(Decimal(val).quantize(Decimal("0.000000000000000001"), rounding=ROUND_DOWN))
+        # 18 decimal places as string (same text as the former Decimal quantize)
+        return zscore_str(val)
 
-    def score_wallet(self, wallet_json: Dict[str, Any]) -> Dict[str, Any]:
+    def score_wallet(self, wallet_json: Union[WalletMessage, CompactWallet, Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Score one wallet. Accepts a raw dict (validated here) or an already validated
+        WalletMessage or CompactWallet, which is read as-is so validation happens exactly
+        once. Returns a plain-JSON dict in the SuccessMessage shape.
+        """
         t0 = time.time()
-        wallet = WalletMessage(**wallet_json)
-        out_categories: List[CategoryScore] = []
+        wallet = wallet_json if isinstance(wallet_json, (WalletMessage, CompactWallet)) else WalletMessage(**wallet_json)
+        jobs = []
+        for block in wallet.data:
+            ptype = block.protocolType.lower()
+            if ptype == "dexes":
+                jobs.append(partial(self._dex_category, block))
+            elif ptype in self.scorers:
+                jobs.append(partial(self._other_category, self.scorers[ptype], block))
+            # blocks of protocolTypes without a scorer are skipped
+        return self._success(wallet.wallet_address, run_concurrently(jobs, self.category_workers), t0)
+
+    def _dex_category(self, block: Union[ProtocolData, CompactBlock]) -> Dict[str, Any]:
+        t = perf_counter_ns()
+        features, tx_count = self._extract_features(block)
+        _T_FEATURES.record_ns(perf_counter_ns() - t)
+        out = self._category(features, tx_count)
+        category_timer("dexes").record_ns(perf_counter_ns() - t)
+        return out
+
+    def _other_category(self, scorer: CategoryScorer, block: Union[ProtocolData, CompactBlock]) -> Dict[str, Any]:
+        # validated models are packed once; the scorer reads the columns it declared
+        packed = block if isinstance(block, CompactBlock) else compact_block(block)
+        return scorer.category(packed, packed.unique_rows if self.dedup_tx else None, self.config)
+
+    def stream_scorer(self) -> StreamingWalletScorer:
+        """
+        Incremental alternative to score_wallet for very large wallets: feed() the raw
+        JSON bytes chunk by chunk, then finish(). Memory stays flat in the transaction count.
+        """
+        return StreamingWalletScorer(self)
+
+    def _category(self, features: CategoryFeatures, tx_count: int) -> Dict[str, Any]:
+        # combine LP and Swap, both against the same config snapshot
+        t = perf_counter_ns()
+        caps = self._caps()
+        lp = self._score_lp(features, caps)
+        sw = self._score_swap(features, caps)
+        if self.normalizer is not None:
+            lp, sw = self.normalizer.observe_and_map1(lp, sw)
+        combined = (0.5 * lp + 0.5 * sw)  # equal weights
+        _T_SUBSCORES.record_ns(perf_counter_ns() - t)
+        return {
+            "category": "dexes",
+            "score": round(combined, 6),
+            "transaction_count": tx_count,
+            "features": {name: getattr(features, name) for name in FEATURE_FIELDS},
+        }
+
+    def _success(self, wallet_address: str, out_categories: List[Dict[str, Any]], t0: float) -> Dict[str, Any]:
+        final = sum(c["score"] for c in out_categories) / len(out_categories) if out_categories else 0.0
+        t = perf_counter_ns()
+        zscore = self._to_zstr(final)
+        _T_ZSCORE.record_ns(perf_counter_ns() - t)
+
+        # same keys/order as SuccessMessage(...).dict(), built directly
+        return {
+            "wallet_address": wallet_address,
+            "zscore": zscore,
+            "timestamp": int(time.time()),
+            "processing_time_ms": int((time.time() - t0) * 1000),
+            "categories": out_categories,
+        }
+
+    def score_batch(self, wallets: Sequence[Union[WalletMessage, CompactWallet, Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """
+        Score many wallets in one pass. All "dexes" transactions are flattened into NumPy
+        columns and every feature/sub-score is computed with grouped reductions, so the
+        per-transaction Python work is a single decode loop.
 
+        Returns one dict per input, in order: the same SuccessMessage dict score_wallet
+        would return (processing_time_ms is the wallet's share of the batch), or a
+        FailureMessage dict for inputs that fail validation.
+        """
+        t0 = time.time()
+        results: List[Dict[str, Any] | None] = [None] * len(wallets)
+        valid_idx: List[int] = []
+        addresses: List[str] = []
+        # wallets with blocks of other categories: their scored blocks in order, None for
+        # a dexes block, else the index of the job scoring it
+        layouts: Dict[int, List[Optional[int]]] = {}
+        jobs: List[Any] = []
+
+        def validated():
+            # validate lazily so each WalletMessage is dropped right after it is flattened
+            for i, w in enumerate(wallets):
+                try:
+                    wallet = w if isinstance(w, (WalletMessage, CompactWallet)) else WalletMessage(**w)
+                except Exception as e:
+                    addr = w.get("wallet_address", "unknown") if isinstance(w, dict) else "unknown"
+                    results[i] = failure_message(str(addr), str(e), int((time.time() - t0) * 1000))
+                    continue
+                if self.scorers:
+                    self._layout(wallet, len(valid_idx), layouts, jobs)
+                valid_idx.append(i)
+                addresses.append(wallet.wallet_address)
+                yield wallet
+
+        t = perf_counter_ns()
+        cols = flatten_wallets(validated(), dedup=self.dedup_tx)
+        _T_BATCH_FLATTEN.record_ns(perf_counter_ns() - t)
+        for i, result in zip(valid_idx, self.score_columns(cols, addresses, t0, len(wallets))):
+            results[i] = result
+        if jobs:
+            others = run_concurrently(jobs, self.category_workers)
+            for wi, slots in layouts.items():
+                result = results[valid_idx[wi]]
+                dex = iter(result["categories"])
+                cats = result["categories"] = [next(dex) if s is None else others[s] for s in slots]
+                result["zscore"] = self._to_zstr(sum(c["score"] for c in cats) / len(cats))
+        return results
+
+    def _layout(self, wallet: Union[WalletMessage, CompactWallet], wi: int,
+                layouts: Dict[int, List[Optional[int]]], jobs: List[Any]):
+        slots: List[Optional[int]] = []
         for block in wallet.data:
-            if block.protocolType.lower() != "dexes":
-                # skip unsupported categories for now
-                continue
-
-            features, tx_count = self._extract_features(block.dict())
-            # combine LP and Swap
-            lp = self._score_lp(features)
-            sw = self._score_swap(features)
-            combined = (0.5 * lp + 0.5 * sw)  # equal weights
-
-            out_categories.append(
-                CategoryScore(
-                    category="dexes",
-                    score=round(combined, 6),
-                    transaction_count=tx_count,
-                    features=features
-                )
-            )
-
-        final = sum(c.score for c in out_categories) / len(out_categories) if out_categories else 0.0
-
-        resp = SuccessMessage(
-            wallet_address=wallet.wallet_address,
-            zscore=self._to_zstr(final),
-            timestamp=int(time.time()),
-            processing_time_ms=int((time.time() - t0) * 1000),
-            categories=out_categories
-        ).dict()
-
-        # ensure plain JSON types
-        return resp
+            ptype = block.protocolType.lower()
+            if ptype == "dexes":
+                slots.append(None)
+            elif ptype in self.scorers:
+                slots.append(len(jobs))
+                jobs.append(partial(self._other_category, self.scorers[ptype], block))
+        if len(slots) > slots.count(None):
+            layouts[wi] = slots
+
+    def score_columns(self, cols: TxColumns, addresses: Sequence[str], t0: Optional[float] = None,
+                      n_inputs: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        SuccessMessage dicts for wallets already decoded into TxColumns, where wallet i of
+        `cols.block_wallet` is addresses[i] (flatten_wallets, app.models.arrow_ingest).
+        processing_time_ms is each wallet's share of the time since `t0` over `n_inputs`.
+        """
+        t0 = time.time() if t0 is None else t0
+        t = perf_counter_ns()
+        raw = block_features(cols)
+        _T_BATCH_FEATURES.record_ns(perf_counter_ns() - t)
+
+        # rounding goes through Python's round() so it matches the scalar path exactly
+        t = perf_counter_ns()
+        feats: Dict[str, np.ndarray] = {}
+        for name in FEATURE_FIELDS:
+            if name in FLOAT_FEATURES:
+                feats[name] = np.array([round(x, 6) for x in raw[name].tolist()], dtype=np.float64)
+            else:
+                feats[name] = raw[name]
+        caps = self._caps()
+        lp, sw = self._score_lp_batch(feats, caps), self._score_swap_batch(feats, caps)
+        if self.normalizer is not None:
+            lp, sw = self.normalizer.observe_and_map(lp, sw)
+        combined = 0.5 * lp + 0.5 * sw
+        _T_BATCH_SCORES.record_ns(perf_counter_ns() - t)
+
+        # block -> plain category dicts, grouped per wallet
+        columns = {name: feats[name].tolist() for name in FEATURE_FIELDS}
+        tx_counts = raw["transaction_count"].tolist()
+        per_wallet: List[List[Dict[str, Any]]] = [[] for _ in addresses]
+        for b, (wi, score) in enumerate(zip(cols.block_wallet.tolist(), combined.tolist())):
+            per_wallet[wi].append({
+                "category": "dexes",
+                "score": round(score, 6),
+                "transaction_count": tx_counts[b],
+                "features": {name: columns[name][b] for name in FEATURE_FIELDS},
+            })
+
+        now = int(time.time())
+        share_ms = int((time.time() - t0) * 1000 / max(n_inputs or len(addresses), 1))
+        results = []
+        for address, cats in zip(addresses, per_wallet):
+            final = sum(c["score"] for c in cats) / len(cats) if cats else 0.0
+            results.append({
+                "wallet_address": address,
+                "zscore": self._to_zstr(final),
+                "timestamp": now,
+                "processing_time_ms": share_ms,
+                "categories": cats,
+            })
+        return results
@@ -0,0 +1,211 @@
+# app/models/incremental.py
+from __future__ import annotations
+from typing import Any, Deque, Dict, List, Optional, Tuple, Union
+from collections import deque
+from bisect import insort
+import time
+
+from app.models.dex_model import DexScoringModel
+from app.utils.dedup import DedupIndex
+from app.utils.types import WalletMessage, Transaction, CategoryFeatures
+
+
+class PoolState:
+    """
+    Hold-time bookkeeping for one pool: its unmatched deposits and the running hold sum.
+
+    The greedy pairing in DexScoringModel._extract_features (sorted deposits vs sorted
+    withdraws, two pointers) is the same as replaying LP events in time order and
+    matching every withdraw with the oldest unmatched deposit at or before it, so the
+    matched history is never kept: a deposit is queued and a withdraw pops the queue in
+    O(1). An event older than ones already applied is paired as it arrives, without
+    re-pairing the past (see WalletState).
+    """
+    __slots__ = ("unmatched", "hold_sum", "hold_n")
+
+    def __init__(self):
+        self.unmatched: Deque[int] = deque()  # deposit timestamps, ascending
+        self.hold_sum = 0.0
+        self.hold_n = 0
+
+    def add_deposit(self, ts: int):
+        if not self.unmatched or ts >= self.unmatched[-1]:
+            self.unmatched.append(ts)
+        else:
+            insort(self.unmatched, ts)  # late deposit
+
+    def add_withdraw(self, ts: int):
+        if self.unmatched and self.unmatched[0] <= ts:
+            d = self.unmatched.popleft()
+            self.hold_sum += (ts - d) / 86400.0
+            self.hold_n += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"unmatched": list(self.unmatched), "hold_sum": self.hold_sum, "hold_n": self.hold_n}
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "PoolState":
+        p = cls()
+        p.unmatched = deque(d["unmatched"])
+        p.hold_sum = float(d["hold_sum"])
+        p.hold_n = int(d["hold_n"])
+        return p
+
+
+class WalletState:
+    """
+    Running DEX feature state of one wallet: sums, counts, pools seen and per-pool
+    hold-time state. apply() folds new transactions in; features() is O(pools).
+
+    Sums are accumulated in arrival order, so they are bit-identical to rescoring the
+    concatenated history. The LP events of a message are paired in time order, so while
+    a wallet's deltas arrive in time order the hold-time average matches a full rescore
+    (up to the last ulp before the 6-decimal rounding, as it is summed per pool). A delta
+    whose LP events predate ones already applied is paired greedily and can shift it.
+    """
+
+    def __init__(self, wallet_address: str):
+        self.wallet_address = wallet_address
+        self.total_deposit_usd = 0.0
+        self.total_withdraw_usd = 0.0
+        self.total_swap_volume = 0.0
+        self.num_deposits = 0
+        self.num_withdraws = 0
+        self.num_swaps = 0
+        self.tx_count = 0
+        self.has_dexes = False  # a dexes block was applied, even an empty one
+        self.pools_seen: set = set()
+        # pool -> PoolState, created on the pool's first LP event
+        self.pools: Dict[str, PoolState] = {}
+        self.updated_at = 0
+
+    def apply(self, txs: List[Transaction], model: DexScoringModel):
+        lp: List[Tuple[int, int, str]] = []  # (timestamp, 0 = deposit / 1 = withdraw, pool)
+        self.has_dexes = True
+        for t in txs:
+            action = (t.action or "").lower()
+            pool_id = t.poolId or ""
+            ts = int(t.timestamp or 0)
+            self.tx_count += 1
+            if pool_id:
+                self.pools_seen.add(pool_id)
+
+            if action == "swap":
+                self.num_swaps += 1
+                vin = model._leg_usd(t.tokenIn)
+                vout = model._leg_usd(t.tokenOut)
+                volume = vout if vin == 0 and vout > 0 else vin if vout == 0 and vin > 0 else (vin + vout) / 2.0
+                self.total_swap_volume += volume
+
+            elif action == "deposit":
+                self.num_deposits += 1
+                self.total_deposit_usd += model._leg_usd(t.token0) + model._leg_usd(t.token1)
+                if pool_id and ts:
+                    lp.append((ts, 0, pool_id))
+
+            elif action == "withdraw":
+                self.num_withdraws += 1
+                self.total_withdraw_usd += model._leg_usd(t.token0) + model._leg_usd(t.token1)
+                if pool_id and ts:
+                    lp.append((ts, 1, pool_id))
+        # a deposit pairs with a withdraw at the same timestamp, so deposits sort first
+        for ts, kind, pool_id in sorted(lp):
+            if kind:
+                self._pool(pool_id).add_withdraw(ts)
+            else:
+                self._pool(pool_id).add_deposit(ts)
+        self.updated_at = int(time.time())
+
+    def _pool(self, pool_id: str) -> PoolState:
+        p = self.pools.get(pool_id)
+        if p is None:
+            p = self.pools[pool_id] = PoolState()
+        return p
+
+    def features(self) -> CategoryFeatures:
+        hold_n = sum(p.hold_n for p in self.pools.values())
+        hold_sum = sum(p.hold_sum for p in self.pools.values())
+        return CategoryFeatures(
+            total_deposit_usd=round(self.total_deposit_usd, 6),
+            total_withdraw_usd=round(self.total_withdraw_usd, 6),
+            total_swap_volume=round(self.total_swap_volume, 6),
+            num_deposits=self.num_deposits,
+            num_withdraws=self.num_withdraws,
+            num_swaps=self.num_swaps,
+            avg_hold_time_days=round(hold_sum / hold_n if hold_n else 0.0, 6),
+            unique_pools=len(self.pools_seen),
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "wallet_address": self.wallet_address,
+            "total_deposit_usd": self.total_deposit_usd,
+            "total_withdraw_usd": self.total_withdraw_usd,
+            "total_swap_volume": self.total_swap_volume,
+            "num_deposits": self.num_deposits,
+            "num_withdraws": self.num_withdraws,
+            "num_swaps": self.num_swaps,
+            "tx_count": self.tx_count,
+            "has_dexes": self.has_dexes,
+            "pools_seen": sorted(self.pools_seen),
+            "pools": {k: p.to_dict() for k, p in self.pools.items()},
+            "updated_at": self.updated_at,
+        }
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "WalletState":
+        s = cls(d["wallet_address"])
+        for k in ("total_deposit_usd", "total_withdraw_usd", "total_swap_volume"):
+            setattr(s, k, float(d[k]))
+        for k in ("num_deposits", "num_withdraws", "num_swaps", "tx_count", "updated_at"):
+            setattr(s, k, int(d[k]))
+        s.has_dexes = bool(d.get("has_dexes", s.tx_count))
+        s.pools_seen = set(d["pools_seen"])
+        s.pools = {k: PoolState.from_dict(p) for k, p in d["pools"].items()}
+        return s
+
+
+class IncrementalScorer:
+    """
+    Scores wallets from persisted WalletState instead of the full history: each call
+    applies only the transactions in the message (the delta) and rescoring is O(delta).
+    The state store is pluggable (see app.services.state_store); each wallet's
+    get -> apply -> put runs under the store's lock for that wallet, so concurrent
+    deltas of one wallet (HTTP and Kafka, or several consumers) never lose an update.
+    Only the dexes blocks are scored: a model with category scorers or a score
+    normalizer is refused, as neither has a running state to fold deltas into.
+
+    Unless the model's dedup_tx is off, a DedupIndex remembers the document_ids each
+    wallet has sent, so a redelivered message or an overlapping snapshot only applies
+    the transactions that are new. The index lives in memory: after a restart, or once a
+    wallet has been evicted from it, replays are counted again.
+    """
+
+    def __init__(self, store, model: Optional[DexScoringModel] = None, dedup: Optional[DedupIndex] = None):
+        self.store = store
+        self.model = model or DexScoringModel()
+        if self.model.scorers:
+            raise ValueError("incremental scoring only scores dexes blocks; unset SCORING_CATEGORIES")
+        if self.model.normalizer is not None:
+            raise ValueError("incremental scoring does not support SCORE_NORMALIZATION")
+        self.dedup = dedup if dedup is not None else DedupIndex() if self.model.dedup_tx else None
+
+    def update(self, wallet_json: Union[WalletMessage, Dict[str, Any]]) -> Dict[str, Any]:
+        t0 = time.time()
+        wallet = wallet_json if isinstance(wallet_json, WalletMessage) else WalletMessage(**wallet_json)
+        with self.store.lock(wallet.wallet_address):
+            state = self.store.get(wallet.wallet_address) or WalletState(wallet.wallet_address)
+            for block in wallet.data:
+                if block.protocolType.lower() == "dexes":
+                    txs = block.transactions
+                    if self.dedup is not None:
+                        txs = self.dedup.unique_transactions(wallet.wallet_address, txs)
+                    state.apply(txs, self.model)
+            self.store.put(state)
+            return self.score_state(state, t0)
+
+    def score_state(self, state: WalletState, t0: Optional[float] = None) -> Dict[str, Any]:
+        t0 = time.time() if t0 is None else t0
+        # like score_wallet, a wallet that never sent a dexes block has no category
+        categories = [self.model._category(state.features(), state.tx_count)] if state.has_dexes else []
+        return self.model._success(state.wallet_address, categories, t0)
@@ -0,0 +1,400 @@
+# app/models/notebook_model.py
+from __future__ import annotations
+from typing import AbstractSet, Any, Callable, Dict, Iterable, List, Optional, Sequence, Union
+from array import array
+import time
+
+import numpy as np
+
+from app.models.columnar import (
+    ACTION_CODES, ACTION_OTHER, ACTION_SWAP, ACTION_DEPOSIT, ACTION_WITHDRAW, NO_POOL, _group_sum, _usd
+)
+from app.models.dex_model import DexScoringModel, StreamingWalletScorer
+from app.utils.compact import NO_SYMBOL, CompactBlock, CompactWallet
+from app.utils.types import WalletMessage, Transaction, failure_message
+
+# calculate_token_diversity: stable tokens score 10, anything else 15
+STABLE_TOKENS = frozenset({"USDC", "USDT", "DAI", "LUSD", "USDP", "TUSD", "FRAX"})
+
+# feature keys in the order process_wallet_complete emits them
+NOTEBOOK_FEATURES = (
+    "total_deposit_usd", "total_withdraw_usd", "num_deposits", "num_withdraws",
+    "withdraw_ratio", "avg_hold_time_days", "account_age_days", "unique_pools",
+    "total_swap_volume", "num_swaps", "unique_pools_swapped", "avg_swap_size",
+    "token_diversity_score", "swap_frequency_score",
+    "lp_score", "swap_score", "final_score",
+)
+INT_FEATURES = ("num_deposits", "num_withdraws", "unique_pools", "num_swaps",
+                "unique_pools_swapped", "token_diversity_score")
+
+
+class NotebookColumns:
+    """
+    Per-transaction columns of the notebook pipeline (the rows of the DataFrame built by
+    preprocess_dex_transactions), appended into packed array buffers and read back as
+    NumPy arrays without copying. `group` is the wallet a row belongs to (the protocol
+    block, while a single wallet is being streamed).
+    """
+
+    def __init__(self):
+        self.group = array("q")
+        self.action = array("b")
+        self.pool = array("q")
+        self.timestamp = array("q")
+        self.amount_usd = array("d")
+        self.sym_in = array("q")
+        self.sym_out = array("q")
+        self.pool_codes: Dict[str, int] = {}
+        self.symbol_codes: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.group)
+
+    def add_many(self, group: int, txs: Iterable[Transaction]):
+        pool_codes, symbol_codes = self.pool_codes, self.symbol_codes
+        g_col, a_col, p_col, t_col = self.group, self.action, self.pool, self.timestamp
+        usd_col, in_col, out_col = self.amount_usd, self.sym_in, self.sym_out
+
+        for t in txs:
+            code = ACTION_CODES.get((t.action or "").lower(), ACTION_OTHER)
+            pid = t.poolId or ""
+            g_col.append(group)
+            a_col.append(code)
+            p_col.append(pool_codes.setdefault(pid, len(pool_codes)) if pid else NO_POOL)
+            t_col.append(int(t.timestamp or 0))
+            if code == ACTION_SWAP:
+                # swap size is the larger leg
+                usd_col.append(max(_usd(t.tokenIn), _usd(t.tokenOut)))
+                s_in = t.tokenIn.symbol if t.tokenIn is not None else None
+                s_out = t.tokenOut.symbol if t.tokenOut is not None else None
+                in_col.append(symbol_codes.setdefault(s_in, len(symbol_codes)) if s_in else NO_SYMBOL)
+                out_col.append(symbol_codes.setdefault(s_out, len(symbol_codes)) if s_out else NO_SYMBOL)
+            else:
+                usd_col.append(_usd(t.token0) + _usd(t.token1) if code in (ACTION_DEPOSIT, ACTION_WITHDRAW) else 0.0)
+                in_col.append(NO_SYMBOL)
+                out_col.append(NO_SYMBOL)
+
+    def add_compact(self, group: int, block: CompactBlock, wallet: CompactWallet,
+                    keep: Optional[np.ndarray] = None):
+        """
+        add_many() over the rows of a CompactBlock (only those `keep` selects), appended
+        whole; the wallet's pool and symbol codes are re-interned into this table.
+        """
+        c = block.arrays()
+        if keep is not None:
+            c = {name: col[keep] for name, col in c.items()}
+        act, a, b = c["action"], c["leg_a"], c["leg_b"]
+        swap = act == ACTION_SWAP
+        pools = self._recode(wallet.pools, self.pool_codes)
+        symbols = self._recode(wallet.symbols, self.symbol_codes)
+        n = len(act)
+
+        self.group.frombytes(np.full(n, group, dtype=np.int64).tobytes())
+        self.action.frombytes(act.tobytes())
+        self.pool.frombytes(pools[c["pool"]].tobytes())
+        self.timestamp.frombytes(c["timestamp"].tobytes())
+        lp = (act == ACTION_DEPOSIT) | (act == ACTION_WITHDRAW)
+        usd = np.where(swap, np.maximum(a, b), np.where(lp, a + b, 0.0))
+        self.amount_usd.frombytes(usd.tobytes())
+        for col, sym in ((self.sym_in, c["sym_a"]), (self.sym_out, c["sym_b"])):
+            col.frombytes(np.where(swap, symbols[sym], NO_SYMBOL).tobytes())
+
+    @staticmethod
+    def _recode(table: List[str], codes: Dict[str, int]) -> np.ndarray:
+        # wallet-local code -> code in `codes`; the trailing -1 keeps NO_POOL / NO_SYMBOL as is
+        return np.array([codes.setdefault(s, len(codes)) for s in table] + [-1], dtype=np.int64)
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        return {
+            "group": np.frombuffer(self.group, dtype=np.int64),
+            "action": np.frombuffer(self.action, dtype=np.int8),
+            "pool": np.frombuffer(self.pool, dtype=np.int64),
+            "timestamp": np.frombuffer(self.timestamp, dtype=np.int64),
+            "amount_usd": np.frombuffer(self.amount_usd, dtype=np.float64),
+            "sym_in": np.frombuffer(self.sym_in, dtype=np.int64),
+            "sym_out": np.frombuffer(self.sym_out, dtype=np.int64),
+        }
+
+    def stable_flags(self, stable_tokens: AbstractSet[str] = STABLE_TOKENS) -> np.ndarray:
+        flags = np.zeros(len(self.symbol_codes), dtype=bool)
+        for sym, code in self.symbol_codes.items():
+            flags[code] = sym in stable_tokens
+        return flags
+
+
+def _group_unique(group: np.ndarray, key: np.ndarray, n: int) -> np.ndarray:
+    # number of distinct non-negative keys per group
+    keep = key >= 0
+    if not keep.any():
+        return np.zeros(n, dtype=np.int64)
+    width = int(key[keep].max()) + 1
+    pairs = np.unique(group[keep] * width + key[keep])
+    return np.bincount(pairs // width, minlength=n)
+
+
+def _group_ts_range(group: np.ndarray, ts: np.ndarray, n: int):
+    lo = np.full(n, np.iinfo(np.int64).max, dtype=np.int64)
+    hi = np.full(n, np.iinfo(np.int64).min, dtype=np.int64)
+    np.minimum.at(lo, group, ts)
+    np.maximum.at(hi, group, ts)
+    return lo, hi
+
+
+def _hold_days(group: np.ndarray, dep_ts: np.ndarray, w_group: np.ndarray, w_ts: np.ndarray,
+               now: float) -> np.ndarray:
+    """
+    calculate_holding_time for every deposit at once: days until the first withdraw of
+    the same wallet strictly after it (any pool), or until `now` if there is none.
+    """
+    if dep_ts.size == 0:
+        return np.zeros(0)
+    if w_ts.size == 0:
+        return (now - dep_ts) / 86400
+    # one sorted key space: wallet-major, timestamp-minor
+    lo = int(min(dep_ts.min(), w_ts.min()))
+    span = int(max(dep_ts.max(), w_ts.max())) - lo + 2
+    w_key = w_group * span + (w_ts - lo)
+    order = np.argsort(w_key, kind="stable")
+    w_key, w_group, w_ts = w_key[order], w_group[order], w_ts[order]
+
+    pos = np.searchsorted(w_key, group * span + (dep_ts - lo), side="right")
+    hit = pos < len(w_key)
+    pos = np.minimum(pos, len(w_key) - 1)
+    hit &= w_group[pos] == group
+    return np.where(hit, (w_ts[pos] - dep_ts) / 86400, (now - dep_ts) / 86400)
+
+
+def notebook_features(cols: NotebookColumns, n: int, now: float,
+                      stable_tokens: AbstractSet[str] = STABLE_TOKENS) -> Dict[str, np.ndarray]:
+    """
+    Every feature and sub-score of the notebook's process_wallet_complete for `n` groups,
+    as grouped reductions over the columns (no per-wallet DataFrame).
+    """
+    c = cols.arrays()
+    g, act, ts, usd = c["group"], c["action"], c["timestamp"], c["amount_usd"]
+    is_dep, is_wd, is_swap = act == ACTION_DEPOSIT, act == ACTION_WITHDRAW, act == ACTION_SWAP
+    zeros = np.zeros(n)
+
+    # ---- calculate_lp_features ----
+    f: Dict[str, np.ndarray] = {}
+    f["transaction_count"] = np.bincount(g, minlength=n)
+    f["total_deposit_usd"] = _group_sum(g[is_dep], usd[is_dep], n)
+    f["total_withdraw_usd"] = _group_sum(g[is_wd], usd[is_wd], n)
+    f["num_deposits"] = np.bincount(g[is_dep], minlength=n)
+    f["num_withdraws"] = np.bincount(g[is_wd], minlength=n)
+    f["withdraw_ratio"] = np.divide(f["total_withdraw_usd"], f["total_deposit_usd"], out=zeros.copy(),
+                                    where=f["total_deposit_usd"] > 0)
+    first, last = _group_ts_range(g, ts, n)
+    f["account_age_days"] = np.where(f["transaction_count"] > 0, (last - first) / 86400, 0.0)
+    hold = _hold_days(g[is_dep], ts[is_dep], g[is_wd], ts[is_wd], now)
+    f["avg_hold_time_days"] = np.divide(_group_sum(g[is_dep], hold, n), f["num_deposits"],
+                                        out=zeros.copy(), where=f["num_deposits"] > 0)
+    f["unique_pools"] = _group_unique(g, c["pool"], n)
+
+    # ---- calculate_swap_features ----
+    sg = g[is_swap]
+    f["total_swap_volume"] = _group_sum(sg, usd[is_swap], n)
+    f["num_swaps"] = np.bincount(sg, minlength=n)
+    f["unique_pools_swapped"] = _group_unique(sg, c["pool"][is_swap], n)
+    f["avg_swap_size"] = np.divide(f["total_swap_volume"], f["num_swaps"], out=zeros.copy(),
+                                   where=f["num_swaps"] > 0)
+
+    # calculate_token_diversity: distinct symbols over both legs, stable vs volatile
+    sym_g = np.concatenate([sg, sg])
+    sym = np.concatenate([c["sym_in"][is_swap], c["sym_out"][is_swap]])
+    keep = sym >= 0
+    stable = cols.stable_flags(stable_tokens)
+    if keep.any():
+        width = len(stable)
+        pairs = np.unique(sym_g[keep] * width + sym[keep])
+        pair_g, pair_stable = pairs // width, stable[pairs % width]
+        n_stable = np.bincount(pair_g[pair_stable], minlength=n)
+        n_volatile = np.bincount(pair_g[~pair_stable], minlength=n)
+        f["token_diversity_score"] = np.minimum(n_stable * 10 + n_volatile * 15, 150)
+    else:
+        f["token_diversity_score"] = np.zeros(n, dtype=np.int64)
+
+    # calculate_swap_frequency: mean gap between consecutive swaps, in hours
+    s_first, s_last = _group_ts_range(sg, ts[is_swap], n)
+    multi = f["num_swaps"] >= 2
+    gap_h = np.divide((s_last - s_first) / 3600, f["num_swaps"] - 1, out=zeros.copy(), where=multi)
+    freq = np.select([gap_h <= 1, gap_h <= 24, gap_h <= 168, gap_h <= 720], [100.0, 80.0, 60.0, 40.0], 20.0)
+    f["swap_frequency_score"] = np.where(multi, freq, 0.0)
+
+    # ---- calculate_lp_score / calculate_swap_score / calculate_final_score ----
+    lp = np.minimum(f["total_deposit_usd"] / 10000 * 300, 300)
+    lp = lp + np.minimum(f["num_deposits"] * 20, 200)
+    lp = lp + np.maximum(0, (1 - f["withdraw_ratio"]) * 250)
+    lp = lp + np.minimum(f["avg_hold_time_days"] / 30 * 150, 150)
+    lp = lp + np.minimum(f["unique_pools"] * 20, 100)
+    sw = np.minimum(f["total_swap_volume"] / 50000 * 250, 250)
+    sw = sw + np.minimum(f["num_swaps"] * 10, 200)
+    sw = sw + f["token_diversity_score"]
+    sw = sw + f["swap_frequency_score"]
+    sw = sw + np.minimum(f["unique_pools_swapped"] * 25, 100)
+    f["lp_score"] = lp
+    f["swap_score"] = sw
+    f["final_score"] = lp * 0.6 + sw * 0.4
+    return f
+
+
+def user_tags(f: Dict[str, Any]) -> List[str]:
+    """
+    generate_user_tags, on one wallet's feature values.
+    """
+    tags = []
+    dep, hold, vol = f["total_deposit_usd"], f["avg_hold_time_days"], f["total_swap_volume"]
+    if dep > 100000:
+        tags.append("Whale LP")
+    elif dep > 10000:
+        tags.append("Large LP")
+    elif dep > 1000:
+        tags.append("Medium LP")
+    elif dep > 0:
+        tags.append("Small LP")
+
+    if hold > 90:
+        tags.append("Long-term Holder")
+    elif hold > 30:
+        tags.append("Medium-term Holder")
+    elif hold > 0:
+        tags.append("Short-term Holder")
+
+    if vol > 500000:
+        tags.append("Whale Trader")
+    elif vol > 50000:
+        tags.append("Large Trader")
+    elif vol > 5000:
+        tags.append("Active Trader")
+    elif vol > 0:
+        tags.append("Casual Trader")
+
+    if f["num_swaps"] > 100:
+        tags.append("High Frequency Trader")
+    elif f["num_swaps"] > 20:
+        tags.append("Regular Trader")
+
+    if f["token_diversity_score"] > 100:
+        tags.append("Diversified Trader")
+    elif f["unique_pools"] > 3:
+        tags.append("Multi-Pool LP")
+    return tags
+
+
+class NotebookStreamScorer(StreamingWalletScorer):
+    """
+    StreamingWalletScorer for NotebookScoringModel: transactions go into packed
+    NotebookColumns (about 50 bytes per row) grouped by protocol block.
+    """
+
+    def __init__(self, model: "NotebookScoringModel", validate_every: int = 256):
+        super().__init__(model, validate_every)
+        self._cols = NotebookColumns()
+
+    def _add(self, b: int, txs: List[Transaction]):
+        self._cols.add_many(b, txs)
+
+    def _categories(self, wallet: WalletMessage) -> List[Dict[str, Any]]:
+        dexes = np.array([block.protocolType.lower() == "dexes" for block in wallet.data], dtype=bool)
+        # rows of every dexes block belong to wallet 0, rows of other blocks are dropped
+        keep = dexes[np.frombuffer(self._cols.group, dtype=np.int64)]
+        cols = NotebookColumns()
+        cols.pool_codes, cols.symbol_codes = self._cols.pool_codes, self._cols.symbol_codes
+        c = self._cols.arrays()
+        for name in ("action", "pool", "timestamp", "amount_usd", "sym_in", "sym_out"):
+            getattr(cols, name).frombytes(c[name][keep].tobytes())
+        cols.group.frombytes(bytes(8 * int(keep.sum())))
+        return self.model._categories(cols, 1)[0]
+
+
+class NotebookScoringModel(DexScoringModel):
+    """
+    The full dex_scoring_model.ipynb pipeline (account age, withdraw ratio, avg swap size,
+    token diversity, swap frequency, user tags, 60/40 LP/swap weighting), computed for
+    whole batches on NumPy columns.
+
+    As in the notebook, all "dexes" blocks of a wallet are scored together as one
+    "dexes" category. Differences from the notebook: action and protocolType match
+    case-insensitively (as in DexScoringModel), a missing leg or amountUSD counts as 0
+    instead of raising, and a wallet with no DEX transactions gets no category (zscore 0)
+    instead of an error. With a ConfigStore attached, stable tokens are the symbols the
+    tokens collection flags `is_stable`. Other protocolTypes are not scored (no category
+    scorers).
+    """
+
+    # TxColumns lack the symbols the notebook features need (see score_columns)
+    scores_tx_columns = False
+
+    def __init__(self, config=None, clock: Callable[[], float] = time.time):
+        super().__init__(config, scorers={})
+        # "now" for deposits that were never withdrawn (calculate_holding_time)
+        self.clock = clock
+
+    def _add_wallet(self, cols: NotebookColumns, group: int, wallet: Union[WalletMessage, CompactWallet]):
+        for block in wallet.data:
+            if block.protocolType.lower() != "dexes":
+                continue
+            if isinstance(block, CompactBlock):
+                cols.add_compact(group, block, wallet, block.unique_rows if self.dedup_tx else None)
+            else:
+                cols.add_many(group, self._transactions(block))
+
+    def score_wallet(self, wallet_json: Union[WalletMessage, CompactWallet, Dict[str, Any]]) -> Dict[str, Any]:
+        t0 = time.time()
+        wallet = wallet_json if isinstance(wallet_json, (WalletMessage, CompactWallet)) else WalletMessage(**wallet_json)
+        cols = NotebookColumns()
+        self._add_wallet(cols, 0, wallet)
+        return self._success(wallet.wallet_address, self._categories(cols, 1)[0], t0)
+
+    def score_batch(self, wallets: Sequence[Union[WalletMessage, CompactWallet, Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        t0 = time.time()
+        results: List[Dict[str, Any] | None] = [None] * len(wallets)
+        valid_idx: List[int] = []
+        addresses: List[str] = []
+        cols = NotebookColumns()
+
+        for i, w in enumerate(wallets):
+            try:
+                wallet = w if isinstance(w, (WalletMessage, CompactWallet)) else WalletMessage(**w)
+            except Exception as e:
+                addr = w.get("wallet_address", "unknown") if isinstance(w, dict) else "unknown"
+                results[i] = failure_message(str(addr), str(e), int((time.time() - t0) * 1000))
+                continue
+            self._add_wallet(cols, len(valid_idx), wallet)
+            valid_idx.append(i)
+            addresses.append(wallet.wallet_address)
+
+        per_wallet = self._categories(cols, len(addresses))
+        share_ms = int((time.time() - t0) * 1000 / max(len(wallets), 1))
+        for i, address, cats in zip(valid_idx, addresses, per_wallet):
+            results[i] = self._success(address, cats, t0)
+            results[i]["processing_time_ms"] = share_ms
+        return results
+
+    def score_columns(self, cols, addresses, t0=None, n_inputs=None):
+        # TxColumns lack the symbols and per-wallet grouping the notebook features need,
+        # hence scores_tx_columns = False and the same error as arrow_ingest.check_model
+        raise ValueError("NotebookScoringModel cannot score Arrow/Parquet tables; use SCORING_MODEL=dex")
+
+    def stream_scorer(self) -> NotebookStreamScorer:
+        return NotebookStreamScorer(self)
+
+    def _categories(self, cols: NotebookColumns, n: int) -> List[List[Dict[str, Any]]]:
+        stable = self.config.snapshot.stable_symbols if self.config is not None else None
+        f = notebook_features(cols, n, self.clock(), stable or STABLE_TOKENS)
+        columns = {name: f[name].tolist() for name in NOTEBOOK_FEATURES}
+        tx_counts = f["transaction_count"].tolist()
+        out: List[List[Dict[str, Any]]] = []
+        for w in range(n):
+            if not tx_counts[w]:
+                out.append([])
+                continue
+            values = {name: columns[name][w] for name in NOTEBOOK_FEATURES}
+            out.append([{
+                "category": "dexes",
+                "score": round(values["final_score"], 6),
+                "transaction_count": tx_counts[w],
+                "features": {name: int(v) if name in INT_FEATURES else round(v, 6) for name, v in values.items()},
+                "user_tags": user_tags(values),
+            }])
+        return out
@@ -0,0 +1,140 @@
+# app/serve.py
+"""
+Preforked multi-worker server:
+
+    python -m app.serve --workers 4 --host 0.0.0.0 --port 8000
+
+The master binds the listening socket once, creates the shared stats file and forks
+one uvicorn worker per slot; the kernel spreads connections over the workers
+accepting on the inherited socket. Every worker learns its identity from
+SCORING_WORKER_ID / SCORING_WORKERS / SCORING_SHARED_STATS (app.services.workers),
+which it uses to publish its stats for the others and, with real Kafka, to pick the
+input partitions it owns. A worker that dies is forked again into the same slot;
+SIGTERM/SIGINT stop all workers and remove the stats file.
+
+The master never imports the app (and with it NumPy, the model, Kafka clients): each
+worker builds its own after the fork.
+"""
+import os
+import sys
+import time
+import signal
+import socket
+import logging
+import argparse
+import tempfile
+
+from app.utils.shared_slots import SharedSlots
+
+log = logging.getLogger("app.serve")
+
+SCORING_WORKERS = int(os.getenv("SCORING_WORKERS", "1"))
+SHARED_STATS_SLOT_BYTES = int(os.getenv("SHARED_STATS_SLOT_BYTES", str(1 << 20)))
+# a worker exiting sooner than this after its fork is restarted with a delay
+MIN_WORKER_UPTIME_S = 1.0
+
+
+def _bind(host: str, port: int, backlog: int = 2048) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _default_stats_path() -> str:
+    base = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(base, f"scoring-stats-{os.getpid()}")
+
+
+def _run_worker(worker_id: int, workers: int, stats_path: str, sock: socket.socket, args) -> int:
+    # runs in the forked child
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    os.environ["SCORING_WORKER_ID"] = str(worker_id)
+    os.environ["SCORING_WORKERS"] = str(workers)
+    os.environ["SCORING_SHARED_STATS"] = stats_path
+    import uvicorn
+
+    config = uvicorn.Config(args.app, log_level=args.log_level)
+    uvicorn.Server(config).run(sockets=[sock])
+    return 0
+
+
+def serve(args) -> int:
+    sock = _bind(args.host, args.port)
+    stats_path = args.shared_stats or _default_stats_path()
+    slots = SharedSlots.create(stats_path, args.workers, args.slot_bytes)
+    children = {}  # pid -> (worker id, fork time)
+    stopping = False
+
+    def spawn(worker_id: int):
+        slots.clear(worker_id)
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                code = _run_worker(worker_id, args.workers, stats_path, sock, args)
+            except BaseException:
+                log.exception("worker %d crashed", worker_id)
+            finally:
+                os._exit(code)
+        children[pid] = (worker_id, time.monotonic())
+        log.info("worker %d started (pid %d)", worker_id, pid)
+
+    def shutdown(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+    try:
+        for worker_id in range(args.workers):
+            spawn(worker_id)
+        while children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            if pid not in children:
+                continue
+            worker_id, started = children.pop(pid)
+            if stopping:
+                continue
+            log.warning("worker %d (pid %d) exited with status %d, restarting", worker_id, pid,
+                        os.waitstatus_to_exitcode(status))
+            if time.monotonic() - started < MIN_WORKER_UPTIME_S:
+                time.sleep(MIN_WORKER_UPTIME_S)
+            if not stopping:
+                spawn(worker_id)
+    finally:
+        shutdown(None, None)
+        sock.close()
+        slots.unlink()
+    return 0
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m app.serve")
+    ap.add_argument("--app", default="app.main:app")
+    ap.add_argument("--host", default="0.0.0.0")
+    ap.add_argument("--port", type=int, default=8000)
+    ap.add_argument("--workers", type=int, default=SCORING_WORKERS)
+    ap.add_argument("--shared-stats", help="stats file path (default: /dev/shm/scoring-stats-<pid>)")
+    ap.add_argument("--slot-bytes", type=int, default=SHARED_STATS_SLOT_BYTES, help="stats bytes per worker")
+    ap.add_argument("--log-level", default="info")
+    args = ap.parse_args(argv)
+    logging.basicConfig(level=args.log_level.upper(), format="%(asctime)s %(name)s %(levelname)s %(message)s")
+    if args.workers < 1:
+        ap.error("--workers must be at least 1")
+    return serve(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
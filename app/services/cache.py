@@ -0,0 +1,166 @@
+# app/services/cache.py
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+# off | memory | sqlite
+RESULT_CACHE = os.getenv("RESULT_CACHE", "off").lower()
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "10000"))
+RESULT_CACHE_TTL_S = float(os.getenv("RESULT_CACHE_TTL_S", "300"))
+RESULT_CACHE_PATH = os.getenv("RESULT_CACHE_PATH", "/tmp/ai-scoring-cache.sqlite")
+
+
+def payload_key(raw: bytes, version: str = "") -> str:
+    """
+    Content address of a wallet payload: hash of its raw bytes, so a lookup costs no
+    JSON decode (a re-published snapshot hits when its bytes are identical). `version`
+    (DexScoringModel.version_key()) is hashed in too, so results cached by another model
+    or config snapshot, e.g. in a SQLite file from before a restart, miss.
+    """
+    return hashlib.blake2b(version.encode() + b"\n" + raw, digest_size=20).hexdigest()
+
+
+class _Counters:
+    def __init__(self):
+        self.hits = self.misses = self.evictions = self.expired = 0
+
+    def as_dict(self, size: int, backend: str) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "backend": backend, "size": size,
+            "hits": self.hits, "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions, "expired": self.expired,
+        }
+
+
+class ResultCache:
+    """
+    In-process LRU of scoring results with a TTL. Thread-safe.
+    """
+    backend = "memory"
+
+    def __init__(self, max_entries: int = RESULT_CACHE_SIZE, ttl_s: float = RESULT_CACHE_TTL_S):
+        self.max_entries = max(1, max_entries)
+        self.ttl_s = ttl_s
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._c = _Counters()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self._c.misses += 1
+                return None
+            expires, value = item
+            if expires < now:
+                del self._data[key]
+                self._c.expired += 1
+                self._c.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self._c.hits += 1
+            return value
+
+    def put(self, key: str, value: Dict[str, Any]):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl_s, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self._c.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return self._c.as_dict(len(self._data), self.backend)
+
+
+class SqliteResultCache:
+    """
+    Same contract as ResultCache, backed by a local SQLite file so every worker process
+    on the host shares one cache. LRU order is kept in `last_access`; TTL uses wall time.
+    Hit/miss counters are per process; connections are per thread, so the counters
+    have a lock of their own.
+    """
+    backend = "sqlite"
+
+    def __init__(self, path: str = RESULT_CACHE_PATH, max_entries: int = RESULT_CACHE_SIZE,
+                 ttl_s: float = RESULT_CACHE_TTL_S):
+        self.path = path
+        self.max_entries = max(1, max_entries)
+        self.ttl_s = ttl_s
+        self._local = threading.local()
+        self._lock = threading.Lock()  # guards _c
+        self._c = _Counters()
+        self._conn().execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        conn = self._conn()
+        row = conn.execute("SELECT value, expires FROM results WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            with self._lock:
+                self._c.misses += 1
+            return None
+        if row[1] < now:
+            conn.execute("DELETE FROM results WHERE key = ?", (key,))
+            with self._lock:
+                self._c.expired += 1
+                self._c.misses += 1
+            return None
+        conn.execute("UPDATE results SET last_access = ? WHERE key = ?", (now, key))
+        with self._lock:
+            self._c.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key: str, value: Dict[str, Any]):
+        now = time.time()
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO results (key, value, expires, last_access) VALUES (?, ?, ?, ?)",
+            (key, json.dumps(value).encode(), now + self.ttl_s, now),
+        )
+        n = conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        if n > self.max_entries:
+            cur = conn.execute(
+                "DELETE FROM results WHERE key IN (SELECT key FROM results ORDER BY last_access LIMIT ?)",
+                (n - self.max_entries,),
+            )
+            with self._lock:
+                self._c.evictions += cur.rowcount
+
+    def stats(self) -> Dict[str, Any]:
+        size = self._conn().execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        with self._lock:
+            return self._c.as_dict(size, self.backend)
+
+
+def build_cache():
+    """
+    Cache configured by RESULT_CACHE, or None when caching is off.
+    """
+    if RESULT_CACHE == "memory":
+        return ResultCache()
+    if RESULT_CACHE == "sqlite":
+        return SqliteResultCache()
+    if RESULT_CACHE != "off":
+        raise ValueError(f"unknown RESULT_CACHE backend: {RESULT_CACHE}")
+    return None
@@ -0,0 +1,94 @@
+# app/services/coalescer.py
+import os
+import asyncio
+from time import perf_counter_ns
+from typing import Any, Dict, List, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from app.services.executor import ScoringExecutor
+from app.utils.metrics import METRICS, stage
+
+# how long the first waiting /score request holds its batch open (0 = no coalescing)
+SCORE_COALESCE_WINDOW_MS = float(os.getenv("SCORE_COALESCE_WINDOW_MS", "0"))
+# a batch is scored as soon as it holds this many wallets
+SCORE_COALESCE_MAX = int(os.getenv("SCORE_COALESCE_MAX", "256"))
+
+_T_WAIT = stage("coalesce_wait")  # enqueue -> batch handed to the executor
+_BATCHES = METRICS.counter("scoring_coalesced_batches_total", "Batches scored by the request coalescer")
+_WALLETS = METRICS.counter("scoring_coalesced_wallets_total", "Wallets scored by the request coalescer")
+
+
+class RequestCoalescer:
+    """
+    Collects concurrent single-wallet score requests on the event loop and scores them
+    together, one executor.score() (one model.score_batch call) per batch. Each caller
+    awaits its own future.
+
+    A batch leaves as soon as fewer than `max_inflight` batches are being scored, so
+    an idle server adds no delay. Otherwise requests queue up behind the running
+    batches and leave together when one of them finishes, when the batch holds
+    `max_batch` wallets, or when its first request has waited `window_ms`, whichever
+    comes first: the busier the server, the bigger the batches.
+
+    Batches are scored in the thread pool. A wallet that errors inside a batch only fails
+    itself (score_payloads retries the batch one by one).
+    """
+
+    def __init__(self, executor: ScoringExecutor, window_ms: float = SCORE_COALESCE_WINDOW_MS,
+                 max_batch: int = SCORE_COALESCE_MAX, max_inflight: Optional[int] = None):
+        self.executor = executor
+        self.window_s = max(0.0, window_ms) / 1000
+        self.max_batch = max(1, max_batch)
+        # one batch per scoring process keeps them all busy; in thread mode one at a time
+        self.max_inflight = max(1, max_inflight or executor.workers)
+        self._inflight = 0
+        self._pending: List[Tuple[bytes, asyncio.Future, int]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    async def score(self, payload: bytes) -> Tuple[str, Dict[str, Any]]:
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        self._pending.append((payload, fut, perf_counter_ns()))
+        if len(self._pending) >= self.max_batch or self._inflight < self.max_inflight:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window_s, self._flush)
+        return await fut
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            self._inflight += 1
+            asyncio.ensure_future(self._run(batch))
+
+    async def _run(self, batch: List[Tuple[bytes, asyncio.Future, int]]):
+        now = perf_counter_ns()
+        for _, _, t in batch:
+            _T_WAIT.record_ns(now - t)
+        _BATCHES.inc()
+        _WALLETS.inc(len(batch))
+        try:
+            results = await run_in_threadpool(self.executor.score, [p for p, _, _ in batch])
+        except Exception as e:
+            for _, fut, _ in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        finally:
+            self._inflight -= 1
+            if self._pending:
+                self._flush()
+        for (_, fut, _), result in zip(batch, results):
+            if not fut.done():  # the caller may have gone away
+                fut.set_result(result)
+
+
+def build_coalescer(executor: ScoringExecutor) -> Optional[RequestCoalescer]:
+    """The /score coalescer, or None unless SCORE_COALESCE_WINDOW_MS is set."""
+    if SCORE_COALESCE_WINDOW_MS <= 0:
+        return None
+    return RequestCoalescer(executor)
@@ -0,0 +1,219 @@
+# app/services/config_store.py
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+MONGODB_URL = os.getenv("MONGODB_URL", "")  # empty: no Mongo, built-in defaults only
+MONGODB_DATABASE = os.getenv("MONGODB_DATABASE", "ai_scoring")
+MONGODB_TOKENS_COLLECTION = os.getenv("MONGODB_TOKENS_COLLECTION", "tokens")
+MONGODB_THRESHOLDS_COLLECTION = os.getenv("MONGODB_THRESHOLDS_COLLECTION", "protocol-thresholds-percentiles")
+CONFIG_REFRESH_S = float(os.getenv("CONFIG_REFRESH_S", "60"))
+# a metric's sub-score saturates at this percentile of its threshold distribution
+THRESHOLD_CAP_PERCENTILE = float(os.getenv("THRESHOLD_CAP_PERCENTILE", "90"))
+
+
+def _frozen(a) -> np.ndarray:
+    a = np.asarray(a, dtype=np.float64)
+    a.setflags(write=False)
+    return a
+
+
+class ConfigSnapshot:
+    """
+    Immutable view of the thresholds and tokens collections at one point in time.
+
+    Thresholds documents look like
+        {"protocolType": "dexes", "metric": "total_deposit_usd",
+         "percentiles": {"50": 420.0, "90": 1000.0, "99": 25000.0}}
+    and are kept as two sorted read-only arrays per (protocolType, metric), so lookups are
+    a binary search. Token documents ({"address", "symbol", "decimals", "is_stable", ...})
+    are kept in a dict by lower-cased address. Scoring code only ever reads a snapshot.
+    """
+
+    def __init__(self, thresholds: List[Dict[str, Any]] = (), tokens: List[Dict[str, Any]] = (),
+                 version: int = 0, fingerprint: str = ""):
+        self.version = version
+        self.fingerprint = fingerprint
+        self.loaded_at = time.time()
+
+        curves: Dict[Tuple[str, str], Tuple[np.ndarray, np.ndarray]] = {}
+        for doc in thresholds:
+            pts = sorted((float(p), float(v)) for p, v in (doc.get("percentiles") or {}).items())
+            if not pts:
+                continue
+            pcts, values = zip(*pts)
+            # a percentile curve is non-decreasing; repair noisy exports instead of rejecting them
+            curves[(str(doc.get("protocolType", "dexes")).lower(), str(doc["metric"]))] = (
+                _frozen(pcts), _frozen(np.maximum.accumulate(values)))
+        self._curves = MappingProxyType(curves)
+
+        by_address = {}
+        for doc in tokens:
+            if doc.get("address"):
+                by_address[str(doc["address"]).lower()] = MappingProxyType(dict(doc))
+        self.tokens: Mapping[str, Mapping[str, Any]] = MappingProxyType(by_address)
+        stable = frozenset(str(t["symbol"]) for t in by_address.values() if t.get("is_stable") and t.get("symbol"))
+        self.stable_symbols: Optional[frozenset] = stable or None
+        self._caps: Dict[str, Mapping[str, float]] = {}
+
+    def has(self, protocol: str, metric: str) -> bool:
+        return (protocol, metric) in self._curves
+
+    def percentile(self, protocol: str, metric: str, value: float) -> Optional[float]:
+        """Percentile rank (0..100) of `value`, or None if the metric has no thresholds."""
+        curve = self._curves.get((protocol, metric))
+        if curve is None:
+            return None
+        pcts, values = curve
+        return float(np.interp(value, values, pcts))
+
+    def value_at(self, protocol: str, metric: str, pct: float, default: float) -> float:
+        curve = self._curves.get((protocol, metric))
+        if curve is None:
+            return default
+        pcts, values = curve
+        return float(np.interp(pct, pcts, values))
+
+    def caps(self, protocol: str, defaults: Mapping[str, float]) -> Mapping[str, float]:
+        """
+        Saturation points of the sub-scores: the THRESHOLD_CAP_PERCENTILE value of every
+        metric that has thresholds, `defaults` for the rest. Computed once per snapshot.
+        """
+        caps = self._caps.get(protocol)
+        if caps is None:
+            merged = {}
+            for metric, default in defaults.items():
+                v = self.value_at(protocol, metric, THRESHOLD_CAP_PERCENTILE, default)
+                merged[metric] = v if v > 0 else default
+            caps = self._caps[protocol] = MappingProxyType(merged)
+        return caps
+
+    def token(self, address: str) -> Optional[Mapping[str, Any]]:
+        return self.tokens.get((address or "").lower())
+
+
+EMPTY_SNAPSHOT = ConfigSnapshot()
+
+
+class MongoConfigSource:
+    """
+    Reads both collections in full. `client` may be injected (anything indexable as
+    client[db][collection] with a pymongo-style find()); otherwise a MongoClient is made.
+    """
+
+    def __init__(self, client=None, url: str = MONGODB_URL, database: str = MONGODB_DATABASE,
+                 thresholds: str = MONGODB_THRESHOLDS_COLLECTION, tokens: str = MONGODB_TOKENS_COLLECTION):
+        if client is None:
+            from pymongo import MongoClient
+            client = MongoClient(url, serverSelectionTimeoutMS=5000)
+        self._db = client[database]
+        self._thresholds, self._tokens = thresholds, tokens
+
+    def load(self) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        return (list(self._db[self._thresholds].find({}, {"_id": 0})),
+                list(self._db[self._tokens].find({}, {"_id": 0})))
+
+
+def _fingerprint(thresholds, tokens) -> str:
+    docs = [sorted(json.dumps(d, sort_keys=True, default=str) for d in part) for part in (thresholds, tokens)]
+    return hashlib.blake2b(json.dumps(docs).encode(), digest_size=16).hexdigest()
+
+
+class ConfigStore:
+    """
+    Holds the current ConfigSnapshot and replaces it from `source` every `refresh_s` in a
+    background thread. A reload whose documents hash the same as the current snapshot
+    keeps it (no version bump); a changed one is swapped in with a single reference
+    assignment, so readers see either the old or the new snapshot, never a mix.
+    A failed reload keeps serving the last good snapshot; staleness_s() says how old it is.
+    """
+
+    def __init__(self, source=None, refresh_s: float = CONFIG_REFRESH_S):
+        self.source = source
+        self.refresh_s = refresh_s
+        self._snapshot = EMPTY_SNAPSHOT
+        self._checked_at = time.time()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.counters = {"refreshes": 0, "changes": 0, "errors": 0}
+
+    @property
+    def snapshot(self) -> ConfigSnapshot:
+        return self._snapshot
+
+    def refresh(self) -> bool:
+        """Reload from the source now. Returns True if a new snapshot was swapped in."""
+        with self._lock:
+            self.counters["refreshes"] += 1
+            try:
+                thresholds, tokens = self.source.load()
+                fingerprint = _fingerprint(thresholds, tokens)
+                if fingerprint == self._snapshot.fingerprint:
+                    self._checked_at = time.time()
+                    return False
+                snapshot = ConfigSnapshot(thresholds, tokens, self._snapshot.version + 1, fingerprint)
+            except Exception:
+                self.counters["errors"] += 1
+                log.exception("config refresh failed; keeping snapshot v%d", self._snapshot.version)
+                return False
+            self._snapshot = snapshot
+            self._checked_at = snapshot.loaded_at
+            self.counters["changes"] += 1
+            return True
+
+    def staleness_s(self) -> float:
+        """Seconds since the snapshot was last confirmed current."""
+        return time.time() - self._checked_at
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self.refresh()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="config-refresh", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.refresh_s):
+            self.refresh()
+
+    def stats(self) -> Dict[str, Any]:
+        snap = self._snapshot
+        return {"version": snap.version, "loaded_at": int(snap.loaded_at),
+                "staleness_s": round(self.staleness_s(), 3), "thresholds": len(snap._curves),
+                "tokens": len(snap.tokens), **self.counters}
+
+
+_store: Optional[ConfigStore] = None
+_store_lock = threading.Lock()
+
+
+def get_config_store() -> Optional[ConfigStore]:
+    """
+    Process-wide store fed from MongoDB, started on first use; None when MONGODB_URL is
+    not set (scoring then uses the built-in defaults).
+    """
+    global _store
+    if not MONGODB_URL:
+        return None
+    with _store_lock:
+        if _store is None:
+            _store = ConfigStore(MongoConfigSource())
+            _store.start()
+    return _store
@@ -0,0 +1,465 @@
+# app/services/executor.py
+import os
+import json
+import time
+import atexit
+import shutil
+import logging
+import tempfile
+import threading
+from time import perf_counter_ns
+from concurrent.futures import Future
+from typing import Any, AsyncIterable, Dict, Iterable, List, Optional, Tuple
+
+from app.models.dex_model import DexScoringModel
+from app.models.incremental import IncrementalScorer
+from app.services.cache import build_cache, payload_key
+from app.services.config_store import get_config_store
+from app.services.score_sketch import SCORE_NORMALIZATION, SCORE_SKETCH_SHARE_DIR, build_normalizer
+from app.services.state_store import build_state_store
+from app.utils.metrics import METRICS, stage
+from app.utils.profiling import profile_call
+from app.utils.compact import COMPACT_TX, parse_wallet_compact
+from app.utils.encoding import encode_result
+from app.utils.types import parse_wallet, failure_message
+
+# "thread": score in the calling thread (HTTP thread pool / Kafka worker pool)
+# "process": score in a pool of worker processes to use every core
+SCORING_EXECUTOR = os.getenv("SCORING_EXECUTOR", "thread").lower()
+SCORING_PROCESSES = int(os.getenv("SCORING_PROCESSES", str(os.cpu_count() or 1)))
+SCORING_MAX_INFLIGHT = int(os.getenv("SCORING_MAX_INFLIGHT", str(4 * SCORING_PROCESSES)))
+SCORING_MP_CONTEXT = os.getenv("SCORING_MP_CONTEXT", "spawn")
+# "dex": DexScoringModel, "notebook": the full dex_scoring_model.ipynb pipeline
+SCORING_MODEL = os.getenv("SCORING_MODEL", "dex").lower()
+# payloads of at least this many bytes are scored with the streaming parser, in the
+# calling thread, so memory stays flat in the transaction count (0 disables)
+STREAM_MIN_BYTES = int(os.getenv("STREAM_MIN_BYTES", str(8 * 1024 * 1024)))
+STREAM_CHUNK_BYTES = 1 << 20
+# run the warm-up wallet through every scoring path at startup (see warm_up)
+SCORING_WARMUP = os.getenv("SCORING_WARMUP", "true").lower() == "true"
+# how often a pool worker sends its metrics back along with a result (an export costs ~1 ms)
+METRICS_SHIP_S = 0.5
+
+log = logging.getLogger(__name__)
+
+# per-payload outcome of score_payloads
+OK, INVALID, ERROR = "ok", "invalid", "error"
+
+_WARMUP_WALLET = json.dumps({
+    "wallet_address": "0x0000000000000000000000000000000000000000",
+    "data": [{"protocolType": "dexes", "transactions": [
+        {"document_id": "0", "action": "deposit", "timestamp": 1, "caller": None, "protocol": None,
+         "poolId": "0x0", "token0": {"amountUSD": 1.0}, "token1": {"amountUSD": 1.0}},
+        {"document_id": "1", "action": "withdraw", "timestamp": 2, "caller": None, "protocol": None,
+         "poolId": "0x0", "token0": {"amountUSD": 1.0}, "token1": {"amountUSD": 1.0}},
+        {"document_id": "2", "action": "swap", "timestamp": 3, "caller": None, "protocol": None,
+         "poolId": "0x0", "tokenIn": {"amountUSD": 1.0}, "tokenOut": {"amountUSD": 1.0}},
+    ]}, {"protocolType": "lending", "transactions": [
+        {"document_id": "3", "action": "borrow", "timestamp": 4, "caller": None, "protocol": None,
+         "token0": {"amountUSD": 1.0}},
+    ]}],
+}).encode()
+
+_model: Optional[DexScoringModel] = None
+# where the score normalizers of this process and of its pool workers exchange their
+# sketches (see ScoreNormalizer); "process" mode defaults it to a temporary directory
+_share_dir = SCORE_SKETCH_SHARE_DIR
+_T_DECODE = stage("decode")  # JSON bytes -> validated WalletMessage / CompactWallet
+# in a pool worker: what its METRICS held when they were last sent to the parent, and when
+_shipped: Dict[Any, Dict] = {}
+_shipped_at = float("-inf")
+
+
+def build_model() -> DexScoringModel:
+    if SCORING_MODEL not in ("dex", "notebook"):
+        raise ValueError(f"unknown scoring model: {SCORING_MODEL}")
+    # thresholds/tokens snapshot kept fresh in the background (None without MONGODB_URL)
+    config = get_config_store()
+    if SCORING_MODEL == "notebook":
+        from app.models.notebook_model import NotebookScoringModel  # only this mode loads it
+
+        return NotebookScoringModel(config)
+    # percentile normalization of the sub-scores (None unless SCORE_NORMALIZATION=percentile)
+    return DexScoringModel(config, build_normalizer(_share_dir))
+
+
+def get_model() -> DexScoringModel:
+    """
+    This process's model, built on first use. The HTTP app reads its config snapshot and
+    score normalizer from here, so they are the ones scoring in "thread" mode.
+    """
+    global _model
+    if _model is None:
+        _model = build_model()
+    return _model
+
+
+def score_payloads(payloads: List[bytes]) -> List[Tuple[str, Dict[str, Any]]]:
+    """
+    Validate + score raw JSON wallet payloads. Returns (status, result) per payload, where
+    result is the SuccessMessage dict (OK) or a FailureMessage dict (INVALID/ERROR).
+    Runs in whichever process the executor picked; only bytes in and plain dicts out.
+    A wallet that errors inside score_batch would fail all of it, so the wallets are then
+    scored one by one and only the culprit gets ERROR.
+    """
+    model = get_model()
+    parse = parse_wallet_compact if COMPACT_TX else parse_wallet
+    out: List[Optional[Tuple[str, Dict[str, Any]]]] = [None] * len(payloads)
+    wallets, idx = [], []
+    for i, raw in enumerate(payloads):
+        if not isinstance(raw, _PAYLOAD_TYPES):
+            out[i] = _not_bytes(raw)
+            continue
+        t = perf_counter_ns()
+        try:
+            wallets.append(parse(raw))
+            idx.append(i)
+        except Exception as e:
+            out[i] = (INVALID, failure_message(_address_hint(raw), str(e)))
+        _T_DECODE.record_ns(perf_counter_ns() - t)
+
+    if len(wallets) > 1:
+        try:
+            for i, result in zip(idx, model.score_batch(wallets)):
+                out[i] = (OK, result)
+            return out
+        except Exception:
+            log.warning("score_batch of %d wallets failed, scoring them one by one", len(wallets))
+    for i, wallet in zip(idx, wallets):
+        try:
+            out[i] = (OK, model.score_wallet(wallet))
+        except Exception as e:
+            out[i] = (ERROR, failure_message(wallet.wallet_address, str(e)))
+    return out
+
+
+def _score_in_worker(payloads: List[bytes]) -> Tuple[List[Tuple[str, Dict[str, Any]]], Optional[List[Dict]]]:
+    """
+    score_payloads() in a pool worker, plus what its METRICS recorded since they were last
+    sent (at most every METRICS_SHIP_S, None in between) for the parent to add to its own.
+    """
+    global _shipped_at
+    out = score_payloads(payloads)
+    now = time.monotonic()
+    if now - _shipped_at < METRICS_SHIP_S:
+        return out, None
+    _shipped_at = now
+    return out, METRICS.export_since(_shipped)
+
+
+def score_profiled(payload: bytes, sort: str = "cumulative") -> Tuple[str, Dict[str, Any]]:
+    """
+    score_payloads() of one payload under cProfile, always in the calling thread (also in
+    process mode) so the call tree is the real one; the report is added as result["profile"].
+    """
+    scored, report = profile_call(score_payloads, [payload], sort=sort)
+    status, result = scored[0]
+    result["profile"] = report
+    return status, result
+
+
+def score_stream(chunks: Iterable[bytes]) -> Tuple[str, Dict[str, Any]]:
+    """
+    Score one wallet from its raw JSON bytes in chunks (see DexScoringModel.stream_scorer).
+    Returns (status, result) like score_payloads.
+    """
+    scorer = get_model().stream_scorer()
+    try:
+        for chunk in chunks:
+            scorer.feed(chunk)
+        return OK, scorer.finish()
+    except Exception as e:
+        return _stream_failure(scorer, e)
+
+
+def _stream_failure(scorer, e: Exception) -> Tuple[str, Dict[str, Any]]:
+    return INVALID if isinstance(e, ValueError) else ERROR, failure_message(scorer.wallet_address_hint(), str(e))
+
+
+def _chunks(raw: bytes) -> Iterable[bytes]:
+    view = memoryview(raw)
+    for i in range(0, len(raw), STREAM_CHUNK_BYTES):
+        yield view[i:i + STREAM_CHUNK_BYTES]
+
+
+_PAYLOAD_TYPES = (bytes, bytearray)
+
+
+def _not_bytes(raw: Any) -> Tuple[str, Dict[str, Any]]:
+    # e.g. a Kafka tombstone, whose value is None
+    return INVALID, failure_message("unknown", f"payload must be bytes, got {type(raw).__name__}")
+
+
+def _address_hint(raw: bytes) -> str:
+    try:
+        return str(json.loads(raw).get("wallet_address", "unknown"))
+    except Exception:
+        return "unknown"
+
+
+def warm_up() -> float:
+    """
+    Pay the first-call costs (lazy imports, pydantic and NumPy setup, orjson) at boot
+    instead of in the first request: the warm-up wallet is validated both ways, scored
+    singly, in a batch and streamed, and the results and a FailureMessage are encoded.
+    Builds this process's model, but scores with a copy of it without the normalizer,
+    so the score distribution never sees the wallet. Returns the seconds taken.
+    """
+    t0 = time.perf_counter()
+    model = get_model()
+    scratch = type(model)(model.config)
+    wallets = [parse_wallet(_WARMUP_WALLET), parse_wallet_compact(_WARMUP_WALLET)]
+    results = [scratch.score_wallet(wallets[1])] + scratch.score_batch(wallets)
+    streamed = scratch.stream_scorer()
+    streamed.feed(_WARMUP_WALLET)
+    results.append(streamed.finish())
+    results.append(failure_message("unknown", "warm-up"))
+    for result in results:
+        encode_result(result)
+    elapsed = time.perf_counter() - t0
+    log.info("scoring warm-up took %.1f ms", elapsed * 1000)
+    return elapsed
+
+
+def _init_worker(share_dir: str = ""):
+    # import + build the model and warm it up so the first real task is not cold
+    global _share_dir
+    if share_dir:
+        _share_dir = share_dir
+    warm_up()
+    normalizer = get_model().normalizer
+    if normalizer is not None and normalizer.share_dir:
+        # publish what was observed since the last exchange when the pool shuts down
+        # (multiprocessing runs these finalizers as the worker exits, fork or spawn)
+        from multiprocessing.util import Finalize
+
+        Finalize(normalizer, normalizer.publish, exitpriority=10)
+
+
+def _share_sketches() -> str:
+    """
+    Every pool worker has its own normalizer, and the parent (which serves /api/v1/stats
+    and /api/v1/sketch and saves SCORE_SKETCH_PATH) scores no pooled wallet itself: they
+    only see one population through a share directory. Without SCORE_SKETCH_SHARE_DIR
+    a temporary one is created, and removed when the process exits.
+    """
+    global _share_dir
+    if not _share_dir and SCORE_NORMALIZATION == "percentile":
+        _share_dir = tempfile.mkdtemp(prefix="score-sketch-")
+        atexit.register(shutil.rmtree, _share_dir, True)
+        if _model is not None and _model.normalizer is not None:
+            _model.normalizer.share_dir = _share_dir
+    return _share_dir
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+class ScoringExecutor:
+    """
+    Scoring backend shared by the HTTP endpoints and the Kafka consumer.
+
+    In "process" mode payloads travel to the workers as the raw JSON bytes they arrived
+    as (never pickled pydantic objects) and are validated once, inside the worker.
+    At most `max_inflight` submissions are outstanding; submit() blocks beyond that so
+    callers feel backpressure instead of queueing without bound.
+
+    With a result cache (RESULT_CACHE, see app.services.cache) score() answers repeated
+    payloads from the cache; only `timestamp` and `processing_time_ms` are refreshed.
+    The cache is bypassed while the model has a score normalizer: a percentile score
+    changes with the population, and every wallet scored must be observed.
+
+    Payloads of STREAM_MIN_BYTES or more skip both the cache and the worker pool and are
+    scored by score_stream() in the calling thread.
+
+    A worker that dies (e.g. OOM-killed on a whale wallet) breaks the whole process pool:
+    the submissions in flight at that moment fail, and the next one replaces the pool.
+
+    In "process" mode with SCORE_NORMALIZATION=percentile the workers and this process
+    exchange their score sketches through a share directory (see _share_sketches).
+
+    With a state store (INCREMENTAL_STATE, see app.services.state_store) every payload is
+    a delta of its wallet's transactions, folded into the stored state by an
+    IncrementalScorer in the calling thread; the cache and the worker pool are not used.
+
+    The workers' stage histograms are added to this process's METRICS as results come
+    back, so /api/v1/metrics covers them; they may lag by up to METRICS_SHIP_S.
+    """
+
+    def __init__(self, mode: str = SCORING_EXECUTOR, workers: int = SCORING_PROCESSES,
+                 max_inflight: int = SCORING_MAX_INFLIGHT, cache: Any = "env", state: Any = "env"):
+        if mode not in ("thread", "process"):
+            raise ValueError(f"unknown scoring executor mode: {mode}")
+        self.mode = mode
+        self.workers = max(1, workers) if mode == "process" else 1
+        self._slots = threading.BoundedSemaphore(max(1, max_inflight))
+        self._pool = None  # ProcessPoolExecutor in "process" mode, once started
+        self._pool_lock = threading.Lock()
+        self.cache = build_cache() if cache == "env" else cache
+        if mode == "process":
+            _share_sketches()
+        store = build_state_store() if state == "env" else state
+        self.incremental = IncrementalScorer(store, get_model()) if store is not None else None
+
+    def start(self):
+        if self.mode != "process" or self._pool is not None:
+            return
+        self._pool = self._new_pool()
+        # force every worker to spawn (and warm up) now rather than on the first request
+        for f in [self._pool.submit(_ping) for _ in range(self.workers)]:
+            f.result()
+
+    def _new_pool(self):
+        # the pool machinery is only imported by "process" mode
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context(SCORING_MP_CONTEXT),
+            initializer=_init_worker,
+            initargs=(_share_dir,),
+        )
+
+    def _pool_submit(self, payloads: List[bytes]) -> Future:
+        from concurrent.futures.process import BrokenProcessPool
+
+        pool = self._pool
+        try:
+            remote = pool.submit(_score_in_worker, payloads)
+        except BrokenProcessPool:
+            with self._pool_lock:
+                if self._pool is pool:  # not replaced by a concurrent submitter yet
+                    log.error("a scoring worker died and broke the process pool, starting a new one")
+                    pool.shutdown(wait=False)
+                    self._pool = self._new_pool()
+            remote = self._pool.submit(_score_in_worker, payloads)
+        fut: Future = Future()
+
+        def unpack(f: Future):
+            try:
+                out, metrics = f.result()
+            except BaseException as e:
+                fut.set_exception(e)
+                return
+            if metrics:
+                METRICS.add(metrics)
+            fut.set_result(out)
+
+        remote.add_done_callback(unpack)
+        return fut
+
+    def stop(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+    def submit(self, payloads: List[bytes]) -> "Future[List[Tuple[str, Dict[str, Any]]]]":
+        self._slots.acquire()
+        if self._pool is None:
+            fut: Future = Future()
+            try:
+                fut.set_result(score_payloads(payloads))
+            except Exception as e:
+                fut.set_exception(e)
+            finally:
+                self._slots.release()
+            return fut
+        try:
+            fut = self._pool_submit(payloads)
+        except Exception:
+            self._slots.release()
+            raise
+        fut.add_done_callback(lambda _: self._slots.release())
+        return fut
+
+    def score(self, payloads: List[bytes]) -> List[Tuple[str, Dict[str, Any]]]:
+        if not all(isinstance(p, _PAYLOAD_TYPES) for p in payloads):
+            return self._score_bytes_only(payloads)
+        if self.incremental is not None:
+            return self._score_incremental(payloads)
+        if STREAM_MIN_BYTES and any(len(p) >= STREAM_MIN_BYTES for p in payloads):
+            return self._score_mixed(payloads)
+        model = get_model()
+        if self.cache is None or model.normalizer is not None:
+            return self.submit(payloads).result()
+
+        t0 = time.time()
+        version = model.version_key()
+        keys = [payload_key(p, version) for p in payloads]
+        out: List[Optional[Tuple[str, Dict[str, Any]]]] = [None] * len(payloads)
+        misses: List[int] = []
+        for i, key in enumerate(keys):
+            hit = self.cache.get(key) if key else None
+            if hit is None:
+                misses.append(i)
+            else:
+                out[i] = (OK, {**hit, "timestamp": int(time.time()),
+                               "processing_time_ms": int((time.time() - t0) * 1000)})
+        if misses:
+            scored = self.submit([payloads[i] for i in misses]).result()
+            for i, (status, result) in zip(misses, scored):
+                out[i] = (status, result)
+                if status == OK and keys[i]:
+                    self.cache.put(keys[i], dict(result))
+        return out
+
+    async def score_stream(self, chunks: AsyncIterable[bytes]) -> Tuple[str, Dict[str, Any]]:
+        """
+        score_stream() of one wallet whose bytes arrive on the event loop (a large HTTP
+        body): each chunk is fed in the thread pool as it comes, so no thread waits on
+        the network. Always in this process, with the same model as score().
+        """
+        from starlette.concurrency import run_in_threadpool
+
+        if self.incremental is not None:
+            body = b"".join([chunk async for chunk in chunks])
+            return (await run_in_threadpool(self._score_incremental, [body]))[0]
+        scorer = get_model().stream_scorer()
+        try:
+            async for chunk in chunks:
+                if chunk:
+                    await run_in_threadpool(scorer.feed, chunk)
+            return OK, await run_in_threadpool(scorer.finish)
+        except Exception as e:
+            return _stream_failure(scorer, e)
+
+    def _score_incremental(self, payloads: List[bytes]) -> List[Tuple[str, Dict[str, Any]]]:
+        out: List[Tuple[str, Dict[str, Any]]] = []
+        for raw in payloads:
+            t = perf_counter_ns()
+            try:
+                wallet = parse_wallet(raw)
+            except Exception as e:
+                out.append((INVALID, failure_message(_address_hint(raw), str(e))))
+                continue
+            finally:
+                _T_DECODE.record_ns(perf_counter_ns() - t)
+            try:
+                out.append((OK, self.incremental.update(wallet)))
+            except Exception as e:
+                out.append((ERROR, failure_message(wallet.wallet_address, str(e))))
+        return out
+
+    def _score_bytes_only(self, payloads: List[Any]) -> List[Tuple[str, Dict[str, Any]]]:
+        out: List[Optional[Tuple[str, Dict[str, Any]]]] = [None] * len(payloads)
+        valid = [i for i, p in enumerate(payloads) if isinstance(p, _PAYLOAD_TYPES)]
+        for i, p in enumerate(payloads):
+            if not isinstance(p, _PAYLOAD_TYPES):
+                out[i] = _not_bytes(p)
+        if valid:
+            for i, result in zip(valid, self.score([payloads[i] for i in valid])):
+                out[i] = result
+        return out
+
+    def _score_mixed(self, payloads: List[bytes]) -> List[Tuple[str, Dict[str, Any]]]:
+        out: List[Optional[Tuple[str, Dict[str, Any]]]] = [None] * len(payloads)
+        small = [i for i, p in enumerate(payloads) if len(p) < STREAM_MIN_BYTES]
+        for i, p in enumerate(payloads):
+            if len(p) >= STREAM_MIN_BYTES:
+                out[i] = score_stream(_chunks(p))
+        if small:
+            for i, result in zip(small, self.score([payloads[i] for i in small])):
+                out[i] = result
+        return out
@@ -1,122 +1,290 @@
-# # app/services/kafka_service.py
-# import os
-# import json
-# import threading
-# import time
-# from typing import Dict, Any, Optional
-
-# from app.models.dex_model import DexScoringModel
-# from app.utils.types import FailureMessage, FailureCategory, to_serializable
-# from dotenv import load_dotenv
-# load_dotenv()
-
-# KAFKA_ENABLED = os.getenv("KAFKA_ENABLED", "false").lower() == "true"
-
-# if KAFKA_ENABLED:
-#     from kafka import KafkaConsumer, KafkaProducer
-
-# from app.models.dex_model import DexScoringModel
-
-# class KafkaScoringService:
-#     def __init__(self, use_kafka: bool = True):
-#         self.model = DexScoringModel()
-#         self.use_kafka = use_kafka
-
-#         if self.use_kafka:
-#             from kafka import KafkaConsumer, KafkaProducer
-#             import os
-#             self.consumer = KafkaConsumer(
-#                 os.getenv("KAFKA_INPUT_TOPIC", "wallet-transactions"),
-#                 bootstrap_servers=os.getenv("KAFKA_BOOTSTRAP_SERVERS", "localhost:9092"),
-#                 group_id=os.getenv("KAFKA_CONSUMER_GROUP", "ai-scoring-service")
-#             )
-#             self.producer = KafkaProducer(
-#                 bootstrap_servers=os.getenv("KAFKA_BOOTSTRAP_SERVERS", "localhost:9092")
-#             )
-#         else:
-#             # No Kafka → mock mode
-#             self.consumer = None
-#             self.producer = None
-
-#     def process_message(self, wallet_json: dict):
-#         """Process one wallet JSON message and return success/failure result."""
-#         try:
-#             result = self.model.score_wallet(wallet_json)
-#             return {"status": "success", "result": result}
-#         except Exception as e:
-#             return {
-#                 "status": "failure",
-#                 "result": {
-#                     "wallet_address": wallet_json.get("wallet_address", "unknown"),
-#                     "error": str(e),
-#                     "timestamp": 0,
-#                     "processing_time_ms": 0,
-#                     "categories": [{"category": "dexes", "error": str(e), "transaction_count": 0}]
-#                 }
-#             }
 # app/services/kafka_service.py
 import os
-from queue import Queue
-from app.models.dex_model import DexScoringModel
+import json
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+from time import perf_counter_ns
+
+from app.services.executor import ScoringExecutor, score_profiled, _address_hint
+from app.services.mock_broker import MockBroker
+from app.services.workers import WORKER_COUNT, WORKER_ID, owned_partitions
+from app.utils.encoding import encode_result
+from app.utils.metrics import METRICS, stage
+from app.utils.profiling import PROFILING_ENABLED, sort_key
+from app.utils.types import failure_message
+
+log = logging.getLogger(__name__)
 
 # Load Kafka flag from env
 KAFKA_ENABLED = os.getenv("KAFKA_ENABLED", "false").lower() == "true"
 
-if KAFKA_ENABLED:
-    from kafka import KafkaConsumer, KafkaProducer
+KAFKA_BOOTSTRAP_SERVERS = os.getenv("KAFKA_BOOTSTRAP_SERVERS", "localhost:9092")
+KAFKA_INPUT_TOPIC = os.getenv("KAFKA_INPUT_TOPIC", "wallet-transactions")
+KAFKA_SUCCESS_TOPIC = os.getenv("KAFKA_SUCCESS_TOPIC", "wallet-scores-success")
+KAFKA_FAILURE_TOPIC = os.getenv("KAFKA_FAILURE_TOPIC", "wallet-scores-failure")
+KAFKA_CONSUMER_GROUP = os.getenv("KAFKA_CONSUMER_GROUP", "ai-scoring-service")
+
+# micro-batching knobs
+KAFKA_MAX_POLL_RECORDS = int(os.getenv("KAFKA_MAX_POLL_RECORDS", "500"))
+KAFKA_POLL_TIMEOUT_MS = int(os.getenv("KAFKA_POLL_TIMEOUT_MS", "200"))
+KAFKA_LINGER_MS = int(os.getenv("KAFKA_LINGER_MS", "10"))
+KAFKA_SEND_TIMEOUT_S = float(os.getenv("KAFKA_SEND_TIMEOUT_S", "30"))
+KAFKA_SCORING_WORKERS = int(os.getenv("KAFKA_SCORING_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+_T_POLL = stage("kafka_poll")
+_T_PRODUCE = stage("kafka_produce")  # send + flush + acks of one batch
+_T_COMMIT = stage("kafka_commit")
+_T_SERIALIZE = stage("serialize")
+_RECORDS = {topic: METRICS.counter("kafka_records_total", "Results published to Kafka", topic=topic)
+            for topic in (KAFKA_SUCCESS_TOPIC, KAFKA_FAILURE_TOPIC)}
+
+
+def _profile_header(record) -> Optional[str]:
+    for key, value in getattr(record, "headers", None) or ():
+        if key.lower() == "x-profile":
+            return sort_key(value.decode() if isinstance(value, bytes) else value) or "cumulative"
+    return None
 
 
 class KafkaScoringService:
-    def __init__(self):
-        self.model = DexScoringModel()
-        self.real_mode = KAFKA_ENABLED  # Track if real Kafka is enabled
+    """
+    Consume wallet messages, score them in micro-batches and publish the results.
+
+    One consumer thread runs poll -> score -> produce -> commit:
+    - poll() returns up to KAFKA_MAX_POLL_RECORDS records across partitions
+    - the batch is split across a small worker pool and each chunk of raw record values
+      is decoded and scored by the shared ScoringExecutor (in-thread or process pool)
+    - every result is sent asynchronously to the success/failure topic, the producer is
+      flushed once per batch and each send is awaited
+    - if scoring the batch raises, its records are re-scored one at a time and a record
+      that still fails is published to the failure topic, so one poison record cannot
+      stall its partition
+    - offsets are committed only after all sends of the batch are acknowledged; if a send
+      fails the batch is rewound (seek) and redelivered, i.e. at-least-once delivery
+
+    `consumer`/`producer` may be injected (anything with the kafka-python client
+    interface); otherwise real clients are created when KAFKA_ENABLED is set, and an
+    in-process MockBroker (app.services.mock_broker) stands in for Kafka when it is not.
+    The same loop runs in all three cases.
+
+    Under app.serve with several workers, the real consumer does not join the group's
+    rebalancing: each worker assign()s the input partitions it owns
+    (workers.owned_partitions), so every partition has one fixed owner and a worker
+    restart does not pause the others. Partitions added to the topic later are picked
+    up on the next restart; a worker owning none does not consume. The mock broker is
+    in-process, so there every worker runs its own pipeline.
+    """
+
+    def __init__(self, consumer=None, producer=None, executor: Optional[ScoringExecutor] = None,
+                 broker: Optional[MockBroker] = None):
+        self.executor = executor or ScoringExecutor(mode="thread")
+        self.real_mode = KAFKA_ENABLED or consumer is not None  # Track if real Kafka is enabled
+        self.stats = {"batches": 0, "processed": 0, "success": 0, "failure": 0, "send_errors": 0,
+                      "score_errors": 0}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self.broker: Optional[MockBroker] = None
+        self._drain = None
+        self.partitions: Optional[List[int]] = None  # statically owned input partitions
+
+        if consumer is not None:
+            self.consumer = consumer
+            self.producer = producer
+        elif self.real_mode:
+            # Real Kafka mode; the client library is only imported here
+            from kafka import KafkaConsumer, KafkaProducer, TopicPartition
 
-        if self.real_mode:
-            # Real Kafka mode
             self.consumer = KafkaConsumer(
-                os.getenv("KAFKA_INPUT_TOPIC", "wallet-transactions"),
-                bootstrap_servers=os.getenv("KAFKA_BOOTSTRAP_SERVERS", "localhost:9092"),
-                group_id=os.getenv("KAFKA_CONSUMER_GROUP", "ai-scoring-service"),
+                *(() if WORKER_COUNT > 1 else (KAFKA_INPUT_TOPIC,)),
+                bootstrap_servers=KAFKA_BOOTSTRAP_SERVERS,
+                group_id=KAFKA_CONSUMER_GROUP,
+                enable_auto_commit=False,
+                auto_offset_reset="earliest",
+                max_poll_records=KAFKA_MAX_POLL_RECORDS,
             )
+            if WORKER_COUNT > 1:
+                self.partitions = owned_partitions(self.consumer.partitions_for_topic(KAFKA_INPUT_TOPIC) or ())
+                self.consumer.assign([TopicPartition(KAFKA_INPUT_TOPIC, p) for p in self.partitions])
+                self.stats["partitions"] = len(self.partitions)
+                log.info("worker %d/%d owns %s partitions %s", WORKER_ID, WORKER_COUNT, KAFKA_INPUT_TOPIC,
+                         self.partitions)
             self.producer = KafkaProducer(
-                bootstrap_servers=os.getenv("KAFKA_BOOTSTRAP_SERVERS", "localhost:9092")
+                bootstrap_servers=KAFKA_BOOTSTRAP_SERVERS,
+                linger_ms=KAFKA_LINGER_MS,
+                acks="all",
             )
         else:
-            # Mock mode with queue
-            self.queue = Queue()
-            self.consumer = None
-            self.producer = None
+            # Mock mode: in-process broker, nothing reads the output topics but the
+            # drain endpoint, so they keep their latest records instead of blocking
+            self.broker = broker or MockBroker()
+            for topic in (KAFKA_SUCCESS_TOPIC, KAFKA_FAILURE_TOPIC):
+                self.broker.create_topic(topic, blocking=False)
+            self.consumer = self.broker.consumer(KAFKA_INPUT_TOPIC, group_id=KAFKA_CONSUMER_GROUP,
+                                                 max_poll_records=KAFKA_MAX_POLL_RECORDS)
+            self.producer = self.broker.producer()
 
-    def process_message(self, wallet_json: dict):
-        """Process one wallet JSON message and return success/failure result."""
+    # ---------------- pipeline ----------------
+    def start(self):
+        if self._thread is not None or self.partitions == []:
+            return
+        self._stop.clear()
+        self._pool = ThreadPoolExecutor(max_workers=self._dispatchers(), thread_name_prefix="kafka-score")
+        self._thread = threading.Thread(target=self._run, name="kafka-consumer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        if self._thread is None:
+            if self.partitions != []:
+                return
+        else:
+            self._stop.set()
+            self._thread.join(timeout)
+            self._thread = None
+            self._pool.shutdown(wait=True)
+            self._pool = None
+        try:
+            self.producer.flush()
+            self.producer.close()
+        finally:
+            self.consumer.close()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception:
+                log.exception("kafka pipeline iteration failed")
+                time.sleep(1.0)
+
+    def run_once(self) -> int:
+        """
+        Poll one micro-batch and carry it through score -> produce -> commit.
+        Returns the number of records handled (0 if the poll was empty).
+        """
+        t = perf_counter_ns()
+        batch = self.consumer.poll(timeout_ms=KAFKA_POLL_TIMEOUT_MS, max_records=KAFKA_MAX_POLL_RECORDS)
+        records = [r for recs in batch.values() for r in recs]
+        if not records:
+            return 0
+        _T_POLL.record_ns(perf_counter_ns() - t)
+
+        try:
+            outputs = self._score_records(records)
+        except Exception:
+            # e.g. a broken process pool or a record the scorer chokes on
+            self.stats["score_errors"] += 1
+            log.exception("scoring %d records failed, retrying them one at a time", len(records))
+            outputs = [out for r in records for out in self._score_single(r)]
+        try:
+            t = perf_counter_ns()
+            futures = [self.producer.send(topic, key=key, value=value) for topic, key, value in outputs]
+            self.producer.flush(timeout=KAFKA_SEND_TIMEOUT_S)
+            for f in futures:
+                f.get(timeout=KAFKA_SEND_TIMEOUT_S)
+            _T_PRODUCE.record_ns(perf_counter_ns() - t)
+        except Exception:
+            self.stats["send_errors"] += 1
+            log.exception("publishing %d results failed, rewinding batch", len(outputs))
+            self._rewind(batch)
+            return 0
+
+        t = perf_counter_ns()
+        self.consumer.commit()
+        _T_COMMIT.record_ns(perf_counter_ns() - t)
+        ok = sum(1 for topic, _, _ in outputs if topic == KAFKA_SUCCESS_TOPIC)
+        _RECORDS[KAFKA_SUCCESS_TOPIC].inc(ok)
+        _RECORDS[KAFKA_FAILURE_TOPIC].inc(len(outputs) - ok)
+        self.stats["batches"] += 1
+        self.stats["processed"] += len(outputs)
+        self.stats["success"] += ok
+        self.stats["failure"] += len(outputs) - ok
+        return len(records)
+
+    def _rewind(self, batch: Dict[Any, List[Any]]):
+        for tp, recs in batch.items():
+            self.consumer.seek(tp, recs[0].offset)
+
+    def _score_records(self, records: List[Any]) -> List[Tuple[str, bytes, bytes]]:
+        """
+        Decode + score a batch of records; returns (topic, key, value) in input order.
+        """
+        n_chunks = max(1, min(self._dispatchers(), len(records) // 64))
+        size = -(-len(records) // n_chunks)
+        chunks = [records[i:i + size] for i in range(0, len(records), size)]
+        if len(chunks) == 1 or self._pool is None:
+            parts = [self._score_chunk(c) for c in chunks]
+        else:
+            parts = list(self._pool.map(self._score_chunk, chunks))
+        return [out for part in parts for out in part]
+
+    def _score_single(self, record: Any) -> List[Tuple[str, bytes, bytes]]:
+        """
+        Score one record after its batch failed; a record that fails again becomes a
+        failure message rather than blocking the commit.
+        """
         try:
-            result = self.model.score_wallet(wallet_json)
-            return {"status": "success", "result": result}
+            return self._score_chunk([record])
         except Exception as e:
-            return {
-                "status": "failure",
-                "result": {
-                    "wallet_address": wallet_json.get("wallet_address", "unknown"),
-                    "error": str(e),
-                    "timestamp": 0,
-                    "processing_time_ms": 0,
-                    "categories": [
-                        {"category": "dexes", "error": str(e), "transaction_count": 0}
-                    ],
-                },
-            }
+            log.exception("record %s:%s failed scoring, publishing a failure",
+                          getattr(record, "partition", "?"), getattr(record, "offset", "?"))
+            result = failure_message(_address_hint(record.value), str(e))
+            return [(KAFKA_FAILURE_TOPIC, str(result["wallet_address"]).encode(), encode_result(result))]
 
-    # ---------------- MOCK Helpers ----------------
-    def mock_send(self, message: dict):
-        if not self.real_mode:
-            self.queue.put(message)
+    def _dispatchers(self) -> int:
+        # enough threads to keep every scoring process busy
+        return max(KAFKA_SCORING_WORKERS, self.executor.workers)
+
+    def _score_chunk(self, records: List[Any]) -> List[Tuple[str, bytes, bytes]]:
+        out: List[Tuple[str, bytes, bytes]] = []
+        for _, result in self._score_values(records):
+            topic = KAFKA_SUCCESS_TOPIC if "zscore" in result else KAFKA_FAILURE_TOPIC
+            t = perf_counter_ns()
+            value = encode_result(result)
+            _T_SERIALIZE.record_ns(perf_counter_ns() - t)
+            out.append((topic, str(result["wallet_address"]).encode(), value))
+        return out
+
+    def _score_values(self, records: List[Any]) -> List[Tuple[str, Any]]:
+        """
+        executor.score() of the record values, except that records carrying an
+        X-Profile header (with PROFILING_ENABLED) are scored under cProfile and published
+        with the report under "profile".
+        """
+        sorts = [_profile_header(r) if PROFILING_ENABLED else None for r in records]
+        if not any(sorts):
+            return self.executor.score([r.value for r in records])
+        plain = iter(self.executor.score([r.value for r, s in zip(records, sorts) if not s]))
+        return [score_profiled(r.value, s) if s else next(plain) for r, s in zip(records, sorts)]
 
-    def mock_drain(self):
-        if not self.real_mode:
-            drained = []
-            while not self.queue.empty():
-                drained.append(self.queue.get())
-            return drained
-        return []
+    def process_message(self, wallet_json: dict):
+        """Process one wallet JSON message and return success/failure result."""
+        _, result = self.executor.score([json.dumps(wallet_json).encode()])[0]
+        return {"status": "success" if "zscore" in result else "failure", "result": result}
 
+    # ---------------- MOCK Helpers ----------------
+    def mock_send(self, message: dict):
+        """
+        Produce a wallet message to the mock broker's input topic; blocks while the
+        partition is full (BrokerFullError after KAFKA_MOCK_SEND_TIMEOUT_S).
+        """
+        if self.broker is not None:
+            self.producer.send(KAFKA_INPUT_TOPIC, value=json.dumps(message).encode()).get()
 
+    def mock_drain(self) -> List[Dict[str, Any]]:
+        """Scored results published to the success/failure topics since the last drain."""
+        if self.broker is None:
+            return []
+        if self._drain is None:
+            self._drain = self.broker.consumer(KAFKA_SUCCESS_TOPIC, KAFKA_FAILURE_TOPIC, group_id="mock-drain")
+        drained = []
+        while True:
+            batch = self._drain.poll(timeout_ms=0)
+            if not batch:
+                break
+            drained += [json.loads(r.value) for recs in batch.values() for r in recs]
+        self._drain.commit()
+        return drained
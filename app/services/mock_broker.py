@@ -0,0 +1,290 @@
+# app/services/mock_broker.py
+import os
+import time
+import zlib
+import threading
+from collections import deque, namedtuple
+from itertools import islice
+from typing import Any, Dict, List, Optional, Tuple
+
+KAFKA_MOCK_PARTITIONS = int(os.getenv("KAFKA_MOCK_PARTITIONS", "4"))
+# records a partition retains; a full partition of a consumed topic blocks producers
+KAFKA_MOCK_CAPACITY = int(os.getenv("KAFKA_MOCK_CAPACITY", "10000"))
+KAFKA_MOCK_SEND_TIMEOUT_S = float(os.getenv("KAFKA_MOCK_SEND_TIMEOUT_S", "30"))
+
+# same shapes as kafka-python's (both are namedtuples there too)
+TopicPartition = namedtuple("TopicPartition", "topic partition")
+ConsumerRecord = namedtuple("ConsumerRecord", "topic partition offset timestamp key value headers")
+RecordMetadata = namedtuple("RecordMetadata", "topic partition offset")
+
+
+class BrokerFullError(Exception):
+    """send() found the partition full and no consumer freed room within the timeout."""
+
+
+class _Partition:
+    __slots__ = ("log", "start")
+
+    def __init__(self):
+        self.log: deque = deque()
+        self.start = 0  # offset of log[0]
+
+    @property
+    def end(self) -> int:
+        return self.start + len(self.log)
+
+
+class _Topic:
+    def __init__(self, name: str, partitions: int, capacity: int, blocking: bool):
+        self.name = name
+        self.parts = [_Partition() for _ in range(max(1, partitions))]
+        self.capacity = max(1, capacity)
+        self.blocking = blocking
+        self.groups: set = set()
+        self.next_rr = 0
+
+
+class _Group:
+    def __init__(self):
+        self.members: List["MockConsumer"] = []
+        self.committed: Dict[TopicPartition, int] = {}
+
+
+class MockBroker:
+    """
+    In-process stand-in for a Kafka cluster, enough of it for KafkaScoringService to run
+    its real poll -> score -> produce -> commit loop without Kafka:
+
+    - topics split into partitions (records keyed by crc32(key), round-robin otherwise)
+    - consumer groups: partitions are spread over the members of a group and re-spread
+      when one joins or leaves; each group has its own committed offsets, and a member
+      (re)starts from them, so uncommitted records are redelivered
+    - bounded partitions: records are dropped once every group reading the topic has
+      committed past them; a partition holding `capacity` uncommitted records blocks
+      send() until room frees up (BrokerFullError after the timeout). Topics created
+      with blocking=False, or read by no group, drop their oldest records instead
+
+    One lock and condition variable guard everything; consumers wait on it in poll().
+    """
+
+    def __init__(self, partitions: int = KAFKA_MOCK_PARTITIONS, capacity: int = KAFKA_MOCK_CAPACITY):
+        self.partitions = partitions
+        self.capacity = capacity
+        self._cond = threading.Condition()
+        self._topics: Dict[str, _Topic] = {}
+        self._groups: Dict[str, _Group] = {}
+
+    # ---------------- topics ----------------
+    def create_topic(self, name: str, partitions: Optional[int] = None, capacity: Optional[int] = None,
+                     blocking: bool = True):
+        with self._cond:
+            if name not in self._topics:
+                self._topics[name] = _Topic(name, partitions or self.partitions, capacity or self.capacity, blocking)
+
+    def _topic(self, name: str) -> _Topic:
+        topic = self._topics.get(name)
+        if topic is None:
+            topic = self._topics[name] = _Topic(name, self.partitions, self.capacity, True)
+        return topic
+
+    def producer(self, send_timeout_s: float = KAFKA_MOCK_SEND_TIMEOUT_S) -> "MockProducer":
+        return MockProducer(self, send_timeout_s)
+
+    def consumer(self, *topics: str, group_id: Optional[str] = None, auto_offset_reset: str = "earliest",
+                 max_poll_records: int = 500) -> "MockConsumer":
+        return MockConsumer(self, topics, group_id, auto_offset_reset, max_poll_records)
+
+    # ---------------- produce ----------------
+    def append(self, topic_name: str, key: Optional[bytes], value: bytes, headers=None,
+               timeout_s: float = KAFKA_MOCK_SEND_TIMEOUT_S) -> RecordMetadata:
+        deadline = time.monotonic() + timeout_s
+        with self._cond:
+            topic = self._topic(topic_name)
+            if key is None:
+                p = topic.next_rr % len(topic.parts)
+                topic.next_rr += 1
+            else:
+                p = zlib.crc32(key) % len(topic.parts)
+            part = topic.parts[p]
+            while len(part.log) >= topic.capacity:
+                if not (topic.blocking and topic.groups):
+                    part.log.popleft()
+                    part.start += 1
+                    continue
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise BrokerFullError(f"{topic_name}[{p}] holds {topic.capacity} uncommitted records")
+                self._cond.wait(remaining)
+            offset = part.end
+            part.log.append(ConsumerRecord(topic_name, p, offset, int(time.time() * 1000), key, value,
+                                           list(headers or ())))
+            self._cond.notify_all()
+            return RecordMetadata(topic_name, p, offset)
+
+    # ---------------- consumer groups ----------------
+    def _join(self, consumer: "MockConsumer"):
+        with self._cond:
+            for name in consumer.topics:
+                self._topic(name)
+            if consumer.group_id is None:
+                consumer._assign([TopicPartition(name, p) for name in consumer.topics
+                                  for p in range(len(self._topics[name].parts))], {})
+                return
+            group = self._groups.setdefault(consumer.group_id, _Group())
+            group.members.append(consumer)
+            for name in consumer.topics:
+                self._topics[name].groups.add(consumer.group_id)
+            self._rebalance(group)
+
+    def _leave(self, consumer: "MockConsumer"):
+        with self._cond:
+            group = self._groups.get(consumer.group_id) if consumer.group_id is not None else None
+            if group is not None and consumer in group.members:
+                group.members.remove(consumer)
+                self._rebalance(group)
+            consumer._assigned = []
+            self._cond.notify_all()
+
+    def _rebalance(self, group: _Group):
+        tps = sorted({TopicPartition(name, p) for m in group.members for name in m.topics
+                      for p in range(len(self._topics[name].parts))})
+        for i, member in enumerate(group.members):
+            member._assign(tps[i::len(group.members)], group.committed)
+
+    def _commit(self, consumer: "MockConsumer"):
+        with self._cond:
+            group = self._groups.get(consumer.group_id)
+            if group is None:
+                return
+            for tp in consumer._assigned:
+                group.committed[tp] = consumer._positions[tp]
+                self._trim(self._topics[tp.topic], tp.partition)
+            self._cond.notify_all()
+
+    def _trim(self, topic: _Topic, p: int):
+        # drop what every group reading the topic has committed
+        part = topic.parts[p]
+        tp = TopicPartition(topic.name, p)
+        low = min(self._groups[g].committed.get(tp, part.start) for g in topic.groups)
+        while part.start < low and part.log:
+            part.log.popleft()
+            part.start += 1
+
+    def _fetch(self, consumer: "MockConsumer", timeout_s: float, max_records: int) -> Dict[TopicPartition, List]:
+        deadline = time.monotonic() + timeout_s
+        with self._cond:
+            while True:
+                out: Dict[TopicPartition, List] = {}
+                n = 0
+                tps = consumer._assigned
+                # start at a different partition each poll so none is starved
+                k = consumer._rotation % len(tps) if tps else 0
+                consumer._rotation += 1
+                for tp in tps[k:] + tps[:k]:
+                    part = self._topics[tp.topic].parts[tp.partition]
+                    pos = max(consumer._positions[tp], part.start)
+                    batch = list(islice(part.log, pos - part.start, pos - part.start + max_records - n))
+                    if batch:
+                        out[tp] = batch
+                        consumer._positions[tp] = pos + len(batch)
+                        n += len(batch)
+                        if n >= max_records:
+                            break
+                remaining = deadline - time.monotonic()
+                if out or remaining <= 0:
+                    return out
+                self._cond.wait(remaining)
+
+    def _reset_offset(self, tp: TopicPartition, policy: str) -> int:
+        part = self._topics[tp.topic].parts[tp.partition]
+        return part.end if policy == "latest" else part.start
+
+    # ---------------- introspection ----------------
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            topics = {name: {"partitions": len(t.parts), "capacity": t.capacity,
+                             "retained": sum(len(p.log) for p in t.parts),
+                             "end_offsets": [p.end for p in t.parts]}
+                      for name, t in self._topics.items()}
+            groups = {}
+            for gid, group in self._groups.items():
+                lag = 0
+                for name, t in self._topics.items():
+                    if gid in t.groups:
+                        for p, part in enumerate(t.parts):
+                            lag += part.end - group.committed.get(TopicPartition(name, p), part.start)
+                groups[gid] = {"members": len(group.members), "lag": lag}
+            return {"topics": topics, "groups": groups}
+
+    def lag(self, group_id: str) -> int:
+        return self.stats()["groups"].get(group_id, {}).get("lag", 0)
+
+
+class _SendResult:
+    """Already-completed stand-in for kafka-python's FutureRecordMetadata."""
+
+    def __init__(self, metadata: Optional[RecordMetadata] = None, error: Optional[Exception] = None):
+        self.metadata, self.error = metadata, error
+
+    def get(self, timeout: Optional[float] = None) -> RecordMetadata:
+        if self.error is not None:
+            raise self.error
+        return self.metadata
+
+
+class MockProducer:
+    """KafkaProducer interface over a MockBroker. send() blocks while the partition is full."""
+
+    def __init__(self, broker: MockBroker, send_timeout_s: float = KAFKA_MOCK_SEND_TIMEOUT_S):
+        self.broker = broker
+        self.send_timeout_s = send_timeout_s
+
+    def send(self, topic: str, value: bytes = None, key: Optional[bytes] = None, headers=None) -> _SendResult:
+        return _SendResult(self.broker.append(topic, key, value, headers, self.send_timeout_s))
+
+    def flush(self, timeout: Optional[float] = None):
+        pass
+
+    def close(self, timeout: Optional[float] = None):
+        pass
+
+
+class MockConsumer:
+    """
+    KafkaConsumer interface over a MockBroker (manual commits). Without a group_id it
+    reads every partition of its topics from `auto_offset_reset` and commits nothing.
+    """
+
+    def __init__(self, broker: MockBroker, topics: Tuple[str, ...], group_id: Optional[str] = None,
+                 auto_offset_reset: str = "earliest", max_poll_records: int = 500):
+        self.broker = broker
+        self.topics = tuple(topics)
+        self.group_id = group_id
+        self.auto_offset_reset = auto_offset_reset
+        self.max_poll_records = max_poll_records
+        self._assigned: List[TopicPartition] = []
+        self._positions: Dict[TopicPartition, int] = {}
+        self._rotation = 0
+        broker._join(self)
+
+    def _assign(self, tps: List[TopicPartition], committed: Dict[TopicPartition, int]):
+        # called under the broker lock
+        self._assigned = list(tps)
+        self._positions = {tp: committed[tp] if tp in committed else self.broker._reset_offset(tp, self.auto_offset_reset)
+                           for tp in tps}
+
+    def assignment(self) -> set:
+        return set(self._assigned)
+
+    def poll(self, timeout_ms: int = 0, max_records: Optional[int] = None) -> Dict[TopicPartition, List]:
+        return self.broker._fetch(self, timeout_ms / 1000, max_records or self.max_poll_records)
+
+    def seek(self, tp: TopicPartition, offset: int):
+        with self.broker._cond:
+            self._positions[tp] = offset
+
+    def commit(self):
+        self.broker._commit(self)
+
+    def close(self):
+        self.broker._leave(self)
@@ -0,0 +1,203 @@
+# app/services/score_sketch.py
+import os
+import json
+import glob
+import uuid
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.utils.sketch import QuantileSketch, CdfView
+
+log = logging.getLogger(__name__)
+
+# off | percentile
+SCORE_NORMALIZATION = os.getenv("SCORE_NORMALIZATION", "off").lower()
+SCORE_SKETCH_K = int(os.getenv("SCORE_SKETCH_K", "200"))
+# raw scores are served until the population has this many wallets
+SCORE_NORMALIZE_MIN_COUNT = int(os.getenv("SCORE_NORMALIZE_MIN_COUNT", "1000"))
+# observations between two rebuilds of the lookup view (and exchanges with peers)
+SCORE_SKETCH_PUBLISH_EVERY = int(os.getenv("SCORE_SKETCH_PUBLISH_EVERY", "1000"))
+# snapshot loaded at startup and written at shutdown
+SCORE_SKETCH_PATH = os.getenv("SCORE_SKETCH_PATH", "")
+# directory where every process publishes its own sketch and reads its peers' (optional)
+SCORE_SKETCH_SHARE_DIR = os.getenv("SCORE_SKETCH_SHARE_DIR", "")
+
+SUB_SCORES = ("lp", "swap")
+
+
+class ScoreNormalizer:
+    """
+    Maps raw LP / swap sub-scores (0..1000) to their percentile in the population of
+    wallets scored so far, times 1000.
+
+    Every process keeps a local QuantileSketch per sub-score, fed as wallets are scored.
+    Lookups go to a frozen CdfView of base (the startup snapshot) + local + peers, rebuilt
+    every `publish_every` observations, so a lookup is a binary search and never waits on
+    a rebuild. With `share_dir`, every rebuild also writes this process's local sketches
+    to share_dir/sketch-<pid>-<id>.json and merges the other processes' files.
+    """
+
+    def __init__(self, k: int = SCORE_SKETCH_K, min_count: int = SCORE_NORMALIZE_MIN_COUNT,
+                 publish_every: int = SCORE_SKETCH_PUBLISH_EVERY, path: str = SCORE_SKETCH_PATH,
+                 share_dir: str = SCORE_SKETCH_SHARE_DIR):
+        self.k = k
+        self.min_count = min_count
+        self.publish_every = max(1, publish_every)
+        self.path = path
+        self.share_dir = share_dir
+        self._own_file = f"sketch-{os.getpid()}-{uuid.uuid4().hex[:8]}.json"
+        self._lock = threading.Lock()
+        self._local = {name: QuantileSketch(k) for name in SUB_SCORES}
+        self._base = {name: QuantileSketch(k) for name in SUB_SCORES}
+        self._buffer_lp: List[float] = []
+        self._buffer_swap: List[float] = []
+        self._pending = 0
+        self._views: Optional[Dict[str, CdfView]] = None
+        self._population = 0
+        if path and os.path.exists(path):
+            self._base = self._read(path)
+        self._rebuild()
+
+    # ---------------- scoring ----------------
+
+    def observe_and_map(self, lp: np.ndarray, swap: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Record the raw sub-scores and return them as population percentiles x 1000
+        (unchanged while the population is smaller than `min_count`).
+        """
+        with self._lock:
+            self._local["lp"].update(lp)
+            self._local["swap"].update(swap)
+            self._pending += len(lp)
+            if self._pending >= self.publish_every or (self._views is None and self._ready_locked()):
+                self._rebuild()
+        views = self._views
+        if views is None:
+            return lp, swap
+        return views["lp"].rank(lp) * 1000.0, views["swap"].rank(swap) * 1000.0
+
+    def observe_and_map1(self, lp: float, swap: float) -> Tuple[float, float]:
+        """observe_and_map for a single wallet."""
+        with self._lock:
+            # buffered: the sketches are updated in bulk at the next rebuild
+            self._buffer_lp.append(lp)
+            self._buffer_swap.append(swap)
+            self._pending += 1
+            if self._pending >= self.publish_every or (self._views is None and self._ready_locked()):
+                self._rebuild()
+        views = self._views
+        if views is None:
+            return lp, swap
+        return views["lp"].rank1(lp) * 1000.0, views["swap"].rank1(swap) * 1000.0
+
+    def _ready_locked(self) -> bool:
+        return self._population + self._pending >= self.min_count
+
+    # ---------------- merging / persistence ----------------
+
+    def _flush(self):
+        if self._buffer_lp:
+            self._local["lp"].update(self._buffer_lp)
+            self._local["swap"].update(self._buffer_swap)
+            self._buffer_lp, self._buffer_swap = [], []
+
+    def merged(self) -> Dict[str, QuantileSketch]:
+        """base + local + peers, as fresh sketches."""
+        self._flush()
+        out = {name: QuantileSketch(self.k).merge(self._base[name]).merge(self._local[name]) for name in SUB_SCORES}
+        for peer in self._peer_files():
+            try:
+                sketches = self._read(peer)
+            except (OSError, ValueError, KeyError):
+                continue  # peer file mid-replace or gone
+            for name in SUB_SCORES:
+                out[name].merge(sketches[name])
+        return out
+
+    def _rebuild(self):
+        self._pending = 0
+        self._flush()
+        if self.share_dir:
+            self._write(os.path.join(self.share_dir, self._own_file), self._local)
+        merged = self.merged()
+        self._population = merged["lp"].count
+        self._views = {name: merged[name].cdf_view() for name in SUB_SCORES} \
+            if self._population >= self.min_count else None
+
+    def _peer_files(self):
+        if not self.share_dir:
+            return []
+        return [p for p in glob.glob(os.path.join(self.share_dir, "sketch-*.json"))
+                if os.path.basename(p) != self._own_file]
+
+    def publish(self):
+        """
+        Rebuild the lookup view now rather than after `publish_every` observations, and
+        write this process's sketches to share_dir.
+        """
+        with self._lock:
+            self._rebuild()
+
+    def export(self) -> Dict[str, Any]:
+        with self._lock:
+            merged = self.merged()
+        return {name: merged[name].to_dict() for name in SUB_SCORES}
+
+    def save(self, path: Optional[str] = None):
+        """
+        Write the merged population (base + local + peers) to `path`, to be loaded as the
+        base at the next startup. Peer files are removed since they are now in the snapshot.
+        """
+        path = path or self.path
+        if not path:
+            return
+        with self._lock:
+            merged = self.merged()
+            peers = self._peer_files()
+            self._write(path, merged)
+        for p in peers + ([os.path.join(self.share_dir, self._own_file)] if self.share_dir else []):
+            try:
+                os.remove(p)
+            except OSError:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        The population as of the last rebuild (plus this process's pending observations);
+        peers' growth shows up after the next publish, so reading it writes nothing.
+        """
+        views = self._views
+        return {
+            "population": self._population + self._pending,
+            "active": views is not None,
+            "retained": sum(s.size() for s in self._local.values()),
+            **({f"{name}_p50": views[name].quantile(0.5) for name in SUB_SCORES} if views else {}),
+        }
+
+    @staticmethod
+    def _write(path: str, sketches: Dict[str, QuantileSketch]):
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({name: sketches[name].to_dict() for name in SUB_SCORES}, f)
+        os.replace(tmp, path)
+
+    @staticmethod
+    def _read(path: str) -> Dict[str, QuantileSketch]:
+        with open(path) as f:
+            d = json.load(f)
+        return {name: QuantileSketch.from_dict(d[name]) for name in SUB_SCORES}
+
+
+def build_normalizer(share_dir: Optional[str] = None) -> Optional[ScoreNormalizer]:
+    """
+    Normalizer configured by SCORE_NORMALIZATION, or None when it is off. `share_dir`
+    overrides SCORE_SKETCH_SHARE_DIR.
+    """
+    if SCORE_NORMALIZATION == "percentile":
+        return ScoreNormalizer(share_dir=SCORE_SKETCH_SHARE_DIR if share_dir is None else share_dir)
+    if SCORE_NORMALIZATION != "off":
+        raise ValueError(f"unknown SCORE_NORMALIZATION: {SCORE_NORMALIZATION}")
+    return None
@@ -0,0 +1,104 @@
+# app/services/state_store.py
+import os
+import json
+import fcntl
+import hashlib
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+from app.models.incremental import WalletState
+
+# off | memory | file: score every payload as a delta folded into its wallet's stored
+# state (app.models.incremental.IncrementalScorer) instead of as the full history
+INCREMENTAL_STATE = os.getenv("INCREMENTAL_STATE", "off").lower()
+INCREMENTAL_STATE_DIR = os.getenv("INCREMENTAL_STATE_DIR", "/tmp/ai-scoring-state")
+
+
+class WalletLocks:
+    """
+    A fixed set of locks that wallet addresses hash onto: one wallet always gets the same
+    lock, in bounded memory however many wallets are seen.
+    """
+
+    def __init__(self, n: int = 256):
+        self._locks = [threading.Lock() for _ in range(n)]
+
+    def __call__(self, wallet_address: str) -> threading.Lock:
+        return self._locks[hash(wallet_address.lower()) % len(self._locks)]
+
+
+class InMemoryStateStore:
+    """
+    Per-process WalletState store (lost on restart).
+    """
+
+    def __init__(self):
+        self._states: Dict[str, WalletState] = {}
+        self._lock = threading.Lock()
+        self.lock = WalletLocks()  # lock(wallet_address): held around get -> apply -> put
+
+    def get(self, wallet_address: str) -> Optional[WalletState]:
+        with self._lock:
+            return self._states.get(wallet_address)
+
+    def put(self, state: WalletState):
+        with self._lock:
+            self._states[state.wallet_address] = state
+
+    def __len__(self) -> int:
+        return len(self._states)
+
+
+class FileStateStore:
+    """
+    WalletState persisted as one JSON file per wallet under `root`.
+    Writes go to a temp file and are renamed into place, so a crash never leaves a
+    half-written state behind. lock() also takes an flock on the wallet's .lock file,
+    so processes sharing `root` (app.serve workers) serialize their updates too.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self._locks = WalletLocks()
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, wallet_address: str) -> str:
+        name = hashlib.sha1(wallet_address.lower().encode()).hexdigest()
+        return os.path.join(self.root, name[:2], name + ".json")
+
+    @contextmanager
+    def lock(self, wallet_address: str) -> Iterator[None]:
+        path = self._path(wallet_address)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._locks(wallet_address), open(path + ".lock", "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)  # released when the file is closed
+            yield
+
+    def get(self, wallet_address: str) -> Optional[WalletState]:
+        try:
+            with open(self._path(wallet_address), "r", encoding="utf-8") as f:
+                return WalletState.from_dict(json.load(f))
+        except FileNotFoundError:
+            return None
+
+    def put(self, state: WalletState):
+        path = self._path(state.wallet_address)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(state.to_dict(), f)
+        os.replace(tmp, path)
+
+
+def build_state_store():
+    """
+    State store configured by INCREMENTAL_STATE, or None when incremental scoring is off.
+    """
+    if INCREMENTAL_STATE == "memory":
+        return InMemoryStateStore()
+    if INCREMENTAL_STATE == "file":
+        return FileStateStore(INCREMENTAL_STATE_DIR)
+    if INCREMENTAL_STATE != "off":
+        raise ValueError(f"unknown INCREMENTAL_STATE: {INCREMENTAL_STATE}")
+    return None
@@ -0,0 +1,76 @@
+# app/services/workers.py
+import os
+import json
+import logging
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from app.utils.shared_slots import SharedSlots
+
+log = logging.getLogger(__name__)
+
+# set by app.serve in every worker it forks; a plain `uvicorn app.main:app` is worker 0 of 1
+WORKER_ID = int(os.getenv("SCORING_WORKER_ID", "0"))
+WORKER_COUNT = int(os.getenv("SCORING_WORKERS", "1"))
+SHARED_STATS_PATH = os.getenv("SCORING_SHARED_STATS", "")
+SHARED_STATS_INTERVAL_S = float(os.getenv("SHARED_STATS_INTERVAL_S", "1.0"))
+
+
+def owned_partitions(partitions: Iterable[int], worker_id: int = WORKER_ID, workers: int = WORKER_COUNT) -> List[int]:
+    """
+    The partitions `worker_id` of `workers` consumes: every workers-th one of the sorted
+    list, so each partition has exactly one owner and the counts differ by at most one.
+    """
+    return [p for i, p in enumerate(sorted(partitions)) if i % workers == worker_id]
+
+
+class SharedStats:
+    """
+    This worker's view of the shared stats file: a daemon thread writes
+    `snapshot()` (JSON) into the worker's slot every `interval_s`, and read_all()
+    returns the latest snapshot of every worker, so any worker can answer for all.
+    """
+
+    def __init__(self, slots: SharedSlots, worker_id: int, interval_s: float = SHARED_STATS_INTERVAL_S):
+        self.slots = slots
+        self.worker_id = worker_id
+        self.interval_s = interval_s
+        self._snapshot: Optional[Callable[[], Dict[str, Any]]] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_env(cls) -> Optional["SharedStats"]:
+        """The worker's SharedStats when running under app.serve, None otherwise."""
+        if not SHARED_STATS_PATH:
+            return None
+        return cls(SharedSlots(SHARED_STATS_PATH), WORKER_ID)
+
+    def start(self, snapshot: Callable[[], Dict[str, Any]]):
+        self._snapshot = snapshot
+        self.publish()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="shared-stats", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.publish()
+
+    def _run(self):
+        while not self._stop.wait(self.interval_s):
+            try:
+                self.publish()
+            except Exception:
+                log.exception("publishing worker %d stats failed", self.worker_id)
+
+    def publish(self):
+        if self._snapshot is not None:
+            self.slots.write(self.worker_id, json.dumps(self._snapshot()).encode())
+
+    def read_all(self) -> List[Dict[str, Any]]:
+        """Latest snapshot of every worker that has published one, by worker id."""
+        return [json.loads(data) for data in self.slots.read_all() if data]
@@ -0,0 +1,228 @@
+# app/utils/compact.py
+import os
+import json
+from array import array
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+from app.models.columnar import ACTION_CODES, ACTION_OTHER, ACTION_SWAP, NO_POOL
+from app.utils.dedup import first_occurrences
+from app.utils.types import INT64_MAX, INT64_MIN, ProtocolData, Transaction, WalletMessage, parse_wallet
+
+# decode payloads into CompactWallet (packed columns) instead of per-transaction models
+COMPACT_TX = os.getenv("COMPACT_TX", "true").lower() == "true"
+
+NO_SYMBOL = -1
+
+_OPT_STR = frozenset((str, type(None)))
+_OPT_NUMBER = frozenset((int, float, type(None)))
+
+
+class CompactBlock:
+    """
+    The transactions of one protocol block as packed columns, one row per transaction:
+    ACTION_* code, pool and token symbols as codes into the wallet's tables, timestamp,
+    and the two USD legs scoring reads (tokenIn/tokenOut for swaps, token0/token1
+    otherwise; a missing leg or amountUSD is 0.0). Fields scoring never reads (caller,
+    protocol, poolName, token amounts and addresses) are validated but not kept.
+
+    document_ids are not kept either: `unique_rows` is the keep-mask of the rows whose
+    id is the first of its kind in the block, None when no id repeats.
+    """
+    __slots__ = ("protocolType", "action", "pool", "timestamp", "leg_a", "leg_b",
+                 "sym_a", "sym_b", "unique_rows")
+
+    def __init__(self, protocolType: str):
+        self.protocolType = protocolType
+        self.action = array("b")
+        self.pool = array("i")
+        self.timestamp = array("q")
+        self.leg_a = array("d")
+        self.leg_b = array("d")
+        self.sym_a = array("i")
+        self.sym_b = array("i")
+        self.unique_rows: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return len(self.action)
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        return {
+            "action": np.frombuffer(self.action, dtype=np.int8),
+            "pool": np.frombuffer(self.pool, dtype=np.int32),
+            "timestamp": np.frombuffer(self.timestamp, dtype=np.int64),
+            "leg_a": np.frombuffer(self.leg_a, dtype=np.float64),
+            "leg_b": np.frombuffer(self.leg_b, dtype=np.float64),
+            "sym_a": np.frombuffer(self.sym_a, dtype=np.int32),
+            "sym_b": np.frombuffer(self.sym_b, dtype=np.int32),
+        }
+
+    @property
+    def nbytes(self) -> int:
+        cols = (self.action, self.pool, self.timestamp, self.leg_a, self.leg_b, self.sym_a, self.sym_b)
+        return sum(c.buffer_info()[1] * c.itemsize for c in cols)
+
+
+class CompactWallet:
+    """
+    A validated WalletMessage stored for scoring: one CompactBlock per protocol block,
+    plus the wallet's interned poolIds and token symbols (code -> string).
+    """
+    __slots__ = ("wallet_address", "data", "pools", "symbols")
+
+    def __init__(self, wallet_address: str, data: List[CompactBlock], pools: List[str], symbols: List[str]):
+        self.wallet_address = wallet_address
+        self.data = data
+        self.pools = pools
+        self.symbols = symbols
+
+    @classmethod
+    def from_wallet(cls, wallet: WalletMessage) -> "CompactWallet":
+        dump = wallet.model_dump() if hasattr(wallet, "model_dump") else wallet.dict()
+        return _compact(dump)
+
+    @property
+    def transaction_count(self) -> int:
+        return sum(len(b) for b in self.data)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(b.nbytes for b in self.data)
+
+
+class _Unsupported(Exception):
+    """Input the fast path does not handle itself; pydantic decides (and words any error)."""
+
+
+def _reject_constant(name: str):
+    raise _Unsupported(name)
+
+
+def _loads(raw: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw, parse_constant=_reject_constant)
+
+
+def _leg(tok: Any, symbol_codes: Optional[Dict[str, int]]) -> Tuple[float, int]:
+    # TokenAmount: every field optional; numbers may be JSON ints or floats.
+    # Returns (amountUSD, symbol code); without a table the token is only checked
+    if tok is None:
+        return 0.0, NO_SYMBOL
+    if type(tok) is not dict:
+        raise _Unsupported
+    usd, sym = tok.get("amountUSD"), tok.get("symbol")
+    if (type(usd) not in _OPT_NUMBER or type(sym) not in _OPT_STR
+            or type(tok.get("amount")) not in _OPT_NUMBER or type(tok.get("address")) not in _OPT_STR):
+        raise _Unsupported
+    if symbol_codes is None:
+        return 0.0, NO_SYMBOL
+    return (0.0 if usd is None else float(usd)), (symbol_codes.setdefault(sym, len(symbol_codes)) if sym else NO_SYMBOL)
+
+
+def _compact(doc: Any) -> CompactWallet:
+    """
+    Build a CompactWallet from decoded JSON, accepting exactly the canonical shapes the
+    pydantic models accept. Anything else (a missing or mistyped field, a value pydantic
+    would coerce) raises _Unsupported.
+    """
+    if type(doc) is not dict:
+        raise _Unsupported
+    address = doc["wallet_address"]
+    data = doc["data"]
+    if type(address) is not str or type(data) is not list:
+        raise _Unsupported
+
+    pool_codes: Dict[str, int] = {}
+    symbol_codes: Dict[str, int] = {}
+    blocks: List[CompactBlock] = []
+    for pblock in data:
+        if type(pblock) is not dict:
+            raise _Unsupported
+        ptype = pblock["protocolType"]
+        txs = pblock.get("transactions", ())
+        if type(ptype) is not str or (type(txs) is not list and txs != ()):
+            raise _Unsupported
+        blk = CompactBlock(ptype)
+        blk.unique_rows = first_occurrences(_append_rows(blk, txs, pool_codes, symbol_codes))
+        blocks.append(blk)
+    return CompactWallet(address, blocks, list(pool_codes), list(symbol_codes))
+
+
+def _append_rows(blk: CompactBlock, txs: List[Any], pool_codes: Dict[str, int],
+                 symbol_codes: Dict[str, int]) -> List[Optional[str]]:
+    # checks and packs decoded transaction dicts onto blk; returns their document_ids
+    a_col, p_col, t_col = blk.action, blk.pool, blk.timestamp
+    la_col, lb_col, sa_col, sb_col = blk.leg_a, blk.leg_b, blk.sym_a, blk.sym_b
+    ids = []
+    for t in txs:
+        if type(t) is not dict:
+            raise _Unsupported
+        doc_id = t["document_id"]
+        action = t["action"]
+        ts = t["timestamp"]
+        caller = t["caller"]
+        protocol = t["protocol"]
+        pid = t.get("poolId")
+        if (type(action) is not str or type(ts) is not int or not INT64_MIN <= ts <= INT64_MAX
+                or type(doc_id) not in _OPT_STR
+                or type(caller) not in _OPT_STR or type(protocol) not in _OPT_STR
+                or type(pid) not in _OPT_STR or type(t.get("poolName")) not in _OPT_STR):
+            raise _Unsupported
+        code = ACTION_CODES.get(action.lower(), ACTION_OTHER)
+        if code == ACTION_SWAP:
+            a, b, other = t.get("tokenIn"), t.get("tokenOut"), (t.get("token0"), t.get("token1"))
+        else:
+            a, b, other = t.get("token0"), t.get("token1"), (t.get("tokenIn"), t.get("tokenOut"))
+        for tok in other:
+            if tok is not None:
+                _leg(tok, None)  # the legs scoring does not read are validated, not kept
+        usd_a, sym_a = _leg(a, symbol_codes)
+        usd_b, sym_b = _leg(b, symbol_codes)
+
+        ids.append(doc_id)
+        a_col.append(code)
+        p_col.append(pool_codes.setdefault(pid, len(pool_codes)) if pid else NO_POOL)
+        t_col.append(ts)
+        la_col.append(usd_a)
+        lb_col.append(usd_b)
+        sa_col.append(sym_a)
+        sb_col.append(sym_b)
+    return ids
+
+
+def append_transactions(blk: CompactBlock, txs: List[Transaction], pool_codes: Dict[str, int],
+                        symbol_codes: Dict[str, int]) -> List[Optional[str]]:
+    """
+    Pack already validated Transactions onto `blk`, interning pools and symbols into the
+    given tables (shared by every call for one wallet). Returns their document_ids.
+    """
+    dumps = [t.model_dump() if hasattr(t, "model_dump") else t.dict() for t in txs]
+    return _append_rows(blk, dumps, pool_codes, symbol_codes)
+
+
+def compact_block(block: ProtocolData) -> CompactBlock:
+    """One validated protocol block as a CompactBlock, with its own pool and symbol codes."""
+    blk = CompactBlock(block.protocolType)
+    blk.unique_rows = first_occurrences(append_transactions(blk, block.transactions, {}, {}))
+    return blk
+
+
+def parse_wallet_compact(raw: bytes) -> CompactWallet:
+    """
+    parse_wallet() into a CompactWallet. Canonical payloads are checked and packed in
+    one pass over the decoded JSON; anything else goes through parse_wallet(), so what
+    is accepted, how it is coerced and the wording of every validation error are
+    pydantic's own.
+    """
+    try:
+        return _compact(_loads(raw))
+    except (_Unsupported, KeyError, ValueError, TypeError, OverflowError):
+        # a wallet parse_wallet() accepts always fits the columns (timestamps are int64)
+        return CompactWallet.from_wallet(parse_wallet(raw))
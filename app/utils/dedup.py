@@ -0,0 +1,287 @@
+# app/utils/dedup.py
+import os
+import math
+import threading
+from collections import OrderedDict, deque
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+# drop transactions whose document_id already appeared in the same protocol block
+TX_DEDUP = os.getenv("TX_DEDUP", "true").lower() == "true"
+# cross-message index (DedupIndex): wallets tracked, memory budget, exact ids kept per wallet
+DEDUP_MAX_WALLETS = int(os.getenv("DEDUP_MAX_WALLETS", "100000"))
+DEDUP_MAX_BYTES = int(os.getenv("DEDUP_MAX_BYTES", str(256 * 1024 * 1024)))
+DEDUP_RECENT_IDS = int(os.getenv("DEDUP_RECENT_IDS", "256"))
+DEDUP_ERROR_RATE = float(os.getenv("DEDUP_ERROR_RATE", "1e-6"))
+
+# rough footprint of one id in a recent set (str object + set slot + deque slot)
+_RECENT_ID_BYTES = 120
+
+_C1 = np.uint64(0xBF58476D1CE4E5B9)
+_C2 = np.uint64(0x94D049BB133111EB)
+
+
+def _hashes(ids: Sequence[Any]) -> np.ndarray:
+    # Python's own (per-process salted) hash: strings cache it, so this is one pass
+    return np.fromiter((hash(s) for s in ids), dtype=np.int64, count=len(ids)).view(np.uint64)
+
+
+def _mix(h: np.ndarray) -> np.ndarray:
+    # splitmix64 finalizer: a second, independent-looking hash for double hashing
+    h = (h ^ (h >> np.uint64(30))) * _C1
+    h = (h ^ (h >> np.uint64(27))) * _C2
+    return h ^ (h >> np.uint64(31))
+
+
+def first_occurrences(ids: Sequence[Optional[str]], groups: Optional[np.ndarray] = None) -> Optional[np.ndarray]:
+    """
+    Keep-mask over `ids`: False for every row whose id already appeared on an earlier row
+    of the same group (all rows are one group without `groups`). None ids are always
+    kept. Returns None when nothing repeats, which is the common case.
+
+    Ids that are all distinct (one set() build) return at once. Otherwise rows are
+    sorted by (group, hash) and equal neighbours flagged, all in NumPy; only the flagged
+    rows are then compared exactly, so hash collisions never drop a row.
+    """
+    n = len(ids)
+    if n < 2 or len(set(ids)) == n:
+        return None
+    h = _hashes(ids)
+    order = np.lexsort((h,) if groups is None else (h, groups))  # stable: first occurrence first
+    hs = h[order]
+    same = hs[1:] == hs[:-1]
+    if groups is not None:
+        gs = groups[order]
+        same &= gs[1:] == gs[:-1]
+    cand = np.flatnonzero(same)
+    if cand.size == 0:
+        return None
+
+    keep = np.ones(n, dtype=bool)
+    rows = order[np.union1d(cand, cand + 1)].tolist()  # sorted positions, runs in row order
+    grp = groups[rows].tolist() if groups is not None else [0] * len(rows)
+    seen = set()
+    for r, g in zip(rows, grp):
+        key = (g, ids[r])
+        if key[1] is None:
+            continue
+        if key in seen:
+            keep[r] = False
+        else:
+            seen.add(key)
+    return None if keep.all() else keep
+
+
+def unique_transactions(txs: List[Any], seen: Optional[set] = None) -> List[Any]:
+    """
+    `txs` without the transactions whose document_id appeared earlier in the list. With
+    `seen`, also without the ids in it, and the kept ids are added: one set per block
+    dedups a block that arrives in pieces exactly.
+    """
+    if seen is None:
+        keep = first_occurrences([t.document_id for t in txs])
+        return txs if keep is None else [t for t, k in zip(txs, keep.tolist()) if k]
+    kept = []
+    for t in txs:
+        if t.document_id is None:
+            kept.append(t)
+        elif t.document_id not in seen:
+            seen.add(t.document_id)
+            kept.append(t)
+    return kept
+
+
+class BloomFilter:
+    """Fixed-size bloom filter over 64-bit hashes, k probes by double hashing."""
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = max(1, capacity)
+        self.error_rate = error_rate
+        bits_per_id = -math.log(error_rate) / math.log(2) ** 2
+        m = max(64, -(-math.ceil(self.capacity * bits_per_id) // 8) * 8)
+        self.k = max(1, round(bits_per_id * math.log(2)))
+        self._m = np.uint64(m)
+        self.bits = np.zeros(m // 8, dtype=np.uint8)
+        self.count = 0
+
+    def _positions(self, h1: np.ndarray, h2: np.ndarray) -> np.ndarray:
+        # modulo, not a power-of-two mask: a mask only looks at the low bits of h1/h2,
+        # which for small filters repeats probe patterns and inflates false positives
+        i = np.arange(self.k, dtype=np.uint64)[:, None]
+        return (h1[None, :] + i * h2[None, :]) % self._m  # (k, n)
+
+    def contains(self, h1: np.ndarray, h2: np.ndarray) -> np.ndarray:
+        # probe by probe over the ids still possibly present: about half of them drop out
+        # per probe, so a batch of unseen ids costs ~2 probes each instead of k
+        idx = np.arange(len(h1))
+        for i in range(self.k):
+            pos = (h1[idx] + np.uint64(i) * h2[idx]) % self._m
+            hit = (self.bits[pos >> np.uint64(3)] >> (pos & np.uint64(7)).astype(np.uint8)) & np.uint8(1)
+            idx = idx[hit.astype(bool)]
+            if not idx.size:
+                break
+        out = np.zeros(len(h1), dtype=bool)
+        out[idx] = True
+        return out
+
+    def add(self, h1: np.ndarray, h2: np.ndarray):
+        pos = self._positions(h1, h2).ravel()
+        np.bitwise_or.at(self.bits, pos >> np.uint64(3), np.uint8(1) << (pos & np.uint64(7)).astype(np.uint8))
+        self.count += len(h1)
+
+    @property
+    def nbytes(self) -> int:
+        return self.bits.nbytes
+
+
+class ScalableBloomFilter:
+    """
+    Bloom filter that grows with what is added: when the newest filter reaches its
+    capacity a twice-as-large one with a tighter error rate (x0.8) is started, so the
+    combined false-positive rate stays below `error_rate` and memory stays proportional
+    to the number of ids (4-5 bytes per id at 1e-6).
+    """
+
+    def __init__(self, initial_capacity: int = 1024, error_rate: float = DEDUP_ERROR_RATE):
+        # filter j gets p * 0.2 * 0.8**j: the rates sum to less than p
+        self.filters = [BloomFilter(initial_capacity, error_rate * 0.2)]
+
+    def contains(self, h1: np.ndarray, h2: np.ndarray) -> np.ndarray:
+        hit = self.filters[0].contains(h1, h2)
+        for f in self.filters[1:]:
+            hit |= f.contains(h1, h2)
+        return hit
+
+    def add(self, h1: np.ndarray, h2: np.ndarray):
+        i = 0
+        while i < len(h1):
+            last = self.filters[-1]
+            if last.count >= last.capacity:
+                last = BloomFilter(last.capacity * 2, last.error_rate * 0.8)
+                self.filters.append(last)
+            room = last.capacity - last.count
+            last.add(h1[i:i + room], h2[i:i + room])
+            i += room
+
+    @property
+    def count(self) -> int:
+        return sum(f.count for f in self.filters)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(f.nbytes for f in self.filters)
+
+
+class TxIdFilter:
+    """
+    The document_ids one wallet has shown so far. The newest `recent` ids are kept
+    exactly, every id also goes into a ScalableBloomFilter; an id the filter claims to
+    know but that is no longer among the recent ones counts as a (probable) duplicate,
+    which is wrong with probability `error_rate`.
+    """
+
+    def __init__(self, recent: int = DEDUP_RECENT_IDS, error_rate: float = DEDUP_ERROR_RATE):
+        self.recent_size = max(0, recent)
+        self._recent: deque = deque()
+        self._recent_set: set = set()
+        self.bloom = ScalableBloomFilter(max(64, recent), error_rate)  # grows past `recent` ids
+        self.exact_duplicates = 0
+        self.probable_duplicates = 0
+
+    def check_add(self, ids: Sequence[Optional[str]]) -> np.ndarray:
+        """Keep-mask over `ids` (False = seen before, here or earlier); the kept ids are recorded."""
+        keep = first_occurrences(ids)
+        keep = np.ones(len(ids), dtype=bool) if keep is None else keep
+        idx = [i for i, (s, k) in enumerate(zip(ids, keep.tolist())) if k and s is not None]
+        if not idx:
+            return keep
+        fresh = [ids[i] for i in idx]
+        h1 = _hashes(fresh)
+        h2 = _mix(h1) | np.uint64(1)
+        recent = self._recent_set
+        exact = np.fromiter((s in recent for s in fresh), dtype=bool, count=len(fresh))
+        probable = self.bloom.contains(h1, h2) & ~exact
+        seen = exact | probable
+        self.exact_duplicates += int(exact.sum())
+        self.probable_duplicates += int(probable.sum())
+        keep[np.asarray(idx)[seen]] = False
+        new = np.flatnonzero(~seen)
+        if new.size:
+            self.bloom.add(h1[new], h2[new])
+            self._remember([fresh[j] for j in new[-self.recent_size:].tolist()] if self.recent_size else [])
+        return keep
+
+    def _remember(self, ids: List[str]):
+        self._recent.extend(ids)
+        self._recent_set.update(ids)
+        for _ in range(len(self._recent) - self.recent_size):
+            self._recent_set.discard(self._recent.popleft())
+
+    def unique_transactions(self, txs: List[Any]) -> List[Any]:
+        keep = self.check_add([t.document_id for t in txs])
+        return [t for t, k in zip(txs, keep.tolist()) if k]
+
+    @property
+    def nbytes(self) -> int:
+        return self.bloom.nbytes + len(self._recent) * _RECENT_ID_BYTES
+
+
+class DedupIndex:
+    """
+    Seen document_ids per wallet across messages (a TxIdFilter each), so transactions
+    that are replayed or arrive again in an overlapping snapshot are counted once.
+    Bounded: the least recently seen wallets are forgotten beyond `max_wallets` or when
+    the filters together exceed `max_bytes`. Thread-safe: one lock covers a wallet's
+    filter and the LRU bookkeeping, so the HTTP threads and Kafka workers can share one.
+    """
+
+    def __init__(self, max_wallets: int = DEDUP_MAX_WALLETS, max_bytes: int = DEDUP_MAX_BYTES,
+                 recent: int = DEDUP_RECENT_IDS, error_rate: float = DEDUP_ERROR_RATE):
+        self.max_wallets = max(1, max_wallets)
+        self.max_bytes = max_bytes
+        self.recent = recent
+        self.error_rate = error_rate
+        self._wallets: "OrderedDict[str, TxIdFilter]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.evicted = 0
+        self.exact_duplicates = 0
+        self.probable_duplicates = 0
+
+    def check_add(self, wallet_address: str, ids: Sequence[Optional[str]]) -> np.ndarray:
+        with self._lock:
+            return self._check_add_locked(wallet_address, ids)
+
+    def _check_add_locked(self, wallet_address: str, ids: Sequence[Optional[str]]) -> np.ndarray:
+        f = self._wallets.get(wallet_address)
+        if f is None:
+            f = self._wallets[wallet_address] = TxIdFilter(self.recent, self.error_rate)
+            before = 0
+        else:
+            self._wallets.move_to_end(wallet_address)
+            before = f.nbytes
+        exact, probable = f.exact_duplicates, f.probable_duplicates
+        keep = f.check_add(ids)
+        self._bytes += f.nbytes - before
+        self.exact_duplicates += f.exact_duplicates - exact
+        self.probable_duplicates += f.probable_duplicates - probable
+        while len(self._wallets) > 1 and (len(self._wallets) > self.max_wallets or self._bytes > self.max_bytes):
+            _, old = self._wallets.popitem(last=False)
+            self._bytes -= old.nbytes
+            self.evicted += 1
+        return keep
+
+    def unique_transactions(self, wallet_address: str, txs: List[Any]) -> List[Any]:
+        keep = self.check_add(wallet_address, [t.document_id for t in txs])
+        return [t for t, k in zip(txs, keep.tolist()) if k]
+
+    @property
+    def nbytes(self) -> int:
+        return self._bytes
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"wallets": len(self._wallets), "ids": sum(f.bloom.count for f in self._wallets.values()),
+                    "bytes": self._bytes, "exact_duplicates": self.exact_duplicates,
+                    "probable_duplicates": self.probable_duplicates, "evicted_wallets": self.evicted}
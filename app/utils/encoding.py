@@ -0,0 +1,79 @@
+# app/utils/encoding.py
+import json
+import math
+from decimal import Decimal, ROUND_DOWN
+from typing import Any, Dict
+
+try:
+    import orjson
+except ImportError:  # optional speedup; the stdlib encoder produces the same bytes
+    orjson = None
+
+# what starlette's JSONResponse renders: compact separators, UTF-8, NaN rejected
+_encode_std = json.JSONEncoder(ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode
+
+_ZSCORE_QUANTUM = Decimal("0.000000000000000001")
+_ZSCORE_SCALE = 10 ** 18
+
+
+def zscore_str(val: float) -> str:
+    """
+    str(Decimal(val).quantize(1e-18, ROUND_DOWN)) without building Decimals: the float's
+    exact binary value is truncated to 18 decimals in integer arithmetic and laid out the
+    way Decimal.__str__ would ("0E-18" for zero, exponent form below 1e-6).
+    """
+    if not math.isfinite(val) or abs(val) >= 1e10:
+        # beyond 28 significant digits quantize() raises; keep that behaviour
+        return str(Decimal(val).quantize(_ZSCORE_QUANTUM, rounding=ROUND_DOWN))
+    n, d = float(val).as_integer_ratio()
+    digits = str(abs(n) * _ZSCORE_SCALE // d)
+    sign = "-" if math.copysign(1.0, val) < 0 else ""
+    left = len(digits) - 18  # digits before the decimal point
+    if left > -6:
+        if left <= 0:
+            return f"{sign}0.{'0' * -left}{digits}"
+        return f"{sign}{digits[:left]}.{digits[left:]}"
+    frac = f".{digits[1:]}" if len(digits) > 1 else ""
+    return f"{sign}{digits[0]}{frac}E{left - 1:+d}"
+
+
+def _orjson_safe(obj: Any) -> bool:
+    # orjson agrees with the stdlib byte for byte except on floats that repr() writes in
+    # exponent form, NaN/inf (stdlib raises) and float/int subclasses such as numpy scalars
+    t = type(obj)
+    if t is float:
+        return obj == 0.0 or 1e-4 <= abs(obj) < 1e16
+    if t is str or t is int or t is bool or obj is None:
+        return True
+    if t is dict:
+        return all(type(k) is str and _orjson_safe(v) for k, v in obj.items())
+    if t is list:
+        return all(_orjson_safe(v) for v in obj)
+    return False
+
+
+# digits -> "0" and "E" -> "e", so an exponent-form float (written differently by repr())
+# shows up as b"0e" in the encoded categories; NaN/inf show up as null
+_DIGITS = bytes.maketrans(b"123456789E", b"000000000e")
+
+
+def encode_result(result: Dict[str, Any]) -> bytes:
+    """
+    JSON bytes of a SuccessMessage/FailureMessage dict, identical to what JSONResponse
+    renders for it. Served as-is over HTTP and reused as the Kafka record value.
+    """
+    if orjson is not None:
+        try:
+            if "zscore" not in result:
+                if _orjson_safe(result):
+                    return orjson.dumps(result)
+            else:
+                # checking the encoded categories is cheaper than walking the dict first;
+                # a false alarm (e.g. "null" inside a string) only costs the slow path
+                out = orjson.dumps(result)
+                tail = out[out.find(b'"categories":'):].translate(_DIGITS)
+                if b"0e" not in tail and b"null" not in tail:
+                    return out
+        except orjson.JSONEncodeError:  # numpy scalars, ints beyond 64 bits, ...
+            pass
+    return _encode_std(result).encode("utf-8")
@@ -0,0 +1,297 @@
+# app/utils/metrics.py
+import math
+import threading
+from time import perf_counter_ns
+from typing import Dict, List, Optional, Tuple
+
+# HDR-style log-linear buckets: 2**SUB_BITS linear sub-buckets per power of two, i.e.
+# every recorded value is known to within 1/2**SUB_BITS (~3%) of itself
+SUB_BITS = 5
+SUB_COUNT = 1 << SUB_BITS
+MAX_BITS = 48  # values up to 2**48 ns (~3 days); larger ones land in the last bucket
+N_BUCKETS = (MAX_BITS - SUB_BITS + 1) * SUB_COUNT
+QUANTILES = (0.5, 0.95, 0.99)
+_SHIFT_BASE = SUB_BITS + 1
+
+
+def bucket_index(v: int) -> int:
+    if v < SUB_COUNT:
+        return v if v > 0 else 0
+    shift = v.bit_length() - SUB_BITS - 1
+    return min((shift + 1) * SUB_COUNT + (v >> shift) - SUB_COUNT, N_BUCKETS - 1)
+
+
+def bucket_bounds(idx: int) -> Tuple[int, int]:
+    if idx < 2 * SUB_COUNT:
+        return idx, idx + 1
+    shift = idx // SUB_COUNT - 1
+    m = idx % SUB_COUNT + SUB_COUNT
+    return m << shift, (m + 1) << shift
+
+
+class _Shard:
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self):
+        self.counts = [0] * N_BUCKETS
+        self.total = 0
+        self.count = 0
+
+
+class _Sharded:
+    """
+    Per-thread shards: a writer only ever touches its own thread's shard, so recording
+    needs no lock; readers sum all shards (a shard may be mid-update, which is fine for
+    monitoring). Shards outlive their threads so no counts are lost.
+    """
+
+    def __init__(self):
+        self._tls = threading.local()
+        self._shards: List = []
+        self._lock = threading.Lock()
+
+    def _new_shard(self):
+        raise NotImplementedError
+
+    def _shard(self):
+        """Create and register the calling thread's shard (on its first write)."""
+        shard = self._tls.shard = self._new_shard()
+        with self._lock:
+            self._shards.append(shard)
+        return shard
+
+
+class Histogram(_Sharded):
+    """
+    Latency histogram in nanoseconds. record_ns() costs one bucket-index computation and
+    three additions on the calling thread's shard.
+    """
+    kind = "summary"
+
+    def __init__(self, name: str, help: str, labels: Optional[Dict[str, str]] = None):
+        super().__init__()
+        self.name, self.help, self.labels = name, help, labels or {}
+
+    def _new_shard(self):
+        return _Shard()
+
+    def record_ns(self, ns: int):
+        try:
+            shard = self._tls.shard
+        except AttributeError:
+            shard = self._shard()
+        if ns < SUB_COUNT:
+            idx = ns if ns > 0 else 0
+        else:
+            # bucket_index() inlined: this runs several times per scored wallet
+            shift = ns.bit_length() - _SHIFT_BASE
+            idx = shift * SUB_COUNT + (ns >> shift)
+            if idx >= N_BUCKETS:
+                idx = N_BUCKETS - 1
+        shard.counts[idx] += 1
+        shard.total += ns
+        shard.count += 1
+
+    def time(self) -> "_Timer":
+        return _Timer(self)
+
+    def add_counts(self, buckets: Dict[int, int], total: int, count: int):
+        """Fold another histogram's snapshot (sparse bucket counts) into this one."""
+        try:
+            shard = self._tls.shard
+        except AttributeError:
+            shard = self._shard()
+        for i, c in buckets.items():
+            shard.counts[int(i)] += c
+        shard.total += total
+        shard.count += count
+
+    def snapshot(self) -> Tuple[List[int], int, int]:
+        counts = [0] * N_BUCKETS
+        total = count = 0
+        with self._lock:
+            shards = list(self._shards)
+        for s in shards:
+            for i, c in enumerate(s.counts):
+                if c:
+                    counts[i] += c
+            total += s.total
+            count += s.count
+        return counts, total, count
+
+    def quantiles(self, qs=QUANTILES) -> Dict[float, float]:
+        """Quantiles in ns (bucket midpoints), 0 when nothing was recorded."""
+        counts, _, count = self.snapshot()
+        out = {}
+        for q in qs:
+            if not count:
+                out[q] = 0.0
+                continue
+            rank = max(1, math.ceil(q * count))
+            seen = 0
+            for i, c in enumerate(counts):
+                seen += c
+                if seen >= rank:
+                    lo, hi = bucket_bounds(i)
+                    out[q] = (lo + hi - 1) / 2.0
+                    break
+        return out
+
+
+class _Timer:
+    __slots__ = ("hist", "t0")
+
+    def __init__(self, hist: Histogram):
+        self.hist = hist
+
+    def __enter__(self):
+        self.t0 = perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.hist.record_ns(perf_counter_ns() - self.t0)
+
+
+class _CounterShard:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+
+class Counter(_Sharded):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Optional[Dict[str, str]] = None):
+        super().__init__()
+        self.name, self.help, self.labels = name, help, labels or {}
+
+    def _new_shard(self):
+        return _CounterShard()
+
+    def inc(self, n=1):
+        try:
+            shard = self._tls.shard
+        except AttributeError:
+            shard = self._shard()
+        shard.value += n
+
+    def value(self):
+        with self._lock:
+            shards = list(self._shards)
+        return sum(s.value for s in shards)
+
+
+def _labels(labels: Dict[str, str], extra: Optional[Dict[str, str]] = None) -> str:
+    items = {**labels, **(extra or {})}
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in items.items()) + "}"
+
+
+class Registry:
+    """
+    Named metrics of this process; render() is the Prometheus text exposition format.
+    Histograms are exported as summaries (p50/p95/p99 in seconds, plus _sum and _count).
+    """
+
+    def __init__(self):
+        self._metrics: Dict[Tuple[str, Tuple], object] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name: str, help: str, labels: Dict[str, str]):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            m = self._metrics.get(key)
+            if m is None:
+                m = self._metrics[key] = cls(name, help, labels)
+        return m
+
+    def histogram(self, name: str, help: str, **labels) -> Histogram:
+        return self._get(Histogram, name, help, labels)
+
+    def counter(self, name: str, help: str, **labels) -> Counter:
+        return self._get(Counter, name, help, labels)
+
+    def export(self) -> List[Dict]:
+        """Plain-JSON snapshot of every metric (histograms as sparse bucket counts)."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        rows = []
+        for m in metrics:
+            row = {"name": m.name, "help": m.help, "kind": m.kind, "labels": m.labels}
+            if isinstance(m, Histogram):
+                counts, row["total"], row["count"] = m.snapshot()
+                row["buckets"] = {i: c for i, c in enumerate(counts) if c}
+            else:
+                row["value"] = m.value()
+            rows.append(row)
+        return rows
+
+    def export_since(self, last: Dict[Tuple, Dict]) -> List[Dict]:
+        """
+        export() as the change since the previous call given the same `last` (updated in
+        place); unchanged metrics are left out. Adding every result to a registry with
+        add() sums up to this one.
+        """
+        rows = []
+        for row in self.export():
+            key = (row["name"], tuple(sorted(row["labels"].items())))
+            prev, last[key] = last.get(key), row
+            if prev is None:
+                rows.append(row)
+            elif row["kind"] == Histogram.kind:
+                if row["count"] != prev["count"]:
+                    old = prev["buckets"]
+                    rows.append(dict(row, total=row["total"] - prev["total"], count=row["count"] - prev["count"],
+                                     buckets={i: c - old.get(i, 0) for i, c in row["buckets"].items()
+                                              if c != old.get(i, 0)}))
+            elif row["value"] != prev["value"]:
+                rows.append(dict(row, value=row["value"] - prev["value"]))
+        return rows
+
+    def add(self, rows: List[Dict]):
+        """Add an export() of another registry (e.g. a worker process's) to this one."""
+        for row in rows:
+            if row["kind"] == Histogram.kind:
+                self.histogram(row["name"], row["help"], **row["labels"]).add_counts(
+                    row["buckets"], row["total"], row["count"])
+            else:
+                self.counter(row["name"], row["help"], **row["labels"]).inc(row["value"])
+
+    @classmethod
+    def merged(cls, exports) -> "Registry":
+        """A registry holding the sums of several export()s, e.g. one per worker process."""
+        reg = cls()
+        for rows in exports:
+            reg.add(rows)
+        return reg
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        lines: List[str] = []
+        seen = set()
+        for m in metrics:
+            if m.name not in seen:
+                seen.add(m.name)
+                lines.append(f"# HELP {m.name} {m.help}")
+                lines.append(f"# TYPE {m.name} {m.kind}")
+            if isinstance(m, Histogram):
+                _, total, count = m.snapshot()
+                for q, ns in m.quantiles().items():
+                    lines.append(f"{m.name}{_labels(m.labels, {'quantile': str(q)})} {ns / 1e9:.9f}")
+                lines.append(f"{m.name}_sum{_labels(m.labels)} {total / 1e9:.9f}")
+                lines.append(f"{m.name}_count{_labels(m.labels)} {count}")
+            else:
+                lines.append(f"{m.name}{_labels(m.labels)} {m.value()}")
+        return "\n".join(lines) + "\n"
+
+
+# process-wide registry used by the service
+METRICS = Registry()
+
+
+def stage(name: str) -> Histogram:
+    """Latency histogram of one scoring pipeline stage."""
+    return METRICS.histogram("scoring_stage_seconds", "Latency of one scoring pipeline stage", stage=name)
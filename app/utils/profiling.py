@@ -0,0 +1,149 @@
+# app/utils/profiling.py
+import os
+import sys
+import time
+import threading
+from collections import Counter
+from typing import Any, Callable, Dict, Optional, Tuple
+
+# opt-in: X-Profile requests/records and the admin sampler are refused unless set
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+PROFILE_DIR = os.getenv("PROFILE_DIR", "/tmp")
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "300"))
+
+SORT_KEYS = ("cumulative", "tottime", "ncalls")
+
+# one deterministic profile at a time: from Python 3.12 on cProfile is a process-wide
+# sys.monitoring tool and a second concurrent Profile().enable() raises
+_profile_lock = threading.Lock()
+
+
+def sort_key(value: Optional[str]) -> Optional[str]:
+    """X-Profile header value -> pstats sort key; None when profiling was not asked for."""
+    if not value:
+        return None
+    value = value.strip().lower()
+    return value if value in SORT_KEYS else "cumulative"
+
+
+def profile_call(fn: Callable, *args, sort: str = "cumulative", limit: int = 30) -> Tuple[Any, Dict[str, Any]]:
+    """
+    Run fn(*args) under cProfile in the calling thread. Returns (fn's result, report)
+    where report lists the top `limit` functions by `sort` with times in ms.
+    """
+    import cProfile  # loaded on the first profile, not at startup
+    import pstats
+
+    profiler = cProfile.Profile()
+    with _profile_lock:
+        t0 = time.perf_counter()
+        profiler.enable()
+        try:
+            result = fn(*args)
+        finally:
+            profiler.disable()
+        total_ms = (time.perf_counter() - t0) * 1000
+
+    stats = pstats.Stats(profiler)
+    rows = []
+    for (filename, line, name), (cc, nc, tt, ct, _) in stats.stats.items():
+        rows.append({"function": f"{_short_path(filename)}:{line}({name})", "ncalls": nc,
+                     "primitive_calls": cc, "tottime_ms": round(tt * 1000, 4), "cumtime_ms": round(ct * 1000, 4)})
+    field = {"cumulative": "cumtime_ms", "tottime": "tottime_ms", "ncalls": "ncalls"}[sort]
+    rows.sort(key=lambda r: r[field], reverse=True)
+    return result, {"total_ms": round(total_ms, 4), "sort": sort, "functions": rows[:limit]}
+
+
+def _short_path(filename: str) -> str:
+    # site-packages/numpy/core/x.py -> numpy/core/x.py, /repo/app/models/x.py -> app/models/x.py
+    for marker in ("site-packages" + os.sep, os.getcwd() + os.sep):
+        i = filename.find(marker)
+        if i >= 0:
+            return filename[i + len(marker):]
+    return filename
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler for the whole process: a daemon thread wakes every `interval_s`,
+    walks the current stack of every other thread (sys._current_frames) and counts each
+    stack in collapsed form ("module:func;module:func;... count", the input of
+    flamegraph.pl / speedscope). Nothing is hooked into the profiled code, so the cost is
+    one stack walk per thread per interval, borne by the sampler thread.
+
+    A run ends after `seconds` or on stop(); its output is written to `path` and stays
+    available from collapsed() until the next run starts.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._stacks: Counter = Counter()
+        self.samples = 0
+        self.started_at = 0.0
+        self.deadline = 0.0
+        self.interval_s = 0.005
+        self.path: Optional[str] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, seconds: float, interval_s: float = 0.005, path: Optional[str] = None) -> bool:
+        """Start a run; False if one is already in progress."""
+        with self._lock:
+            if self.running:
+                return False
+            self._stacks = Counter()
+            self.samples = 0
+            self.interval_s = max(0.001, interval_s)
+            self.started_at = time.time()
+            self.deadline = self.started_at + min(max(seconds, 0.0), PROFILE_MAX_SECONDS)
+            self.path = path or os.path.join(PROFILE_DIR, f"profile-{int(self.started_at)}-{os.getpid()}.collapsed")
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+            self._thread.start()
+            return True
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def _run(self):
+        me = threading.get_ident()
+        try:
+            while not self._stop.is_set() and time.time() < self.deadline:
+                stacks = [_collapse(frame) for ident, frame in sys._current_frames().items() if ident != me]
+                with self._lock:
+                    self._stacks.update(stacks)
+                    self.samples += 1
+                self._stop.wait(self.interval_s)
+        finally:
+            with open(self.path, "w") as f:
+                f.write(self.collapsed())
+
+    def collapsed(self) -> str:
+        with self._lock:
+            stacks = self._stacks.most_common()
+        return "".join(f"{stack} {n}\n" for stack, n in stacks)
+
+    def status(self) -> Dict[str, Any]:
+        return {"running": self.running, "samples": self.samples, "interval_ms": self.interval_s * 1000,
+                "started_at": int(self.started_at), "ends_at": int(self.deadline),
+                "stacks": len(self._stacks), "path": self.path}
+
+
+def _collapse(frame) -> str:
+    parts = []
+    while frame is not None:
+        code = frame.f_code
+        parts.append(f"{frame.f_globals.get('__name__', '?')}:{code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(parts))
+
+
+# process-wide sampler behind the admin endpoint
+SAMPLER = SamplingProfiler()
@@ -0,0 +1,91 @@
+# app/utils/shared_slots.py
+import os
+import mmap
+import time
+import struct
+import threading
+from typing import List, Optional
+
+_MAGIC = b"SCSLOTS1"
+_HEADER = struct.Struct("<8sII")  # magic, slots, slot_bytes
+_HEADER_BYTES = 64
+_SLOT = struct.Struct("<QI")  # sequence, payload length
+
+
+class SharedSlots:
+    """
+    A file of fixed-size slots mapped into every process that opens it; each slot
+    holds one byte string and has exactly one writing process (a preforked worker
+    publishing its stats), while any process may read all of them.
+
+    Writes are guarded by a seqlock instead of a cross-process lock: the writer makes
+    the slot's sequence odd, copies the payload, and makes it even again; a reader
+    retries until it sees the same even sequence before and after copying. Readers never
+    block the writer, and a writer that dies mid-write only leaves its own slot unreadable
+    until it is rewritten.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "r+b") as f:
+            self._mm = mmap.mmap(f.fileno(), 0)
+        magic, self.slots, self.slot_bytes = _HEADER.unpack_from(self._mm, 0)
+        if magic != _MAGIC:
+            raise ValueError(f"{path} is not a shared slots file")
+        self.capacity = self.slot_bytes - _SLOT.size
+        self._write_lock = threading.Lock()
+
+    @classmethod
+    def create(cls, path: str, slots: int, slot_bytes: int = 1 << 20) -> "SharedSlots":
+        """Create (or truncate) the file with `slots` empty slots and open it."""
+        with open(path, "wb") as f:
+            f.truncate(_HEADER_BYTES + slots * slot_bytes)
+            f.write(_HEADER.pack(_MAGIC, slots, slot_bytes))
+        return cls(path)
+
+    def _offset(self, i: int) -> int:
+        if not 0 <= i < self.slots:
+            raise IndexError(f"slot {i} out of range (0..{self.slots - 1})")
+        return _HEADER_BYTES + i * self.slot_bytes
+
+    def write(self, i: int, data: bytes):
+        if len(data) > self.capacity:
+            raise ValueError(f"{len(data)} bytes do not fit a {self.capacity}-byte slot")
+        off = self._offset(i)
+        with self._write_lock:
+            seq, _ = _SLOT.unpack_from(self._mm, off)
+            seq |= 1  # odd: write in progress (also after a writer died mid-write)
+            _SLOT.pack_into(self._mm, off, seq, 0)
+            self._mm[off + _SLOT.size:off + _SLOT.size + len(data)] = data
+            _SLOT.pack_into(self._mm, off, seq + 1, len(data))
+
+    def read(self, i: int, retries: int = 1000) -> Optional[bytes]:
+        """The slot's payload; None if it was never written (or stays mid-write)."""
+        off = self._offset(i)
+        for _ in range(retries):
+            seq, length = _SLOT.unpack_from(self._mm, off)
+            if seq & 1:
+                time.sleep(0)
+                continue
+            data = self._mm[off + _SLOT.size:off + _SLOT.size + length]
+            if _SLOT.unpack_from(self._mm, off)[0] == seq:
+                return data if seq else None
+        return None
+
+    def read_all(self) -> List[Optional[bytes]]:
+        return [self.read(i) for i in range(self.slots)]
+
+    def clear(self, i: int):
+        off = self._offset(i)
+        with self._write_lock:
+            _SLOT.pack_into(self._mm, off, 0, 0)
+
+    def close(self):
+        self._mm.close()
+
+    def unlink(self):
+        self.close()
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
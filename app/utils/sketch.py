@@ -0,0 +1,143 @@
+# app/utils/sketch.py
+from bisect import bisect_left, bisect_right
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+class QuantileSketch:
+    """
+    KLL-style streaming quantile sketch: bounded memory (at most ~3*k retained values),
+    mergeable, serializable.
+
+    Level h holds values of weight 2**h. When a level outgrows its capacity it is sorted
+    and every other value (random offset) is promoted to the next level, which keeps
+    rank estimates unbiased; capacities shrink geometrically towards the lower levels.
+    Rank error is roughly 1/k of the stream length with high probability.
+    """
+
+    def __init__(self, k: int = 200, seed: Optional[int] = None):
+        self.k = max(8, int(k))
+        self.count = 0
+        self.levels: List[np.ndarray] = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+        self._cdf: Optional[Tuple[np.ndarray, np.ndarray]] = None
+
+    def __len__(self) -> int:
+        return self.count
+
+    def size(self) -> int:
+        """Number of retained values (the memory footprint)."""
+        return sum(len(lvl) for lvl in self.levels)
+
+    def _capacity(self, h: int) -> int:
+        depth = len(self.levels) - 1 - h
+        return max(2, int(np.ceil(self.k * (2.0 / 3.0) ** depth)))
+
+    def update(self, values) -> "QuantileSketch":
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[np.isfinite(values)]
+        if values.size:
+            self.levels[0] = np.concatenate([self.levels[0], values])
+            self.count += int(values.size)
+            self._compress()
+        return self
+
+    def merge(self, other: "QuantileSketch") -> "QuantileSketch":
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for h, lvl in enumerate(other.levels):
+            if lvl.size:
+                self.levels[h] = np.concatenate([self.levels[h], lvl])
+        self.count += other.count
+        self._compress()
+        return self
+
+    def _compress(self):
+        self._cdf = None
+        changed = True
+        while changed:
+            changed = False
+            for h in range(len(self.levels)):
+                lvl = self.levels[h]
+                if len(lvl) <= self._capacity(h):
+                    continue
+                if h + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                lvl = np.sort(lvl)
+                # with an odd length the smallest value stays behind at this level
+                keep, pair = (lvl[:1], lvl[1:]) if len(lvl) % 2 else (lvl[:0], lvl)
+                promoted = pair[int(self._rng.integers(2))::2]
+                self.levels[h] = keep
+                self.levels[h + 1] = np.concatenate([self.levels[h + 1], promoted])
+                changed = True
+
+    def _sorted(self) -> Tuple[np.ndarray, np.ndarray]:
+        if self._cdf is None:
+            values = np.concatenate(self.levels)
+            weights = np.concatenate([np.full(len(lvl), 2.0 ** h) for h, lvl in enumerate(self.levels)])
+            order = np.argsort(values, kind="stable")
+            self._cdf = (values[order], np.cumsum(weights[order]))
+        return self._cdf
+
+    def cdf_view(self) -> "CdfView":
+        values, cum = self._sorted()
+        return CdfView(values.copy(), cum.copy())
+
+    def rank(self, x) -> np.ndarray:
+        return self.cdf_view().rank(x)
+
+    def quantile(self, q: float) -> float:
+        return self.cdf_view().quantile(q)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"k": self.k, "count": self.count, "levels": [lvl.tolist() for lvl in self.levels]}
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "QuantileSketch":
+        s = cls(int(d["k"]))
+        s.count = int(d["count"])
+        s.levels = [np.asarray(lvl, dtype=np.float64) for lvl in d["levels"]] or [np.empty(0)]
+        return s
+
+
+class CdfView:
+    """
+    Frozen sorted (value, cumulative weight) arrays of a sketch; each lookup is one
+    binary search, O(log k).
+    """
+
+    def __init__(self, values: np.ndarray, cum: np.ndarray):
+        self.values = values
+        self.cum = cum
+        self.total = float(cum[-1]) if len(cum) else 0.0
+        # plain lists for the scalar path: bisect beats a NumPy call on one value
+        self._values_list = values.tolist()
+        self._cum_list = cum.tolist()
+
+    def rank(self, x) -> np.ndarray:
+        """Mid-rank of x in [0, 1]: ties share the middle of their rank range."""
+        x = np.asarray(x, dtype=np.float64)
+        if not self.total:
+            return np.zeros_like(x)
+        lo = np.searchsorted(self.values, x, side="left")
+        hi = np.searchsorted(self.values, x, side="right")
+        below = np.where(lo > 0, self.cum[np.maximum(lo - 1, 0)], 0.0)
+        upto = np.where(hi > 0, self.cum[np.maximum(hi - 1, 0)], 0.0)
+        return (below + upto) / (2.0 * self.total)
+
+    def rank1(self, x: float) -> float:
+        """rank() of a single value."""
+        if not self.total:
+            return 0.0
+        lo = bisect_left(self._values_list, x)
+        hi = bisect_right(self._values_list, x)
+        below = self._cum_list[lo - 1] if lo else 0.0
+        upto = self._cum_list[hi - 1] if hi else 0.0
+        return (below + upto) / (2.0 * self.total)
+
+    def quantile(self, q: float) -> float:
+        if not self.total:
+            return float("nan")
+        i = int(np.searchsorted(self.cum, q * self.total, side="left"))
+        return float(self.values[min(i, len(self.values) - 1)])
@@ -0,0 +1,288 @@
+# app/utils/stream.py
+import json
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+# structural characters outside / inside a JSON string
+_STRUCT_RE = re.compile(rb'["{}\[\]]')
+_STRING_RE = re.compile(rb'["\\]')
+_BLANK = frozenset(b" \t\r\n,")
+
+
+class DecodeError(ValueError):
+    """A single document in a multi-document body could not be decoded."""
+
+
+class WalletStreamDecoder:
+    """
+    Incremental splitter for request bodies holding many wallet documents, either
+    NDJSON (one object per line) or a single JSON array of objects.
+
+    feed() takes raw bytes as they arrive and returns the documents completed so far,
+    decoded to dicts (or, with raw=True, as the undecoded bytes of each document); a
+    document that is not valid JSON is returned as a DecodeError instead, so callers
+    can report it and keep going. Only the current (incomplete) document is buffered,
+    so memory is bounded by the largest single wallet.
+    """
+
+    def __init__(self, raw: bool = False):
+        self._raw = raw
+        self._buf = bytearray()
+        self._mode: Optional[str] = None  # "ndjson" | "array"
+        self._pos = 0  # where scanning resumes in _buf
+        self._depth = 0
+        self._start = -1
+        self._in_string = False
+        self._done = False
+
+    def feed(self, data: bytes) -> List[Any]:
+        self._buf += data
+        if self._mode is None:
+            stripped = self._buf.lstrip()
+            if not stripped:
+                return []
+            if stripped[:1] == b"[":
+                self._mode = "array"
+                del self._buf[:len(self._buf) - len(stripped) + 1]
+            else:
+                self._mode = "ndjson"
+        return self._split_lines(final=False) if self._mode == "ndjson" else self._split_array()
+
+    def close(self) -> List[Any]:
+        if self._mode == "ndjson":
+            return self._split_lines(final=True)
+        if self._mode == "array" and not self._done:
+            self._buf.clear()
+            return [DecodeError("unterminated JSON array")]
+        return []
+
+    def _decode(self, raw: bytes) -> Any:
+        if self._raw:
+            return raw
+        try:
+            return json.loads(raw)
+        except ValueError as e:
+            return DecodeError(f"invalid JSON document: {e}")
+
+    def _split_lines(self, final: bool) -> List[Any]:
+        out: List[Any] = []
+        buf = self._buf
+        start = 0
+        # bytes before _pos were searched already, so a long line is scanned once
+        nl = buf.find(b"\n", self._pos)
+        while nl >= 0:
+            line = bytes(buf[start:nl]).strip()
+            if line:
+                out.append(self._decode(line))
+            start = nl + 1
+            nl = buf.find(b"\n", start)
+        del buf[:start]
+        self._pos = len(buf)
+        if final:
+            line = bytes(buf).strip()
+            buf.clear()
+            if line:
+                out.append(self._decode(line))
+        return out
+
+    def _split_array(self) -> List[Any]:
+        out: List[Any] = []
+        buf = self._buf
+        pos = self._pos
+        consumed = 0
+        while not self._done:
+            if self._in_string:
+                m = _STRING_RE.search(buf, pos)
+                if m is None:
+                    pos = max(pos, len(buf))
+                    break
+                if m.group() == b"\\":
+                    pos = m.end() + 1  # may point past the end until more bytes arrive
+                    continue
+                self._in_string = False
+                pos = m.end()
+                continue
+
+            m = _STRUCT_RE.search(buf, pos)
+            if m is None:
+                pos = len(buf)
+                break
+            ch = m.group()
+            pos = m.end()
+            if ch == b'"':
+                self._in_string = True
+            elif ch in (b"{", b"["):
+                if self._depth == 0:
+                    if any(c not in _BLANK for c in buf[consumed:m.start()]):
+                        out.append(DecodeError("unexpected data between array elements"))
+                    self._start = m.start()
+                self._depth += 1
+            elif self._depth == 0:
+                # scalars are only seen here, as non-blank bytes before the next bracket
+                if ch == b"}" or any(c not in _BLANK for c in buf[consumed:m.start()]):
+                    out.append(DecodeError("unexpected data between array elements"))
+                # a closing bracket at the top level ends the array
+                if ch == b"]":
+                    self._done = True
+                consumed = pos
+            else:
+                self._depth -= 1
+                if self._depth == 0:
+                    out.append(self._decode(bytes(buf[self._start:pos])))
+                    consumed = pos
+                    self._start = -1
+
+        if self._start >= 0:
+            consumed = min(consumed, self._start)
+            self._start -= consumed
+        del buf[:consumed]
+        self._pos = max(pos - consumed, 0)
+        return out
+
+
+
+# tokens outside transaction arrays: strings, brackets/braces, ":" and ","
+_TOKEN_RE = re.compile(rb'["{}\[\]:,]')
+
+
+class TransactionStreamParser:
+    """
+    Incremental parser for ONE wallet message that never materializes its
+    `data[*].transactions` arrays.
+
+    feed() returns the transactions completed so far as (block_index, raw_json_bytes);
+    each element is cut out of the buffer as soon as it closes, so at most one
+    transaction is buffered at a time. Everything outside the transaction arrays is kept
+    as a small "skeleton" document in which every transactions array is empty;
+    skeleton() returns it once the whole body has been fed. Keys may come in any order
+    (e.g. protocolType after transactions). A transactions element that is not an object
+    raises ValueError, as validating the buffered document would.
+    """
+
+    def __init__(self):
+        self._buf = bytearray()
+        self._pos = 0
+        self._stack = bytearray()             # b"{" / b"[" per open container
+        self._keys: List[Optional[bytes]] = []  # last key seen per open container
+        self._expect_key = False
+        self._skeleton = bytearray()
+        self._copy_from = 0                   # start of bytes still owed to the skeleton
+        self._in_txs = False
+        self._tx_start = -1
+        self._gap_from = 0                    # start of the bytes since the last transaction
+        self._block = -1
+        self._protocol_types: Dict[int, str] = {}
+
+    def feed(self, data: bytes) -> List[Tuple[int, bytes]]:
+        self._buf += data
+        buf = self._buf
+        pos = self._pos
+        out: List[Tuple[int, bytes]] = []
+        while True:
+            m = (_STRUCT_RE if self._in_txs else _TOKEN_RE).search(buf, pos)
+            if m is None:
+                pos = len(buf)
+                break
+            ch = m.group()
+            if ch == b'"':
+                if self._in_txs and len(self._stack) == 4:
+                    self._not_an_object()
+                end = self._string_end(buf, m.end())
+                if end < 0:
+                    pos = m.start()  # incomplete string: rescanned when more bytes arrive
+                    break
+                if self._expect_key and not self._in_txs:
+                    self._keys[-1] = bytes(buf[m.end():end - 1])
+                elif (len(self._stack) == 3 and self._keys[2] == b"protocolType" and self._keys[0] == b"data"
+                      and not self._in_txs):
+                    self._protocol_types[self._block] = json.loads(bytes(buf[m.start():end]))
+                pos = end
+                continue
+
+            pos = m.end()
+            depth = len(self._stack)
+            if ch == b":":
+                self._expect_key = False
+            elif ch == b",":
+                self._expect_key = depth > 0 and self._stack[-1] == ord("{")
+            elif ch in (b"{", b"["):
+                if self._in_txs:
+                    if depth == 4:
+                        if ch == b"[":
+                            self._not_an_object()
+                        self._check_gap(buf, m.start())
+                        self._tx_start = m.start()
+                elif depth == 2 and ch == b"{" and self._keys[0] == b"data":
+                    self._block += 1
+                elif depth == 3 and ch == b"[" and self._keys[2] == b"transactions" and self._keys[0] == b"data":
+                    self._in_txs = True
+                    self._gap_from = pos
+                    self._skeleton += buf[self._copy_from:pos]
+                self._stack += ch
+                self._keys.append(None)
+                self._expect_key = ch == b"{"
+            else:
+                if not self._stack:
+                    raise ValueError("invalid JSON document: unbalanced closing bracket")
+                self._stack.pop()
+                self._keys.pop()
+                depth -= 1
+                if self._in_txs and depth == 4 and self._tx_start >= 0:
+                    out.append((self._block, bytes(buf[self._tx_start:pos])))
+                    self._tx_start = -1
+                    self._gap_from = pos
+                elif self._in_txs and depth == 3:
+                    self._check_gap(buf, m.start())
+                    self._in_txs = False
+                    self._copy_from = m.start()
+                self._expect_key = False
+
+        # drop everything that is either in the skeleton or an emitted transaction
+        if not self._in_txs:
+            self._skeleton += buf[self._copy_from:pos]
+            drop = pos
+        elif self._tx_start >= 0:
+            drop = self._tx_start
+        else:
+            self._check_gap(buf, pos)
+            drop = pos
+        del buf[:drop]
+        self._pos = pos - drop
+        self._copy_from = 0
+        self._gap_from = max(self._gap_from - drop, 0)
+        if self._tx_start >= 0:
+            self._tx_start -= drop
+        return out
+
+    def _check_gap(self, buf: bytearray, end: int):
+        # between two transactions only blanks and commas; anything else is a scalar element
+        if any(c not in _BLANK for c in buf[self._gap_from:end]):
+            self._not_an_object()
+
+    def _not_an_object(self):
+        raise ValueError(f"data.{self._block}.transactions: every element must be a JSON object")
+
+    @staticmethod
+    def _string_end(buf: bytearray, i: int) -> int:
+        while True:
+            m = _STRING_RE.search(buf, i)
+            if m is None:
+                return -1
+            if m.group() == b"\\":
+                i = m.end() + 1
+                if i > len(buf):
+                    return -1
+                continue
+            return m.end()
+
+    def protocol_type(self, block: int) -> Optional[str]:
+        """protocolType of data[block] if it came before the bytes fed so far, else None."""
+        return self._protocol_types.get(block)
+
+    def skeleton_so_far(self) -> bytes:
+        return bytes(self._skeleton)
+
+    def skeleton(self) -> bytes:
+        if self._stack:
+            raise ValueError("invalid JSON document: truncated")
+        return bytes(self._skeleton + self._buf)
@@ -1,11 +1,15 @@
 # app/utils/types.py
+import sys
+import time
 from typing import List, Optional, Dict, Any
 from pydantic import BaseModel, Field, validator
 from datetime import datetime
-import numpy as np
 from decimal import Decimal
 
 # -------- Input models --------
+# timestamps are packed into int64 columns for scoring
+INT64_MIN, INT64_MAX = -(2 ** 63), 2 ** 63 - 1
+
 class TokenAmount(BaseModel):
     amount: Optional[float] = None
     amountUSD: Optional[float] = None
@@ -15,7 +19,7 @@ class TokenAmount(BaseModel):
 class Transaction(BaseModel):
     document_id: Optional[str]
     action: str
-    timestamp: int
+    timestamp: int = Field(..., ge=INT64_MIN, le=INT64_MAX)
     caller: Optional[str]
     protocol: Optional[str]
     poolId: Optional[str] = None
@@ -74,10 +78,43 @@ class FailureMessage(BaseModel):
     categories: List[FailureCategory] = Field(default_factory=list)
 
 # -------- utils --------
+def parse_wallet(raw: bytes) -> WalletMessage:
+    """
+    Validate a WalletMessage straight from JSON bytes (no intermediate dict on pydantic v2).
+    """
+    if hasattr(WalletMessage, "model_validate_json"):
+        return WalletMessage.model_validate_json(raw)
+    return WalletMessage.parse_raw(raw)
+
+def parse_transactions(raws: List[bytes]) -> List[Transaction]:
+    """
+    Validate a batch of raw JSON Transaction objects in one call.
+    """
+    body = b'{"protocolType":"","transactions":[' + b",".join(raws) + b"]}"
+    if hasattr(ProtocolData, "model_validate_json"):
+        return ProtocolData.model_validate_json(body).transactions
+    return ProtocolData.parse_raw(body).transactions
+
+def failure_message(wallet_address: str, error: str, processing_time_ms: int = 0,
+                    transaction_count: int = 0) -> Dict[str, Any]:
+    """
+    Plain-dict FailureMessage for a wallet that could not be decoded, validated or scored.
+    """
+    return FailureMessage(
+        wallet_address=wallet_address,
+        error=error,
+        timestamp=int(time.time()),
+        processing_time_ms=processing_time_ms,
+        categories=[FailureCategory(category="dexes", error=error, transaction_count=transaction_count)],
+    ).dict()
+
 def to_serializable(obj: Any):
-    if isinstance(obj, (np.floating,)):
+    # NumPy scalars can only exist once something else imported numpy; not importing
+    # it here keeps it off the import path of modules that never touch arrays
+    np = sys.modules.get("numpy")
+    if np is not None and isinstance(obj, np.floating):
         return float(obj)
-    if isinstance(obj, (np.integer,)):
+    if np is not None and isinstance(obj, np.integer):
         return int(obj)
     if isinstance(obj, Decimal):
         return float(obj)
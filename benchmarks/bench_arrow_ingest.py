@@ -0,0 +1,79 @@
+# benchmarks/bench_arrow_ingest.py
+"""
+Backfill throughput of a transactions table: the JSON path (nested WalletMessage
+payloads, parse_wallet_compact + score_batch per --batch wallets) against reading the
+same rows from Parquet and Arrow IPC files with app.models.arrow_ingest. Needs pyarrow.
+
+    python -m benchmarks.bench_arrow_ingest [--wallets 10000] [--tx 100] [--batch 256]
+"""
+import os
+import json
+import time
+import argparse
+import tempfile
+import warnings
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from app.models.arrow_ingest import score_file
+from app.models.dex_model import DexScoringModel
+from app.utils.compact import parse_wallet_compact
+from benchmarks.synthetic import make_wallets
+
+warnings.simplefilter("ignore")
+
+LEGS = ("tokenIn", "tokenOut", "token0", "token1")
+
+
+def _table(wallets) -> "pa.Table":
+    cols = {name: [] for name in ("wallet_address", "action", "timestamp", "poolId", "document_id")}
+    cols.update({f"{leg}.amountUSD": [] for leg in LEGS})
+    for w in wallets:
+        for t in w["data"][0]["transactions"]:
+            cols["wallet_address"].append(w["wallet_address"])
+            for name in ("action", "timestamp", "poolId", "document_id"):
+                cols[name].append(t[name])
+            for leg in LEGS:
+                cols[f"{leg}.amountUSD"].append(t[leg]["amountUSD"] if leg in t else None)
+    return pa.table(cols)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--wallets", type=int, default=10_000)
+    ap.add_argument("--tx", type=int, default=100, help="transactions per wallet")
+    ap.add_argument("--batch", type=int, default=256, help="wallets per score_batch call on the JSON path")
+    args = ap.parse_args()
+    model = DexScoringModel()
+    wallets = make_wallets(args.wallets, n_tx=args.tx)
+    rows = args.wallets * args.tx
+    table = _table(wallets)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        jsonl = os.path.join(tmp, "tx.jsonl")
+        with open(jsonl, "wb") as f:
+            f.writelines(json.dumps(w).encode() + b"\n" for w in wallets)
+        pq.write_table(table, os.path.join(tmp, "tx.parquet"))
+        with pa.OSFile(os.path.join(tmp, "tx.arrow"), "wb") as sink, pa.ipc.new_file(sink, table.schema) as w:
+            w.write_table(table)
+        del wallets, table
+
+        print(f"{'input':<8} {'MB':>7} {'seconds':>8} {'rows/s':>12} {'wallets/s':>10}")
+        for name in ("jsonl", "parquet", "arrow"):
+            path = os.path.join(tmp, f"tx.{name}")
+            t = time.perf_counter()
+            if name == "jsonl":
+                with open(path, "rb") as f:
+                    lines = f.read().splitlines()
+                for i in range(0, len(lines), args.batch):
+                    model.score_batch([parse_wallet_compact(line) for line in lines[i:i + args.batch]])
+            else:
+                score_file(model, path)
+            s = time.perf_counter() - t
+            print(f"{name:<8} {os.path.getsize(path) / 2 ** 20:>7.1f} {s:>8.2f} {rows / s:>12,.0f} "
+                  f"{args.wallets / s:>10,.0f}")
+
+
+if __name__ == "__main__":
+    main()
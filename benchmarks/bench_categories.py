@@ -0,0 +1,77 @@
+# benchmarks/bench_categories.py
+"""
+Per-wallet latency of score_wallet for wallets with a dexes, a lending and a staking
+block of --tx transactions each: DEX-only scoring (no category scorers), all categories
+one after another, and all categories side by side on CATEGORY_WORKERS threads.
+The mean per block comes from the scoring_category_seconds histograms.
+
+    python -m benchmarks.bench_categories [--tx 100 10000 100000] [--workers 3]
+"""
+import copy
+import json
+import time
+import random
+import argparse
+import statistics
+import warnings
+
+from app.models.categories import category_timer, enabled_scorers
+from app.models.dex_model import DexScoringModel
+from app.utils.compact import parse_wallet_compact
+from benchmarks.synthetic import make_wallets
+
+warnings.simplefilter("ignore")
+
+LENDING_ACTIONS = ("deposit", "withdraw", "borrow", "repay", "liquidate")
+STAKING_ACTIONS = ("stake", "unstake", "claim")
+
+
+def _wallet(n_tx: int) -> bytes:
+    rng = random.Random(n_tx)
+    w = make_wallets(1, n_tx=n_tx, seed=n_tx)[0]
+    dex = w["data"][0]["transactions"]
+    for ptype, actions in (("lending", LENDING_ACTIONS), ("staking", STAKING_ACTIONS)):
+        txs = copy.deepcopy(dex)
+        for t in txs:
+            t["action"] = rng.choice(actions)
+            t["token0"] = {"amountUSD": round(rng.uniform(1, 500), 2), "symbol": "USDC"}
+        w["data"].append({"protocolType": ptype, "transactions": txs})
+    return json.dumps(w).encode()
+
+
+def _mean_ms(category: str, before) -> float:
+    _, total, count = category_timer(category).snapshot()
+    return (total - before[1]) / max(count - before[2], 1) / 1e6
+
+
+def _p50_ms(model: DexScoringModel, wallet, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        model.score_wallet(wallet)
+        times.append((time.perf_counter() - t) * 1000)
+    return statistics.median(times)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--tx", type=int, nargs="+", default=[100, 10_000, 100_000], help="transactions per block")
+    ap.add_argument("--workers", type=int, default=3, help="category threads of the concurrent run")
+    args = ap.parse_args()
+    scorers = enabled_scorers("lending,staking")
+    models = {"dexes only": DexScoringModel(scorers={}), "in turn": DexScoringModel(scorers=scorers, category_workers=0),
+              "concurrent": DexScoringModel(scorers=scorers, category_workers=args.workers)}
+
+    print(f"{'tx/block':>9} " + " ".join(f"{name:>12}" for name in models)
+          + "  mean ms per block: " + " / ".join(("dexes", "lending", "staking")))
+    for n_tx in args.tx:
+        wallet = parse_wallet_compact(_wallet(n_tx))
+        repeat = max(5, 20_000 // n_tx)
+        before = {c: category_timer(c).snapshot() for c in ("dexes", "lending", "staking")}
+        cells = [f"{_p50_ms(model, wallet, repeat):>9.2f} ms" for model in models.values()]
+        per_block = [_mean_ms(c, snap) for c, snap in before.items()]
+        print(f"{n_tx:>9} " + " ".join(cells) + "  " + " / ".join(f"{v:.2f}" for v in per_block))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+# benchmarks/bench_coalescer.py
+"""
+Latency/throughput trade-off of the /score request coalescer: `--clients` concurrent
+callers on one event loop each score small wallets back to back, once per thread-pool
+call (the default path, "off") and through a RequestCoalescer for every window.
+
+    python -m benchmarks.bench_coalescer [--clients 1,16,64,256] [--windows 0.5,1,2,5] [--tx 10]
+"""
+import time
+import json
+import asyncio
+import argparse
+import warnings
+from typing import Awaitable, Callable, List
+
+import numpy as np
+from starlette.concurrency import run_in_threadpool
+
+from app.services.coalescer import RequestCoalescer
+from app.services.executor import ScoringExecutor
+from benchmarks.synthetic import make_wallets
+
+warnings.simplefilter("ignore")
+
+
+async def _drive(score: Callable[[bytes], Awaitable], payloads: List[bytes], clients: int, duration: float):
+    latencies: List[float] = []
+    deadline = time.perf_counter() + duration
+
+    async def client(k: int):
+        i = k
+        while time.perf_counter() < deadline:
+            t = time.perf_counter()
+            await score(payloads[i % len(payloads)])
+            latencies.append(time.perf_counter() - t)
+            i += clients
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(client(k) for k in range(clients)))
+    elapsed = time.perf_counter() - t0
+    ms = np.asarray(latencies) * 1000
+    return len(latencies) / elapsed, float(np.percentile(ms, 50)), float(np.percentile(ms, 99))
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--clients", default="1,16,64,256", help="concurrent callers, comma separated")
+    ap.add_argument("--windows", default="0.5,1,2,5", help="coalescing windows in ms")
+    ap.add_argument("--max-batch", type=int, default=256)
+    ap.add_argument("--tx", type=int, default=10, help="transactions per wallet")
+    ap.add_argument("--duration", type=float, default=3.0, help="seconds per setting")
+    args = ap.parse_args()
+
+    payloads = [json.dumps(w).encode() for w in make_wallets(512, n_tx=args.tx)]
+    ex = ScoringExecutor(mode="thread", cache=None)
+    ex.score(payloads[:8])  # warm up
+
+    async def single(p: bytes):
+        return (await run_in_threadpool(ex.score, [p]))[0]
+
+    print(f"{'clients':>8} {'window':>8} {'wallets/s':>10} {'p50 ms':>8} {'p99 ms':>8}")
+    for clients in (int(c) for c in args.clients.split(",")):
+        settings = [("off", single)] + [
+            (f"{w}ms", RequestCoalescer(ex, float(w), args.max_batch).score) for w in args.windows.split(",")]
+        for label, score in settings:
+            rate, p50, p99 = asyncio.run(_drive(score, payloads, clients, args.duration))
+            print(f"{clients:>8} {label:>8} {rate:>10.0f} {p50:>8.2f} {p99:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+# benchmarks/bench_cold_start.py
+"""
+Cold start of the API server: the import time of app.main (median of fresh
+interpreters, plus the modules with the largest own import time), then, with
+SCORING_WARMUP off and on, the time from spawning uvicorn to the first successful
+POST /api/v1/score, the latency of that first request and of the ones after it.
+
+    python -m benchmarks.bench_cold_start [--repeat 5] [--requests 20] [--top 10]
+"""
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import statistics
+import subprocess
+import http.client
+
+from benchmarks.synthetic import make_wallets
+
+_IMPORT = "import time; t = time.perf_counter(); import app.main; print(time.perf_counter() - t)"
+
+
+def _import_seconds(repeat: int) -> float:
+    runs = [float(subprocess.run([sys.executable, "-c", _IMPORT], capture_output=True, text=True,
+                                 check=True).stdout) for _ in range(repeat)]
+    return statistics.median(runs)
+
+
+def _heaviest_imports(top: int):
+    err = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app.main"],
+                         capture_output=True, text=True, check=True).stderr
+    rows = []
+    for line in err.splitlines():
+        parts = line.split("|")
+        if len(parts) == 3 and parts[0].split(":")[-1].strip().isdigit():
+            rows.append((int(parts[0].split(":")[-1]), parts[2].strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _post(port: int, body: bytes) -> int:
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    try:
+        conn.request("POST", "/api/v1/score", body, {"Content-Type": "application/json"})
+        resp = conn.getresponse()
+        resp.read()
+        return resp.status
+    finally:
+        conn.close()
+
+
+def _boot(warmup: bool, body: bytes, n_requests: int):
+    port = _free_port()
+    env = dict(os.environ, SCORING_WARMUP=str(warmup).lower())
+    t0 = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port),
+                             "--log-level", "warning"], env=env)
+    try:
+        while True:  # uvicorn only listens once the startup hook has returned
+            t = time.perf_counter()
+            try:
+                status = _post(port, body)
+            except ConnectionRefusedError:
+                if proc.poll() is not None:
+                    raise RuntimeError("server exited during startup")
+                time.sleep(0.005)
+                continue
+            first_ms = (time.perf_counter() - t) * 1000
+            if status != 200:
+                raise RuntimeError(f"first /api/v1/score answered {status}")
+            break
+        ready_s = time.perf_counter() - t0
+        later = []
+        for _ in range(n_requests):
+            t = time.perf_counter()
+            _post(port, body)
+            later.append((time.perf_counter() - t) * 1000)
+        return ready_s, first_ms, statistics.median(later)
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--repeat", type=int, default=5, help="fresh interpreters per import measurement")
+    ap.add_argument("--requests", type=int, default=20, help="requests timed after the first")
+    ap.add_argument("--top", type=int, default=10, help="heaviest imports to list")
+    ap.add_argument("--tx", type=int, default=20)
+    args = ap.parse_args()
+
+    print(f"import app.main: {_import_seconds(args.repeat) * 1000:.0f} ms (median of {args.repeat})")
+    for us, name in _heaviest_imports(args.top):
+        print(f"  {us / 1000:7.1f} ms  {name}")
+
+    body = json.dumps(make_wallets(1, n_tx=args.tx)[0]).encode()
+    print(f"\n{'warm-up':>8} {'first 200 after spawn':>22} {'first request':>14} {'later (median)':>15}")
+    for warmup in (False, True):
+        ready_s, first_ms, later_ms = _boot(warmup, body, args.requests)
+        print(f"{'on' if warmup else 'off':>8} {ready_s * 1000:>19.0f} ms {first_ms:>11.1f} ms {later_ms:>12.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
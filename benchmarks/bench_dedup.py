@@ -0,0 +1,97 @@
+# benchmarks/bench_dedup.py
+"""
+Memory and throughput of the document_id dedup index at scale (default 10M ids):
+
+    whale      one wallet sending --ids ids in messages of --chunk
+    wallets    --ids ids spread over --wallets wallets
+    replay     every id of the last 1M sent again (must all be dropped), then 1M new
+               ids (any dropped one is a bloom false positive)
+    in-payload first_occurrences over --ids ids in blocks of --chunk, 5% repeated
+
+    python -m benchmarks.bench_dedup [--ids 10000000] [--chunk 10000] [--wallets 10000]
+"""
+import gc
+import time
+import random
+import argparse
+
+import numpy as np
+
+from app.utils.dedup import DedupIndex, first_occurrences
+
+
+def _rss_mb() -> float:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * 4096 / 2 ** 20
+
+
+def _ids(start: int, n: int):
+    return [f"{i:024x}" for i in range(start, start + n)]
+
+
+def _report(name: str, n: int, seconds: float, index: DedupIndex, rss0: float):
+    s = index.stats()
+    print(f"{name:<10} {n / seconds:>12,.0f} ids/s  index {s['bytes'] / 2 ** 20:>8.1f} MB "
+          f"({s['bytes'] / max(s['ids'], 1):.2f} B/id)  rss +{_rss_mb() - rss0:>7.1f} MB  "
+          f"wallets {s['wallets']}  evicted {s['evicted_wallets']}")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--ids", type=int, default=10_000_000)
+    ap.add_argument("--chunk", type=int, default=10_000, help="ids per message / block")
+    ap.add_argument("--wallets", type=int, default=10_000)
+    ap.add_argument("--max-mb", type=int, default=1024, help="index memory budget")
+    args = ap.parse_args()
+    budget = args.max_mb * 2 ** 20
+
+    gc.collect()
+    rss0 = _rss_mb()
+    whale = DedupIndex(max_bytes=budget)
+    t = time.perf_counter()
+    for start in range(0, args.ids, args.chunk):
+        whale.check_add("0xwhale", _ids(start, min(args.chunk, args.ids - start)))
+    _report("whale", args.ids, time.perf_counter() - t, whale, rss0)
+
+    tail = max(0, args.ids - 1_000_000)
+    t = time.perf_counter()
+    kept = sum(int(whale.check_add("0xwhale", _ids(s, args.chunk)).sum()) for s in range(tail, args.ids, args.chunk))
+    replay_s = time.perf_counter() - t
+    fresh = sum(int(whale.check_add("0xwhale", _ids(s, args.chunk)).sum())
+                for s in range(args.ids, args.ids + 1_000_000, args.chunk))
+    n_tail = args.ids - tail
+    print(f"{'replay':<10} {n_tail / replay_s:>12,.0f} ids/s  replayed kept {kept} of {n_tail}, "
+          f"new dropped {1_000_000 - fresh} of 1000000 (false-positive rate {(1_000_000 - fresh) / 1e6:.1e})")
+    del whale
+    gc.collect()
+
+    rss0 = _rss_mb()
+    index = DedupIndex(max_wallets=args.wallets, max_bytes=budget)
+    per_wallet = max(1, args.ids // args.wallets)
+    msg = min(args.chunk, per_wallet)
+    t = time.perf_counter()
+    for start in range(0, per_wallet, msg):
+        for w in range(args.wallets):
+            index.check_add(f"0x{w:040x}", _ids(w * per_wallet + start, min(msg, per_wallet - start)))
+    _report("wallets", per_wallet * args.wallets, time.perf_counter() - t, index, rss0)
+    del index
+    gc.collect()
+
+    rng = random.Random(1)
+    n_blocks = max(1, args.ids // args.chunk)
+    block_ids = _ids(0, args.chunk)
+    repeats = rng.sample(range(args.chunk), args.chunk // 20)
+    for i, j in zip(repeats, rng.sample(range(args.chunk), len(repeats))):
+        block_ids[i] = block_ids[j]
+    groups = np.zeros(args.chunk, dtype=np.int64)
+    t = time.perf_counter()
+    dropped = 0
+    for _ in range(n_blocks):
+        keep = first_occurrences(list(block_ids), groups)
+        dropped += 0 if keep is None else int((~keep).sum())
+    elapsed = time.perf_counter() - t
+    print(f"{'in-payload':<10} {n_blocks * args.chunk / elapsed:>12,.0f} ids/s  dropped {dropped:,} repeated ids")
+
+
+if __name__ == "__main__":
+    main()
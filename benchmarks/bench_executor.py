@@ -0,0 +1,51 @@
+# benchmarks/bench_executor.py
+"""
+Scoring throughput of the process-pool executor from 1 to N worker processes.
+
+    python -m benchmarks.bench_executor [--max-workers N] [--tx 50]
+"""
+import os
+import json
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+from app.services.executor import ScoringExecutor
+from benchmarks.synthetic import make_wallets
+
+
+def _throughput(ex: ScoringExecutor, chunks, dispatchers: int) -> float:
+    n = sum(len(c) for c in chunks)
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(dispatchers) as tp:
+        list(tp.map(ex.score, chunks))
+    return n / (time.perf_counter() - t0)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--tx", type=int, default=50, help="transactions per wallet")
+    ap.add_argument("--wallets", type=int, default=4000)
+    ap.add_argument("--chunk", type=int, default=50)
+    args = ap.parse_args()
+
+    payloads = [json.dumps(w).encode() for w in make_wallets(args.wallets, n_tx=args.tx)]
+    chunks = [payloads[i:i + args.chunk] for i in range(0, len(payloads), args.chunk)]
+
+    inline = _throughput(ScoringExecutor(mode="thread"), chunks, 1)
+    print(f"cores available: {os.cpu_count()}")
+    print(f"{'mode':>10} {'workers':>8} {'wallets/s':>10} {'vs inline':>10}")
+    print(f"{'thread':>10} {1:>8} {inline:>10.0f} {1.0:>9.2f}x")
+    for k in range(1, args.max_workers + 1):
+        ex = ScoringExecutor(mode="process", workers=k, max_inflight=2 * k)
+        ex.start()
+        try:
+            rate = _throughput(ex, chunks, 2 * k)
+        finally:
+            ex.stop()
+        print(f"{'process':>10} {k:>8} {rate:>10.0f} {rate / inline:>9.2f}x")
+
+
+if __name__ == "__main__":
+    main()
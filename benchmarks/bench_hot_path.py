@@ -0,0 +1,39 @@
+# benchmarks/bench_hot_path.py
+"""
+Per-request latency and allocations of the /api/v1/score handler body: validating the
+raw JSON body into a WalletMessage and scoring it (what the in-thread executor runs).
+
+    python -m benchmarks.bench_hot_path
+"""
+import time
+import tracemalloc
+import warnings
+import statistics
+
+import json
+
+from app.services.executor import score_payloads
+from benchmarks.synthetic import make_wallets
+
+warnings.simplefilter("ignore")
+
+
+def main():
+    print(f"{'tx/wallet':>10} {'p50 ms':>9} {'min ms':>9} {'peak alloc KiB':>15}")
+    for n_tx in (10, 1_000, 50_000):
+        body = json.dumps(make_wallets(1, n_tx=n_tx)[0]).encode()
+        reps = 200 if n_tx <= 1_000 else 5
+        times = []
+        for _ in range(reps):
+            t0 = time.perf_counter()
+            score_payloads([body])
+            times.append((time.perf_counter() - t0) * 1000)
+        tracemalloc.start()
+        score_payloads([body])
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"{n_tx:>10} {statistics.median(times):>9.3f} {min(times):>9.3f} {peak / 1024:>15.1f}")
+
+
+if __name__ == "__main__":
+    main()
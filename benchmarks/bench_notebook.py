@@ -0,0 +1,46 @@
+# benchmarks/bench_notebook.py
+"""
+Notebook pipeline throughput: the pandas reference (process_wallet_complete, one
+DataFrame per wallet) vs NotebookScoringModel per wallet and batched.
+
+    python -m benchmarks.bench_notebook [--wallets 500]
+"""
+import time
+import argparse
+import warnings
+
+from app.models.notebook_model import NotebookScoringModel
+from app.utils.types import WalletMessage
+from benchmarks.notebook_reference import load_notebook
+from benchmarks.synthetic import make_wallets, SYMBOLS
+
+warnings.simplefilter("ignore")
+
+
+def _rate(fn, n: int) -> float:
+    t0 = time.perf_counter()
+    fn()
+    return n / (time.perf_counter() - t0)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--wallets", type=int, default=500)
+    args = ap.parse_args()
+
+    nb = load_notebook()
+    model = NotebookScoringModel()
+    print(f"{'tx/wallet':>10} {'pandas w/s':>11} {'numpy 1-by-1 w/s':>17} {'numpy batch w/s':>16} {'speedup':>8}")
+    for n_tx in (20, 200, 2_000):
+        n = max(20, args.wallets * 20 // n_tx)
+        raw = make_wallets(n, n_tx=n_tx, symbols=SYMBOLS)
+        wallets = [WalletMessage(**w) for w in raw]
+        pandas_rate = _rate(lambda: [nb["process_wallet_complete"](w) for w in raw], n)
+        single_rate = _rate(lambda: [model.score_wallet(w) for w in wallets], n)
+        batch_rate = _rate(lambda: model.score_batch(wallets), n)
+        print(f"{n_tx:>10} {pandas_rate:>11.0f} {single_rate:>17.0f} {batch_rate:>16.0f} "
+              f"{batch_rate / pandas_rate:>7.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+# benchmarks/bench_score_batch.py
+"""
+Wallets/second of DexScoringModel.score_batch vs a score_wallet loop.
+
+    python -m benchmarks.bench_score_batch [--tx 20]
+"""
+import argparse
+import time
+import warnings
+
+from app.models.dex_model import DexScoringModel
+from benchmarks.synthetic import make_wallets
+
+warnings.simplefilter("ignore")
+
+
+def _rate(fn, n_wallets: int, min_time: float = 0.5) -> float:
+    done, t0 = 0, time.perf_counter()
+    while True:
+        fn()
+        done += n_wallets
+        elapsed = time.perf_counter() - t0
+        if elapsed >= min_time:
+            return done / elapsed
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--tx", type=int, default=20, help="transactions per wallet")
+    args = ap.parse_args()
+
+    model = DexScoringModel()
+    print(f"{'batch':>8} {'score_wallet w/s':>18} {'score_batch w/s':>17} {'speedup':>8}")
+    for size in (1, 100, 10_000):
+        wallets = make_wallets(size, n_tx=args.tx)
+        loop = _rate(lambda: [model.score_wallet(w) for w in wallets], size)
+        batch = _rate(lambda: model.score_batch(wallets), size)
+        print(f"{size:>8} {loop:>18.0f} {batch:>17.0f} {batch / loop:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+# benchmarks/bench_stream_memory.py
+"""
+Peak RSS of scoring ONE large wallet, buffered vs streaming, on the HTTP path
+(POST /api/v1/score) and the Kafka path (KafkaScoringService._score_chunk).
+Every case runs in a fresh interpreter; the reported figure is the peak RSS growth over
+the process baseline measured after the payload bytes were loaded.
+
+    python -m benchmarks.bench_stream_memory [--tx 10000 100000 200000]
+"""
+import os
+import sys
+import json
+import argparse
+import resource
+import subprocess
+import tempfile
+
+from benchmarks.synthetic import make_wallets
+
+
+def _rss_mib() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # Linux: KiB
+
+
+def _child(path: str, body_file: str):
+    import warnings
+    from types import SimpleNamespace
+    warnings.simplefilter("ignore")
+
+    if path == "http":
+        from fastapi.testclient import TestClient
+        from app.main import app
+        client = TestClient(app)
+    else:
+        from app.services.kafka_service import KafkaScoringService
+        service = KafkaScoringService()
+    with open(body_file, "rb") as f:
+        body = f.read()
+    base = _rss_mib()
+
+    if path == "http":
+        def chunks():
+            for i in range(0, len(body), 1 << 16):
+                yield body[i:i + (1 << 16)]
+        resp = client.post("/api/v1/score", content=chunks(), headers={"content-length": str(len(body))})
+        ok = resp.status_code == 200
+    else:
+        out = service._score_chunk([SimpleNamespace(value=body)])
+        ok = b"zscore" in out[0][2]
+    print(json.dumps({"ok": ok, "peak_mib": _rss_mib() - base}))
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--tx", type=int, nargs="+", default=[10_000, 100_000, 200_000])
+    args = ap.parse_args()
+
+    print(f"{'path':>6} {'tx':>8} {'body MiB':>9} {'buffered MiB':>13} {'streaming MiB':>14}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n_tx in args.tx:
+            body_file = os.path.join(tmp, f"{n_tx}.json")
+            with open(body_file, "wb") as f:
+                f.write(json.dumps(make_wallets(1, n_tx=n_tx)[0]).encode())
+            size = os.path.getsize(body_file) / (1 << 20)
+            for path in ("http", "kafka"):
+                peaks = []
+                for min_bytes in ("0", "1"):  # 0 disables streaming, 1 streams everything
+                    env = dict(os.environ, STREAM_MIN_BYTES=min_bytes, RESULT_CACHE="off")
+                    res = json.loads(subprocess.run(
+                        [sys.executable, "-m", "benchmarks.bench_stream_memory", "--child", path, body_file],
+                        env=env, check=True, capture_output=True, text=True).stdout.strip().splitlines()[-1])
+                    assert res["ok"], (path, n_tx, min_bytes)
+                    peaks.append(res["peak_mib"])
+                print(f"{path:>6} {n_tx:>8} {size:>9.1f} {peaks[0]:>13.1f} {peaks[1]:>14.1f}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == "--child":
+        _child(sys.argv[2], sys.argv[3])
+    else:
+        main()
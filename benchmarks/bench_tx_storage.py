@@ -0,0 +1,72 @@
+# benchmarks/bench_tx_storage.py
+"""
+Pydantic WalletMessage vs array-backed CompactWallet (app.utils.compact) per payload size:
+bytes each decoded transaction keeps alive (tracemalloc, all wallets held at once),
+validation throughput from JSON bytes, and validation + scoring throughput one wallet
+at a time (score_wallet) and in batches (score_batch).
+
+    python -m benchmarks.bench_tx_storage [--tx 10 100 1000] [--total 50000] [--batch 64]
+"""
+import gc
+import json
+import time
+import argparse
+import tracemalloc
+import warnings
+
+from app.models.dex_model import DexScoringModel
+from app.utils.compact import parse_wallet_compact
+from app.utils.types import parse_wallet
+from benchmarks.synthetic import SYMBOLS, make_wallets
+
+warnings.simplefilter("ignore")
+
+PARSERS = {"pydantic": parse_wallet, "compact": parse_wallet_compact}
+
+
+def _retained_bytes(parse, payloads) -> int:
+    gc.collect()
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    held = [parse(p) for p in payloads]
+    size = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+    del held
+    return size
+
+
+def _rate(fn, n_tx: int, repeat: int = 3) -> float:
+    best = float("inf")
+    gc.collect()
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t)
+    return n_tx / best
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--tx", type=int, nargs="+", default=[10, 100, 1000], help="transactions per wallet")
+    ap.add_argument("--total", type=int, default=50_000, help="transactions per measurement")
+    ap.add_argument("--batch", type=int, default=64, help="wallets per score_batch call")
+    args = ap.parse_args()
+    model = DexScoringModel()
+
+    print(f"{'tx/wallet':>9} {'storage':>9} {'B/tx':>7} {'validate tx/s':>14} "
+          f"{'+score_wallet tx/s':>19} {'+score_batch tx/s':>18}")
+    for n_tx in args.tx:
+        n_wallets = max(1, args.total // n_tx)
+        payloads = [json.dumps(w).encode() for w in make_wallets(n_wallets, n_tx=n_tx, symbols=SYMBOLS[:4])]
+        total = n_wallets * n_tx
+        for name, parse in PARSERS.items():
+            per_tx = _retained_bytes(parse, payloads) / total
+            validate = _rate(lambda: [parse(p) and None for p in payloads], total)
+            single = _rate(lambda: [model.score_wallet(parse(p)) and None for p in payloads], total)
+            batched = _rate(lambda: [model.score_batch([parse(p) for p in payloads[i:i + args.batch]])
+                                     for i in range(0, n_wallets, args.batch)], total)
+            print(f"{n_tx:>9} {name:>9} {per_tx:>7.0f} {validate:>14,.0f} {single:>19,.0f} {batched:>18,.0f}")
+
+
+if __name__ == "__main__":
+    main()
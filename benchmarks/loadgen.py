@@ -0,0 +1,320 @@
+# benchmarks/loadgen.py
+"""
+Load generator for the scoring service: concurrent async clients against
+POST /api/v1/score or the Kafka input topic, reporting sustained throughput, error
+rates and p50/p99/p999 latency, checked against the challenge target
+(1000+ wallets/minute, < 2 s per wallet).
+
+    # closed loop: 32 clients, each sends its next wallet when the previous one returns
+    python -m benchmarks.loadgen --concurrency 32 --duration 30
+    # open loop: 50 wallets/s on a fixed schedule, whatever the response times
+    python -m benchmarks.loadgen --rate 50 --duration 60 --jsonl wallets.jsonl
+    # Kafka: produce to KAFKA_INPUT_TOPIC, time until the result shows up on the
+    # success/failure topic (matched by wallet address)
+    python -m benchmarks.loadgen --target kafka --rate 100 --duration 60
+    # the same Kafka pipeline in this process, against the in-process mock broker
+    python -m benchmarks.loadgen --target mock --concurrency 200 --duration 10
+
+Coordinated omission: a client that waits for a slow response also stops sending,
+so a stall is recorded as a single slow sample. In open-loop mode latency is
+measured from each request's scheduled send time, which counts the queueing a stall
+causes. In closed-loop mode --expected-interval-ms backfills the missing samples the
+way HdrHistogram's recordValueWithExpectedInterval does. Both the raw ("service") and
+the corrected ("response") histograms are reported.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import threading
+from collections import Counter, defaultdict, deque
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.utils.metrics import Histogram
+from benchmarks.synthetic import make_wallets
+
+QUANTILES = {0.5: "p50_ms", 0.99: "p99_ms", 0.999: "p999_ms"}
+TARGET_PER_MINUTE = 1000
+TARGET_LATENCY_S = 2.0
+
+
+def load_payloads(jsonl: Optional[str] = None, synthetic: int = 100, n_tx: int = 20,
+                  seed: int = 42) -> List[bytes]:
+    """Wallet messages to replay: the non-empty lines of `jsonl`, or synthetic wallets."""
+    if jsonl:
+        with open(jsonl, "rb") as f:
+            payloads = [line.strip() for line in f if line.strip()]
+        if not payloads:
+            raise ValueError(f"no wallet messages in {jsonl}")
+        return payloads
+    return [json.dumps(w).encode() for w in make_wallets(synthetic, n_tx=n_tx, seed=seed)]
+
+
+class LoadStats:
+    def __init__(self, expected_interval_ns: int = 0):
+        self.service = Histogram("service", "send -> response")
+        self.response = Histogram("response", "scheduled send -> response, corrected")
+        self.expected_interval_ns = expected_interval_ns
+        self.ok = 0
+        self.errors: Counter = Counter()
+        self.max_ns = 0
+
+    def record(self, ok: bool, reason: str, service_ns: int, response_ns: int):
+        if ok:
+            self.ok += 1
+        else:
+            self.errors[reason] += 1
+        self.service.record_ns(service_ns)
+        self.response.record_ns(response_ns)
+        self.max_ns = max(self.max_ns, response_ns)
+        # backfill the samples a closed-loop client did not send while it waited
+        step = self.expected_interval_ns
+        if step:
+            missed = response_ns - step
+            while missed >= step:
+                self.response.record_ns(missed)
+                missed -= step
+
+    def report(self, elapsed_s: float) -> Dict[str, Any]:
+        done = self.ok + sum(self.errors.values())
+        out: Dict[str, Any] = {
+            "elapsed_s": round(elapsed_s, 3), "completed": done, "ok": self.ok,
+            "errors": dict(self.errors), "error_rate": round(1 - self.ok / done, 5) if done else 0.0,
+            "throughput_per_s": round(self.ok / elapsed_s, 2) if elapsed_s else 0.0,
+        }
+        for name, hist in (("service", self.service), ("response", self.response)):
+            _, total, count = hist.snapshot()
+            qs = hist.quantiles(QUANTILES)
+            out[name] = {"mean_ms": round(total / count / 1e6, 3) if count else 0.0,
+                         **{QUANTILES[q]: round(ns / 1e6, 3) for q, ns in qs.items()}}
+        out["response"]["max_ms"] = round(self.max_ns / 1e6, 3)
+        out["meets_target"] = (out["throughput_per_s"] * 60 >= TARGET_PER_MINUTE
+                               and out["response"]["mean_ms"] < TARGET_LATENCY_S * 1000
+                               and out["error_rate"] == 0.0)
+        return out
+
+
+class HttpTarget:
+    """POST each payload to /api/v1/score; `client` may be any httpx.AsyncClient."""
+
+    def __init__(self, url: str = "http://127.0.0.1:8000", client=None, timeout_s: float = 30.0):
+        import httpx
+        self.client = client or httpx.AsyncClient(base_url=url, timeout=timeout_s,
+                                                  limits=httpx.Limits(max_connections=None))
+
+    async def send(self, payload: bytes) -> Tuple[bool, str]:
+        try:
+            resp = await self.client.post("/api/v1/score", content=payload,
+                                          headers={"content-type": "application/json"})
+        except Exception as e:
+            return False, type(e).__name__
+        return resp.status_code == 200, f"http_{resp.status_code}"
+
+    async def close(self):
+        await self.client.aclose()
+
+
+class KafkaTarget:
+    """
+    Produce each payload to the input topic and complete when a result with the same
+    wallet address (the record key) arrives on the success or failure topic. Replaying
+    one wallet several times is fine: results of a key are matched in send order.
+    `producer` / `consumer` may be injected (kafka-python interface).
+    """
+
+    def __init__(self, bootstrap: str, input_topic: str, success_topic: str, failure_topic: str,
+                 producer=None, consumer=None, timeout_s: float = 30.0):
+        if producer is None or consumer is None:
+            from kafka import KafkaConsumer, KafkaProducer
+            producer = producer or KafkaProducer(bootstrap_servers=bootstrap, linger_ms=5)
+            consumer = consumer or KafkaConsumer(success_topic, failure_topic, bootstrap_servers=bootstrap,
+                                                 group_id=None, auto_offset_reset="latest")
+        self.producer, self.consumer = producer, consumer
+        self.input_topic, self.success_topic = input_topic, success_topic
+        self.timeout_s = timeout_s
+        self._pending: Dict[str, deque] = defaultdict(deque)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._addresses: Dict[bytes, str] = {}
+
+    def _address(self, payload: bytes) -> str:
+        addr = self._addresses.get(payload)
+        if addr is None:
+            try:
+                addr = str(json.loads(payload).get("wallet_address", "unknown"))
+            except Exception:
+                addr = "unknown"
+            self._addresses[payload] = addr
+        return addr
+
+    async def send(self, payload: bytes) -> Tuple[bool, str]:
+        if self._thread is None:
+            self._loop = asyncio.get_running_loop()
+            # join the result topics at their current end before the first record goes out
+            while not self.consumer.assignment():
+                self.consumer.poll(timeout_ms=100)
+            self._thread = threading.Thread(target=self._consume, name="loadgen-results", daemon=True)
+            self._thread.start()
+        fut = self._loop.create_future()
+        waiters = self._pending[self._address(payload)]
+        with self._lock:
+            waiters.append(fut)
+        try:
+            self.producer.send(self.input_topic, value=payload)
+            return await asyncio.wait_for(asyncio.shield(fut), self.timeout_s)
+        except Exception as e:
+            with self._lock:
+                if fut in waiters:
+                    waiters.remove(fut)
+            return False, "timeout" if isinstance(e, asyncio.TimeoutError) else type(e).__name__
+
+    def _consume(self):
+        while not self._stop.is_set():
+            for recs in self.consumer.poll(timeout_ms=100).values():
+                for r in recs:
+                    key = r.key.decode() if isinstance(r.key, bytes) else str(r.key)
+                    with self._lock:
+                        waiters = self._pending.get(key)
+                        fut = waiters.popleft() if waiters else None
+                    if fut is not None:
+                        ok = r.topic == self.success_topic
+                        self._loop.call_soon_threadsafe(_resolve, fut, (ok, "ok" if ok else "failure_topic"))
+
+    async def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self.producer.flush()
+
+
+def _resolve(fut: asyncio.Future, value):
+    if not fut.done():
+        fut.set_result(value)
+
+
+async def _timed(target, payload: bytes, scheduled_ns: int, stats: LoadStats):
+    sent = time.perf_counter_ns()
+    ok, reason = await target.send(payload)
+    done = time.perf_counter_ns()
+    stats.record(ok, reason, done - sent, done - scheduled_ns)
+
+
+async def _limited(slots: asyncio.Semaphore, *args):
+    async with slots:
+        await _timed(*args)
+
+
+async def run_closed(target, payloads: List[bytes], concurrency: int, duration_s: float,
+                     max_requests: int = 0, expected_interval_ms: float = 0.0) -> Dict[str, Any]:
+    stats = LoadStats(int(expected_interval_ms * 1e6))
+    t0 = time.perf_counter()
+    deadline = t0 + duration_s
+    issued = 0
+
+    async def client():
+        nonlocal issued
+        while time.perf_counter() < deadline and (not max_requests or issued < max_requests):
+            payload = payloads[issued % len(payloads)]
+            issued += 1
+            await _timed(target, payload, time.perf_counter_ns(), stats)
+
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return stats.report(time.perf_counter() - t0)
+
+
+async def run_open(target, payloads: List[bytes], rate: float, duration_s: float, max_inflight: int,
+                   max_requests: int = 0) -> Dict[str, Any]:
+    stats = LoadStats()
+    slots = asyncio.Semaphore(max_inflight)
+    interval_ns = int(1e9 / rate)
+    n = int(rate * duration_s)
+    if max_requests:
+        n = min(n, max_requests)
+    start = time.perf_counter_ns()
+    tasks = []
+    for i in range(n):
+        scheduled = start + i * interval_ns
+        delay = (scheduled - time.perf_counter_ns()) / 1e9
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.ensure_future(_limited(slots, target, payloads[i % len(payloads)], scheduled, stats)))
+    await asyncio.gather(*tasks)
+    return stats.report((time.perf_counter_ns() - start) / 1e9)
+
+
+def format_report(r: Dict[str, Any]) -> str:
+    lines = [f"completed {r['completed']} in {r['elapsed_s']:.1f} s: {r['throughput_per_s']:.1f} ok/s "
+             f"({r['throughput_per_s'] * 60:.0f}/min), error rate {r['error_rate']:.2%} {r['errors'] or ''}"]
+    for name in ("service", "response"):
+        h = r[name]
+        lines.append(f"{name:>9} latency ms: mean {h['mean_ms']:.1f}  p50 {h['p50_ms']:.1f}  "
+                     f"p99 {h['p99_ms']:.1f}  p999 {h['p999_ms']:.1f}")
+    lines.append(f"target ({TARGET_PER_MINUTE}+ wallets/min, < {TARGET_LATENCY_S:g} s per wallet, no errors): "
+                 f"{'PASS' if r['meets_target'] else 'FAIL'}")
+    return "\n".join(lines)
+
+
+async def _main(args) -> Dict[str, Any]:
+    payloads = load_payloads(args.jsonl, args.wallets, args.tx, args.seed)
+    service = None
+    if args.target == "kafka":
+        from app.services import kafka_service as ks
+        target = KafkaTarget(args.bootstrap or ks.KAFKA_BOOTSTRAP_SERVERS, ks.KAFKA_INPUT_TOPIC,
+                             ks.KAFKA_SUCCESS_TOPIC, ks.KAFKA_FAILURE_TOPIC)
+    elif args.target == "mock":
+        # the real Kafka pipeline in this process, against the in-process broker
+        from app.services import kafka_service as ks
+        from app.services.mock_broker import MockBroker
+        broker = MockBroker()
+        service = ks.KafkaScoringService(broker=broker)
+        service.start()
+        target = KafkaTarget("", ks.KAFKA_INPUT_TOPIC, ks.KAFKA_SUCCESS_TOPIC, ks.KAFKA_FAILURE_TOPIC,
+                             producer=broker.producer(),
+                             consumer=broker.consumer(ks.KAFKA_SUCCESS_TOPIC, ks.KAFKA_FAILURE_TOPIC,
+                                                      auto_offset_reset="latest"))
+    else:
+        target = HttpTarget(args.url)
+    try:
+        if args.rate:
+            return await run_open(target, payloads, args.rate, args.duration, args.concurrency, args.requests)
+        return await run_closed(target, payloads, args.concurrency, args.duration, args.requests,
+                                args.expected_interval_ms)
+    finally:
+        await target.close()
+        if service is not None:
+            service.stop()
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m benchmarks.loadgen")
+    ap.add_argument("--target", choices=("http", "kafka", "mock"), default="http",
+                    help="mock: the Kafka pipeline in-process against the mock broker")
+    ap.add_argument("--url", default=os.getenv("LOADGEN_URL", "http://127.0.0.1:8000"))
+    ap.add_argument("--bootstrap", help="Kafka bootstrap servers (default: KAFKA_BOOTSTRAP_SERVERS)")
+    ap.add_argument("--rate", type=float, default=0.0, help="open loop at this many wallets/s (0: closed loop)")
+    ap.add_argument("--concurrency", type=int, default=32, help="clients (closed) or max in flight (open)")
+    ap.add_argument("--duration", type=float, default=30.0, help="seconds")
+    ap.add_argument("--requests", type=int, default=0, help="stop after this many wallets (0: no limit)")
+    ap.add_argument("--expected-interval-ms", type=float, default=0.0,
+                    help="closed loop: correct for coordinated omission at this send interval")
+    ap.add_argument("--jsonl", help="replay wallet messages from this file, one per line")
+    ap.add_argument("--wallets", type=int, default=100, help="synthetic wallets to cycle through")
+    ap.add_argument("--tx", type=int, default=20, help="transactions per synthetic wallet")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--json", help="also write the report as JSON here")
+    args = ap.parse_args(argv)
+
+    report = asyncio.run(_main(args))
+    print(format_report(report))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0 if report["meets_target"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,36 @@
+# benchmarks/notebook_reference.py
+"""
+Loads the reference pandas pipeline straight from dex_scoring_model.ipynb (function
+definitions only, without the demo code of each cell) for parity tests and benchmarks.
+"""
+import json
+import os
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+NOTEBOOK = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "dex_scoring_model.ipynb")
+
+
+def load_notebook(now: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Namespace holding the notebook functions (process_wallet_complete, ...). With `now`,
+    datetime.now() inside them returns that fixed time.
+    """
+    with open(NOTEBOOK, encoding="utf-8") as f:
+        cells = [c for c in json.load(f)["cells"] if c["cell_type"] == "code"]
+    ns: Dict[str, Any] = {}
+    for cell in cells:
+        src = "".join(cell["source"])
+        if "def " in src:
+            src = src.split("\n# Test")[0]
+        else:
+            src = "\n".join(line for line in src.splitlines() if not line.startswith("print("))
+        exec(compile(src, NOTEBOOK, "exec"), ns)
+
+    if now is not None:
+        class _FixedDatetime(datetime):
+            @classmethod
+            def now(cls, tz=None):
+                return datetime.fromtimestamp(now, tz)
+        ns["datetime"] = _FixedDatetime
+    return ns
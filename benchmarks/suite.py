@@ -0,0 +1,185 @@
+# benchmarks/suite.py
+"""
+Benchmark suite with a JSON baseline and a regression check.
+
+Every case runs over seeded synthetic wallets of three shapes (PROFILES) and records
+throughput plus p50/p99 latency per call:
+
+    validate      raw JSON bytes -> WalletMessage (parse_wallet)
+    features      DexScoringModel._extract_features over each protocol block
+    score_wallet  DexScoringModel.score_wallet on a validated WalletMessage
+    serialize     encode_result of a SuccessMessage (the HTTP body / Kafka value bytes)
+    http          POST /api/v1/score through the in-process ASGI test client
+
+    python -m benchmarks.suite run --out baseline.json          # record a baseline
+    python -m benchmarks.suite compare baseline.json            # rerun, exit 1 on regression
+    python -m benchmarks.suite compare baseline.json --current other.json
+
+A case regresses when its throughput drops by more than --tolerance (default 10%) or
+its p99 grows by more than --p99-tolerance (default 25%). Baselines are only
+comparable on the same machine; the JSON records where it was taken.
+"""
+import gc
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import subprocess
+import warnings
+from time import perf_counter_ns
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from benchmarks.synthetic import make_wallets
+
+warnings.simplefilter("ignore")
+
+SEED = 42
+WALLETS_PER_PROFILE = 16
+# name -> make_wallets keyword arguments
+PROFILES: Dict[str, Dict[str, Any]] = {
+    "small": {"n_tx": 10, "n_pools": 2},
+    "typical": {"n_tx": 200, "n_pools": 8, "symbols": ("USDC", "WETH", "DAI", "UNI")},
+    "whale": {"n_tx": 5000, "n_pools": 40, "action_mix": (0.8, 0.1, 0.1), "spread_days": 365},
+}
+CASES = ("validate", "features", "score_wallet", "serialize", "http")
+
+
+def _cases(profile: Dict[str, Any]) -> Dict[str, Callable[[int], Any]]:
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+    from app.models.dex_model import DexScoringModel
+    from app.utils.encoding import encode_result
+    from app.utils.types import parse_wallet
+
+    raws = make_wallets(WALLETS_PER_PROFILE, seed=SEED, **profile)
+    bodies = [json.dumps(w).encode() for w in raws]
+    wallets = [parse_wallet(b) for b in bodies]
+    model = DexScoringModel()
+    results = [model.score_wallet(w) for w in wallets]
+    client = TestClient(app)
+    n = len(raws)
+
+    def http(i):
+        resp = client.post("/api/v1/score", content=bodies[i % n])
+        assert resp.status_code == 200, resp.text
+
+    return {
+        "validate": lambda i: parse_wallet(bodies[i % n]),
+        "features": lambda i: [model._extract_features(block) for block in wallets[i % n].data],
+        "score_wallet": lambda i: model.score_wallet(wallets[i % n]),
+        "serialize": lambda i: encode_result(results[i % n]),
+        "http": http,
+    }
+
+
+def measure(fn: Callable[[int], Any], min_time: float, min_calls: int = 20, warmup: int = 3) -> Dict[str, float]:
+    gc.collect()  # garbage of the previous case is not charged to this one
+    for i in range(warmup):
+        fn(i)
+    times: List[int] = []
+    deadline = time.perf_counter() + min_time
+    i = 0
+    while len(times) < min_calls or time.perf_counter() < deadline:
+        t = perf_counter_ns()
+        fn(i)
+        times.append(perf_counter_ns() - t)
+        i += 1
+    ns = np.asarray(times, dtype=np.float64)
+    return {"calls": len(times), "ops_per_s": round(len(times) / (ns.sum() / 1e9), 2),
+            "p50_us": round(float(np.percentile(ns, 50)) / 1e3, 3),
+            "p99_us": round(float(np.percentile(ns, 99)) / 1e3, 3)}
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except Exception:
+        return None
+
+
+def run(min_time: float = 1.0, cases=CASES, profiles=tuple(PROFILES)) -> Dict[str, Any]:
+    results: Dict[str, Dict[str, float]] = {}
+    for name in profiles:
+        fns = _cases(PROFILES[name])
+        for case in cases:
+            key = f"{case}/{name}"
+            results[key] = measure(fns[case], min_time)
+            r = results[key]
+            print(f"{key:<24} {r['ops_per_s']:>12.1f}/s  p50 {r['p50_us']:>10.1f} us  p99 {r['p99_us']:>10.1f} us",
+                  file=sys.stderr)
+    return {
+        "meta": {"created": int(time.time()), "commit": _git_commit(), "python": platform.python_version(),
+                 "numpy": np.__version__, "machine": platform.machine(), "node": platform.node(),
+                 "cpu_count": os.cpu_count(), "seed": SEED, "min_time_s": min_time,
+                 "profiles": {k: {kk: list(v) if isinstance(v, tuple) else v for kk, v in p.items()}
+                              for k, p in PROFILES.items() if k in profiles}},
+        "results": results,
+    }
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], tolerance: float = 0.10,
+            p99_tolerance: float = 0.25) -> List[str]:
+    """Regression messages, one per failing metric of the cases present in both runs."""
+    regressions = []
+    for key, base in sorted(baseline["results"].items()):
+        cur = current["results"].get(key)
+        if cur is None:
+            continue
+        if cur["ops_per_s"] < base["ops_per_s"] * (1 - tolerance):
+            regressions.append(f"{key}: throughput {cur['ops_per_s']:.1f}/s vs {base['ops_per_s']:.1f}/s "
+                               f"({cur['ops_per_s'] / base['ops_per_s'] - 1:+.1%})")
+        if cur["p99_us"] > base["p99_us"] * (1 + p99_tolerance):
+            regressions.append(f"{key}: p99 {cur['p99_us']:.1f} us vs {base['p99_us']:.1f} us "
+                               f"({cur['p99_us'] / base['p99_us'] - 1:+.1%})")
+    return regressions
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m benchmarks.suite")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    for name in ("run", "compare"):
+        p = sub.add_parser(name)
+        p.add_argument("--min-time", type=float, default=1.0, help="seconds per case")
+        p.add_argument("--cases", default=",".join(CASES))
+        p.add_argument("--profiles", default=",".join(PROFILES))
+    sub.choices["run"].add_argument("--out", help="write results here (default: stdout)")
+    cmp = sub.choices["compare"]
+    cmp.add_argument("baseline")
+    cmp.add_argument("--current", help="results file to check instead of running now")
+    cmp.add_argument("--tolerance", type=float, default=0.10, help="allowed throughput drop")
+    cmp.add_argument("--p99-tolerance", type=float, default=0.25, help="allowed p99 growth")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "compare" and args.current:
+        with open(args.current) as f:
+            current = json.load(f)
+    else:
+        current = run(args.min_time, args.cases.split(","), args.profiles.split(","))
+
+    if args.cmd == "run":
+        text = json.dumps(current, indent=2)
+        if args.out:
+            with open(args.out, "w") as f:
+                f.write(text + "\n")
+        else:
+            print(text)
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(baseline, current, args.tolerance, args.p99_tolerance)
+    for line in regressions:
+        print("REGRESSION", line)
+    if not regressions:
+        print(f"no regressions across {len(current['results'])} cases")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
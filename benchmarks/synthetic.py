@@ -0,0 +1,47 @@
+# benchmarks/synthetic.py
+"""
+Seeded synthetic wallet generator used by the benchmarks and parity tests.
+"""
+import random
+from typing import Dict, Any, List, Optional, Sequence
+
+ACTIONS = ("swap", "deposit", "withdraw")
+SYMBOLS = ("USDC", "USDT", "DAI", "WETH", "WBTC", "UNI", "LINK", "AAVE", "CRV", "MKR", "SNX")
+
+
+def make_wallet(rng: random.Random, n_tx: int, n_pools: int = 5,
+                symbols: Sequence[str] = ("USDC",), action_mix: Optional[Sequence[float]] = None,
+                spread_days: float = 30) -> Dict[str, Any]:
+    """
+    `action_mix` weights ACTIONS (swap, deposit, withdraw), uniform by default;
+    timestamps fall within `spread_days` of a random start.
+    """
+    addr = "0x%040x" % rng.getrandbits(160)
+    pools = ["0x%040x" % rng.getrandbits(160) for _ in range(n_pools)]
+    ts0 = 1_600_000_000 + rng.randrange(0, 100_000_000)
+    spread = max(1, int(spread_days * 86400))
+    txs: List[Dict[str, Any]] = []
+    for i in range(n_tx):
+        action = rng.choice(ACTIONS) if action_mix is None else rng.choices(ACTIONS, action_mix)[0]
+        tx: Dict[str, Any] = {
+            "document_id": "%024x" % rng.getrandbits(96),
+            "action": action,
+            "timestamp": ts0 + rng.randrange(0, spread),
+            "caller": addr,
+            "protocol": "uniswap_v3",
+            "poolId": rng.choice(pools),
+            "poolName": "Synthetic Pool",
+        }
+        legs = ("tokenIn", "tokenOut") if action == "swap" else ("token0", "token1")
+        for leg in legs:
+            symbol = symbols[0] if len(symbols) == 1 else rng.choice(symbols)
+            tx[leg] = {"amountUSD": round(rng.uniform(0, 5000), 2), "symbol": symbol}
+        txs.append(tx)
+    return {"wallet_address": addr, "data": [{"protocolType": "dexes", "transactions": txs}]}
+
+
+def make_wallets(n_wallets: int, n_tx: int = 20, seed: int = 42, n_pools: int = 5,
+                 symbols: Sequence[str] = ("USDC",), action_mix: Optional[Sequence[float]] = None,
+                 spread_days: float = 30) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    return [make_wallet(rng, n_tx, n_pools, symbols, action_mix, spread_days) for _ in range(n_wallets)]
@@ -0,0 +1,7 @@
+# tests/conftest.py
+# fields of a result that differ between two scorings of the same wallet
+VOLATILE = ("timestamp", "processing_time_ms")
+
+
+def strip(result):
+    return {k: v for k, v in result.items() if k not in VOLATILE}
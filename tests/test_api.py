@@ -0,0 +1,68 @@
+# tests/test_api.py
+import json
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services.executor import get_model
+from app.utils.types import WalletMessage
+from benchmarks.synthetic import make_wallets
+from conftest import strip
+
+model = get_model()
+
+
+def test_score_accepts_prevalidated_message():
+    raw = make_wallets(1, n_tx=25)[0]
+    assert strip(model.score_wallet(WalletMessage(**raw))) == strip(model.score_wallet(raw))
+
+
+def test_score_endpoint_returns_success_message():
+    raw = make_wallets(1, n_tx=25)[0]
+    resp = TestClient(app).post("/api/v1/score", json=raw)
+    assert resp.status_code == 200
+    assert strip(resp.json()) == strip(model.score_wallet(raw))
+
+
+def test_batch_endpoint_streams_results_and_failures():
+    wallets = make_wallets(5, n_tx=10)
+    lines = [json.dumps(w) for w in wallets]
+    lines.insert(2, "{not json")
+    lines.insert(4, json.dumps({"wallet_address": "0xbad", "data": "nope"}))
+    array_body = "[" + ",".join(json.dumps(w) for w in wallets) + "]"
+    client = TestClient(app)
+
+    for body, n_failures in (("\n".join(lines), 2), (array_body, 0)):
+        resp = client.post("/api/v1/score/batch", content=body)
+        assert resp.status_code == 200
+        out = [json.loads(line) for line in resp.text.splitlines()]
+        assert len(out) == len(wallets) + n_failures
+        ok = [r for r in out if "zscore" in r]
+        assert [strip(r) for r in ok] == [strip(model.score_wallet(w)) for w in wallets]
+
+    failures = [json.loads(line) for line in client.post(
+        "/api/v1/score/batch", content="\n".join(lines)).text.splitlines() if "error" in line]
+    assert [r["wallet_address"] for r in failures] == ["unknown", "0xbad"]
+
+
+def test_score_invalid_body_gets_fastapis_validation_errors():
+    typed = FastAPI()
+
+    @typed.post("/score")
+    def typed_score(payload: WalletMessage):
+        return {}
+
+    bodies = [b"{", b"", b"[]", b'{"wallet_address": 1, "data": []}', b'{"wallet_address": "0xa"}',
+              b'{"wallet_address": "0xa", "data": [{"protocolType": "dexes", "transactions": [{"action": 1}]}]}']
+    client, reference = TestClient(app), TestClient(typed)
+    for body in bodies:
+        headers = {"content-type": "application/json"}
+        got = client.post("/api/v1/score", content=body, headers=headers)
+        want = reference.post("/score", content=body, headers=headers)
+        assert got.status_code == want.status_code == 422
+        assert got.json() == want.json()
+
+    request_body = app.openapi()["paths"]["/api/v1/score"]["post"]["requestBody"]
+    assert request_body["content"]["application/json"]["schema"] == {"$ref": "#/components/schemas/WalletMessage"}
+    assert "WalletMessage" in app.openapi()["components"]["schemas"]
@@ -0,0 +1,131 @@
+# tests/test_arrow_ingest.py
+import copy
+import itertools
+import json
+
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+import pyarrow.parquet as pq  # noqa: E402
+
+from app import batch  # noqa: E402
+from app.models.arrow_ingest import read_table, score_file, score_table  # noqa: E402
+from app.models.categories import enabled_scorers  # noqa: E402
+from app.models.dex_model import DexScoringModel  # noqa: E402
+from benchmarks.synthetic import make_wallets  # noqa: E402
+from conftest import strip  # noqa: E402
+
+LEGS = ("tokenIn", "tokenOut", "token0", "token1")
+
+
+def _wallets():
+    wallets = make_wallets(40, n_tx=30, seed=21, n_pools=4)
+    for w in wallets[:10]:
+        txs = w["data"][0]["transactions"]
+        txs += copy.deepcopy(txs[:5])  # replayed ids count once
+        txs[2]["poolId"] = None
+        txs[3]["token0" if txs[3]["action"] != "swap" else "tokenIn"] = None
+        txs[4]["action"] = "Deposit"
+        txs[6]["action"] = "borrow"
+    return wallets
+
+
+def _table(wallets, protocol_types=False, blocks=1):
+    # wallets interleaved row by row: grouping must not rely on the file being sorted
+    rows = [dict(t, wallet_address=w["wallet_address"], protocolType=b["protocolType"])
+            for w in wallets for b in w["data"][:blocks] for t in b["transactions"]]
+    per_wallet = [[r for r in rows if r["wallet_address"] == w["wallet_address"]] for w in wallets]
+    rows = [r for group in itertools.zip_longest(*per_wallet) for r in group if r is not None]
+    cols = {name: [r.get(name) for r in rows] for name in
+            ("wallet_address", "action", "timestamp", "poolId", "document_id")}
+    for leg in LEGS:
+        cols[f"{leg}.amountUSD"] = [(r.get(leg) or {}).get("amountUSD") for r in rows]
+    if protocol_types:
+        cols["protocolType"] = ["DEXES"] * len(rows) if blocks == 1 else [r["protocolType"] for r in rows]
+    return pa.table(cols)
+
+
+def _expected(wallets, model):
+    # the JSON path sees each wallet's transactions in the (interleaved) file order, which
+    # per wallet is the original order
+    return [strip(model.score_wallet(w)) for w in wallets]
+
+
+@pytest.mark.parametrize("model", [DexScoringModel(), DexScoringModel(dedup_tx=False)])
+def test_table_scores_like_json(model):
+    wallets = _wallets()
+    expected = _expected(wallets, model)
+    assert [strip(r) for r in score_table(model, _table(wallets))] == expected
+    assert [strip(r) for r in score_table(model, _table(wallets, protocol_types=True))] == expected
+
+
+def test_parquet_and_arrow_files(tmp_path):
+    wallets = _wallets()
+    table = _table(wallets).append_column("caller", pa.array(["x"] * _table(wallets).num_rows))
+    pq.write_table(table, tmp_path / "tx.parquet", row_group_size=100)
+    with pa.OSFile(str(tmp_path / "tx.arrow"), "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        for batch in table.to_batches(max_chunksize=128):
+            writer.write_batch(batch)
+    model = DexScoringModel()
+    expected = _expected(wallets, model)
+    for name in ("tx.parquet", "tx.arrow"):
+        assert "caller" not in read_table(str(tmp_path / name)).column_names
+        assert [strip(r) for r in score_file(model, str(tmp_path / name))] == expected
+
+
+def test_batch_cli_reads_parquet(tmp_path):
+    wallets = _wallets()
+    pq.write_table(_table(wallets), tmp_path / "tx.parquet")
+    out = tmp_path / "out"
+    assert batch.main([str(tmp_path / "tx.parquet"), "--out", str(out), "--workers", "4"]) == 0
+    lines = (out / "part-00000.success.jsonl").read_text().splitlines()
+    assert [strip(json.loads(line)) for line in lines] == _expected(wallets, DexScoringModel())
+
+
+def test_category_blocks_score_like_json():
+    model = DexScoringModel(scorers=enabled_scorers("lending,staking"))
+    wallets = _wallets()
+    for i, w in enumerate(wallets):
+        txs = copy.deepcopy(w["data"][0]["transactions"][:12])
+        for j, t in enumerate(txs):
+            t["action"] = ("deposit", "borrow", "repay", "stake", "unstake")[(i + j) % 5]
+        lending = {"protocolType": "Lending", "transactions": txs[:6]}
+        staking = {"protocolType": "staking", "transactions": txs[6:]}
+        # one wallet's blocks in another order, one with no dexes rows at all
+        w["data"] = [staking, lending, w["data"][0]] if i == 3 else [lending] if i == 4 \
+            else [w["data"][0], lending, staking]
+    table = _table(wallets, protocol_types=True, blocks=3)
+    assert [strip(r) for r in score_table(model, table)] == _expected(wallets, model)
+    assert [strip(r) for r in score_table(DexScoringModel(scorers={}), table)] == \
+        _expected(wallets, DexScoringModel(scorers={}))
+
+
+def test_other_protocols_and_bad_tables():
+    model = DexScoringModel()
+    table = pa.table({"wallet_address": ["a", "a", "b"], "action": ["swap", "swap", "deposit"],
+                      "timestamp": pa.array([1, 2, 3], pa.timestamp("ms")),
+                      "protocolType": ["dexes", "lending", "lending"],
+                      "tokenIn.amountUSD": [10.0, 20.0, None]})
+    a, b = score_table(model, table)
+    assert a["categories"][0]["features"]["total_swap_volume"] == 10.0 and b["categories"] == []
+    with pytest.raises(ValueError, match="missing column 'action'"):
+        score_table(model, table.drop_columns(["action"]))
+    with pytest.raises(ValueError, match="has nulls"):
+        score_table(model, table.set_column(0, "wallet_address", pa.array(["a", None, "b"])))
+
+
+def test_notebook_model_is_refused_up_front(tmp_path, monkeypatch, capsys):
+    from app.models.notebook_model import NotebookScoringModel
+    from app.services import executor
+
+    wallets = _wallets()
+    with pytest.raises(ValueError, match="use SCORING_MODEL=dex"):
+        score_table(NotebookScoringModel(), _table(wallets))
+    with pytest.raises(ValueError, match="use SCORING_MODEL=dex"):
+        NotebookScoringModel().score_columns(None, [])
+    pq.write_table(_table(wallets), tmp_path / "tx.parquet")
+    monkeypatch.setattr(executor, "SCORING_MODEL", "notebook")
+    with pytest.raises(SystemExit):
+        batch.main([str(tmp_path / "tx.parquet"), "--out", str(tmp_path / "out")])
+    assert "cannot score Arrow/Parquet tables" in capsys.readouterr().err
+    assert not (tmp_path / "out").exists()
@@ -0,0 +1,90 @@
+# tests/test_batch.py
+import gzip
+import json
+import os
+
+import pytest
+
+from app import batch
+from app.models.dex_model import DexScoringModel
+from benchmarks.synthetic import make_wallets
+from conftest import strip
+
+
+def _dump(path, wallets):
+    with open(path, "w") as f:
+        for i, w in enumerate(wallets):
+            f.write(json.dumps(w) + "\n")
+            if i % 40 == 0:
+                f.write("{not json\n\n")
+
+
+def _read(out, kind, compress):
+    rows = []
+    for name in sorted(os.listdir(out)):
+        if name.startswith("part-") and f".{kind}." in name:
+            opener = gzip.open if compress == "gzip" else open
+            with opener(os.path.join(out, name), "rb") as f:
+                rows += [json.loads(line) for line in f]
+    return rows
+
+
+def test_chunk_ranges_end_on_line_boundaries(tmp_path):
+    path = tmp_path / "in.jsonl"
+    path.write_bytes(b"a\nbbbbbbb\n\ncc\nd")
+    for chunk in (1, 3, 8, 100):
+        ranges = batch.chunk_ranges(str(path), chunk)
+        assert ranges[0][0] == 0 and ranges[-1][1] == 15
+        assert all(a[1] == b[0] for a, b in zip(ranges, ranges[1:]))
+        assert all(path.read_bytes()[e - 1:e] == b"\n" for _, e in ranges[:-1])
+    path.write_bytes(b"")
+    assert batch.chunk_ranges(str(path), 10) == []
+
+
+@pytest.mark.parametrize("workers,compress", [(1, "none"), (2, "gzip")])
+def test_batch_scores_every_line_in_order(tmp_path, workers, compress):
+    wallets = make_wallets(150, n_tx=8, seed=11)
+    _dump(tmp_path / "in.jsonl", wallets)
+    out = str(tmp_path / "out")
+    assert batch.main([str(tmp_path / "in.jsonl"), "--out", out, "--workers", str(workers),
+                       "--chunk-mb", "0.01", "--compress", compress, "--batch-size", "16"]) == 0
+    model = DexScoringModel()
+    assert [strip(r) for r in _read(out, "success", compress)] == [strip(model.score_wallet(w)) for w in wallets]
+    failures = _read(out, "failure", compress)
+    assert len(failures) == 4 and all("Invalid JSON" in f["error"] for f in failures)
+
+
+def test_interrupted_run_resumes(tmp_path, monkeypatch):
+    wallets = make_wallets(120, n_tx=5, seed=12)
+    _dump(tmp_path / "in.jsonl", wallets)
+    args = [str(tmp_path / "in.jsonl"), "--out", str(tmp_path / "out"), "--workers", "1", "--chunk-mb", "0.005"]
+    n_chunks = len(batch.chunk_ranges(str(tmp_path / "in.jsonl"), int(0.005 * 2 ** 20)))
+    assert n_chunks > 3
+
+    real = batch.score_range
+    scored = []
+    crash = [True]
+
+    def flaky(path, index, *rest):
+        if index == 2 and crash:
+            crash.clear()
+            scored.append("crashed")
+            raise KeyboardInterrupt
+        scored.append(index)
+        return real(path, index, *rest)
+
+    monkeypatch.setattr(batch, "score_range", flaky)
+    assert batch.main(args) == 130
+    assert scored == [0, 1, "crashed"]
+    with open(tmp_path / "out" / batch.CHECKPOINT_NAME, "ab") as f:
+        f.write(b'{"chunk": 2, "by')  # torn by the kill
+    assert batch.main(args) == 0
+    assert scored[3:] == list(range(2, n_chunks))
+    assert [r["wallet_address"] for r in _read(str(tmp_path / "out"), "success", "none")] == \
+        [w["wallet_address"] for w in wallets]
+
+    with pytest.raises(SystemExit):
+        batch.main(args[:-1] + ["0.01"])  # other chunking, same output directory
+    scored.clear()
+    assert batch.main(args[:-1] + ["0.01", "--restart"]) == 0
+    assert scored == list(range(len(batch.chunk_ranges(str(tmp_path / "in.jsonl"), int(0.01 * 2 ** 20)))))
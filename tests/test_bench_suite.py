@@ -0,0 +1,28 @@
+# tests/test_bench_suite.py
+from benchmarks.suite import compare, measure
+from benchmarks.synthetic import make_wallets
+
+
+def _run(ops, p99):
+    return {"results": {"score_wallet/small": {"ops_per_s": ops, "p50_us": 1.0, "p99_us": p99}}}
+
+
+def test_compare_flags_throughput_and_p99_regressions():
+    base = _run(1000.0, 100.0)
+    assert compare(base, _run(950.0, 110.0)) == []
+    assert [r.split(":")[1].split()[0] for r in compare(base, _run(800.0, 200.0))] == ["throughput", "p99"]
+    assert compare(base, {"results": {}}) == []
+
+
+def test_measure_reports_rate_and_percentiles():
+    r = measure(lambda i: sum(range(100)), min_time=0.01, min_calls=50)
+    assert r["calls"] >= 50 and r["ops_per_s"] > 0 and r["p99_us"] >= r["p50_us"] > 0
+
+
+def test_generator_controls_action_mix_and_spread():
+    w = make_wallets(1, n_tx=500, action_mix=(1, 0, 0), spread_days=1)[0]
+    txs = w["data"][0]["transactions"]
+    assert {t["action"] for t in txs} == {"swap"}
+    ts = [t["timestamp"] for t in txs]
+    assert max(ts) - min(ts) < 86400
+    assert make_wallets(2, seed=7) == make_wallets(2, seed=7)
@@ -0,0 +1,78 @@
+# tests/test_cache.py
+import json
+
+from app.services.cache import ResultCache, SqliteResultCache, payload_key
+from app.services.executor import ScoringExecutor, OK
+from benchmarks.synthetic import make_wallets
+from conftest import strip
+
+
+def test_payload_key_hashes_the_bytes_and_version():
+    raw = json.dumps(make_wallets(1, n_tx=3)[0]).encode()
+    assert payload_key(raw, "v1") == payload_key(bytes(raw), "v1")
+    assert payload_key(raw, "v1") != payload_key(raw, "v2")
+    assert payload_key(raw, "v1") != payload_key(raw + b" ", "v1")
+
+
+def test_lru_and_ttl():
+    cache = ResultCache(max_entries=2, ttl_s=60)
+    cache.put("a", {"v": 1})
+    cache.put("b", {"v": 2})
+    assert cache.get("a") == {"v": 1}
+    cache.put("c", {"v": 3})  # evicts "b", the least recently used
+    assert cache.get("b") is None
+    expired = ResultCache(ttl_s=-1)
+    expired.put("a", {"v": 1})
+    assert expired.get("a") is None
+    s = cache.stats()
+    assert (s["hits"], s["misses"], s["evictions"]) == (1, 1, 1)
+    assert expired.stats()["expired"] == 1
+
+
+def test_executor_serves_repeats_from_cache():
+    payload = json.dumps(make_wallets(1, n_tx=10)[0]).encode()
+    ex = ScoringExecutor(mode="thread", cache=ResultCache())
+    (s1, first), = ex.score([payload])
+    (s2, again), = ex.score([payload])
+    assert s1 == s2 == OK
+    assert strip(first) == strip(again)
+    assert ex.cache.stats()["hits"] == 1
+
+
+def test_sqlite_cache_is_shared(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    a, b = SqliteResultCache(path, max_entries=2), SqliteResultCache(path, max_entries=2)
+    a.put("k", {"zscore": "1.0"})
+    assert b.get("k") == {"zscore": "1.0"}
+    a.put("k2", {})
+    a.put("k3", {})
+    assert b.stats()["size"] == 2
+
+
+def test_key_changes_with_the_model_and_config():
+    from app.models.categories import enabled_scorers
+    from app.models.dex_model import DexScoringModel
+    from app.services.config_store import ConfigStore
+
+    class Source:
+        caps = 1000.0
+
+        def load(self):
+            return [{"protocolType": "dexes", "metric": "total_deposit_usd",
+                     "percentiles": {"50": self.caps / 2, "90": self.caps}}], []
+
+    source = Source()
+    store = ConfigStore(source)
+    store.refresh()
+    payload = json.dumps(make_wallets(1, n_tx=3)[0]).encode()
+    keys = {payload_key(payload, m.version_key()) for m in (
+        DexScoringModel(scorers={}), DexScoringModel(scorers=enabled_scorers("lending")),
+        DexScoringModel(scorers={}, dedup_tx=False), DexScoringModel(store, scorers={}))}
+    # a restart that loads the same documents keeps the key
+    restarted = ConfigStore(source)
+    restarted.refresh()
+    assert DexScoringModel(restarted, scorers={}).version_key() == DexScoringModel(store, scorers={}).version_key()
+    source.caps = 500.0
+    store.refresh()
+    keys.add(payload_key(payload, DexScoringModel(store, scorers={}).version_key()))
+    assert len(keys) == 5
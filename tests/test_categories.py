@@ -0,0 +1,97 @@
+# tests/test_categories.py
+import json
+
+import pytest
+
+from app.models import categories
+from app.models.categories import CategoryScorer, enabled_scorers, register
+from app.models.dex_model import DexScoringModel
+from app.utils.compact import parse_wallet_compact
+from app.utils.types import parse_wallet
+from benchmarks.synthetic import make_wallets
+from conftest import strip
+
+DAY = 86400
+CATEGORIES = "lending,staking"  # SCORING_CATEGORIES is empty by default
+
+
+def _tx(doc_id, action, ts, usd0=0.0, usd1=None):
+    return {"document_id": doc_id, "action": action, "timestamp": ts, "caller": None, "protocol": None,
+            "token0": {"amountUSD": usd0, "symbol": "USDC"}, "token1": None if usd1 is None else {"amountUSD": usd1}}
+
+
+LENDING = [_tx("l1", "deposit", DAY, 500.0), _tx("l2", "Borrow", 2 * DAY, 200.0), _tx("l3", "repay", 3 * DAY, 50.0),
+           _tx("l4", "liquidate", 4 * DAY), _tx("l2", "borrow", 2 * DAY, 200.0)]
+STAKING = [_tx("s1", "stake", 10 * DAY, 300.0, 100.0), _tx("s2", "claim", 12 * DAY, 5.0),
+           _tx("s3", "unstake", 25 * DAY, 100.0)]
+
+
+def _wallet():
+    w = make_wallets(1, n_tx=40, seed=3)[0]
+    w["data"] = [{"protocolType": "Lending", "transactions": LENDING}, w["data"][0],
+                 {"protocolType": "bridges", "transactions": LENDING[:1]},
+                 {"transactions": STAKING, "protocolType": "staking"}]
+    return w
+
+
+def test_lending_and_staking_categories():
+    result = DexScoringModel(scorers=enabled_scorers(CATEGORIES)).score_wallet(_wallet())
+    lending, dexes, staking = result["categories"]
+    assert [c["category"] for c in result["categories"]] == ["lending", "dexes", "staking"]
+    assert lending["transaction_count"] == 4  # the replayed borrow counts once
+    assert lending["features"] == {
+        "total_supplied_usd": 500.0, "total_withdrawn_usd": 0.0, "total_borrowed_usd": 200.0,
+        "total_repaid_usd": 50.0, "num_supplies": 1, "num_borrows": 1, "num_repays": 1, "num_liquidations": 1}
+    assert lending["score"] == pytest.approx(0.5 * 400 + 0.25 * 300 + (2 / 3) * 300)
+    assert staking["features"] == {"total_staked_usd": 400.0, "total_unstaked_usd": 100.0, "num_stakes": 1,
+                                   "num_unstakes": 1, "num_claims": 1, "staking_days": 15.0}
+    assert staking["score"] == pytest.approx(0.4 * 500 + 0.5 * 300 + 0.75 * 200)
+    mean = (lending["score"] + dexes["score"] + staking["score"]) / 3
+    assert float(result["zscore"]) == pytest.approx(mean)
+
+    dex_only = DexScoringModel(scorers={}).score_wallet(_wallet())
+    assert dex_only["categories"] == [dexes]
+
+
+@pytest.mark.parametrize("workers", [0, 3])
+def test_every_path_agrees(workers):
+    model = DexScoringModel(scorers=enabled_scorers(CATEGORIES), category_workers=workers)
+    wallets = [_wallet(), make_wallets(1, seed=4)[0], {"wallet_address": "0xlend", "data": [
+        {"protocolType": "lending", "transactions": []}, {"protocolType": "staking", "transactions": STAKING}]}]
+    raws = [json.dumps(w).encode() for w in wallets]
+    expected = [strip(DexScoringModel(scorers=enabled_scorers(CATEGORIES)).score_wallet(parse_wallet(r))) for r in raws]
+    assert [strip(model.score_wallet(parse_wallet_compact(r))) for r in raws] == expected
+    assert [strip(r) for r in model.score_batch([parse_wallet_compact(r) for r in raws])] == expected
+    assert [strip(r) for r in model.score_batch(wallets)] == expected
+    for raw, want in zip(raws, expected):
+        scorer = model.stream_scorer()
+        for i in range(0, len(raw), 97):
+            scorer.feed(raw[i:i + 97])
+        assert strip(scorer.finish()) == want
+
+
+def test_registry_and_timing():
+    class Bridges(CategoryScorer):
+        protocol_type = "bridges"
+        columns = ("action", "leg_a")
+
+        def features(self, cols):
+            return {"bridged_usd": float(cols["leg_a"].sum())}
+
+        def score(self, f, caps):
+            return f["bridged_usd"]
+
+    with pytest.raises(ValueError):
+        enabled_scorers("lending,perps")
+    with pytest.raises(ValueError):
+        register(type("Bad", (Bridges,), {"columns": ("amount",)})())
+    try:
+        register(Bridges())
+        model = DexScoringModel(scorers=enabled_scorers("bridges"))
+        timer = categories.category_timer("bridges")
+        before = timer.snapshot()[2]
+        cats = model.score_wallet(_wallet())["categories"]
+        assert [c["category"] for c in cats] == ["dexes", "bridges"] and cats[1]["score"] == 500.0
+        assert timer.snapshot()[2] == before + 1
+    finally:
+        categories.SCORERS.pop("bridges", None)
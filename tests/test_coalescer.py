@@ -0,0 +1,70 @@
+# tests/test_coalescer.py
+import asyncio
+import time
+
+from fastapi.testclient import TestClient
+
+from app import main
+from app.main import app
+from app.services.coalescer import RequestCoalescer
+from app.services.executor import ERROR, OK
+from benchmarks.synthetic import make_wallets
+
+
+class RecordingExecutor:
+    workers = 1
+
+    def __init__(self, delay_s=0.0, poison=b""):
+        self.batches = []
+        self.delay_s = delay_s
+        self.poison = poison
+
+    def score(self, payloads):
+        # like ScoringExecutor.score: a failing wallet only fails itself
+        self.batches.append(list(payloads))
+        time.sleep(self.delay_s)
+        return [(ERROR if p == self.poison else OK, {"echo": p}) for p in payloads]
+
+
+def _gather(coalescer, payloads):
+    async def run():
+        return await asyncio.gather(*(coalescer.score(p) for p in payloads))
+    return asyncio.run(run())
+
+
+def test_requests_queue_behind_a_running_batch():
+    ex = RecordingExecutor(delay_s=0.05)
+    payloads = [bytes([i]) for i in range(10)]
+    results = _gather(RequestCoalescer(ex, window_ms=1000, max_batch=256), payloads)
+    assert [r[1]["echo"] for r in results] == payloads
+    # the first request finds the executor idle and leaves at once, the rest wait for it
+    assert [len(b) for b in ex.batches] == [1, 9]
+
+
+def test_max_batch_and_window_bound_the_wait():
+    ex = RecordingExecutor(delay_s=0.2)
+    payloads = [bytes([i]) for i in range(7)]
+    t = time.perf_counter()
+    _gather(RequestCoalescer(ex, window_ms=20, max_batch=3), payloads)
+    assert [len(b) for b in ex.batches] == [1, 3, 3]
+    # the full batches left on size, while the first one was still being scored
+    assert time.perf_counter() - t < 0.35
+
+
+def test_error_in_batch_only_fails_the_culprit():
+    ex = RecordingExecutor(delay_s=0.05, poison=b"bad")
+    payloads = [b"a", b"b", b"bad", b"c"]
+    results = _gather(RequestCoalescer(ex, window_ms=1000), payloads)
+    assert [len(b) for b in ex.batches] == [1, 3]
+    assert [status for status, _ in results] == [OK, OK, ERROR, OK]
+    assert [r["echo"] for s, r in results if s == OK] == [b"a", b"b", b"c"]
+
+
+def test_score_endpoint_through_coalescer(monkeypatch):
+    client = TestClient(app)
+    raw = make_wallets(1, n_tx=25)[0]
+    direct = client.post("/api/v1/score", json=raw).json()
+    monkeypatch.setattr(main, "coalescer", RequestCoalescer(main.scoring, window_ms=2))
+    coalesced = client.post("/api/v1/score", json=raw).json()
+    assert coalesced["categories"] == direct["categories"]
+    assert client.post("/api/v1/score", content=b"{").status_code == 422
@@ -0,0 +1,95 @@
+# tests/test_compact.py
+import copy
+import json
+
+import pytest
+
+from app.models.categories import enabled_scorers
+from app.models.dex_model import DexScoringModel
+from app.models.notebook_model import NotebookScoringModel
+from app.services import executor
+from app.utils.compact import CompactWallet, parse_wallet_compact
+from app.utils.types import parse_wallet
+from benchmarks.synthetic import make_wallets
+from conftest import strip
+
+
+def _payloads():
+    wallets = make_wallets(12, n_tx=60, seed=5, symbols=("USDC", "DAI", "WETH", "UNI"))
+    for w in wallets[:6]:
+        txs = w["data"][0]["transactions"]
+        txs += copy.deepcopy(txs[:7]) + [dict(txs[0], document_id=None)]
+        txs[3]["poolId"] = None
+        txs[4]["tokenIn"] = None
+        txs[6]["action"] = "Swap"
+        txs[8]["action"] = "borrow"
+        txs[9]["timestamp"] = 0
+        w["data"] += [{"protocolType": "lending", "transactions": txs[:3]},
+                      {"protocolType": "DEXES", "transactions": txs[5:20]}, {"protocolType": "dexes"}]
+    bare = {"document_id": "1", "action": "swap", "timestamp": 5, "caller": None, "protocol": None}
+    wallets.append({"wallet_address": "0xbare", "data": [{"protocolType": "dexes", "transactions": [bare]}]})
+    return [json.dumps(w).encode() for w in wallets]
+
+
+@pytest.mark.parametrize("model", [DexScoringModel(), DexScoringModel(dedup_tx=False),
+                                   DexScoringModel(scorers=enabled_scorers("lending,staking")),
+                                   NotebookScoringModel(clock=lambda: 1.8e9)])
+def test_compact_wallets_score_like_validated_models(model):
+    raws = _payloads()
+    validated = [parse_wallet(r) for r in raws]
+    compact = [parse_wallet_compact(r) for r in raws]
+    expected = [strip(model.score_wallet(w)) for w in validated]
+    assert [strip(model.score_wallet(w)) for w in compact] == expected
+    assert [strip(r) for r in model.score_batch(compact)] == expected
+    assert [strip(r) for r in model.score_batch(validated[:3] + compact[3:])] == expected
+
+
+BAD = [
+    b'{',
+    b'[]',
+    b'{"wallet_address": 1, "data": []}',
+    b'{"wallet_address": "0xa"}',
+    b'{"wallet_address": "0xa", "data": [{"protocolType": "dexes", "transactions": null}]}',
+    b'{"wallet_address": "0xa", "data": [{"protocolType": "dexes", "transactions": [{"action": "swap", '
+    b'"timestamp": "soon", "caller": null, "protocol": null}]}]}',
+    b'{"wallet_address": "0xa", "data": [{"protocolType": "dexes", "transactions": [{"document_id": "1", '
+    b'"action": "swap", "timestamp": 1, "caller": null, "protocol": null, "tokenOut": {"amountUSD": "n/a"}}]}]}',
+    b'{"wallet_address": "0xa", "data": [{"protocolType": "dexes", "transactions": [{"document_id": "1", '
+    b'"action": "swap", "timestamp": 1180591620717411303424, "caller": null, "protocol": null}]}]}',
+]
+
+
+@pytest.mark.parametrize("raw", BAD)
+def test_validation_errors_are_pydantics(raw):
+    with pytest.raises(Exception) as expected:
+        parse_wallet(raw)
+    with pytest.raises(Exception) as got:
+        parse_wallet_compact(raw)
+    assert type(got.value) is type(expected.value) and str(got.value) == str(expected.value)
+
+
+def test_values_pydantic_coerces_are_coerced_the_same():
+    raw = (b'{"wallet_address": "0xa", "data": [{"protocolType": "dexes", "transactions": [{"document_id": "1", '
+           b'"action": "swap", "timestamp": "17", "caller": null, "protocol": null, '
+           b'"tokenIn": {"amountUSD": "2.5"}, "tokenOut": {"amountUSD": 3}}]}]}')
+    block = parse_wallet_compact(raw).data[0]
+    assert (list(block.timestamp), list(block.leg_a), list(block.leg_b)) == ([17], [2.5], [3.0])
+    model = DexScoringModel()
+    assert strip(model.score_wallet(parse_wallet_compact(raw))) == strip(model.score_wallet(parse_wallet(raw)))
+
+
+def test_compact_storage_size():
+    raw = json.dumps(make_wallets(1, n_tx=2000, symbols=("USDC", "WETH"))[0]).encode()
+    wallet = parse_wallet_compact(raw)
+    assert isinstance(wallet, CompactWallet) and wallet.transaction_count == 2000
+    assert wallet.nbytes / 2000 < 48
+    assert sorted(wallet.symbols) == ["USDC", "WETH"]
+
+
+def test_score_payloads_on_either_storage(monkeypatch):
+    raws = _payloads() + BAD[:3]
+    compact = executor.score_payloads(raws)
+    monkeypatch.setattr(executor, "COMPACT_TX", False)
+    validated = executor.score_payloads(raws)
+    assert [(s, strip(r)) for s, r in compact] == [(s, strip(r)) for s, r in validated]
+    assert [s for s, _ in compact[-3:]] == [executor.INVALID] * 3
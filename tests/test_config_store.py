@@ -0,0 +1,95 @@
+# tests/test_config_store.py
+import copy
+
+from app.models.dex_model import DexScoringModel
+from app.models.notebook_model import NotebookScoringModel
+from app.services.config_store import ConfigStore, MongoConfigSource
+from benchmarks.synthetic import make_wallets, SYMBOLS
+from conftest import strip
+
+
+class StandInCollection:
+    def __init__(self, docs):
+        self.docs = docs
+        self.finds = 0
+
+    def find(self, query, projection=None):
+        self.finds += 1
+        return [copy.deepcopy(d) for d in self.docs]
+
+
+class StandInMongo:
+    """pymongo-shaped client[db][collection].find() over in-memory documents."""
+
+    def __init__(self, collections):
+        self.db = {name: StandInCollection(docs) for name, docs in collections.items()}
+
+    def __getitem__(self, name):
+        return self.db
+
+
+THRESHOLDS = [
+    {"protocolType": "dexes", "metric": "total_deposit_usd", "percentiles": {"50": 400.0, "90": 5000.0, "99": 90000.0}},
+    {"protocolType": "dexes", "metric": "num_swaps", "percentiles": {"90": 40, "50": 4}},
+]
+TOKENS = [{"address": "0xA0b8", "symbol": "USDC", "is_stable": True},
+          {"address": "0xc02a", "symbol": "WETH", "is_stable": False}]
+
+
+def _store(thresholds=THRESHOLDS, tokens=TOKENS):
+    mongo = StandInMongo({"protocol-thresholds-percentiles": thresholds, "tokens": tokens})
+    store = ConfigStore(MongoConfigSource(client=mongo), refresh_s=3600)
+    assert store.refresh()
+    return store, mongo
+
+
+def test_snapshot_lookups():
+    store, _ = _store()
+    snap = store.snapshot
+    assert snap.version == 1
+    assert snap.percentile("dexes", "total_deposit_usd", 400.0) == 50.0
+    assert snap.percentile("dexes", "total_deposit_usd", 2700.0) == 70.0
+    assert snap.percentile("dexes", "unique_pools", 1.0) is None
+    assert snap.token("0xa0B8")["symbol"] == "USDC"
+    assert snap.stable_symbols == {"USDC"}
+    caps = snap.caps("dexes", {"total_deposit_usd": 1000.0, "num_swaps": 10.0, "unique_pools": 3.0})
+    assert dict(caps) == {"total_deposit_usd": 5000.0, "num_swaps": 40.0, "unique_pools": 3.0}
+
+
+def test_refresh_detects_changes_and_keeps_last_good_snapshot():
+    store, mongo = _store()
+    assert not store.refresh()
+    assert store.snapshot.version == 1
+
+    mongo.db["tokens"].docs.append({"address": "0x6b17", "symbol": "DAI", "is_stable": True})
+    old = store.snapshot
+    assert store.refresh()
+    assert store.snapshot.version == 2 and store.snapshot.stable_symbols == {"USDC", "DAI"}
+    assert old.stable_symbols == {"USDC"}  # readers holding the old snapshot are unaffected
+
+    mongo.db["tokens"].find = None  # source down
+    assert not store.refresh()
+    assert store.snapshot.version == 2
+    assert store.stats()["errors"] == 1 and store.staleness_s() >= 0
+
+
+def test_scoring_reads_snapshot_without_database_calls():
+    wallets = make_wallets(20, n_tx=30, symbols=SYMBOLS)
+    default = DexScoringModel()
+    empty, _ = _store(thresholds=[], tokens=[])
+    assert [strip(r) for r in DexScoringModel(empty).score_batch(wallets)] == \
+        [strip(r) for r in default.score_batch(wallets)]
+
+    store, mongo = _store()
+    model = DexScoringModel(store)
+    finds = mongo.db["tokens"].finds
+    batch = model.score_batch(wallets)
+    assert [strip(r) for r in batch] == [strip(model.score_wallet(w)) for w in wallets]
+    assert [r["zscore"] for r in batch] != [r["zscore"] for r in default.score_batch(wallets)]
+    assert mongo.db["tokens"].finds == finds
+
+    notebook = NotebookScoringModel(store, clock=lambda: 1.8e9)
+    default_nb = NotebookScoringModel(clock=lambda: 1.8e9)
+    diversity = [r["categories"][0]["features"]["token_diversity_score"] for r in notebook.score_batch(wallets)]
+    assert diversity != [r["categories"][0]["features"]["token_diversity_score"]
+                         for r in default_nb.score_batch(wallets)]
@@ -0,0 +1,149 @@
+# tests/test_dedup.py
+import copy
+import json
+
+import numpy as np
+
+from app.models.dex_model import DexScoringModel
+from app.models.incremental import IncrementalScorer
+from app.services.executor import ScoringExecutor, OK
+from app.services.state_store import InMemoryStateStore
+from app.utils.dedup import DedupIndex, ScalableBloomFilter, TxIdFilter, _mix, first_occurrences
+from benchmarks.synthetic import make_wallets
+from conftest import strip
+
+
+def _with_replays(wallet, n):
+    # the first n transactions arrive a second time (an overlapping snapshot), and one
+    # transaction without document_id twice, which must still count twice
+    w = copy.deepcopy(wallet)
+    txs = w["data"][0]["transactions"]
+    anon = dict(txs[0], document_id=None)
+    txs += copy.deepcopy(txs[:n]) + [anon, dict(anon)]
+    clean = copy.deepcopy(wallet)
+    clean["data"][0]["transactions"] += [anon, dict(anon)]
+    return w, clean
+
+
+def test_first_occurrences_per_group():
+    assert first_occurrences(["a", "b", "c"]) is None
+    keep = first_occurrences(["a", "b", "a", None, None, "b", "a"])
+    assert keep.tolist() == [True, True, False, True, True, False, False]
+    keep = first_occurrences(["a", "a", "a", "b"], np.array([0, 1, 1, 1]))
+    assert keep.tolist() == [True, True, False, True]
+
+
+def test_duplicates_inside_a_payload_count_once_on_every_path():
+    model = DexScoringModel()
+    for seed, wallet in enumerate(make_wallets(4, n_tx=120, seed=3)):
+        dup, clean = _with_replays(wallet, 30 + seed)
+        expected = strip(model.score_wallet(clean))
+        assert strip(model.score_wallet(dup)) == expected
+        assert expected["categories"][0]["transaction_count"] == 122
+        scorer = model.stream_scorer()
+        raw = json.dumps(dup).encode()
+        for i in range(0, len(raw), 997):
+            scorer.feed(raw[i:i + 997])
+        assert strip(scorer.finish()) == expected
+    dups, cleans = zip(*(_with_replays(w, 25) for w in make_wallets(6, n_tx=80, seed=4)))
+    assert [strip(r) for r in model.score_batch(list(dups))] == [strip(model.score_wallet(w)) for w in cleans]
+
+    off = DexScoringModel(dedup_tx=False)
+    assert off.score_wallet(dups[0])["categories"][0]["transaction_count"] == 80 + 25 + 2
+
+
+def test_streamed_block_dedup_is_exact_past_the_recent_ids():
+    model = DexScoringModel()
+    wallet = make_wallets(1, n_tx=2000, seed=5)[0]
+    dup, clean = _with_replays(wallet, 2000)
+    scorer = model.stream_scorer()  # validated and deduplicated 256 transactions at a time
+    scorer.feed(json.dumps(dup).encode())
+    assert strip(scorer.finish()) == strip(model.score_wallet(clean))
+
+
+def test_tx_id_filter_across_messages():
+    f = TxIdFilter(recent=100)
+    ids = [f"{i:024x}" for i in range(1000)]
+    assert f.check_add(ids).all()
+    assert not f.check_add(ids[900:]).any()  # still in the recent set
+    assert f.exact_duplicates == 100
+    assert not f.check_add(ids[:100]).any()  # only the bloom filter remembers these
+    assert f.probable_duplicates == 100
+    assert f.check_add(["new", "new", ids[5]]).tolist() == [True, False, False]
+
+
+def test_bloom_filter_false_positive_rate():
+    h = np.random.default_rng(7).integers(0, 2 ** 63, 600_000, dtype=np.int64).view(np.uint64)
+    h2 = _mix(h) | np.uint64(1)
+    bloom = ScalableBloomFilter(64, error_rate=1e-3)
+    for s in range(0, 100_000, 5000):
+        bloom.add(h[s:s + 5000], h2[s:s + 5000])
+    assert bloom.contains(h[:100_000], h2[:100_000]).all()
+    assert bloom.contains(h[100_000:], h2[100_000:]).mean() < 2e-3
+    assert bloom.nbytes < 100_000 * 4
+
+
+def test_dedup_index_is_bounded():
+    index = DedupIndex(max_wallets=3, max_bytes=1 << 30, recent=10)
+    for w in range(5):
+        index.check_add(f"w{w}", [f"{w}-{i}" for i in range(50)])
+    assert index.stats()["wallets"] == 3 and index.evicted == 2
+    assert not index.check_add("w4", ["4-1"]).any()
+    assert index.check_add("w0", ["0-1"]).all()  # forgotten
+    small = DedupIndex(max_bytes=20_000, recent=10)
+    for w in range(20):
+        small.check_add(f"w{w}", [f"{w}-{i}" for i in range(200)])
+    assert small.nbytes <= 20_000 and small.evicted > 0
+
+
+def test_incremental_ignores_replayed_messages():
+    model = DexScoringModel()
+    wallet = make_wallets(1, n_tx=60, seed=9)[0]
+    txs = wallet["data"][0]["transactions"]
+    txs.sort(key=lambda t: t["timestamp"])  # deltas in time order score like a full rescore
+    scorer = IncrementalScorer(InMemoryStateStore(), model)
+
+    def send(part):
+        return scorer.update({"wallet_address": wallet["wallet_address"],
+                              "data": [{"protocolType": "dexes", "transactions": part}]})
+
+    send(txs[:40])
+    send(txs[20:60])  # overlaps the first message
+    got = send(txs[:40])  # redelivered
+    assert strip(got) == strip(IncrementalScorer(InMemoryStateStore(), model).update(wallet))
+    assert got["categories"][0]["transaction_count"] == 60
+    assert scorer.dedup.stats()["exact_duplicates"] == 60
+
+
+def test_incremental_executor_ignores_redelivered_messages():
+    wallet = make_wallets(1, n_tx=40, seed=6)[0]
+    ex = ScoringExecutor(mode="thread", cache=None, state=InMemoryStateStore())
+    raw = json.dumps(wallet).encode()
+    first, again = ex.score([raw, raw])
+    assert first[0] == again[0] == OK
+    assert strip(again[1]) == strip(first[1])
+    assert ex.incremental.dedup.stats()["exact_duplicates"] == 40
+
+
+def test_dedup_index_is_shared_safely_across_threads():
+    import threading
+
+    index = DedupIndex(max_wallets=50, recent=20)
+    errors = []
+
+    def work(t):
+        try:
+            for i in range(300):
+                index.check_add(f"w{(t * 7 + i) % 80}", [f"{t}-{i}-{j}" for j in range(30)])
+                if i % 10 == 0:
+                    index.stats()
+        except Exception as e:  # e.g. the LRU mutated during stats()
+            errors.append(e)
+
+    threads = [threading.Thread(target=work, args=(t,)) for t in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+    assert index.stats()["bytes"] == sum(f.nbytes for f in index._wallets.values())
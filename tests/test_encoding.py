@@ -0,0 +1,47 @@
+# tests/test_encoding.py
+import random
+from decimal import Decimal, ROUND_DOWN
+
+import numpy as np
+import pytest
+from starlette.responses import JSONResponse
+
+from app.models.dex_model import DexScoringModel
+from app.models.notebook_model import NotebookScoringModel
+from app.utils import encoding
+from app.utils.encoding import encode_result, zscore_str
+from app.utils.types import failure_message
+from benchmarks.synthetic import make_wallets, SYMBOLS
+
+
+def _decimal_zstr(v):
+    return str(Decimal(v).quantize(Decimal("0.000000000000000001"), rounding=ROUND_DOWN))
+
+
+def test_zscore_str_matches_decimal_quantize():
+    rng = random.Random(3)
+    values = [0.0, -0.0, 1e-20, -1e-20, 1e-7, 1e-6, 2e-18, 999.9999999, 5e9, -3.25]
+    values += [rng.uniform(0, 1000) for _ in range(2000)] + [round(rng.uniform(0, 1000), 6) for _ in range(2000)]
+    values += [rng.random() * 10 ** rng.randint(-25, 9) for _ in range(2000)]
+    for v in values:
+        assert zscore_str(v) == _decimal_zstr(v), v
+    assert zscore_str(float("nan")) == "NaN"
+
+
+def _results():
+    odd = dict(DexScoringModel().score_wallet(make_wallets(1)[0]))
+    odd["categories"] = [dict(odd["categories"][0], score=1e-7,
+                              features={"a": np.float64(2.5), "b": 1e20, "c": 2 ** 70, "d": "é\n"})]
+    return (DexScoringModel().score_batch(make_wallets(20, n_tx=15))
+            + NotebookScoringModel().score_batch(make_wallets(5, symbols=SYMBOLS))
+            + [failure_message("0xé", "bad\tinput"), odd])
+
+
+@pytest.mark.parametrize("fast", [True, False])
+def test_encode_result_is_byte_identical_to_json_response(monkeypatch, fast):
+    if not fast:
+        monkeypatch.setattr(encoding, "orjson", None)
+    for result in _results():
+        assert encode_result(result) == JSONResponse(result).body
+    with pytest.raises(ValueError):
+        encode_result(dict(_results()[0], categories=[{"score": float("nan")}]))
@@ -0,0 +1,140 @@
+# tests/test_executor.py
+import os
+import sys
+import json
+import time
+import signal
+import threading
+import subprocess
+from concurrent.futures.process import BrokenProcessPool
+
+from app.models.dex_model import DexScoringModel
+from app.services import executor
+from app.services.executor import ScoringExecutor, OK, INVALID, ERROR
+from benchmarks.synthetic import make_wallets
+from conftest import strip
+
+
+def _payloads(n):
+    payloads = [json.dumps(w).encode() for w in make_wallets(n, n_tx=15)]
+    payloads.append(b'{"wallet_address": "0xbad", "data": 1}')
+    return payloads
+
+
+def test_process_pool_matches_inline():
+    payloads = _payloads(20)
+    inline = ScoringExecutor(mode="thread").score(payloads)
+    pool = ScoringExecutor(mode="process", workers=2, max_inflight=2)
+    pool.start()
+    try:
+        remote = pool.score(payloads)
+    finally:
+        pool.stop()
+    assert [s for s, _ in remote] == [OK] * 20 + [INVALID]
+    assert remote[-1][1]["wallet_address"] == "0xbad"
+    assert [strip(r) for _, r in remote] == [strip(r) for _, r in inline]
+
+
+def test_inflight_limit_blocks_submitters():
+    ex = ScoringExecutor(mode="thread", max_inflight=1)
+    ex._slots.acquire()  # occupy the only slot
+    done = threading.Event()
+    t = threading.Thread(target=lambda: (ex.score(_payloads(1)), done.set()))
+    t.start()
+    assert not done.wait(0.2)
+    ex._slots.release()
+    assert done.wait(5)
+    t.join()
+
+
+class FragileModel(DexScoringModel):
+    def score_wallet(self, wallet):
+        if wallet.wallet_address == "0xboom":
+            raise RuntimeError("boom")
+        return super().score_wallet(wallet)
+
+    def score_batch(self, wallets):
+        if any(w.wallet_address == "0xboom" for w in wallets):
+            raise RuntimeError("boom")
+        return super().score_batch(wallets)
+
+
+def test_error_in_batch_only_fails_the_culprit(monkeypatch):
+    monkeypatch.setattr(executor, "_model", FragileModel())
+    payloads = _payloads(3)
+    payloads.insert(1, json.dumps({"wallet_address": "0xboom", "data": []}).encode())
+    scored = executor.score_payloads(payloads)
+    assert [s for s, _ in scored] == [OK, ERROR, OK, OK, INVALID]
+    assert scored[1][1]["wallet_address"] == "0xboom" and scored[1][1]["error"] == "boom"
+    assert [strip(r) for s, r in scored if s == OK] == \
+        [strip(r) for s, r in executor.score_payloads([payloads[i] for i in (0, 2, 3)])]
+
+
+def test_non_bytes_payloads_are_invalid():
+    from app.services.cache import ResultCache
+
+    payloads = _payloads(2)[:2]
+    mixed = [payloads[0], None, payloads[1]]
+    for ex in (ScoringExecutor(mode="thread", cache=None), ScoringExecutor(mode="thread", cache=ResultCache())):
+        scored = ex.score(mixed)
+        assert [s for s, _ in scored] == [OK, INVALID, OK]
+        assert scored[1][1]["error"] == "payload must be bytes, got NoneType"
+    assert executor.score_payloads([None])[0][0] == INVALID
+
+
+def test_warm_up_leaves_the_score_distribution_alone(monkeypatch):
+    from app.services.score_sketch import ScoreNormalizer
+
+    normalizer = ScoreNormalizer(min_count=1)
+    monkeypatch.setattr(executor, "_model", DexScoringModel(normalizer=normalizer))
+    assert executor.warm_up() > 0
+    assert normalizer.stats() == ScoreNormalizer(min_count=1).stats()
+
+
+def test_mode_specific_modules_are_not_imported_at_startup():
+    code = ("import sys, app.main; print(sorted(m for m in ('cProfile', 'multiprocessing', 'kafka', 'pymongo', "
+            "'pandas', 'pyarrow', 'app.models.notebook_model') if m in sys.modules))")
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                         env=dict(os.environ, KAFKA_ENABLED="false", SCORING_EXECUTOR="thread", SCORING_MODEL="dex"))
+    assert out.stdout.split() == ["[]"]
+
+
+def test_process_pool_is_replaced_after_a_worker_dies():
+    ex = ScoringExecutor(mode="process", workers=1, max_inflight=2, cache=None)
+    ex.start()
+    try:
+        pid = ex._pool.submit(os.getpid).result()
+        hanging = ex._pool.submit(time.sleep, 30)
+        os.kill(pid, signal.SIGKILL)
+        assert isinstance(hanging.exception(timeout=30), BrokenProcessPool)
+        assert [s for s, _ in ex.score(_payloads(2))] == [OK, OK, INVALID]
+    finally:
+        ex.stop()
+
+
+def test_process_workers_share_the_normalized_population(monkeypatch):
+    from app.services.cache import ResultCache
+    from app.services.score_sketch import ScoreNormalizer
+
+    # the workers build their normalizer from the environment, this process from the model
+    monkeypatch.setenv("SCORE_NORMALIZATION", "percentile")
+    monkeypatch.setenv("SCORE_NORMALIZE_MIN_COUNT", "1")
+    monkeypatch.setattr(executor, "SCORE_NORMALIZATION", "percentile")
+    monkeypatch.setattr(executor, "_share_dir", "")
+    monkeypatch.setattr(executor, "_model", DexScoringModel(normalizer=ScoreNormalizer(min_count=1)))
+    cache = ResultCache()
+    ex = ScoringExecutor(mode="process", workers=1, max_inflight=2, cache=cache)
+    normalizer = executor.get_model().normalizer
+    assert normalizer.share_dir and normalizer.share_dir == executor._share_dir
+    ex.start()
+    try:
+        payloads = [json.dumps(w).encode() for w in make_wallets(3, n_tx=15)]
+        for _ in range(2):
+            assert [s for s, _ in ex.score(payloads)] == [OK] * 3
+    finally:
+        ex.stop()
+    # every wallet reached the worker (no cache hit) and the worker published on exit
+    assert cache.stats()["hits"] == 0
+    assert normalizer.stats()["population"] == 0
+    normalizer.publish()
+    assert normalizer.stats()["population"] == 6
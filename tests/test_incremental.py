@@ -0,0 +1,140 @@
+# tests/test_incremental.py
+import json
+import random
+import threading
+
+import pytest
+
+from app.models.dex_model import DexScoringModel
+from app.models.incremental import IncrementalScorer
+from app.services.executor import ScoringExecutor, OK, INVALID
+from app.services.state_store import InMemoryStateStore, FileStateStore
+from benchmarks.synthetic import make_wallet
+from conftest import strip
+
+
+def _close(a, b):
+    fa, fb = a["categories"][0]["features"], b["categories"][0]["features"]
+    assert fa.keys() == fb.keys()
+    for k in fa:
+        assert abs(fa[k] - fb[k]) <= 1e-6, k
+    assert abs(float(a["zscore"]) - float(b["zscore"])) <= 1e-5
+
+
+def _deltas(seed, n_tx, shuffle, in_order=True):
+    # deltas in time order (shuffled inside each delta), or not at all with in_order=False
+    rng = random.Random(seed)
+    wallet = make_wallet(rng, n_tx, n_pools=3)
+    txs = wallet["data"][0]["transactions"]
+    if in_order:
+        txs.sort(key=lambda t: t["timestamp"])
+    cuts = sorted(rng.sample(range(1, n_tx), 5))
+    parts = [txs[a:b] for a, b in zip([0] + cuts, cuts + [n_tx])]
+    if shuffle:
+        for part in parts:
+            rng.shuffle(part)
+    return wallet, parts
+
+
+def _message(addr, part):
+    return {"wallet_address": addr, "data": [{"protocolType": "dexes", "transactions": part}]}
+
+
+def test_incremental_matches_full_rescore():
+    model = DexScoringModel()
+    for shuffle in (False, True):
+        for seed in range(10):
+            wallet, parts = _deltas(seed, 120, shuffle)
+            scorer = IncrementalScorer(InMemoryStateStore(), model)
+            seen = []
+            for part in parts:
+                seen += part
+                got = scorer.update({"wallet_address": wallet["wallet_address"],
+                                     "data": [{"protocolType": "dexes", "transactions": part}]})
+                full = model.score_wallet({"wallet_address": wallet["wallet_address"],
+                                           "data": [{"protocolType": "dexes", "transactions": seen}]})
+                _close(got, full)
+                assert got["categories"][0]["transaction_count"] == len(seen)
+
+
+def test_wallet_without_dexes_matches_full_rescore():
+    model = DexScoringModel()
+    scorer = IncrementalScorer(InMemoryStateStore(), model)
+    msg = {"wallet_address": "0xnodex", "data": [{"protocolType": "lending", "transactions": []}]}
+    assert strip(scorer.update(msg)) == strip(model.score_wallet(msg))
+    empty = _message("0xempty", [])
+    assert strip(scorer.update(empty)) == strip(model.score_wallet(empty))
+
+
+def test_models_it_cannot_reproduce_are_refused():
+    from app.models.categories import enabled_scorers
+    from app.services.score_sketch import ScoreNormalizer
+
+    with pytest.raises(ValueError):
+        IncrementalScorer(InMemoryStateStore(), DexScoringModel(scorers=enabled_scorers("lending")))
+    with pytest.raises(ValueError):
+        IncrementalScorer(InMemoryStateStore(), DexScoringModel(normalizer=ScoreNormalizer()))
+
+
+def test_file_store_round_trip(tmp_path):
+    wallet, parts = _deltas(1, 60, True)
+    addr = wallet["wallet_address"]
+    mem = IncrementalScorer(InMemoryStateStore())
+    for part in parts[:-1]:
+        mem.update({"wallet_address": addr, "data": [{"protocolType": "dexes", "transactions": part}]})
+        IncrementalScorer(FileStateStore(str(tmp_path))).update(
+            {"wallet_address": addr, "data": [{"protocolType": "dexes", "transactions": part}]})
+    last = {"wallet_address": addr, "data": [{"protocolType": "dexes", "transactions": parts[-1]}]}
+    assert strip(IncrementalScorer(FileStateStore(str(tmp_path))).update(last)) == strip(mem.update(last))
+
+
+def test_late_deltas_keep_sums_and_counts_exact():
+    model = DexScoringModel()
+    for seed in range(10):
+        wallet, parts = _deltas(seed, 120, True, in_order=False)
+        scorer = IncrementalScorer(InMemoryStateStore(), model)
+        for part in parts:
+            got = scorer.update(_message(wallet["wallet_address"], part))
+        full = model.score_wallet(wallet)["categories"][0]["features"]
+        for name, value in got["categories"][0]["features"].items():
+            if name != "avg_hold_time_days":
+                assert abs(value - full[name]) <= 1e-6, name
+
+
+def test_state_keeps_only_unmatched_deposits():
+    wallet, parts = _deltas(3, 200, False)
+    scorer = IncrementalScorer(InMemoryStateStore())
+    for part in parts:
+        scorer.update(_message(wallet["wallet_address"], part))
+    state = scorer.store.get(wallet["wallet_address"])
+    for pool in state.to_dict()["pools"].values():
+        assert sorted(pool) == ["hold_n", "hold_sum", "unmatched"]
+    n_deposits = state.num_deposits
+    assert sum(len(p.unmatched) + p.hold_n for p in state.pools.values()) <= n_deposits
+
+
+def test_concurrent_deltas_of_one_wallet_are_not_lost(tmp_path):
+    wallet, parts = _deltas(4, 400, False)
+    addr = wallet["wallet_address"]
+    txs = [t for part in parts for t in part]
+    scorer = IncrementalScorer(FileStateStore(str(tmp_path)))
+    threads = [threading.Thread(target=scorer.update, args=(_message(addr, txs[i::8]),)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert scorer.store.get(addr).tx_count == len(txs)
+
+
+def test_executor_scores_deltas_in_incremental_mode():
+    wallet, parts = _deltas(5, 60, False)
+    addr = wallet["wallet_address"]
+    ex = ScoringExecutor(mode="thread", cache=None, state=InMemoryStateStore())
+    counts = []
+    for part in parts:
+        (status, result), = ex.score([json.dumps(_message(addr, part)).encode()])
+        assert status == OK
+        counts.append(result["categories"][0]["transaction_count"])
+    assert counts[-1] == 60 and counts == sorted(counts)
+    _close(result, DexScoringModel().score_wallet(wallet))
+    assert ex.score([b'{"wallet_address": "0x1"}'])[0][0] == INVALID
@@ -0,0 +1,153 @@
+# tests/test_kafka_pipeline.py
+import json
+import time
+from collections import namedtuple
+
+from app.services import kafka_service
+from app.services.kafka_service import KafkaScoringService, KAFKA_SUCCESS_TOPIC, KAFKA_FAILURE_TOPIC
+from benchmarks.synthetic import make_wallets
+
+Record = namedtuple("Record", "topic partition offset key value")
+
+
+class StandInConsumer:
+    """Single-partition stand-in for KafkaConsumer with manual commits."""
+
+    def __init__(self, values):
+        self.records = [Record("wallet-transactions", 0, i, None, v) for i, v in enumerate(values)]
+        self.position = 0
+        self.committed = 0
+
+    def poll(self, timeout_ms=0, max_records=500):
+        batch = self.records[self.position:self.position + max_records]
+        self.position += len(batch)
+        return {("wallet-transactions", 0): batch} if batch else {}
+
+    def seek(self, tp, offset):
+        self.position = offset
+
+    def commit(self):
+        self.committed = self.position
+
+    def close(self):
+        pass
+
+
+class StandInFuture:
+    def __init__(self, error=None):
+        self.error = error
+
+    def get(self, timeout=None):
+        if self.error:
+            raise self.error
+
+
+class StandInProducer:
+    def __init__(self, fail_first_flush=False):
+        self.acked = []
+        self._pending = []
+        self.fail_next = fail_first_flush
+
+    def send(self, topic, key=None, value=None):
+        fut = StandInFuture(RuntimeError("broker unavailable") if self.fail_next else None)
+        self._pending.append((topic, key, value, fut))
+        return fut
+
+    def flush(self, timeout=None):
+        self.acked += [(t, k, v) for t, k, v, f in self._pending if f.error is None]
+        self._pending.clear()
+        self.fail_next = False
+
+    def close(self):
+        pass
+
+
+def _values(n):
+    values = [json.dumps(w).encode() for w in make_wallets(n, n_tx=10)]
+    values[3] = b"{truncated"
+    return values
+
+
+def test_pipeline_publishes_results_and_commits_after_ack():
+    consumer, producer = StandInConsumer(_values(300)), StandInProducer()
+    svc = KafkaScoringService(consumer=consumer, producer=producer)
+    while svc.run_once():
+        pass
+    assert consumer.committed == 300
+    topics = [t for t, _, _ in producer.acked]
+    assert topics.count(KAFKA_FAILURE_TOPIC) == 1 and topics.count(KAFKA_SUCCESS_TOPIC) == 299
+    first = json.loads(producer.acked[0][2])
+    assert first["zscore"] and first["categories"][0]["category"] == "dexes"
+
+
+def test_failed_send_rewinds_without_commit():
+    consumer, producer = StandInConsumer(_values(10)), StandInProducer(fail_first_flush=True)
+    svc = KafkaScoringService(consumer=consumer, producer=producer)
+    assert svc.run_once() == 0
+    assert consumer.committed == 0 and consumer.position == 0
+    assert svc.run_once() == 10
+    assert consumer.committed == 10 and len(producer.acked) == 10
+
+
+def test_background_thread_drains_topic(monkeypatch):
+    monkeypatch.setattr(kafka_service, "KAFKA_POLL_TIMEOUT_MS", 1)
+    consumer, producer = StandInConsumer(_values(2000)), StandInProducer()
+    svc = KafkaScoringService(consumer=consumer, producer=producer)
+    t0 = time.time()
+    svc.start()
+    while consumer.committed < 2000 and time.time() - t0 < 30:
+        time.sleep(0.01)
+    svc.stop()
+    assert consumer.committed == 2000
+    # challenge target is 1000+ wallets/minute
+    assert 2000 / (time.time() - t0) > 1000 / 60
+
+
+def _fail_first_score(svc):
+    score, calls = svc.executor.score, []
+
+    def flaky(values):
+        calls.append(values)
+        if len(calls) == 1:
+            raise RuntimeError("process pool broken")
+        return score(values)
+
+    svc.executor.score = flaky
+
+
+def test_failed_scoring_retries_records_one_at_a_time():
+    consumer, producer = StandInConsumer(_values(10)), StandInProducer()
+    svc = KafkaScoringService(consumer=consumer, producer=producer)
+    _fail_first_score(svc)
+    assert svc.run_once() == 10
+    assert consumer.committed == 10 and svc.stats["score_errors"] == 1
+    topics = [t for t, _, _ in producer.acked]
+    assert topics.count(KAFKA_SUCCESS_TOPIC) == 9 and topics.count(KAFKA_FAILURE_TOPIC) == 1
+
+
+def test_poison_record_is_published_as_failure_and_committed():
+    consumer, producer = StandInConsumer([b"{}", b"poison", b"{}"]), StandInProducer()
+    svc = KafkaScoringService(consumer=consumer, producer=producer)
+    score = svc.executor.score
+
+    def choke(values):
+        if b"poison" in values:
+            raise RuntimeError("scorer crashed")
+        return score(values)
+
+    svc.executor.score = choke
+    assert svc.run_once() == 3
+    assert svc.run_once() == 0
+    assert consumer.committed == 3 and svc.stats["failure"] == 3
+    failed = json.loads(producer.acked[1][2])
+    assert producer.acked[1][0] == KAFKA_FAILURE_TOPIC and failed["error"] == "scorer crashed"
+
+
+def test_mock_broker_publishes_after_failed_scoring():
+    svc = KafkaScoringService()
+    _fail_first_score(svc)
+    svc.mock_send({"wallet_address": "0x1", "data": []})
+    svc.mock_send({"wallet_address": "0x2", "data": []})
+    while svc.run_once():
+        pass
+    assert sorted(r["wallet_address"] for r in svc.mock_drain()) == ["0x1", "0x2"]
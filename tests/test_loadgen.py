@@ -0,0 +1,74 @@
+# tests/test_loadgen.py
+import asyncio
+import json
+from collections import namedtuple
+
+import httpx
+
+from app.main import app
+from benchmarks.loadgen import HttpTarget, KafkaTarget, LoadStats, load_payloads, run_closed, run_open
+
+Record = namedtuple("Record", "topic partition offset key value")
+
+
+def _target():
+    return HttpTarget(client=httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test"))
+
+
+def test_closed_loop_against_in_process_app():
+    payloads = load_payloads(synthetic=4, n_tx=5) + [b"{not json"]
+    report = asyncio.run(run_closed(_target(), payloads, concurrency=3, duration_s=5, max_requests=10))
+    assert report["completed"] == 10 and report["ok"] == 8
+    assert report["errors"] == {"http_422": 2}
+    assert report["response"]["p99_ms"] >= report["response"]["p50_ms"] > 0
+    assert not report["meets_target"]
+
+
+def test_open_loop_measures_from_schedule():
+    report = asyncio.run(run_open(_target(), load_payloads(synthetic=2, n_tx=5), rate=200, duration_s=0.1,
+                                  max_inflight=4))
+    assert report["completed"] == 20 and report["error_rate"] == 0.0
+
+
+def test_coordinated_omission_backfill():
+    stats = LoadStats(expected_interval_ns=10_000_000)
+    stats.record(True, "ok", 100_000_000, 100_000_000)  # one 100 ms stall at a 10 ms cadence
+    _, _, count = stats.response.snapshot()
+    assert count == 10
+    assert stats.service.snapshot()[2] == 1
+
+
+def test_jsonl_replay(tmp_path):
+    path = tmp_path / "wallets.jsonl"
+    path.write_text("\n".join(json.dumps({"wallet_address": str(i)}) for i in range(3)) + "\n\n")
+    assert len(load_payloads(str(path))) == 3
+
+
+class _EchoBroker:
+    """Producer + consumer stand-in: every input record comes straight back as a result."""
+
+    def __init__(self):
+        self.results = []
+
+    def send(self, topic, value=None, key=None):
+        addr = json.loads(value)["wallet_address"].encode()
+        self.results.append(Record("ok-topic", 0, 0, addr, b"{}"))
+
+    def flush(self, timeout=None):
+        pass
+
+    def assignment(self):
+        return {("ok-topic", 0)}
+
+    def poll(self, timeout_ms=0, max_records=500):
+        out, self.results = self.results, []
+        return {("ok-topic", 0): out} if out else {}
+
+
+def test_kafka_target_matches_results_by_key():
+    broker = _EchoBroker()
+    target = KafkaTarget("", "in", "ok-topic", "bad-topic", producer=broker, consumer=broker, timeout_s=5)
+    report = asyncio.run(run_closed(target, load_payloads(synthetic=3, n_tx=5), concurrency=2, duration_s=5,
+                                    max_requests=12))
+    asyncio.run(target.close())
+    assert report["completed"] == report["ok"] == 12
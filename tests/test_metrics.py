@@ -0,0 +1,86 @@
+# tests/test_metrics.py
+import json
+import random
+import threading
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services.executor import ScoringExecutor
+from app.utils.metrics import METRICS, Histogram, Registry, bucket_bounds, bucket_index, N_BUCKETS
+from benchmarks.synthetic import make_wallets
+
+
+def test_buckets_cover_values_within_relative_error():
+    rng = random.Random(7)
+    for v in [0, 1, 31, 32, 33, 63, 64, 1000] + [rng.randrange(1, 1 << 40) for _ in range(2000)]:
+        lo, hi = bucket_bounds(bucket_index(v))
+        assert lo <= v < hi
+        assert hi - lo <= max(1, v / 16)
+    assert bucket_index(1 << 60) == N_BUCKETS - 1
+
+
+def test_quantiles_across_threads():
+    hist = Histogram("t", "test")
+    values = list(range(1, 100_001))
+
+    def work(part):
+        for v in part:
+            hist.record_ns(v * 1000)
+
+    threads = [threading.Thread(target=work, args=(values[i::4],)) for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    _, total, count = hist.snapshot()
+    assert count == len(values) and total == sum(values) * 1000
+    for q, ns in hist.quantiles().items():
+        assert abs(ns - q * len(values) * 1000) <= 0.04 * q * len(values) * 1000
+
+
+def test_render_is_prometheus_text():
+    reg = Registry()
+    reg.histogram("lat_seconds", "latency", stage="a").record_ns(2_000_000)
+    reg.counter("hits_total", "hits", outcome="ok").inc(3)
+    text = reg.render()
+    assert "# TYPE lat_seconds summary" in text
+    assert 'lat_seconds_count{stage="a"} 1' in text
+    assert 'lat_seconds{stage="a",quantile="0.99"} 0.00' in text
+    assert 'hits_total{outcome="ok"} 3' in text
+
+
+def test_metrics_endpoint_reports_stages():
+    client = TestClient(app)
+    assert client.post("/api/v1/score", json=make_wallets(1, n_tx=20)[0]).status_code == 200
+    resp = client.get("/api/v1/metrics")
+    assert resp.status_code == 200
+    for name in ("decode", "features", "subscores", "serialize"):
+        assert f'scoring_stage_seconds_count{{stage="{name}"}}' in resp.text
+    assert 'http_request_seconds_count{path="/api/v1/score",status="200"}' in resp.text
+    stats = client.get("/api/v1/stats").json()
+    assert stats["processed"] == stats["success"] + stats["failure"] >= 1
+
+
+def test_export_since_adds_up_to_the_source():
+    src, dst, last = Registry(), Registry(), {}
+    for rounds in ([5, 700], [], [5, 90_000, 3]):
+        for v in rounds:
+            src.histogram("h", "test", stage="x").record_ns(v)
+        src.counter("c", "test").inc(len(rounds))
+        dst.add(src.export_since(last))
+    assert dst.export() == src.export()
+    assert src.export_since(last) == []
+
+
+def test_process_workers_ship_their_stage_metrics():
+    decode = METRICS.histogram("scoring_stage_seconds", "", stage="decode")
+    before = decode.snapshot()[2]
+    ex = ScoringExecutor(mode="process", workers=1, cache=None)
+    ex.start()
+    try:
+        ex.score([json.dumps(w).encode() for w in make_wallets(3, n_tx=5)])
+    finally:
+        ex.stop()
+    assert decode.snapshot()[2] >= before + 3
@@ -0,0 +1,95 @@
+# tests/test_mock_broker.py
+import time
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services.kafka_service import KafkaScoringService, KAFKA_CONSUMER_GROUP
+from app.services.mock_broker import BrokerFullError, MockBroker, TopicPartition
+from benchmarks.synthetic import make_wallets
+
+
+def _values(consumer, timeout_ms=0):
+    return sorted(r.value for recs in consumer.poll(timeout_ms=timeout_ms).values() for r in recs)
+
+
+def test_group_members_split_partitions_and_resume_from_commits():
+    broker = MockBroker(partitions=4)
+    a = broker.consumer("in", group_id="g")
+    b = broker.consumer("in", group_id="g")
+    assert a.assignment().isdisjoint(b.assignment()) and len(a.assignment() | b.assignment()) == 4
+
+    producer = broker.producer()
+    for i in range(40):
+        producer.send("in", value=b"%02d" % i, key=b"k%d" % i)
+    got_a, got_b = _values(a), _values(b)
+    assert sorted(got_a + got_b) == [b"%02d" % i for i in range(40)]
+
+    a.commit()      # b never commits: its records are redelivered after the rebalance
+    b.close()
+    assert len(a.assignment()) == 4
+    assert _values(a) == got_b
+    assert broker.lag("g") == len(got_b)
+    a.commit()
+    assert broker.lag("g") == 0
+
+
+def test_full_partition_blocks_producer_until_commit():
+    broker = MockBroker(partitions=1, capacity=2)
+    consumer = broker.consumer("in", group_id="g")
+    producer = broker.producer(send_timeout_s=0.05)
+    producer.send("in", value=b"1")
+    producer.send("in", value=b"2")
+    with pytest.raises(BrokerFullError):
+        producer.send("in", value=b"3")
+
+    sent = threading.Event()
+    slow = broker.producer(send_timeout_s=5)
+    t = threading.Thread(target=lambda: (slow.send("in", value=b"3"), sent.set()))
+    t.start()
+    assert _values(consumer) == [b"1", b"2"] and not sent.wait(0.05)
+    consumer.commit()
+    assert sent.wait(5)
+    t.join()
+    assert _values(consumer, timeout_ms=100) == [b"3"]
+
+
+def test_unconsumed_topic_keeps_latest_records():
+    broker = MockBroker(partitions=1, capacity=3)
+    producer = broker.producer(send_timeout_s=0)
+    for i in range(5):
+        producer.send("out", value=b"%d" % i)
+    reader = broker.consumer("out")
+    assert _values(reader) == [b"2", b"3", b"4"]
+    assert reader.assignment() == {TopicPartition("out", 0)}
+
+
+def test_service_scores_through_mock_broker():
+    svc = KafkaScoringService(broker=MockBroker(partitions=3))
+    wallets = make_wallets(50, n_tx=10)
+    svc.start()
+    try:
+        for w in wallets:
+            svc.mock_send(w)
+        results, deadline = [], time.time() + 10
+        while len(results) < len(wallets) and time.time() < deadline:
+            results += svc.mock_drain()
+            time.sleep(0.01)
+    finally:
+        svc.stop()
+    assert sorted(r["wallet_address"] for r in results) == sorted(w["wallet_address"] for w in wallets)
+    assert all("zscore" in r for r in results)
+    assert svc.broker.lag(KAFKA_CONSUMER_GROUP) == 0
+
+
+def test_mock_endpoints_publish_and_drain_scored_results():
+    wallet = make_wallets(1, n_tx=5)[0]
+    with TestClient(app) as client:
+        assert client.post("/api/v1/kafka/publish", json=wallet).json() == {"status": "queued"}
+        drained, deadline = [], time.time() + 10
+        while not drained and time.time() < deadline:
+            drained = client.get("/api/v1/kafka/drain").json()
+        assert drained[0]["wallet_address"] == wallet["wallet_address"] and drained[0]["zscore"]
+        assert "broker" in client.get("/api/v1/stats").json()["kafka"]
@@ -0,0 +1,51 @@
+# tests/test_notebook_model.py
+import json
+import random
+
+import pytest
+
+from app.models.notebook_model import NotebookScoringModel, NOTEBOOK_FEATURES
+from benchmarks.synthetic import make_wallet, SYMBOLS
+
+pytest.importorskip("pandas")
+from benchmarks.notebook_reference import load_notebook  # noqa: E402
+from conftest import strip  # noqa: E402
+
+NOW = 1_800_000_000.0
+
+
+def _wallets(seed, n=40):
+    rng = random.Random(seed)
+    wallets = [make_wallet(rng, rng.choice((1, 2, 5, 30, 200)), rng.randint(1, 6), SYMBOLS[:rng.randint(1, 11)])
+               for _ in range(n)]
+    # several dexes blocks are scored together; other protocol types are ignored
+    wallets[0]["data"].append(make_wallet(rng, 7)["data"][0])
+    wallets[1]["data"].append(dict(make_wallet(rng, 9)["data"][0], protocolType="lending"))
+    return wallets
+
+
+def test_matches_notebook_pipeline():
+    nb = load_notebook(now=NOW)
+    model = NotebookScoringModel(clock=lambda: NOW)
+    for wallet, result in zip(_wallets(0), model.score_batch(_wallets(0))):
+        final, features = nb["process_wallet_complete"](wallet)
+        [cat] = result["categories"]
+        assert cat["score"] == pytest.approx(final, abs=1e-6)
+        assert cat["transaction_count"] == len(nb["preprocess_dex_transactions"](wallet))
+        assert cat["user_tags"] == features["user_tags"]
+        for name in NOTEBOOK_FEATURES:
+            assert cat["features"][name] == pytest.approx(features[name], rel=1e-9, abs=1e-6), name
+
+
+def test_batch_stream_and_single_agree():
+    model = NotebookScoringModel(clock=lambda: NOW)
+    wallets = _wallets(1) + [{"wallet_address": "0xempty", "data": []}]
+    batch = model.score_batch(wallets)
+    for wallet, result in zip(wallets, batch):
+        assert strip(result) == strip(model.score_wallet(wallet))
+        scorer = model.stream_scorer()
+        raw = json.dumps(wallet).encode()
+        for i in range(0, len(raw), 333):
+            scorer.feed(raw[i:i + 333])
+        assert strip(scorer.finish()) == strip(result)
+    assert batch[-1]["categories"] == []
@@ -0,0 +1,81 @@
+# tests/test_profiling.py
+import json
+import time
+import threading
+from collections import namedtuple
+
+from fastapi.testclient import TestClient
+
+from app import main
+from app.main import app
+from app.services import kafka_service
+from app.services.kafka_service import KafkaScoringService
+from app.utils.profiling import SamplingProfiler
+from benchmarks.synthetic import make_wallets
+from tests.test_kafka_pipeline import StandInConsumer, StandInProducer
+
+Record = namedtuple("Record", "topic partition offset key value headers")
+
+
+def test_x_profile_header_returns_call_tree(monkeypatch):
+    client = TestClient(app)
+    raw = make_wallets(1, n_tx=30)[0]
+    assert "profile" not in client.post("/api/v1/score", json=raw, headers={"X-Profile": "1"}).json()
+
+    monkeypatch.setattr(main, "PROFILING_ENABLED", True)
+    out = client.post("/api/v1/score", json=raw, headers={"X-Profile": "tottime"}).json()
+    assert out["zscore"] and out["profile"]["sort"] == "tottime"
+    functions = out["profile"]["functions"]
+    assert any("score_wallet" in f["function"] for f in functions)
+    assert [f["tottime_ms"] for f in functions] == sorted((f["tottime_ms"] for f in functions), reverse=True)
+
+
+def test_admin_endpoint_collects_collapsed_stacks(monkeypatch, tmp_path):
+    client = TestClient(app)
+    assert client.post("/api/v1/admin/profile").status_code == 404
+
+    monkeypatch.setattr(main, "PROFILING_ENABLED", True)
+    monkeypatch.setattr(main, "SAMPLER", SamplingProfiler())
+    monkeypatch.setattr("app.utils.profiling.PROFILE_DIR", str(tmp_path))
+    assert client.post("/api/v1/admin/profile?seconds=30&interval_ms=1").json()["running"]
+    assert client.post("/api/v1/admin/profile").status_code == 409
+    time.sleep(0.05)
+    status = client.delete("/api/v1/admin/profile").json()
+    assert not status["running"] and status["samples"] > 0
+
+    text = client.get("/api/v1/admin/profile").text
+    stack, count = text.splitlines()[0].rsplit(" ", 1)
+    assert int(count) > 0 and ":" in stack
+    assert open(status["path"]).read() == text
+
+
+def test_sampler_sees_busy_thread():
+    stop = threading.Event()
+
+    def spin_here():
+        while not stop.is_set():
+            sum(range(100))
+
+    worker = threading.Thread(target=spin_here)
+    worker.start()
+    sampler = SamplingProfiler()
+    try:
+        sampler.start(0.1, 0.001, path="/dev/null")
+        sampler._thread.join()
+    finally:
+        stop.set()
+        worker.join()
+    assert "test_profiling:spin_here" in sampler.collapsed()
+
+
+def test_kafka_record_header_attaches_profile(monkeypatch):
+    monkeypatch.setattr(kafka_service, "PROFILING_ENABLED", True)
+    values = [json.dumps(w).encode() for w in make_wallets(3, n_tx=10)]
+    consumer = StandInConsumer(values)
+    consumer.records = [Record(*r, [("X-Profile", b"cumulative")] if r.offset == 1 else [])
+                        for r in consumer.records]
+    producer = StandInProducer()
+    KafkaScoringService(consumer=consumer, producer=producer).run_once()
+    out = [json.loads(v) for _, _, v in producer.acked]
+    assert [("profile" in r) for r in out] == [False, True, False]
+    assert [r["wallet_address"] for r in out] == [json.loads(v)["wallet_address"] for v in values]
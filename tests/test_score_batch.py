@@ -0,0 +1,66 @@
+# tests/test_score_batch.py
+import random
+
+import pytest
+from pydantic import ValidationError
+
+from app.models.categories import enabled_scorers
+from app.models.dex_model import DexScoringModel
+from benchmarks.synthetic import make_wallet, make_wallets
+from conftest import strip
+
+
+def _edge_wallets():
+    rng = random.Random(7)
+    wallets = make_wallets(30, n_tx=40, seed=3, n_pools=3)
+    # duplicate timestamps, missing pools/legs, zero timestamps, unknown actions
+    w = make_wallet(rng, 60, n_pools=2)
+    txs = w["data"][0]["transactions"]
+    for i, t in enumerate(txs):
+        if i % 7 == 0:
+            t["timestamp"] = txs[0]["timestamp"]
+        if i % 11 == 0:
+            t["poolId"] = None
+        if i % 13 == 0:
+            t.pop("tokenIn", None)
+            t.pop("token1", None)
+        if i % 17 == 0:
+            t["timestamp"] = 0
+        if i % 19 == 0:
+            t["action"] = "Collect"
+    w["data"].append({"protocolType": "lending", "transactions": []})
+    w["data"].append({"protocolType": "DEXES", "transactions": txs[:10]})
+    wallets.append(w)
+    wallets.append({"wallet_address": "0xempty", "data": []})
+    wallets.append({"wallet_address": "0xnodex", "data": [{"protocolType": "dexes", "transactions": []}]})
+    return wallets
+
+
+@pytest.mark.parametrize("model", [DexScoringModel(), DexScoringModel(scorers=enabled_scorers("lending,staking"))])
+def test_score_batch_matches_score_wallet(model):
+    wallets = _edge_wallets()
+    batch = model.score_batch(wallets)
+    assert len(batch) == len(wallets)
+    for w, got in zip(wallets, batch):
+        assert strip(got) == strip(model.score_wallet(w))
+
+
+def test_score_batch_reports_invalid_wallets_in_place():
+    model = DexScoringModel()
+    wallets = make_wallets(2, n_tx=5)
+    wallets.insert(1, {"wallet_address": "0xbad", "data": [{"transactions": []}]})
+    out = model.score_batch(wallets)
+    assert out[1]["wallet_address"] == "0xbad"
+    assert out[1]["error"] and out[1]["categories"][0]["category"] == "dexes"
+    assert "zscore" in out[0] and "zscore" in out[2]
+
+
+def test_timestamp_beyond_int64_fails_only_its_wallet():
+    model = DexScoringModel(scorers={})
+    wallets = make_wallets(3, n_tx=5)
+    wallets[1]["data"][0]["transactions"][2]["timestamp"] = 2 ** 70
+    out = model.score_batch(wallets)
+    assert "less than or equal to 9223372036854775807" in out[1]["error"]
+    assert [strip(out[i]) for i in (0, 2)] == [strip(model.score_wallet(wallets[i])) for i in (0, 2)]
+    with pytest.raises(ValidationError):
+        model.score_wallet(wallets[1])
@@ -0,0 +1,62 @@
+# tests/test_score_sketch.py
+import numpy as np
+
+from app.models.dex_model import DexScoringModel
+from app.services.score_sketch import ScoreNormalizer
+from app.utils.sketch import QuantileSketch
+from benchmarks.synthetic import make_wallets
+
+
+def _true_rank(data, x):
+    data = np.sort(data)
+    return (np.searchsorted(data, x, side="left") + np.searchsorted(data, x, side="right")) / (2.0 * len(data))
+
+
+def test_sketch_is_bounded_accurate_and_mergeable():
+    rng = np.random.default_rng(7)
+    data = np.concatenate([rng.exponential(300, 60_000), np.full(20_000, 1000.0)])
+    rng.shuffle(data)
+    probes = np.array([10.0, 100.0, 300.0, 700.0, 999.0, 1000.0])
+
+    whole = QuantileSketch(200, seed=1)
+    for chunk in np.array_split(data, 400):
+        whole.update(chunk)
+    parts = [QuantileSketch(200, seed=i).update(chunk) for i, chunk in enumerate(np.array_split(data, 4))]
+    merged = QuantileSketch(200, seed=9)
+    for part in parts:
+        merged.merge(QuantileSketch.from_dict(part.to_dict()))
+
+    for sketch in (whole, merged):
+        assert sketch.count == len(data)
+        assert sketch.size() <= 3 * 200
+        assert np.abs(sketch.rank(probes) - _true_rank(data, probes)).max() < 0.02
+        view = sketch.cdf_view()
+        assert [view.rank1(x) for x in probes] == view.rank(probes).tolist()
+
+
+def test_normalizer_spreads_scores_and_round_trips(tmp_path):
+    wallets = make_wallets(600, n_tx=12)
+    raw = DexScoringModel().score_batch(wallets)
+    share = tmp_path / "share"
+    share.mkdir()
+
+    # two "processes" sharing their sketches through the share directory
+    a = ScoreNormalizer(min_count=500, publish_every=100, share_dir=str(share))
+    b = ScoreNormalizer(min_count=500, publish_every=100, share_dir=str(share))
+    model_a, model_b = DexScoringModel(normalizer=a), DexScoringModel(normalizer=b)
+    first = model_a.score_batch(wallets[:300])
+    assert [r["zscore"] for r in first] == [r["zscore"] for r in raw[:300]]  # below min_count: raw
+    model_b.score_batch(wallets[300:])
+    normalized = [model_a.score_wallet(w) for w in wallets[:200]]
+    assert a.stats()["active"] and a.stats()["population"] >= 600
+
+    spread = lambda rs: np.std([r["categories"][0]["score"] for r in rs])  # noqa: E731
+    assert spread(normalized) > spread(raw[:200])
+    assert all(0.0 <= r["categories"][0]["score"] <= 1000.0 for r in normalized)
+
+    snapshot = tmp_path / "sketch.json"
+    a.save(str(snapshot))
+    assert not list(share.iterdir())
+    restored = ScoreNormalizer(min_count=500, path=str(snapshot))
+    assert restored.stats()["active"]
+    assert restored.export()["lp"]["count"] == 300 + 200 + 300
@@ -0,0 +1,109 @@
+# tests/test_streaming.py
+import json
+import random
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app.main as main
+from app.models.categories import enabled_scorers
+from app.models.dex_model import DexScoringModel
+from app.services import executor
+from app.utils.stream import DecodeError, TransactionStreamParser, WalletStreamDecoder
+from benchmarks.synthetic import make_wallets
+from conftest import strip
+
+
+def _wallet(seed):
+    w = make_wallets(1, n_tx=300, seed=seed)[0]
+    # tricky strings, a non-dexes block and protocolType after the transactions
+    w["data"].append({"transactions": [{"document_id": 'x"]}[,:\\', "action": "swap", "timestamp": 5,
+                                        "caller": None, "protocol": None}], "protocolType": "lending"})
+    w["data"].append({"transactions": w["data"][0]["transactions"][:40], "protocolType": "DEXES"})
+    return w
+
+
+def test_parser_splits_transactions_and_skeleton():
+    w = _wallet(1)
+    raw = json.dumps(w, indent=1).encode()
+    parser = TransactionStreamParser()
+    txs = []
+    for i in range(0, len(raw), 7):
+        txs += parser.feed(raw[i:i + 7])
+    skeleton = json.loads(parser.skeleton())
+    assert skeleton["wallet_address"] == w["wallet_address"]
+    assert [b["transactions"] for b in skeleton["data"]] == [[] for _ in w["data"]]
+    got = [[] for _ in w["data"]]
+    for b, tx in txs:
+        got[b].append(json.loads(tx))
+    assert got == [b["transactions"] for b in w["data"]]
+
+
+@pytest.mark.parametrize("model", [DexScoringModel(), DexScoringModel(scorers=enabled_scorers("lending,staking"))])
+def test_stream_scorer_matches_score_wallet(model):
+    rng = random.Random(0)
+    for seed in range(5):
+        w = _wallet(seed)
+        raw = json.dumps(w).encode()
+        scorer = model.stream_scorer()
+        i = 0
+        while i < len(raw):
+            step = rng.randint(1, 5000)
+            scorer.feed(raw[i:i + step])
+            i += step
+        assert strip(scorer.finish()) == strip(model.score_wallet(w))
+
+
+def test_large_payloads_are_streamed(monkeypatch):
+    monkeypatch.setattr(executor, "STREAM_MIN_BYTES", 1000)
+    monkeypatch.setattr(main, "STREAM_MIN_BYTES", 1000)
+    w = _wallet(3)
+    expected = strip(DexScoringModel().score_wallet(w))
+
+    small = make_wallets(1, n_tx=1)[0]
+    scored = executor.ScoringExecutor(cache=None).score(
+        [json.dumps(w).encode(), json.dumps(small).encode(), b'{"wallet_address": "0xbad", "data": [{}]' * 100])
+    assert [s for s, _ in scored] == [executor.OK, executor.OK, executor.INVALID]
+    assert strip(scored[0][1]) == expected
+    assert scored[2][1]["wallet_address"] == "0xbad"
+
+    resp = TestClient(main.app).post("/api/v1/score", content=json.dumps(w))
+    assert resp.status_code == 200
+    assert strip(resp.json()) == expected
+    bad = dict(w, data=[{"protocolType": "dexes", "transactions": [{"action": "swap"}] * 100}])
+    assert TestClient(main.app).post("/api/v1/score", content=json.dumps(bad)).status_code == 422
+
+
+def _decode_all(body, step):
+    decoder = WalletStreamDecoder()
+    out = []
+    for i in range(0, len(body), step):
+        out += decoder.feed(body[i:i + step])
+    return out + decoder.close()
+
+
+def test_decoder_reports_scalar_array_elements():
+    for body in (b'[1, {"a": 1}]', b'[{"a": 1}, 1]', b'[{"a": 1}, "x"]'):
+        out = _decode_all(body, 3)
+        assert out.count({"a": 1}) == 1 and sum(isinstance(d, DecodeError) for d in out) == 1
+    out = _decode_all(b'["]"]', 1)
+    assert len(out) == 1 and isinstance(out[0], DecodeError)
+
+
+def test_decoder_splits_one_long_ndjson_line_fed_in_small_chunks():
+    doc = {"wallet_address": "0x" + "a" * 50_000, "data": []}
+    body = (json.dumps(doc) + "\n" + json.dumps(doc)).encode()
+    assert _decode_all(body, 64) == [doc, doc]
+
+
+def test_non_object_transactions_are_invalid_buffered_or_streamed(monkeypatch):
+    w = make_wallets(1, n_tx=20)[0]
+    w["data"][0]["transactions"][5:5] = [1, "x"]
+    raw = json.dumps(w).encode()
+    client = TestClient(main.app)
+    assert client.post("/api/v1/score", content=raw).status_code == 422
+    monkeypatch.setattr(main, "STREAM_MIN_BYTES", 1000)
+    resp = client.post("/api/v1/score", content=raw)
+    assert resp.status_code == 422
+    assert "every element must be a JSON object" in resp.json()["detail"][0]["msg"]
+    assert executor.score_stream([raw])[0] == executor.INVALID
@@ -0,0 +1,146 @@
+# tests/test_workers.py
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import httpx
+from fastapi.testclient import TestClient
+
+from app import main
+from app.main import app
+from app.services.workers import SharedStats, owned_partitions
+from app.utils.metrics import Registry
+from app.utils.shared_slots import SharedSlots
+from benchmarks.synthetic import make_wallets
+
+
+def test_slots_roundtrip_and_reopen(tmp_path):
+    path = str(tmp_path / "slots")
+    slots = SharedSlots.create(path, 3, slot_bytes=256)
+    assert slots.read_all() == [None, None, None]
+    slots.write(1, b"hello")
+    slots.write(1, b"hi")
+    other = SharedSlots(path)  # what another process would map
+    assert other.read_all() == [None, b"hi", None]
+    slots.clear(1)
+    assert other.read(1) is None
+    try:
+        slots.write(0, b"x" * 256)
+        raise AssertionError("oversized payload accepted")
+    except ValueError:
+        pass
+    other.close()
+    slots.unlink()
+    assert not os.path.exists(path)
+
+
+def test_reader_never_sees_a_torn_write(tmp_path):
+    slots = SharedSlots.create(str(tmp_path / "slots"), 1, slot_bytes=1 << 16)
+    reader = SharedSlots(slots.path)
+    stop = threading.Event()
+
+    def write():
+        i = 0
+        while not stop.is_set():
+            i += 1
+            slots.write(0, bytes([i % 251]) * (1000 + i % 5000))
+
+    t = threading.Thread(target=write)
+    t.start()
+    try:
+        seen = 0
+        for _ in range(3000):
+            data = reader.read(0)
+            if data:
+                assert data == data[:1] * len(data)
+                seen += 1
+        assert seen
+    finally:
+        stop.set()
+        t.join()
+
+
+def test_owned_partitions_cover_each_partition_once():
+    parts = [5, 0, 3, 1, 4, 2, 6]
+    owned = [owned_partitions(parts, w, 3) for w in range(3)]
+    assert sorted(p for o in owned for p in o) == sorted(parts)
+    assert [len(o) for o in owned] == [3, 2, 2]
+    assert owned_partitions(parts, 0, 1) == sorted(parts)
+    assert owned_partitions([0], 1, 2) == []
+
+
+def test_merged_exports_equal_one_registry():
+    together, parts = Registry(), [Registry(), Registry()]
+    for i in range(1, 2001):
+        for reg in (together, parts[i % 2]):
+            reg.histogram("lat_seconds", "latency", stage="a").record_ns(i * 1000)
+            reg.counter("hits_total", "hits", outcome="ok").inc()
+    exports = json.loads(json.dumps([p.export() for p in parts]))  # through the shared file's encoding
+    merged = Registry.merged(exports)
+    assert merged.render() == together.render()
+
+
+def test_stats_endpoint_aggregates_workers(tmp_path, monkeypatch):
+    slots = SharedSlots.create(str(tmp_path / "slots"), 2, slot_bytes=1 << 20)
+    other = Registry()
+    other.counter("scoring_wallets_total", "Wallets scored over HTTP", outcome="success").inc(5)
+    other.counter("scoring_wallets_ms_total", "Summed HTTP scoring time of all wallets, ms").inc(50)
+    slots.write(1, json.dumps({"worker": 1, "pid": 1, "published": time.time(),
+                               "stats": {"processed": 5}, "metrics": other.export()}).encode())
+    shared = SharedStats(slots, 0)
+    shared._snapshot = main._worker_snapshot
+    monkeypatch.setattr(main, "shared_stats", shared)
+    monkeypatch.setattr(main, "WORKER_ID", 0)
+
+    client = TestClient(app)
+    assert client.post("/api/v1/score", json=make_wallets(1, n_tx=10)[0]).status_code == 200
+    local = main._local_stats()
+    out = client.get("/api/v1/stats").json()
+    assert out["worker"] == 0 and set(out["workers"]) == {"0", "1"}
+    assert out["workers"]["1"]["processed"] == 5
+    assert out["total"]["success"] == local["success"] + 5
+    assert out["total"]["processed"] == local["processed"] + 5
+    metrics = client.get("/api/v1/metrics").text
+    assert f'scoring_wallets_total{{outcome="success"}} {local["success"] + 5}' in metrics
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def test_serve_runs_workers_sharing_one_port(tmp_path):
+    port = _free_port()
+    stats_path = str(tmp_path / "stats")
+    proc = subprocess.Popen([sys.executable, "-m", "app.serve", "--workers", "2", "--host", "127.0.0.1",
+                             "--port", str(port), "--shared-stats", stats_path, "--log-level", "warning"],
+                            env=dict(os.environ, SHARED_STATS_INTERVAL_S="0.1"))
+    try:
+        base = f"http://127.0.0.1:{port}"
+        deadline = time.time() + 60
+        workers = {}
+        while time.time() < deadline and len(workers) < 2:
+            try:
+                workers = httpx.get(f"{base}/api/v1/stats", timeout=5).json()["workers"]
+            except (httpx.HTTPError, KeyError):
+                pass
+            time.sleep(0.2)
+        assert set(workers) == {"0", "1"}
+        assert workers["0"]["pid"] != workers["1"]["pid"]
+
+        body = make_wallets(1, n_tx=10)[0]
+        with httpx.Client(base_url=base, timeout=10) as client:
+            for _ in range(20):
+                assert client.post("/api/v1/score", json=body).status_code == 200
+        time.sleep(0.3)
+        out = httpx.get(f"{base}/api/v1/stats", timeout=5).json()
+        assert out["total"]["success"] == sum(w["success"] for w in out["workers"].values()) == 20
+    finally:
+        proc.terminate()
+        assert proc.wait(30) == 0
+    assert not os.path.exists(stats_path)